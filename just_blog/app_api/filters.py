@@ -1,6 +1,7 @@
 from django_filters import rest_framework as filters
 from app_auth.models import Profile
-from app_blog.models import Post, Blog
+from app_blog.models import Post, Blog, parse_tags
+from django.db.models import QuerySet
 
 
 class ProfileFilter(filters.FilterSet):
@@ -27,11 +28,21 @@ class PostFilter(filters.FilterSet):
         Allows to filter the list by username of the post's owner
         (taken from the User instance of the Profile instance),
         its tag, title.
+        The tag filter accepts one or several space-separated tags and returns the posts
+        having all of them, looked up by the index of the links to the tags.
     """
     username = filters.CharFilter(field_name='profile__user__username')
-    tag = filters.CharFilter(field_name='tag')
+    tag = filters.CharFilter(method='filter_tag')
     title = filters.CharFilter(field_name='title')
 
+    def filter_tag(self, queryset: QuerySet, name: str, value: str) -> QuerySet:
+        """
+            Filters the posts by every tag parsed from the value.
+        """
+        for slug in parse_tags(value):
+            queryset = queryset.filter(post_tags__tag__slug=slug)
+        return queryset
+
     class Meta:
         model = Post
         fields = 'username', 'tag', 'title',
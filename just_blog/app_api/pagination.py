@@ -0,0 +1,120 @@
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+from django.db.models import QuerySet, Model
+from rest_framework.compat import coreapi, coreschema
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import LimitOffsetPagination
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param, remove_query_param
+from rest_framework.views import APIView
+from app_blog.pagination import KeysetPaginator, KeysetPage, InvalidCursor
+
+
+class KeysetPagination(LimitOffsetPagination):
+    """
+    A pagination class that retrieves the pages by the values of the ordering fields
+    (see app_blog.pagination.KeysetPaginator) and returns opaque next and previous tokens
+    instead of offsets.
+    If the request contains the offset parameter, falls back to the default LimitOffsetPagination,
+    so the old links keep working.
+    """
+    cursor_query_param = 'cursor'
+    ordering = ('-id',)
+    invalid_cursor_message = 'Invalid cursor'
+    # The alternative orderings chosen with the ordering parameter, e.g. {'activity': ('-published_count', 'id')}.
+    ordering_query_param = 'ordering'
+    orderings = {}
+
+    def get_ordering(self, request: Request) -> Tuple[str, ...]:
+        """
+        Returns the ordering chosen with the ordering parameter or the default one.
+        """
+        return self.orderings.get(request.query_params.get(self.ordering_query_param), self.ordering)
+
+    def paginate_queryset(self, queryset: QuerySet, request: Request, view: APIView = None) -> Optional[List[Model]]:
+        """
+        Uses the LimitOffsetPagination if the offset parameter was passed, otherwise the KeysetPaginator.
+        """
+        self.keyset_page = None
+        ordering = self.get_ordering(request)
+        if self.offset_query_param in request.query_params:
+            if ordering != self.ordering:
+                queryset = queryset.order_by(*ordering)
+            return super().paginate_queryset(queryset, request, view)
+
+        self.request = request
+        self.limit = self.get_limit(request)
+        if self.limit is None:
+            return None
+        paginator = KeysetPaginator(queryset, self.limit, ordering=ordering)
+        try:
+            self.keyset_page = paginator.page(request.query_params.get(self.cursor_query_param))
+        except InvalidCursor:
+            raise NotFound(self.invalid_cursor_message)
+        return self.keyset_page.object_list
+
+    def get_cursor_link(self, cursor: Optional[str]) -> Optional[str]:
+        """
+        Generates an absolute link to the page with the passed token.
+        """
+        if cursor is None:
+            return None
+        url = remove_query_param(self.request.build_absolute_uri(), self.offset_query_param)
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+    def get_paginated_response(self, data: List[dict]) -> Response:
+        """
+        Returns the results with the next and previous links. In the keyset mode there is no count field.
+        """
+        if self.keyset_page is None:
+            return super().get_paginated_response(data)
+        page: KeysetPage = self.keyset_page
+        return Response(OrderedDict([
+            ('next', self.get_cursor_link(page.next_cursor)),
+            ('previous', self.get_cursor_link(page.previous_cursor)),
+            ('results', data),
+        ]))
+
+    def get_schema_fields(self, view: APIView) -> list:
+        """
+        Adds the cursor parameter to the schema fields of the LimitOffsetPagination.
+        """
+        fields = super().get_schema_fields(view)
+        fields.append(
+            coreapi.Field(
+                name=self.cursor_query_param,
+                required=False,
+                location='query',
+                schema=coreschema.String(
+                    title='Cursor',
+                    description='The pagination cursor value.'
+                )
+            )
+        )
+        return fields
+
+
+class PostKeysetPagination(KeysetPagination):
+    """
+    Paginates the published posts by (published_at, id), the newest first.
+    """
+    ordering = ('-published_at', '-id')
+
+
+class BlogKeysetPagination(KeysetPagination):
+    """
+    Paginates the blogs by their id, or with ordering=activity by the stored number of the published posts,
+    the most active first.
+    """
+    ordering = ('id',)
+    orderings = {'activity': ('-published_count', 'id')}
+
+
+class ProfileKeysetPagination(KeysetPagination):
+    """
+    Paginates the profiles by their id, or with ordering=activity by the stored number of the published posts,
+    the most active first.
+    """
+    ordering = ('id',)
+    orderings = {'activity': ('-published_count', 'id')}
@@ -1,5 +1,6 @@
 from rest_framework.permissions import BasePermission, SAFE_METHODS
 from app_auth.models import Profile
+from app_auth.utils import get_request_profile
 from app_blog.models import Blog, Post, Image
 from django.http import HttpRequest
 from rest_framework.views import View
@@ -54,9 +55,9 @@ class IsBlogsOwner(BasePermission):
             return True
 
         if request.user.is_authenticated:
-            cur_profile: Profile = Profile.objects.get(user=request.user)
+            cur_profile: Profile = get_request_profile(request)
 
-            return obj.profile == cur_profile
+            return cur_profile is not None and obj.profile_id == cur_profile.pk
 
 
 class IsPostOwner(BasePermission):
@@ -69,8 +70,8 @@ class IsPostOwner(BasePermission):
         if request.method in SAFE_METHODS and obj.is_published:
             return True
         if request.user.is_authenticated:
-            cur_profile: Profile = Profile.objects.get(user=request.user)
-            return obj.profile == cur_profile
+            cur_profile: Profile = get_request_profile(request)
+            return cur_profile is not None and obj.profile_id == cur_profile.pk
 
 
 class IsImageOwner(BasePermission):
@@ -86,6 +87,6 @@ class IsImageOwner(BasePermission):
         if request.method in SAFE_METHODS:
             return True
         if request.user.is_authenticated:
-            cur_profile: Profile = Profile.objects.select_related('user').get(user=request.user)
-            return obj.post.profile == cur_profile
+            cur_profile: Profile = get_request_profile(request)
+            return cur_profile is not None and obj.post.profile_id == cur_profile.pk
 
@@ -1,21 +1,128 @@
+from django.conf import settings
+from django.db.models import Count, Expression, Prefetch, QuerySet
+from django.db.models.functions import Substr
 from rest_framework import serializers
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.request import Request
 from rest_framework.fields import CurrentUserDefault
 from app_auth.models import Profile
+from app_auth.utils import get_request_profile
 from django.contrib.auth.models import User
-from app_blog.models import Blog, Post, Image
-from typing import Dict, Union
+from app_blog.models import Blog, Post, Image, Tag
+from app_jobs.models import Job
+from app_uploads.models import Upload
+from app_media.derivatives import get_srcset, WEBP
+import os
+import re
+from typing import Callable, Dict, Iterable, List, Tuple, Union
 
 
 class CurrentProfileDefault(CurrentUserDefault):
     """
         Overrides the CurrentUserDefault field from rest_framework. In the __call__ method
-        instead of returning request.user instance gets the related Profile instance and
-        returns it.
+        instead of returning request.user instance returns the related Profile instance
+        resolved once per request.
     """
 
     def __call__(self, serializer_field):
-        cur_profile = Profile.objects.get(user=serializer_field.context['request'].user)
-        return cur_profile
+        return get_request_profile(serializer_field.context['request'])
+
+
+class SrcsetField(serializers.ReadOnlyField):
+    """
+        A read-only field with the srcset of the image field of the instance in the format
+        of the original (srcset) and in WebP (webp_srcset). The srcsets are empty
+        while the derivatives are not generated. The urls are absolute if there is a request in the context.
+    """
+
+    def __init__(self, image_field: str, **kwargs):
+        self.image_field = image_field
+        kwargs['source'] = '*'
+        super().__init__(**kwargs)
+
+    def build_srcset(self, srcset: str) -> str:
+        """
+            Makes the urls of the srcset absolute with the request from the context.
+        """
+        request = self.context.get('request')
+        if not request or not srcset:
+            return srcset
+        candidates = (candidate.rsplit(' ', 1) for candidate in srcset.split(', '))
+        return ', '.join(f'{request.build_absolute_uri(url)} {width}' for url, width in candidates)
+
+    def to_representation(self, instance) -> Dict[str, str]:
+        return {
+            'srcset': self.build_srcset(get_srcset(instance, self.image_field)),
+            'webp_srcset': self.build_srcset(get_srcset(instance, self.image_field, WEBP)),
+        }
+
+
+def get_requested_fields(request: Request, names: Iterable[str]) -> List[str]:
+    """
+        Returns the names of the fields to return for the request, in their order: the ones listed
+        in the fields query parameter (all, if it is missing) except the ones listed in the exclude parameter.
+        Both parameters are comma-separated, the unknown names are ignored. The id is always returned.
+    """
+    names = list(names)
+    requested = request.query_params.get('fields')
+    if requested:
+        wanted = {name.strip() for name in requested.split(',')} | {'id'}
+        names = [name for name in names if name in wanted]
+    excluded = request.query_params.get('exclude')
+    if excluded:
+        unwanted = {name.strip() for name in excluded.split(',')} - {'id'}
+        names = [name for name in names if name not in unwanted]
+    return names
+
+
+class SparseFieldsMixin:
+    """
+        A mixin for the model serializers returning the sparse fieldsets: for the safe requests only the fields
+        chosen with the fields and exclude query parameters are kept (see get_requested_fields).
+        prepare_queryset() adapts the queryset of the list to the returned fields: it loads only their columns
+        with only() and select_related(), and adds only their prefetches and annotations.
+    """
+    # The columns read by the fields, by the name of the field. The columns of the related models are selected
+    # with select_related(). The fields missing here read the column of the same name, if the model has it.
+    field_columns: Dict[str, Tuple[str, ...]] = {}
+    # The lookups prefetched for the fields.
+    field_prefetches: Dict[str, Tuple[Union[str, Prefetch], ...]] = {}
+    # The functions returning the expressions annotated for the fields.
+    field_annotations: Dict[str, Callable[[], Expression]] = {}
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+        if request is not None and request.method in SAFE_METHODS:
+            requested = set(get_requested_fields(request, self.fields))
+            for name in list(self.fields):
+                if name not in requested:
+                    self.fields.pop(name)
+
+    @classmethod
+    def prepare_queryset(cls, queryset: QuerySet, names: Iterable[str], columns: Iterable[str] = ()) -> QuerySet:
+        """
+            Adapts the queryset to the fields with the passed names. The passed columns are loaded too.
+        """
+        names = list(names)
+        concrete = {field.name for field in queryset.model._meta.concrete_fields}
+        columns = {'id', *columns}
+        for name in names:
+            columns.update(cls.field_columns.get(name, (name,) if name in concrete else ()))
+        related = {column.rsplit('__', 1)[0] for column in columns if '__' in column}
+        for path in related:
+            parts = path.split('__')
+            columns.update('__'.join(parts[:index]) for index in range(1, len(parts) + 1))
+        if related:
+            queryset = queryset.select_related(*related)
+        queryset = queryset.only(*columns)
+        prefetches = [lookup for name in names for lookup in cls.field_prefetches.get(name, ())]
+        if prefetches:
+            queryset = queryset.prefetch_related(*prefetches)
+        annotations = {name: cls.field_annotations[name]() for name in names if name in cls.field_annotations}
+        if annotations:
+            queryset = queryset.annotate(**annotations)
+        return queryset
 
 
 class ProfileSerializer(serializers.ModelSerializer):
@@ -25,11 +132,12 @@ class ProfileSerializer(serializers.ModelSerializer):
     """
     class Meta:
         model = Profile
-        fields = 'id', 'bio', 'age', 'avatar', 'user',
+        fields = 'id', 'bio', 'age', 'avatar', 'avatar_srcset', 'user',
         extra_kwargs = {'bio': {'required': False}, 'age': {'required': False}}
 
     user = serializers.HiddenField(default=CurrentUserDefault())
     avatar = serializers.ImageField(required=False)
+    avatar_srcset = SrcsetField('avatar')
 
 
 class ProfileShortSerializer(serializers.ModelSerializer):
@@ -56,13 +164,28 @@ class BlogShortSerializer(serializers.ModelSerializer):
         fields = 'id', 'title'
 
 
-class ProfileFullSerializer(serializers.ModelSerializer):
+class ProfileFullSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """
         A serializer for the Profile model. Not only includes all of its fields but also
         the fields of the related User instance.
         The fields blogs and posts are represented as hyper linked related fields.
+        The counters blog_count, post_count, published_count and image_count are read from the profile.
+        Supports the sparse fieldsets (see SparseFieldsMixin).
         Used in the ProfileListApiView.
     """
+    field_columns = {
+        'username': ('user__username',),
+        'first_name': ('user__first_name',),
+        'last_name': ('user__last_name',),
+        'email': ('user__email',),
+        'avatar_srcset': ('avatar', 'avatar_derivatives'),
+        'blogs': (),
+        'posts': (),
+    }
+    field_prefetches = {
+        'blogs': (Prefetch('blogs', queryset=Blog.objects.only('id', 'profile')),),
+        'posts': (Prefetch('posts', queryset=Post.objects.only('id', 'profile')),),
+    }
     username = serializers.CharField(source='user.username', read_only=True)
     first_name = serializers.CharField(source='user.first_name', read_only=True)
     last_name = serializers.CharField(source='user.last_name', read_only=True)
@@ -81,10 +204,38 @@ class ProfileFullSerializer(serializers.ModelSerializer):
     )
 
     avatar = serializers.ImageField()
+    avatar_srcset = SrcsetField('avatar')
 
     class Meta:
         model = Profile
-        fields = 'id', 'user', 'username', 'first_name', 'last_name', 'email', 'age', 'bio', 'avatar', 'blogs', 'posts'
+        fields = (
+            'id', 'user', 'username', 'first_name', 'last_name', 'email', 'age', 'bio', 'avatar', 'avatar_srcset',
+            'blogs', 'posts', 'blog_count', 'post_count', 'published_count', 'image_count',
+        )
+
+
+class ProfileCompactSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    """
+        A compact serializer for the Profile model with the fields id, user, username, first_name, last_name,
+        avatar and the counters blog_count, post_count, published_count and image_count
+        instead of the links to the blogs and the posts.
+        Used in the ProfileListApiView with compact=true.
+    """
+    field_columns = {
+        'username': ('user__username',),
+        'first_name': ('user__first_name',),
+        'last_name': ('user__last_name',),
+    }
+    username = serializers.CharField(source='user.username', read_only=True)
+    first_name = serializers.CharField(source='user.first_name', read_only=True)
+    last_name = serializers.CharField(source='user.last_name', read_only=True)
+
+    class Meta:
+        model = Profile
+        fields = (
+            'id', 'user', 'username', 'first_name', 'last_name', 'avatar',
+            'blog_count', 'post_count', 'published_count', 'image_count',
+        )
 
 
 class BlogCreateSerializer(serializers.ModelSerializer):
@@ -114,11 +265,14 @@ class ImageShortSerializer(serializers.ModelSerializer):
         fields = 'id', 'title'
 
 
-class PostSerializer(serializers.ModelSerializer):
+class PostSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """
         A serializer for the Post model with all of its fields.
+        Supports the sparse fieldsets (see SparseFieldsMixin).
         Used in the PostListApiView.
     """
+    field_columns = {'blog': ('blog__title',), 'profile': ('profile__user__username',)}
+    field_prefetches = {'images': (Prefetch('images', queryset=Image.objects.only('id', 'title', 'post')),)}
 
     class Meta:
         model = Post
@@ -129,18 +283,60 @@ class PostSerializer(serializers.ModelSerializer):
     images = ImageShortSerializer(many=True, read_only=True)
 
 
-class BlogDetailSerializer(serializers.ModelSerializer):
+class PostCompactSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    """
+        A compact serializer for the Post model with the fields id, title, tag, the first API_EXCERPT_LENGTH
+        characters of the content (excerpt), created_at, published_at, the ids of the blog and the profile
+        and the number of the images (image_count) instead of their list.
+        Used in the PostListApiView with compact=true.
+    """
+    field_annotations = {
+        'excerpt': lambda: Substr('content', 1, settings.API_EXCERPT_LENGTH),
+        'image_count': lambda: Count('images', distinct=True),
+    }
+
+    class Meta:
+        model = Post
+        fields = 'id', 'title', 'tag', 'excerpt', 'created_at', 'published_at', 'blog', 'profile', 'image_count'
+
+    excerpt = serializers.CharField(read_only=True)
+    image_count = serializers.IntegerField(read_only=True)
+
+
+class PostSearchSerializer(serializers.ModelSerializer):
+    """
+        A serializer for the posts found by the search with the fields id, title, tag, published_at, blog and profile,
+        the relevance (rank), the title with the found words in the <mark> tags (highlighted_title)
+        and a snippet of the content with the found words in the <mark> tags (snippet).
+        Used in the SearchApiView.
+    """
+
+    class Meta:
+        model = Post
+        fields = 'id', 'title', 'tag', 'published_at', 'blog', 'profile', 'rank', 'highlighted_title', 'snippet'
+
+    blog = BlogShortSerializer()
+    profile = ProfileShortSerializer()
+    rank = serializers.FloatField(source='search_rank', read_only=True)
+    highlighted_title = serializers.CharField(source='search_title', read_only=True)
+    snippet = serializers.CharField(source='search_snippet', read_only=True)
+
+
+class BlogDetailSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """
         A serializer for the Blog model with the field id, title,
-        description, posts and profile.
+        description, posts, profile and the counters post_count, published_count and image_count.
         The field posts is defined as a HyperlinkedRelatedField.
         The field profile is defined with the ProfileShortSerializer.
+        Supports the sparse fieldsets (see SparseFieldsMixin).
         Used in the BlogDetailApiView and the BlogListApiView.
     """
+    field_columns = {'profile': ('profile__user__username',), 'posts': ()}
+    field_prefetches = {'posts': (Prefetch('posts', queryset=Post.objects.only('id', 'blog')),)}
 
     class Meta:
         model = Blog
-        fields = 'id', 'title', 'description', 'posts', 'profile',
+        fields = 'id', 'title', 'description', 'posts', 'profile', 'post_count', 'published_count', 'image_count',
         extra_kwargs = {
             'id': {'read_only': True},
             'description': {'required': False},
@@ -156,6 +352,18 @@ class BlogDetailSerializer(serializers.ModelSerializer):
     profile = ProfileShortSerializer(read_only=True)
 
 
+class BlogCompactSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    """
+        A compact serializer for the Blog model with the fields id, title, description, the id of the profile
+        and the counters post_count, published_count and image_count instead of the links to the posts.
+        Used in the BlogListApiView with compact=true.
+    """
+
+    class Meta:
+        model = Blog
+        fields = 'id', 'title', 'description', 'profile', 'post_count', 'published_count', 'image_count',
+
+
 class PostCreateSerializer(serializers.ModelSerializer):
     """
         A serializer for the Post model with the fields id, title, tag,
@@ -214,6 +422,24 @@ class PostDetailSerializer(serializers.ModelSerializer):
 
     images = ImageShortSerializer(many=True, read_only=True)
 
+    def update(self, instance: Post, validated_data: Dict) -> Post:
+        """
+        Saves only the changed fields of the post. The change of is_published is written
+        with Post.publish() or Post.archive(), whose conditional UPDATE is atomic under the concurrent toggles.
+        """
+        is_published = validated_data.pop('is_published', None)
+        changed = [field for field, value in validated_data.items() if getattr(instance, field) != value]
+        for field in changed:
+            setattr(instance, field, validated_data[field])
+        if changed:
+            instance.save(update_fields=changed)
+        if is_published is not None and is_published != instance.is_published:
+            if is_published:
+                instance.publish()
+            else:
+                instance.archive()
+        return instance
+
 
 class ImageCreateSerializer(serializers.ModelSerializer):
     """
@@ -244,12 +470,13 @@ class ImageCreateSerializer(serializers.ModelSerializer):
 class ImageDetailSerializer(serializers.ModelSerializer):
     """
         A serializer for the Image model with all its fields.
+        The image_srcset field contains the srcsets of the thumbnails of the image.
     """
 
     class Meta:
         model = Image
         fields = (
-            'id', 'title', 'image', 'post',
+            'id', 'title', 'image', 'image_srcset', 'post',
         )
         extra_kwargs = {
             'id': {'read_only': True},
@@ -257,3 +484,163 @@ class ImageDetailSerializer(serializers.ModelSerializer):
             'image': {'required': False},
             'title': {'required': False},
         }
+
+    image_srcset = SrcsetField('image')
+
+
+class PostImportSerializer(serializers.Serializer):
+    """
+        A serializer for the csv file with the posts to import into the blog.
+        The file should contain three columns: title, tag and content.
+        Used in the PostImportApiView.
+    """
+
+    file = serializers.FileField()
+
+
+class PostBatchSerializer(serializers.Serializer):
+    """
+        A serializer for the requests to the batch endpoints of the posts: the list of the items (items)
+        with at most POST_BATCH_MAX_ITEMS elements. Every item is validated with the item serializer of the view.
+        Used in the PostBatchApiView.
+    """
+
+    items = serializers.ListField(child=serializers.DictField(), allow_empty=False)
+
+    def validate_items(self, items: List[Dict]) -> List[Dict]:
+        """
+        Checks the number of the items.
+        """
+        limit = settings.POST_BATCH_MAX_ITEMS
+        if len(items) > limit:
+            raise serializers.ValidationError(f'Ensure this field has no more than {limit} elements.')
+        return items
+
+
+class PostBatchCreateSerializer(serializers.ModelSerializer):
+    """
+        A serializer for an item of the batch creation of the posts with the fields title, tag, blog (id: int)
+        and content. The blog is validated as an integer, the blogs of all the items are checked by the view at once.
+        Used in the PostBatchCreateApiView.
+    """
+
+    class Meta:
+        model = Post
+        fields = 'title', 'tag', 'blog', 'content'
+
+    blog = serializers.IntegerField()
+
+
+class PostBatchPublishSerializer(serializers.Serializer):
+    """
+        A serializer for an item of the batch publication of the posts with the fields id and is_published.
+        Used in the PostBatchPublishApiView.
+    """
+
+    id = serializers.IntegerField()
+    is_published = serializers.BooleanField()
+
+
+class PostBatchDeleteSerializer(serializers.Serializer):
+    """
+        A serializer for an item of the batch deletion of the posts with the field id.
+        Used in the PostBatchDeleteApiView.
+    """
+
+    id = serializers.IntegerField()
+
+
+class TagSerializer(serializers.ModelSerializer):
+    """
+        A serializer for the Tag model with the fields id, name, slug
+        and post_count (the number of the published posts with the tag).
+    """
+
+    class Meta:
+        model = Tag
+        fields = 'id', 'name', 'slug', 'post_count',
+        read_only_fields = fields
+
+
+class JobSerializer(serializers.ModelSerializer):
+    """
+        A serializer for the Job model with its status and result.
+        Used in the PostImportApiView and the JobDetailApiView.
+    """
+
+    class Meta:
+        model = Job
+        fields = (
+            'id', 'name', 'status', 'attempts', 'max_attempts', 'result', 'created_at', 'finished_at',
+        )
+        read_only_fields = fields
+
+
+class UploadSerializer(serializers.ModelSerializer):
+    """
+        A serializer for the Upload model: creates a session of a chunked upload and returns its state.
+        The image uploads need the title and the post of the image, chosen from the posts
+        of the current Profile instance, the avatar uploads have neither.
+        Used in the upload api views.
+    """
+    owner = serializers.HiddenField(default=CurrentUserDefault())
+
+    class Meta:
+        model = Upload
+        fields = (
+            'id', 'target', 'filename', 'size', 'checksum', 'title', 'post', 'offset', 'status', 'result', 'error',
+            'created_at', 'updated_at', 'owner',
+        )
+        read_only_fields = 'offset', 'status', 'result', 'error', 'created_at', 'updated_at',
+
+    def __init__(self, *args, **kwargs):
+        """
+            Overrides the __init__ method to retrieve the post only from the posts
+            related to the current Profile instance.
+        """
+        profile = kwargs.get('context', {}).get('profile')
+        super().__init__(*args, **kwargs)
+        self.fields['post'] = serializers.PrimaryKeyRelatedField(
+            queryset=Post.objects.filter(profile=profile), required=False, allow_null=True
+        )
+
+    def validate_filename(self, value: str) -> str:
+        """
+            Keeps only the base name of the file.
+        """
+        value = os.path.basename(value.replace('\\', '/')).strip()
+        if not value:
+            raise serializers.ValidationError('The file name is empty.')
+        return value
+
+    def validate_size(self, value: int) -> int:
+        """
+            Checks that the file is not empty and not larger than UPLOAD_MAX_SIZE.
+        """
+        if not 0 < value <= settings.UPLOAD_MAX_SIZE:
+            raise serializers.ValidationError(f'The size should be from 1 to {settings.UPLOAD_MAX_SIZE} bytes.')
+        return value
+
+    def validate_checksum(self, value: str) -> str:
+        """
+            Checks that the checksum is a hex SHA-256 digest.
+        """
+        value = value.lower()
+        if not re.fullmatch(r'[0-9a-f]{64}', value):
+            raise serializers.ValidationError('The checksum should be a hex SHA-256 digest.')
+        return value
+
+    def validate(self, attrs: Dict) -> Dict:
+        """
+            Checks that an image upload has the title and the post, and that an avatar upload has neither
+            and the current user has a profile.
+        """
+        if attrs['target'] == Upload.IMAGE:
+            if not attrs.get('post') or not attrs.get('title'):
+                raise serializers.ValidationError('The image upload needs the title and the post.')
+        else:
+            if attrs.get('post') or attrs.get('title'):
+                raise serializers.ValidationError('The avatar upload has no title and post.')
+            if self.context.get('profile') is None:
+                raise serializers.ValidationError('The current user has no profile.')
+        return attrs
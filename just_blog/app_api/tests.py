@@ -2,15 +2,31 @@ from random import choices
 from string import ascii_letters
 import json
 from PIL import Image as PilImage
+from hashlib import sha256
 from rest_framework.test import APITestCase
 from django.shortcuts import reverse
 from rest_framework import status
 from django.contrib.auth.models import User
 from app_auth.models import Profile
-from app_blog.models import Blog, Post, Image
+from app_blog.models import Blog, Post, Image, Tag
 import os
 from django.core.files import File
 from django.forms import model_to_dict
+from django.core.files.uploadedfile import SimpleUploadedFile
+from app_jobs.utils import run_pending_jobs
+from app_blog.utils import reconcile_counters
+from django.db import connection
+from django.test import override_settings
+from rest_framework import serializers
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+from app_api.serializers import BlogCompactSerializer, BlogDetailSerializer, PostCompactSerializer, PostSerializer, \
+    ProfileCompactSerializer, ProfileFullSerializer
+from app_api.values import UnsupportedField, ValuesSerializer
+from app_jobs.testing import TemporaryMediaTestMixin
+from django.test.utils import CaptureQueriesContext
+from django.utils.http import http_date
+import time
 
 
 class CreateUserAPITestCase(APITestCase):
@@ -103,6 +119,22 @@ class ProfileListAPITestCase(APITestCase):
 
         self.assertEqual(total_objects, Profile.objects.count())
 
+    def test_profile_list_compact(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url, {'compact': 'true'})
+        self.assertEqual(len(queries), 1)
+        result = response.json()['results'][0]
+        profile = Profile.objects.select_related('user').get(pk=result['id'])
+        self.assertEqual(set(result), {
+            'id', 'user', 'username', 'first_name', 'last_name', 'avatar',
+            'blog_count', 'post_count', 'published_count', 'image_count',
+        })
+        self.assertEqual(result['username'], profile.user.username)
+        self.assertEqual(result['blog_count'], profile.blogs.count())
+
+        response = self.client.get(self.url, {'fields': 'username,avatar_srcset'})
+        self.assertEqual(set(response.json()['results'][0]), {'id', 'username', 'avatar_srcset'})
+
 
 class ProfileCreateAPITestCase(APITestCase):
     fixtures = [
@@ -135,7 +167,7 @@ class ProfileCreateAPITestCase(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
 
 
-class ProfileUpdateAPITestCase(APITestCase):
+class ProfileUpdateAPITestCase(TemporaryMediaTestMixin, APITestCase):
 
     @classmethod
     def setUpClass(cls):
@@ -181,7 +213,9 @@ class ProfileUpdateAPITestCase(APITestCase):
 
         with open(self.path_to_test_image, 'rb') as file:
             image_upload_patch_response = self.client.patch(self.url, {'avatar': file}, format='multipart')
-        self.assertContains(image_upload_patch_response, 'test-image')
+        # The avatar is named by its content.
+        with open(self.path_to_test_image, 'rb') as file:
+            self.assertContains(image_upload_patch_response, sha256(file.read()).hexdigest())
         updated_profile = Profile.objects.get(user=self.user)
         self.assertIsNotNone(updated_profile.avatar)
         self.client.logout()
@@ -260,7 +294,10 @@ class BlogDetailAPITestCase(APITestCase):
             "title": "test title",
             "description": "test description",
             "posts": [],
-            "profile": {"id": self.profile.pk, "username": self.user.username}
+            "profile": {"id": self.profile.pk, "username": self.user.username},
+            "post_count": 0,
+            "published_count": 0,
+            "image_count": 0,
         }
 
     def test_blog_detail_get(self):
@@ -285,6 +322,17 @@ class BlogDetailAPITestCase(APITestCase):
         self.assertJSONEqual(patch_response.content, self.expected_data)
         self.client.logout()
 
+    def test_blog_detail_conditional(self):
+        etag = self.client.get(self.url).headers['ETag']
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_304_NOT_MODIFIED)
+        self.client.force_authenticate(user=self.user)
+        owner_etag = self.client.get(self.url).headers['ETag']
+        self.assertNotEqual(owner_etag, etag)
+        response = self.client.patch(self.url, {'title': self.test_title}, format='json', HTTP_IF_MATCH=owner_etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.client.logout()
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_200_OK)
+
     def test_unauthorized_blog_update(self):
         unauthorized_put_response = self.client.put(
             self.url,
@@ -333,6 +381,7 @@ class BlogListAPITestCase(APITestCase):
         'app_auth/fixtures/profiles.json',
         'app_blog/fixtures/posts.json',
         'app_blog/fixtures/blogs.json',
+        'app_blog/fixtures/images.json',
     ]
 
     def setUp(self) -> None:
@@ -360,6 +409,45 @@ class BlogListAPITestCase(APITestCase):
 
         self.assertEqual(total_objects, Blog.objects.count())
 
+    def test_blog_list_activity_ordering(self):
+        expected = list(Blog.objects.order_by('-published_count', 'id').values_list('pk', 'published_count'))
+        received = []
+        response_to_python = json.loads(self.client.get(self.url, {'ordering': 'activity', 'limit': 3}).content)
+        while True:
+            received.extend((result['id'], result['published_count']) for result in response_to_python['results'])
+            if not response_to_python.get('next'):
+                break
+            response_to_python = json.loads(self.client.get(response_to_python['next']).content)
+        self.assertEqual(received, expected)
+
+        response_to_python = json.loads(self.client.get(self.url, {'ordering': 'activity', 'offset': 0}).content)
+        self.assertEqual([result['id'] for result in response_to_python['results']], [pk for pk, _ in expected])
+
+    def test_blog_list_sparse_fields(self):
+        response = self.client.get(self.url, {'fields': 'title,unknown'})
+        self.assertEqual(set(response.json()['results'][0]), {'id', 'title'})
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url, {'exclude': 'posts,id'})
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(
+            set(response.json()['results'][0]),
+            {'id', 'title', 'description', 'profile', 'post_count', 'published_count', 'image_count'}
+        )
+
+    def test_blog_list_compact(self):
+        expected = list(Blog.objects.order_by('-published_count', 'id').values_list('pk', 'profile_id'))
+        received = []
+        url, params = self.url, {'compact': '1', 'ordering': 'activity', 'limit': 2}
+        while url:
+            with CaptureQueriesContext(connection) as queries:
+                response_to_python = self.client.get(url, params).json()
+            self.assertEqual(len(queries), 1)
+            received.extend((result['id'], result['profile']) for result in response_to_python['results'])
+            url, params = response_to_python['next'], None
+        self.assertEqual(received, expected)
+        self.assertNotIn('posts', response_to_python['results'][0])
+
 
 class PostCreateAPITestCase(APITestCase):
 
@@ -413,6 +501,57 @@ class PostCreateAPITestCase(APITestCase):
         self.assertEqual(bad_post_response.status_code, status.HTTP_400_BAD_REQUEST)
 
 
+class PostImportAPITestCase(TemporaryMediaTestMixin, APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='importer', password='importer-password')
+        profile = Profile.objects.create(user=cls.user)
+        cls.bad_user = User.objects.create_user(username='bad-importer', password='importer-password')
+        Profile.objects.create(user=cls.bad_user)
+        cls.blog = Blog.objects.create(profile=profile, title='test title', description='test description')
+
+    def setUp(self) -> None:
+        self.url = reverse('app_api:post_import', kwargs={'pk': self.blog.pk})
+        self.client.force_authenticate(user=self.user)
+
+    def get_csv_file(self, content: str) -> SimpleUploadedFile:
+        return SimpleUploadedFile('posts.csv', content.encode('utf-8'), content_type='text/csv')
+
+    def test_post_import(self):
+        csv_file = self.get_csv_file('first title;first tag;first content\nsecond title;second tag\n')
+        response = self.client.post(self.url, {'file': csv_file}, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response.data['status'], 'pending')
+
+        run_pending_jobs()
+        job_url = reverse('app_api:job_detail', kwargs={'pk': response.data['id']})
+        job_response = self.client.get(job_url)
+        self.assertEqual(job_response.data['status'], 'done')
+        self.assertEqual(job_response.data['result']['created'], 1)
+        self.assertEqual(job_response.data['result']['errors'][0]['row'], 2)
+        self.assertTrue(Post.objects.filter(blog=self.blog, title='first title', is_published=False).exists())
+
+    def test_post_import_invalid(self):
+        response = self.client.post(self.url, {'file': SimpleUploadedFile('image.jpg', b'\xff\xd8\xff')})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Post.objects.filter(blog=self.blog).exists())
+
+    def test_post_import_not_owner(self):
+        self.client.force_authenticate(user=self.bad_user)
+        csv_file = self.get_csv_file('title;tag;content\n')
+        response = self.client.post(self.url, {'file': csv_file}, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertFalse(Post.objects.filter(blog=self.blog).exists())
+
+    def test_job_not_owner(self):
+        csv_file = self.get_csv_file('title;tag;content\n')
+        response = self.client.post(self.url, {'file': csv_file}, format='multipart')
+        self.client.force_authenticate(user=self.bad_user)
+        job_response = self.client.get(reverse('app_api:job_detail', kwargs={'pk': response.data['id']}))
+        self.assertEqual(job_response.status_code, status.HTTP_404_NOT_FOUND)
+
+
 class PostUpdateAPITestCase(APITestCase):
 
     @classmethod
@@ -472,8 +611,210 @@ class PostUpdateAPITestCase(APITestCase):
         self.client.patch(self.url, {'is_published': True}, format='json')
         self.assertFalse(Post.objects.get(pk=self.post.pk).created_at is None)
 
+    def test_post_publish_toggle_queries(self):
+        self.client.force_authenticate(user=self.user)
+        for is_published in (True, False, True):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.patch(self.url, {'is_published': is_published}, format='json')
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(response.data['is_published'], is_published)
+            statements = [query['sql'] for query in queries]
+            self.assertEqual(len([sql for sql in statements if ' FROM "app_blog_post" WHERE' in sql]), 1)
+            self.assertEqual(len([sql for sql in statements if sql.startswith('UPDATE "app_blog_post"')]), 1)
+        self.assertEqual(response.headers['ETag'], self.client.get(self.url).headers['ETag'])
+        self.assertEqual(reconcile_counters(dry_run=True), {'app_blog.Blog': 0, 'app_auth.Profile': 0})
+
+        with CaptureQueriesContext(connection) as queries:
+            self.client.patch(self.url, {'title': 'test post title', 'is_published': True}, format='json')
+        self.assertFalse([query for query in queries if query['sql'].startswith('UPDATE "app_blog_post"')])
+        response = self.client.patch(self.url, {'title': 'a new title', 'is_published': False}, format='json')
+        post = Post.objects.get(pk=self.post.pk)
+        self.assertEqual((post.title, post.is_published, post.published_at), ('a new title', False, None))
+        self.assertEqual(response.data['title'], 'a new title')
+        self.client.logout()
 
-class ImageCreateAPITestCase(APITestCase):
+    def test_post_conditional_get(self):
+        self.post.publish()
+        response = self.client.get(self.url)
+        etag = response.headers['ETag']
+        self.assertIn('Last-Modified', response.headers)
+        with self.assertNumQueries(1):
+            not_modified_response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(not_modified_response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(not_modified_response.headers['ETag'], etag)
+        self.client.force_authenticate(user=self.user)
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_200_OK)
+        self.client.logout()
+
+    def test_draft_conditional_get(self):
+        future = http_date(time.time() + 3600)
+        anonymous_response = self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=future)
+        self.assertEqual(anonymous_response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertNotIn('ETag', anonymous_response.headers)
+        anonymous_response = self.client.patch(
+            self.url, {'title': 'a new title'}, format='json', HTTP_IF_MATCH='"other"'
+        )
+        self.assertEqual(anonymous_response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertNotIn('ETag', anonymous_response.headers)
+
+        self.client.force_authenticate(user=self.bad_user)
+        forbidden_response = self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=future)
+        self.assertEqual(forbidden_response.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertNotIn('ETag', forbidden_response.headers)
+
+        self.client.force_authenticate(user=self.user)
+        response = self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=future)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.client.logout()
+
+    def test_post_conditional_update(self):
+        self.client.force_authenticate(user=self.user)
+        etag = self.client.get(self.url).headers['ETag']
+        failed_response = self.client.patch(
+            self.url, {'title': 'a new title'}, format='json', HTTP_IF_MATCH='"other"'
+        )
+        self.assertEqual(failed_response.status_code, status.HTTP_412_PRECONDITION_FAILED)
+        self.assertEqual(failed_response.headers['ETag'], etag)
+        self.assertEqual(Post.objects.get(pk=self.post.pk).title, 'test post title')
+
+        response = self.client.patch(self.url, {'title': 'a new title'}, format='json', HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response.headers['ETag'], etag)
+        self.assertEqual(self.client.get(self.url).headers['ETag'], response.headers['ETag'])
+        stale_response = self.client.delete(self.url, HTTP_IF_MATCH=etag)
+        self.assertEqual(stale_response.status_code, status.HTTP_412_PRECONDITION_FAILED)
+        self.assertTrue(Post.objects.filter(pk=self.post.pk).exists())
+        self.client.logout()
+
+
+class PostBatchAPITestCase(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        username = ''.join(choices(ascii_letters, k=5))
+        password = ''.join(choices(ascii_letters, k=9))
+        cls.user = User.objects.create_user(username=username, password=password)
+        cls.profile = Profile.objects.create(user=cls.user)
+        cls.blog = Blog.objects.create(profile=cls.profile, title='test blog title', description='test description')
+        cls.other_blog = Blog.objects.create(profile=cls.profile, title='other blog', description='other description')
+
+        cls.bad_user = User.objects.create_user(username=f'{username}09', password=f'{password}09')
+        bad_profile = Profile.objects.create(user=cls.bad_user)
+        cls.bad_blog = Blog.objects.create(profile=bad_profile, title='bad blog', description='bad description')
+        cls.bad_post = Post.objects.create(
+            profile=bad_profile, blog=cls.bad_blog, title='bad post', tag='batch', content='bad content'
+        )
+
+    def setUp(self) -> None:
+        self.client.force_authenticate(user=self.user)
+
+    def get_items(self, count: int, blog: Blog = None):
+        return [
+            {'title': f'batch post {number}', 'tag': 'batch tag', 'blog': (blog or self.blog).pk, 'content': 'content'}
+            for number in range(count)
+        ]
+
+    def create_posts(self, count: int):
+        url = reverse('app_api:post_batch_create')
+        response = self.client.post(url, {'items': self.get_items(count)}, format='json')
+        return [result['id'] for result in response.data['results']]
+
+    def test_batch_create(self):
+        items = self.get_items(2) + self.get_items(1, self.other_blog)
+        items.append({'title': 'a' * 129, 'tag': 'tag', 'blog': self.blog.pk, 'content': 'content'})
+        items.append({'title': 'title', 'tag': 'tag', 'blog': self.bad_blog.pk, 'content': 'content'})
+        response = self.client.post(reverse('app_api:post_batch_create'), {'items': items}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        results = response.data['results']
+        self.assertEqual([result['status'] for result in results], [201, 201, 201, 400, 400])
+        self.assertEqual([result['index'] for result in results], list(range(5)))
+        self.assertIn('title', results[3]['errors'])
+        self.assertIn('blog', results[4]['errors'])
+        self.assertEqual(
+            set(Post.objects.filter(profile=self.profile).values_list('pk', flat=True)),
+            {result['id'] for result in results[:3]}
+        )
+        self.assertEqual(Blog.objects.get(pk=self.blog.pk).post_count, 2)
+        self.assertEqual(Profile.objects.get(pk=self.profile.pk).post_count, 3)
+        self.assertEqual(reconcile_counters(dry_run=True), {'app_blog.Blog': 0, 'app_auth.Profile': 0})
+        self.assertEqual(Tag.objects.get(slug='batch').posts.count(), 4)
+
+    def test_batch_queries_do_not_grow(self):
+        counts = []
+        for count in (2, 20):
+            items = [{'id': pk, 'is_published': True} for pk in self.create_posts(count)]
+            with CaptureQueriesContext(connection) as queries:
+                self.client.post(reverse('app_api:post_batch_publish'), {'items': items}, format='json')
+            counts.append(len([query for query in queries if 'app_blog_post' in query['sql']]))
+        self.assertEqual(counts[0], counts[1])
+
+        counts = []
+        for count in (2, 20):
+            with CaptureQueriesContext(connection) as queries:
+                self.client.post(reverse('app_api:post_batch_create'), {'items': self.get_items(count)}, format='json')
+            counts.append(len(queries))
+        self.assertEqual(counts[0], counts[1])
+
+    def test_batch_publish(self):
+        first, second, third = self.create_posts(3)
+        items = [
+            {'id': first, 'is_published': True},
+            {'id': second, 'is_published': True},
+            {'id': third, 'is_published': False},
+            {'id': self.bad_post.pk, 'is_published': True},
+            {'id': 0, 'is_published': True},
+            {'id': first, 'is_published': False},
+            {'id': first},
+        ]
+        response = self.client.post(reverse('app_api:post_batch_publish'), {'items': items}, format='json')
+        results = response.data['results']
+        self.assertEqual([result['status'] for result in results], [200, 200, 200, 403, 404, 400, 400])
+        self.assertEqual([result['changed'] for result in results[:3]], [True, True, False])
+        self.assertEqual(
+            set(Post.objects.filter(is_published=True).values_list('pk', flat=True)), {first, second}
+        )
+        self.assertIsNotNone(Post.objects.get(pk=first).published_at)
+        self.assertFalse(Post.objects.get(pk=self.bad_post.pk).is_published)
+        self.assertEqual(Blog.objects.get(pk=self.blog.pk).published_count, 2)
+        self.assertEqual(reconcile_counters(dry_run=True), {'app_blog.Blog': 0, 'app_auth.Profile': 0})
+        self.assertEqual(Tag.objects.get(slug='batch').post_count, 2)
+        search_response = self.client.get(reverse('app_api:search'), {'q': 'batch'})
+        self.assertEqual(search_response.data['count'], 2)
+
+        items = [{'id': first, 'is_published': False}]
+        response = self.client.post(reverse('app_api:post_batch_publish'), {'items': items}, format='json')
+        self.assertTrue(response.data['results'][0]['changed'])
+        self.assertEqual(Tag.objects.get(slug='batch').post_count, 1)
+        self.assertIsNone(Post.objects.get(pk=first).published_at)
+
+    def test_batch_delete(self):
+        first, second, third = self.create_posts(3)
+        self.client.post(
+            reverse('app_api:post_batch_publish'), {'items': [{'id': first, 'is_published': True}]}, format='json'
+        )
+        items = [{'id': first}, {'id': second}, {'id': self.bad_post.pk}, {'id': 'a'}]
+        response = self.client.post(reverse('app_api:post_batch_delete'), {'items': items}, format='json')
+        self.assertEqual([result['status'] for result in response.data['results']], [204, 204, 403, 400])
+        self.assertEqual(list(Post.objects.filter(profile=self.profile).values_list('pk', flat=True)), [third])
+        self.assertTrue(Post.objects.filter(pk=self.bad_post.pk).exists())
+        self.assertEqual(Blog.objects.get(pk=self.blog.pk).post_count, 1)
+        self.assertEqual(reconcile_counters(dry_run=True), {'app_blog.Blog': 0, 'app_auth.Profile': 0})
+        self.assertEqual(Tag.objects.get(slug='batch').post_count, 0)
+
+    def test_batch_requests(self):
+        url = reverse('app_api:post_batch_create')
+        self.assertEqual(self.client.post(url, {'items': []}, format='json').status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.post(url, {'items': 1}, format='json').status_code, status.HTTP_400_BAD_REQUEST)
+        with self.settings(POST_BATCH_MAX_ITEMS=2):
+            response = self.client.post(url, {'items': self.get_items(3)}, format='json')
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Post.objects.filter(profile=self.profile).exists())
+        self.client.logout()
+        response = self.client.post(url, {'items': self.get_items(1)}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class ImageCreateAPITestCase(TemporaryMediaTestMixin, APITestCase):
 
     @classmethod
     def setUpClass(cls):
@@ -567,7 +908,7 @@ class ImageCreateAPITestCase(APITestCase):
         self.assertEqual(bad_post_response.status_code, status.HTTP_400_BAD_REQUEST)
         self.client.logout()
 
-class ImageDetailAPITestCase(APITestCase):
+class ImageDetailAPITestCase(TemporaryMediaTestMixin, APITestCase):
 
     @classmethod
     def setUpClass(cls):
@@ -629,7 +970,9 @@ class ImageDetailAPITestCase(APITestCase):
     def test_image_detail(self):
         get_response = self.client.get(self.url)
         self.assertEqual(get_response.status_code, status.HTTP_200_OK)
-        self.assertContains(get_response, 'test-image')
+        with open(self.path_to_test_image, 'rb') as file:
+            self.assertContains(get_response, sha256(file.read()).hexdigest())
+        self.assertEqual(get_response.data['image_srcset'], {'srcset': '', 'webp_srcset': ''})
 
     def test_image_detail_unauthorized_delete(self):
         unauthorized_response = self.client.delete(self.url)
@@ -652,7 +995,8 @@ class ImageDetailAPITestCase(APITestCase):
         self.client.force_authenticate(user=self.user)
         with open(self.path_to_sec_test_image, 'rb') as new_image:
             patch_response = self.client.patch(self.url, {'image': new_image}, format='multipart')
-        self.assertContains(patch_response, 'sec-test-image')
+        with open(self.path_to_sec_test_image, 'rb') as file:
+            self.assertContains(patch_response, sha256(file.read()).hexdigest())
         self.client.logout()
 
     def test_image_detail_delete(self):
@@ -702,3 +1046,230 @@ class PostListAPITestCase(APITestCase):
                     break
 
             self.assertEqual(total_objects, posts_in_db.count())
+
+    def test_post_list_sparse_fields(self):
+        response = self.client.get(self.url, {'fields': 'title,blog'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        result = response.json()['results'][0]
+        self.assertEqual(set(result), {'id', 'title', 'blog'})
+        self.assertEqual(result['blog']['id'], Post.objects.get(pk=result['id']).blog_id)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url, {'exclude': 'images,content'})
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn('content', queries[0]['sql'])
+        self.assertEqual(
+            set(response.json()['results'][0]),
+            {'id', 'title', 'tag', 'created_at', 'is_published', 'blog', 'profile'}
+        )
+
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(self.url)
+        self.assertEqual(len(queries), 2)
+
+    def test_post_list_pages_with_sparse_fields(self):
+        expected = list(Post.objects.filter(is_published=True).order_by('-published_at', '-id').values_list(
+            'pk', flat=True
+        ))
+        received = []
+        url, params = self.url, {'fields': 'title', 'limit': 2}
+        while url:
+            response_to_python = self.client.get(url, params).json()
+            received.extend(result['id'] for result in response_to_python['results'])
+            url, params = response_to_python['next'], None
+        self.assertEqual(received, expected)
+
+    @override_settings(API_EXCERPT_LENGTH=20)
+    def test_post_list_compact(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url, {'compact': 'true', 'limit': 100})
+        self.assertEqual(len(queries), 1)
+        results = response.json()['results']
+        self.assertEqual(len(results), Post.objects.filter(is_published=True).count())
+        for result in results:
+            post = Post.objects.get(pk=result['id'])
+            self.assertEqual(set(result), {
+                'id', 'title', 'tag', 'excerpt', 'created_at', 'published_at', 'blog', 'profile', 'image_count',
+            })
+            self.assertEqual(result['excerpt'], post.content[:20])
+            self.assertEqual(result['image_count'], post.images.count())
+            self.assertEqual((result['blog'], result['profile']), (post.blog_id, post.profile_id))
+
+        response = self.client.get(self.url, {'compact': 'true', 'exclude': 'excerpt,image_count'})
+        self.assertNotIn('excerpt', response.json()['results'][0])
+
+
+class ValuesSerializerAPITestCase(APITestCase):
+    fixtures = [
+        'app_auth/fixtures/users.json',
+        'app_auth/fixtures/profiles.json',
+        'app_blog/fixtures/blogs.json',
+        'app_blog/fixtures/posts.json',
+        'app_blog/fixtures/images.json',
+    ]
+
+    def setUp(self) -> None:
+        profile = Profile.objects.exclude(avatar='').first()
+        Profile.objects.filter(pk=profile.pk).update(avatar_derivatives={
+            'name': profile.avatar.name, 'format': 'jpeg', 'width': 800,
+            'variants': [
+                {'name': 'derivatives/avatar-320w.jpeg', 'width': 320, 'format': 'jpeg'},
+                {'name': 'derivatives/avatar-320w.webp', 'width': 320, 'format': 'webp'},
+            ],
+        })
+        request = APIRequestFactory().get('/')
+        self.context = {'request': Request(request), 'format': None}
+
+    def get_both(self, url: str, params: dict = None):
+        """
+            Returns the responses of the url serialized by the model serializer and by the ValuesSerializer.
+        """
+        with override_settings(API_VALUES_SERIALIZATION=False):
+            expected = self.client.get(url, params)
+        with override_settings(API_VALUES_SERIALIZATION=True):
+            received = self.client.get(url, params)
+        return expected, received
+
+    def test_serializers_are_supported(self):
+        for serializer_class in (
+                PostSerializer, BlogDetailSerializer, ProfileFullSerializer,
+                PostCompactSerializer, BlogCompactSerializer, ProfileCompactSerializer,
+        ):
+            ValuesSerializer(serializer_class(context=self.context))
+
+        class PostMethodSerializer(PostSerializer):
+            words = serializers.SerializerMethodField()
+
+            class Meta(PostSerializer.Meta):
+                fields = PostSerializer.Meta.fields + ('words',)
+
+        with self.assertRaises(UnsupportedField):
+            ValuesSerializer(PostMethodSerializer(context=self.context))
+
+    def test_lists_are_identical(self):
+        cases = {
+            'app_api:post_list': [
+                {}, {'limit': 2}, {'fields': 'title,blog,profile'}, {'exclude': 'images,content'}, {'compact': 'true'},
+                {'offset': 1, 'limit': 2}, {'search': 'the'}, {'username': 'J_Peterson'}, {'format': 'json'},
+            ],
+            'app_api:blog_list': [{}, {'limit': 2}, {'compact': '1', 'ordering': 'activity'}, {'exclude': 'posts'}],
+            'app_api:profile_list': [{}, {'compact': 'true'}, {'fields': 'username,avatar,avatar_srcset'}],
+        }
+        for name, variants in cases.items():
+            for params in variants:
+                with self.subTest(name=name, params=params):
+                    with override_settings(API_VALUES_SERIALIZATION=False):
+                        with CaptureQueriesContext(connection) as expected_queries:
+                            expected = self.client.get(reverse(name), params)
+                    with override_settings(API_VALUES_SERIALIZATION=True):
+                        with CaptureQueriesContext(connection) as received_queries:
+                            received = self.client.get(reverse(name), params)
+                    self.assertEqual(received.status_code, status.HTTP_200_OK)
+                    self.assertEqual(received.content, expected.content)
+                    self.assertEqual(len(received_queries), len(expected_queries))
+
+    def test_srcset_is_identical(self):
+        expected, received = self.get_both(reverse('app_api:profile_list'), {'fields': 'avatar_srcset'})
+        self.assertIn(b'320w', received.content)
+        self.assertEqual(received.content, expected.content)
+
+    def test_pages_are_identical(self):
+        for name in ('app_api:post_list', 'app_api:blog_list', 'app_api:profile_list'):
+            url, params = reverse(name), {'limit': 1}
+            while url:
+                expected, received = self.get_both(url, params)
+                self.assertEqual(received.content, expected.content)
+                url, params = received.json()['next'], None
+
+
+class TagAPITestCase(APITestCase):
+
+    fixtures = [
+        'app_auth/fixtures/users.json',
+        'app_auth/fixtures/profiles.json',
+        'app_blog/fixtures/posts.json',
+        'app_blog/fixtures/blogs.json',
+    ]
+
+    def setUp(self) -> None:
+        Tag.objects.sync_posts(Post.objects.all())
+        blog = Blog.objects.first()
+        self.post = Post.objects.create(
+            title='tagged post', tag='gardening roses', content='content', blog=blog, profile=blog.profile
+        )
+        self.post.publish()
+        Post.objects.create(
+            title='another tagged post', tag='gardening', content='content', blog=blog, profile=blog.profile
+        ).publish()
+
+    def test_post_list_tag_filter(self):
+        response = self.client.get(reverse('app_api:post_list'), {'tag': 'gardening'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['results']), 2)
+
+        response = self.client.get(reverse('app_api:post_list'), {'tag': '#Roses gardening'})
+        self.assertEqual([result['id'] for result in response.data['results']], [self.post.pk])
+
+        response = self.client.get(reverse('app_api:post_list'), {'tag': 'no-such-tag'})
+        self.assertEqual(response.data['results'], [])
+
+    def test_tag_list(self):
+        response = self.client.get(reverse('app_api:tag_list'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        results = response.data['results']
+        counts = [result['post_count'] for result in results]
+        self.assertEqual(counts, sorted(counts, reverse=True))
+        self.assertTrue(all(counts))
+        gardening = next(result for result in results if result['slug'] == 'gardening')
+        self.assertEqual(gardening['post_count'], 2)
+        self.assertEqual(response.data['count'], Tag.objects.filter(post_count__gt=0).count())
+
+
+class PostListKeysetAPITestCase(APITestCase):
+
+    fixtures = [
+        'app_auth/fixtures/users.json',
+        'app_auth/fixtures/profiles.json',
+        'app_blog/fixtures/posts.json',
+        'app_blog/fixtures/blogs.json',
+    ]
+
+    def setUp(self) -> None:
+        self.url = reverse('app_api:post_list')
+        self.published_posts = list(
+            Post.objects.filter(is_published=True).order_by('-published_at', '-id').values_list('pk', flat=True)
+        )
+
+    def test_post_list_cursor(self):
+        response_to_python = json.loads(self.client.get(self.url, {'limit': 3}).content)
+        self.assertNotIn('count', response_to_python)
+        self.assertIsNone(response_to_python.get('previous'))
+
+        received_posts = []
+        while True:
+            received_posts.extend(result['id'] for result in response_to_python.get('results'))
+            new_url = response_to_python.get('next')
+            if not new_url:
+                break
+            self.assertIn('cursor=', new_url)
+            response_to_python = json.loads(self.client.get(new_url).content)
+
+        self.assertEqual(received_posts, self.published_posts)
+
+        previous_url = response_to_python.get('previous')
+        if previous_url:
+            previous_page = json.loads(self.client.get(previous_url).content)
+            last_page_size = len(response_to_python.get('results'))
+            self.assertEqual(
+                [result['id'] for result in previous_page.get('results')],
+                received_posts[-last_page_size - 3:-last_page_size]
+            )
+
+    def test_post_list_offset(self):
+        response = self.client.get(self.url, {'offset': 0, 'limit': 3})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(json.loads(response.content).get('count'), len(self.published_posts))
+
+    def test_post_list_invalid_cursor(self):
+        response = self.client.get(self.url, {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
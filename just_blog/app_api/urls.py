@@ -6,9 +6,19 @@ from .views import (
     BlogListApiView,
     BlogDetailApiView,
     PostCreateApiView,
+    PostImportApiView,
+    PostBatchCreateApiView,
+    PostBatchPublishApiView,
+    PostBatchDeleteApiView,
+    JobDetailApiView,
+    SearchApiView,
+    TagListApiView,
     PostUpdateApiView,
     ImageCreateApiView,
     ImageDetailApiView,
+    UploadCreateApiView,
+    UploadDetailApiView,
+    UploadFinalizeApiView,
     PostListApiView,
     ProfileUpdateApiView,
 )
@@ -22,10 +32,20 @@ urlpatterns = [
     path('blogs/', BlogListApiView.as_view(), name='blog_list'),
     path('blog/<int:pk>/', BlogDetailApiView.as_view(), name='blog_detail'),
     path('new-post/', PostCreateApiView.as_view(), name='new_post'),
+    path('blog/<int:pk>/import-posts/', PostImportApiView.as_view(), name='post_import'),
     path('post/<int:pk>/', PostUpdateApiView.as_view(), name='post_detail'),
     path('new-image/', ImageCreateApiView.as_view(), name='new_image'),
     path('image/<int:pk>/', ImageDetailApiView.as_view(), name='image_detail'),
+    path('uploads/', UploadCreateApiView.as_view(), name='upload_create'),
+    path('upload/<int:pk>/', UploadDetailApiView.as_view(), name='upload_detail'),
+    path('upload/<int:pk>/finalize/', UploadFinalizeApiView.as_view(), name='upload_finalize'),
     path('posts/', PostListApiView.as_view(), name='post_list'),
+    path('posts/batch/', PostBatchCreateApiView.as_view(), name='post_batch_create'),
+    path('posts/batch/publish/', PostBatchPublishApiView.as_view(), name='post_batch_publish'),
+    path('posts/batch/delete/', PostBatchDeleteApiView.as_view(), name='post_batch_delete'),
     path('profile/<int:pk>/', ProfileUpdateApiView.as_view(), name='profile_update'),
+    path('job/<int:pk>/', JobDetailApiView.as_view(), name='job_detail'),
+    path('search/', SearchApiView.as_view(), name='search'),
+    path('tags/', TagListApiView.as_view(), name='tag_list'),
 ]
 
@@ -0,0 +1,310 @@
+"""
+The fast path of the read-only serialization of the lists of the api. A ValuesSerializer is compiled
+from a bound model serializer: every field becomes a reader of the row returned by values(),
+so no model instances are created and no field is resolved through the attributes of an object.
+The hyperlinks are built from an url template reversed once per request, and the nested lists
+and the lists of the links are loaded with one query per field, like the prefetches.
+The output is the same as the output of the model serializer, the values are converted
+with the same fields. The fields that can't be read from the rows raise UnsupportedField,
+and the serializer is then used as usual.
+"""
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Model, QuerySet
+from django.db.models.fields.files import FileField as ModelFileField
+from rest_framework import serializers
+from rest_framework.relations import Hyperlink, HyperlinkedRelatedField, ManyRelatedField, PKOnlyObject, \
+    PrimaryKeyRelatedField, RelatedField
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, Type
+from .serializers import SrcsetField
+
+# The row of the values() queryset.
+Row = Dict[str, Any]
+Reader = Callable[[Row], Any]
+
+# The primary key reversed into the url template of the hyperlinks and replaced with the real ones.
+URL_TEMPLATE_PK = 9876543210
+
+
+class UnsupportedField(Exception):
+    """
+    Raised when a field of the serializer can't be read from the rows of values().
+    """
+
+
+def get_converter(field: serializers.Field) -> Callable[[Any], Any]:
+    """
+    Returns the function converting the value of the column to the representation of the field.
+    The values of the plain fields are converted without the call of the field.
+    """
+    if isinstance(field, serializers.CharField):
+        return str
+    if isinstance(field, serializers.IntegerField):
+        return int
+    if isinstance(field, (serializers.BooleanField, serializers.ReadOnlyField)):
+        return lambda value: value
+    return field.to_representation
+
+
+def read_column(column: str, convert: Callable[[Any], Any]) -> Reader:
+    """
+    Returns the reader of the converted value of the column. None is returned as is, like the serializers do.
+    """
+
+    def read(row: Row) -> Any:
+        value = row[column]
+        return None if value is None else convert(value)
+
+    return read
+
+
+def get_model_field(model: Type[Model], path: List[str]):
+    """
+    Returns the model field at the end of the path of the names, following the relations.
+    Raises UnsupportedField if there is no such field or a relation of the path is nullable,
+    as the serializer would return None for the whole nested value then.
+    """
+    field = None
+    for index, name in enumerate(path):
+        try:
+            field = model._meta.get_field(name)
+        except FieldDoesNotExist:
+            raise UnsupportedField(name)
+        if index < len(path) - 1:
+            check_foreign_key(field)
+            model = field.related_model
+    return field
+
+
+def check_foreign_key(field) -> None:
+    """
+    Raises UnsupportedField unless the model field is a non-nullable foreign key or one-to-one field.
+    """
+    if not (field.many_to_one or field.one_to_one) or field.auto_created or field.null:
+        raise UnsupportedField(field.name)
+
+
+class RelatedRows:
+    """
+    The rows of the objects of a reverse foreign key (e.g. the images of the posts), loaded with one query
+    for all the rows of the page and grouped by the primary key of their parent.
+    The objects are ordered like the prefetched ones, by the default ordering of their model.
+    """
+
+    def __init__(self, model: Type[Model], name: str, columns: Iterable[str]) -> None:
+        relation = model._meta.get_field(name)
+        if not relation.one_to_many or relation.related_model is None:
+            raise UnsupportedField(name)
+        self.model = relation.related_model
+        self.foreign_key = relation.field.name
+        self.columns = list(dict.fromkeys(columns))
+        self.rows: Dict[Any, List[Row]] = {}
+
+    def load(self, pks: List[Any]) -> None:
+        """
+        Loads the rows of the objects related to the parents with the passed primary keys.
+        """
+        self.rows = {pk: [] for pk in pks}
+        if not pks:
+            return
+        queryset = self.model._default_manager.filter(**{f'{self.foreign_key}__in': pks})
+        for row in queryset.values(self.foreign_key, *self.columns):
+            self.rows[row[self.foreign_key]].append(row)
+
+    def get(self, row: Row) -> List[Row]:
+        """
+        Returns the rows of the objects related to the parent row.
+        """
+        return self.rows.get(row['id'], [])
+
+
+class ValuesSerializer:
+    """
+    Serializes the rows of a values() queryset exactly like the passed bound model serializer serializes
+    the instances. Supports the plain fields (the model fields, the fields of the related objects
+    and the annotations), the file fields, the SrcsetField, the primary keys of the related objects,
+    the nested serializers of the foreign keys, the nested lists and the lists of the hyperlinks
+    of the reverse foreign keys. Raises UnsupportedField for any other field.
+    """
+
+    def __init__(self, serializer: serializers.ModelSerializer, prefix: str = '') -> None:
+        self.model: Type[Model] = serializer.Meta.model
+        self.context = serializer.context
+        self.prefix = prefix
+        self.columns: List[str] = [f'{prefix}id']
+        self.readers: List[Tuple[str, Reader]] = []
+        self.relations: List[RelatedRows] = []
+        for name, field in serializer.fields.items():
+            if not field.write_only:
+                self.readers.append((name, self.compile_field(field)))
+
+    def get_path(self, field: serializers.Field) -> List[str]:
+        """
+        Returns the names of the model fields the field reads its value from.
+        """
+        if field.source == '*':
+            raise UnsupportedField(field.field_name)
+        return field.source_attrs
+
+    def add_column(self, path: List[str]) -> str:
+        """
+        Adds the column at the path to the columns of the queryset and returns its name.
+        """
+        column = self.prefix + '__'.join(path)
+        if column not in self.columns:
+            self.columns.append(column)
+        return column
+
+    def compile_field(self, field: serializers.Field) -> Reader:
+        """
+        Returns the reader of the representation of the field from the row.
+        """
+        if isinstance(field, SrcsetField):
+            return self.compile_srcset(field)
+        if isinstance(field, ManyRelatedField):
+            return self.compile_links(field)
+        if isinstance(field, serializers.ListSerializer):
+            return self.compile_list(field)
+        if isinstance(field, serializers.ModelSerializer):
+            return self.compile_nested(field)
+        if isinstance(field, (serializers.BaseSerializer, serializers.SerializerMethodField)):
+            raise UnsupportedField(field.field_name)
+        if isinstance(field, RelatedField):
+            return self.compile_related(field)
+        path = self.get_path(field)
+        if isinstance(field, serializers.FileField):
+            return self.compile_file(field, path)
+        if len(path) > 1:
+            get_model_field(self.model, path)
+        return read_column(self.add_column(path), get_converter(field))
+
+    def compile_related(self, field: RelatedField) -> Reader:
+        """
+        Returns the reader of the primary key of the related object.
+        """
+        if not isinstance(field, PrimaryKeyRelatedField):
+            raise UnsupportedField(field.field_name)
+        path = self.get_path(field)
+        get_model_field(self.model, path)
+        convert = field.pk_field.to_representation if field.pk_field is not None else (lambda value: value)
+        return read_column(self.add_column(path), convert)
+
+    def compile_file(self, field: serializers.FileField, path: List[str]) -> Reader:
+        """
+        Returns the reader of the url of the file, converted by the field from the file of the model field.
+        """
+        model_field = get_model_field(self.model, path)
+        if not isinstance(model_field, ModelFileField):
+            raise UnsupportedField(field.field_name)
+        column = self.add_column(path)
+        attr_class = model_field.attr_class
+
+        def read(row: Row) -> Optional[str]:
+            return field.to_representation(attr_class(None, model_field, row[column]))
+
+        return read
+
+    def compile_srcset(self, field: SrcsetField) -> Reader:
+        """
+        Returns the reader of the srcsets of the image field, computed from its file and its derivatives.
+        """
+        if self.prefix:
+            raise UnsupportedField(field.field_name)
+        image_field = field.image_field
+        model_field = get_model_field(self.model, [image_field])
+        derivatives_field = f'{image_field}_derivatives'
+        get_model_field(self.model, [derivatives_field])
+        column, derivatives_column = self.add_column([image_field]), self.add_column([derivatives_field])
+        attr_class = model_field.attr_class
+
+        def read(row: Row) -> Dict[str, str]:
+            instance = SimpleNamespace(**{
+                image_field: attr_class(None, model_field, row[column]),
+                derivatives_field: row[derivatives_column],
+            })
+            return field.to_representation(instance)
+
+        return read
+
+    def compile_nested(self, field: serializers.ModelSerializer) -> Reader:
+        """
+        Returns the reader of the nested object of a foreign key, read from the columns of the joined table.
+        """
+        path = self.get_path(field)
+        if len(path) != 1:
+            raise UnsupportedField(field.field_name)
+        check_foreign_key(get_model_field(self.model, path))
+        nested = ValuesSerializer(field, prefix=f'{self.prefix}{path[0]}__')
+        if nested.relations:
+            raise UnsupportedField(field.field_name)
+        for column in nested.columns:
+            if column not in self.columns:
+                self.columns.append(column)
+        return nested.to_representation
+
+    def compile_list(self, field: serializers.ListSerializer) -> Reader:
+        """
+        Returns the reader of the nested list of the objects of a reverse foreign key.
+        """
+        path = self.get_path(field)
+        if self.prefix or len(path) != 1 or not isinstance(field.child, serializers.ModelSerializer):
+            raise UnsupportedField(field.field_name)
+        child = ValuesSerializer(field.child)
+        if child.relations:
+            raise UnsupportedField(field.field_name)
+        relation = RelatedRows(self.model, path[0], child.columns)
+        self.relations.append(relation)
+        to_representation = child.to_representation
+        return lambda row: [to_representation(child_row) for child_row in relation.get(row)]
+
+    def compile_links(self, field: ManyRelatedField) -> Reader:
+        """
+        Returns the reader of the list of the hyperlinks of the objects of a reverse foreign key.
+        The urls are built by substituting the primary keys into the url template.
+        """
+        child = field.child_relation
+        path = self.get_path(field)
+        if self.prefix or len(path) != 1 or type(child) is not HyperlinkedRelatedField or child.lookup_field != 'pk':
+            raise UnsupportedField(field.field_name)
+        request = self.context['request']
+        url_format = self.context.get('format')
+        if url_format and child.format and child.format != url_format:
+            url_format = child.format
+        template = child.get_url(PKOnlyObject(URL_TEMPLATE_PK), child.view_name, request, url_format)
+        if template is None or template.count(str(URL_TEMPLATE_PK)) != 1:
+            raise UnsupportedField(field.field_name)
+        start, end = template.split(str(URL_TEMPLATE_PK))
+        relation = RelatedRows(self.model, path[0], ['pk'])
+        self.relations.append(relation)
+
+        def read(row: Row) -> List[Hyperlink]:
+            return [
+                Hyperlink(f'{start}{child_row["pk"]}{end}', PKOnlyObject(child_row['pk']))
+                for child_row in relation.get(row)
+            ]
+
+        return read
+
+    def get_queryset(self, queryset: QuerySet, columns: Iterable[str] = ()) -> QuerySet:
+        """
+        Returns the values() queryset with the columns of the fields and the passed ones (e.g. the ordering).
+        The annotations of the queryset are kept, the prefetches are loaded by the serializer instead.
+        """
+        columns = list(dict.fromkeys([*self.columns, *columns]))
+        return queryset.prefetch_related(None).values(*columns)
+
+    def to_representation(self, row: Row) -> Dict[str, Any]:
+        """
+        Returns the representation of one row. The related rows should be loaded before.
+        """
+        return {name: read(row) for name, read in self.readers}
+
+    def serialize(self, rows: Iterable[Row]) -> List[Dict[str, Any]]:
+        """
+        Loads the related rows of the rows and returns their representations.
+        """
+        rows = list(rows)
+        pks = [row['id'] for row in rows]
+        for relation in self.relations:
+            relation.load(pks)
+        return [self.to_representation(row) for row in rows]
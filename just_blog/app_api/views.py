@@ -1,11 +1,15 @@
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAuthenticated, SAFE_METHODS
 from app_auth.models import Profile
-from app_blog.models import Blog, Post, Image
+from app_auth.utils import get_request_profile
+from app_blog.models import Blog, Post, Image, Tag
 from rest_framework.generics import (
+    get_object_or_404,
     GenericAPIView,
     RetrieveUpdateDestroyAPIView,
     CreateAPIView,
     RetrieveUpdateAPIView,
+    RetrieveAPIView,
+    RetrieveDestroyAPIView,
 )
 from rest_framework.mixins import ListModelMixin, CreateModelMixin
 from .serializers import (
@@ -18,6 +22,19 @@ from .serializers import (
     ImageCreateSerializer,
     ImageDetailSerializer,
     PostSerializer,
+    PostCompactSerializer,
+    BlogCompactSerializer,
+    ProfileCompactSerializer,
+    PostImportSerializer,
+    PostBatchSerializer,
+    PostBatchCreateSerializer,
+    PostBatchPublishSerializer,
+    PostBatchDeleteSerializer,
+    JobSerializer,
+    UploadSerializer,
+    PostSearchSerializer,
+    TagSerializer,
+    get_requested_fields,
 )
 from django.http import HttpRequest
 from rest_framework.response import Response
@@ -31,18 +48,198 @@ from .permissions import (
     IsProfile,
     IsProfileOwnerOrReadOnly
 )
-from django.db.models import F
+from django.db.models import F, Model, Prefetch, QuerySet, prefetch_related_objects
 from rest_framework.parsers import MultiPartParser, FormParser
+from .pagination import PostKeysetPagination, BlogKeysetPagination, ProfileKeysetPagination
+from app_blog.utils import create_posts, delete_posts, is_utf8_text, set_posts_published
+from app_jobs.models import Job
+from app_jobs.utils import enqueue, stage_file
+from app_uploads.models import Upload
+from app_uploads.utils import UploadError, claim_upload, delete_part_file, finalize_upload, parse_content_digest, \
+    parse_content_range, unlock_upload, write_chunk
+from app_search.utils import SearchResults
+from rest_framework.pagination import LimitOffsetPagination
+from rest_framework import status
+from rest_framework.exceptions import NotFound, PermissionDenied, ValidationError
+from django.db import transaction
+from django.conf import settings
+from .values import UnsupportedField, ValuesSerializer
+from app_cache.conditional import Validators, build_validators, check_validators, get_validators, is_conditional, \
+    set_validators
+from typing import Callable, Dict, List, Optional, Tuple
+
+
+class ConditionalObjectMixin:
+    """
+    A mixin for the detail api views of the models with the updated_at field, answering the conditional requests.
+    GET with If-None-Match or If-Modified-Since is answered with 304 without serializing the object,
+    if it hasn't changed. PUT, PATCH and DELETE with If-Match or If-Unmodified-Since fail with 412 if the object
+    has changed since the client has read it, so the concurrent updates are never lost. The preconditions are checked
+    in the transaction of the write with the row locked. The object is retrieved and its permissions are checked
+    before the validators, so they never reveal an object the user may not see.
+    The successful responses carry the ETag and Last-Modified. The validators depend on the user and the format.
+    """
+
+    def get_validator_variant(self) -> tuple:
+        """
+        Returns the variant of the representation: the id of the user and the format.
+        """
+        return self.request.user.pk, self.request.accepted_renderer.format
+
+    def build_object_validators(self, instance: Model) -> Validators:
+        """
+        Returns the validators of the retrieved object.
+        """
+        return build_validators(self.queryset.model, instance.pk, instance.updated_at, *self.get_validator_variant())
+
+    def get_object_from(self, queryset: QuerySet) -> Model:
+        """
+        Returns the requested object from the queryset, checking its permissions as get_object() does.
+        """
+        lookup = {self.lookup_field: self.kwargs[self.lookup_url_kwarg or self.lookup_field]}
+        instance = get_object_or_404(self.filter_queryset(queryset), **lookup)
+        self.check_object_permissions(self.request, instance)
+        return instance
+
+    def get_object_validators(self, lock: bool = False) -> Optional[Validators]:
+        """
+        Returns the validators of the requested object, reading only its updated_at.
+        """
+        pk = self.kwargs[self.lookup_url_kwarg or self.lookup_field]
+        return get_validators(self.queryset.model, pk, *self.get_validator_variant(), lock=lock)
+
+    def retrieve(self, request: HttpRequest, *args, **kwargs) -> Response:
+        """
+        Returns 304 if the object hasn't changed, otherwise the object with its validators.
+        The conditional requests retrieve the object without its prefetched relations,
+        which are fetched only if the object is serialized.
+        """
+        if not is_conditional(request):
+            instance = self.get_object()
+        else:
+            queryset = self.get_queryset()
+            instance = self.get_object_from(queryset.prefetch_related(None))
+            response = check_validators(request, self.build_object_validators(instance))
+            if response is not None:
+                return response
+            prefetch_related_objects([instance], *queryset._prefetch_related_lookups)
+        return set_validators(Response(self.get_serializer(instance).data), self.build_object_validators(instance))
+
+    def conditional_write(self, write: Callable, request: HttpRequest, *args, **kwargs) -> Response:
+        """
+        Checks the preconditions of the request and performs the write in one transaction.
+        Adds the new validators to the successful response.
+        """
+        with transaction.atomic():
+            if is_conditional(request):
+                self.get_object()
+                response = check_validators(request, self.get_object_validators(lock=True))
+                if response is not None:
+                    return response
+            response = write(request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            set_validators(response, self.get_object_validators())
+        return response
+
+    def update(self, request: HttpRequest, *args, **kwargs) -> Response:
+        """
+        Updates the object if the preconditions of the request pass.
+        """
+        return self.conditional_write(super().update, request, *args, **kwargs)
+
+    def destroy(self, request: HttpRequest, *args, **kwargs) -> Response:
+        """
+        Destroys the object if the preconditions of the request pass.
+        """
+        return self.conditional_write(super().destroy, request, *args, **kwargs)
+
+
+class SparseListMixin:
+    """
+    A mixin for the list api views returning the sparse fieldsets (see SparseFieldsMixin of the serializers).
+    The fields are chosen with the fields and exclude parameters, with compact=true the compact representation
+    (compact_serializer_class) is returned instead. The queryset loads only the columns, the related objects,
+    the prefetches and the annotations of the returned fields and the columns of the ordering of the pagination.
+    The lists are serialized from the rows of values() by the ValuesSerializer compiled from the serializer.
+    """
+    compact_serializer_class = None
+    compact_query_param = 'compact'
+
+    def is_compact(self) -> bool:
+        """
+        Checks if the compact representation was requested.
+        """
+        value = self.request.query_params.get(self.compact_query_param, '')
+        return self.compact_serializer_class is not None and value.lower() in ('1', 'true')
+
+    def get_serializer_class(self) -> type:
+        """
+        Returns the compact serializer if it was requested, otherwise the default one.
+        """
+        if getattr(self, 'swagger_fake_view', False) or not self.is_compact():
+            return super().get_serializer_class()
+        return self.compact_serializer_class
+
+    def get_ordering_columns(self) -> List[str]:
+        """
+        Returns the columns of the ordering of the pagination.
+        """
+        ordering = self.paginator.get_ordering(self.request) if self.paginator is not None else ()
+        return [field.lstrip('-') for field in ordering]
+
+    def get_queryset(self) -> QuerySet:
+        """
+        Adapts the queryset to the fields returned for the request.
+        """
+        queryset = super().get_queryset()
+        if getattr(self, 'swagger_fake_view', False):
+            return queryset
+        serializer_class = self.get_serializer_class()
+        names = get_requested_fields(self.request, serializer_class.Meta.fields)
+        return serializer_class.prepare_queryset(queryset, names, self.get_ordering_columns())
+
+    def get_values_serializer(self) -> Optional[ValuesSerializer]:
+        """
+        Returns the ValuesSerializer compiled from the serializer of the request,
+        or None if it is disabled with API_VALUES_SERIALIZATION or doesn't support a field of the serializer.
+        """
+        if not settings.API_VALUES_SERIALIZATION:
+            return None
+        try:
+            return ValuesSerializer(self.get_serializer())
+        except UnsupportedField:
+            return None
+
+    def list(self, request: HttpRequest, *args, **kwargs) -> Response:
+        """
+        Returns the page of the list serialized from the rows of values() by the ValuesSerializer,
+        or by the serializer as usual if there is no ValuesSerializer.
+        """
+        values_serializer = self.get_values_serializer()
+        if values_serializer is None:
+            return super().list(request, *args, **kwargs)
+        queryset = values_serializer.get_queryset(
+            self.filter_queryset(self.get_queryset()), self.get_ordering_columns()
+        )
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(values_serializer.serialize(page))
+        return Response(values_serializer.serialize(queryset))
 
 
-class ProfileListApiView(ListModelMixin, GenericAPIView):
+class ProfileListApiView(SparseListMixin, ListModelMixin, GenericAPIView):
     """
     Returns a list of all profiles. Allows filtering by the fields
     username, first_name, last_name, email (these four belong to the related User instance)
     and the field birthday which corresponds to the age field of the Profile model.
+    With ordering=activity the profiles are sorted by the stored number of their published posts.
+    Only the ids of the blogs and the posts are prefetched for the links, the counts are stored in the profile.
+    Supports the sparse fieldsets and the compact representation (see SparseListMixin).
     """
-    queryset = Profile.objects.select_related('user').prefetch_related('blogs', 'posts').all()
+    queryset = Profile.objects.all()
     serializer_class = ProfileFullSerializer
+    compact_serializer_class = ProfileCompactSerializer
+    pagination_class = ProfileKeysetPagination
     filter_backends = [filters.SearchFilter, DjangoFilterBackend]
     search_fields = 'user__username', 'user__first_name', 'user__last_name', 'user__email', 'age'
     filterset_class = ProfileFilter
@@ -75,11 +272,12 @@ class ProfileCreateApiView(CreateAPIView):
         return self.create(request, *args, **kwargs)
 
 
-class ProfileUpdateApiView(RetrieveUpdateAPIView):
+class ProfileUpdateApiView(ConditionalObjectMixin, RetrieveUpdateAPIView):
     """
     An api view to update the retrieved Profile instance by its id.
     If the user hasn't logged in or the authenticated user is not related
     to the retrieved Profile instance, only safe methods are allowed.
+    Supports the conditional requests (see ConditionalObjectMixin).
     """
     queryset = Profile.objects.select_related('user')
     serializer_class = ProfileSerializer
@@ -121,15 +319,17 @@ class BlogCreateApiView(CreateAPIView):
         return self.create(request, *args, **kwargs)
 
 
-class BlogDetailApiView(RetrieveUpdateDestroyAPIView):
+class BlogDetailApiView(ConditionalObjectMixin, RetrieveUpdateDestroyAPIView):
     """
     An api view to retrieve, update or destroy a Blog instance.
     To perform unsafe methods, the retrieved Blog instance should belong to the current
-    Profile instance.
+    Profile instance. Supports the conditional requests (see ConditionalObjectMixin).
     """
     serializer_class = BlogDetailSerializer
     permission_classes = [IsBlogsOwner]
-    queryset = Blog.objects.select_related('profile').prefetch_related('posts').all()
+    queryset = Blog.objects.select_related('profile__user').prefetch_related(
+        Prefetch('posts', queryset=Post.objects.only('id', 'blog_id'))
+    ).all()
 
     def get(self, request: HttpRequest, *args, **kwargs) -> Response:
         """
@@ -160,16 +360,21 @@ class BlogDetailApiView(RetrieveUpdateDestroyAPIView):
         return self.destroy(request, *args, **kwargs)
 
 
-class BlogListApiView(ListModelMixin, GenericAPIView):
+class BlogListApiView(SparseListMixin, ListModelMixin, GenericAPIView):
     """
     An api view to return a list of the model Blog instances.
     Can be filtered by the username of the user which has the Profile instance
     related to the blog, and the title of the Blog instance.
     The search can be performed by the same fields plus the id of the Profile instance
     related to the blog.
+    With ordering=activity the blogs are sorted by the stored number of their published posts.
+    Only the ids of the posts are prefetched for the links, the counts are stored in the blog.
+    Supports the sparse fieldsets and the compact representation (see SparseListMixin).
     """
-    queryset = Blog.objects.select_related('profile').prefetch_related('posts').all()
+    queryset = Blog.objects.all()
     serializer_class = BlogDetailSerializer
+    compact_serializer_class = BlogCompactSerializer
+    pagination_class = BlogKeysetPagination
     filter_backends = [filters.SearchFilter, DjangoFilterBackend]
     search_fields = 'profile__id', 'title', 'profile__user__username'
     filterset_class = BlogFilter
@@ -181,6 +386,8 @@ class BlogListApiView(ListModelMixin, GenericAPIView):
         id, title, description, posts and profile.
         The posts field is represented as list of hyperlinks.
         The profile field contains its fields id and username (username of the related user).
+        The fields can be chosen with the fields and exclude parameters (comma-separated names).
+        With compact=true the posts field is omitted and the profile is represented by its id.
         """
         return self.list(request)
 
@@ -206,53 +413,251 @@ class PostCreateApiView(CreateModelMixin, GenericAPIView):
         Serves to filter the possible blogs to choose between.
         """
         context = super().get_serializer_context()
-        context['profile'] = Profile.objects.get(user=self.request.user)
+        context['profile'] = get_request_profile(self.request)
         return context
 
 
-class PostUpdateApiView(RetrieveUpdateDestroyAPIView):
+class PostImportApiView(GenericAPIView):
+    """
+    An api view to import new Post instances from a csv file into the blog.
+    Only the owner of the blog can import posts into it.
+    The import runs in the background: the response contains the job to poll.
+    """
+    serializer_class = PostImportSerializer
+    permission_classes = [IsAuthenticated, IsBlogsOwner]
+    parser_classes = [MultiPartParser, FormParser]
+    queryset = Blog.objects.select_related('profile').all()
+    throttle_scope = 'upload'
+
+    def post(self, request: HttpRequest, *args, **kwargs) -> Response:
+        """
+        A post method to import the posts from the uploaded file (the field file).
+        The file should contain three columns: title, tag and content.
+        Enqueues the import_posts job and returns it with the status 202.
+        Once the job is done, its result contains the number of the created posts (created)
+        and the list of the errors of the skipped rows (errors) with the number of the row and the messages.
+        """
+        blog = self.get_object()
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        csv_file = serializer.validated_data['file']
+        if not is_utf8_text(csv_file):
+            raise ValidationError({'file': ['The file you have just tried to upload is invalid']})
+        job = enqueue(
+            'import_posts', owner=request.user, blog_id=blog.pk, profile_id=blog.profile_id, path=stage_file(csv_file)
+        )
+        return Response(JobSerializer(job, context=self.get_serializer_context()).data, status=status.HTTP_202_ACCEPTED)
+
+
+class PostBatchApiView(GenericAPIView):
+    """
+    The base api view of the batch endpoints of the posts, which accept up to POST_BATCH_MAX_ITEMS items
+    in the field items. All the items are validated with item_serializer_class in one pass,
+    the ownership of all of them is checked with one query and the valid items of the current profile
+    are written by self.write() in one transaction. The invalid items are skipped.
+    The response contains the results of the items in the order of the request: the index of the item,
+    its status (an HTTP status code) and the id of the post or the errors.
+    Available only for the authenticated users.
+    """
+    serializer_class = PostBatchSerializer
+    permission_classes = [IsAuthenticated]
+    item_serializer_class = None
+
+    @staticmethod
+    def get_result(index: int, status_code: int, **data) -> Dict:
+        """
+        Returns the result of the item with the index.
+        """
+        return {'index': index, 'status': status_code, **data}
+
+    def post(self, request: HttpRequest, *args, **kwargs) -> Response:
+        """
+        Validates the items and writes the valid ones. Returns the results of all the items.
+        """
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        results: List[Optional[Dict]] = []
+        items = {}
+        for index, data in enumerate(serializer.validated_data['items']):
+            item_serializer = self.item_serializer_class(data=data)
+            if item_serializer.is_valid():
+                items[index] = item_serializer.validated_data
+                results.append(None)
+            else:
+                results.append(self.get_result(index, status.HTTP_400_BAD_REQUEST, errors=item_serializer.errors))
+        if items:
+            with transaction.atomic():
+                for index, result in self.write(get_request_profile(request), items).items():
+                    results[index] = result
+        return Response({'results': results})
+
+    def write(self, profile: Optional[Profile], items: Dict[int, Dict]) -> Dict[int, Dict]:
+        """
+        Writes the valid items, passed by their index, and returns their results by the index.
+        """
+        raise NotImplementedError
+
+    def get_posts(self, profile: Optional[Profile], items: Dict[int, Dict]) -> Tuple[Dict[int, Post], Dict[int, Dict]]:
+        """
+        Retrieves the posts of the items with one query, locking them until the end of the transaction.
+        Returns the posts of the profile by the index of the item and the results of the rest of the items:
+        400 for the repeated posts, 404 for the missing ones and 403 for the posts of the other profiles.
+        """
+        posts = Post.objects.select_for_update().in_bulk({item['id'] for item in items.values()})
+        owned, results, seen = {}, {}, set()
+        for index, item in items.items():
+            post = posts.get(item['id'])
+            if item['id'] in seen:
+                errors = {'id': ['The post is repeated in the batch.']}
+                results[index] = self.get_result(index, status.HTTP_400_BAD_REQUEST, id=item['id'], errors=errors)
+            elif post is None:
+                errors = {'detail': str(NotFound.default_detail)}
+                results[index] = self.get_result(index, status.HTTP_404_NOT_FOUND, id=item['id'], errors=errors)
+            elif profile is None or post.profile_id != profile.pk:
+                errors = {'detail': str(PermissionDenied.default_detail)}
+                results[index] = self.get_result(index, status.HTTP_403_FORBIDDEN, id=item['id'], errors=errors)
+            else:
+                owned[index] = post
+            seen.add(item['id'])
+        return owned, results
+
+
+class PostBatchCreateApiView(PostBatchApiView):
+    """
+    An api view to create up to POST_BATCH_MAX_ITEMS new Post instances with one request.
+    The fields of every item are title, tag, blog (id: int) and content, the blog should belong
+    to the current profile. The posts are created with bulk_create and are not published.
+    The result of a created post has the status 201 and its id.
+    """
+    item_serializer_class = PostBatchCreateSerializer
+
+    def write(self, profile: Optional[Profile], items: Dict[int, Dict]) -> Dict[int, Dict]:
+        """
+        Checks the blogs of all the items with one query and creates the posts in the blogs of the profile.
+        """
+        blogs = Blog.objects.filter(profile=profile).in_bulk({item['blog'] for item in items.values()}) \
+            if profile is not None else {}
+        posts, results = {}, {}
+        for index, item in items.items():
+            data = dict(item)
+            blog = blogs.get(data.pop('blog'))
+            if blog is None:
+                errors = {'blog': [f'Invalid pk "{item["blog"]}" - object does not exist.']}
+                results[index] = self.get_result(index, status.HTTP_400_BAD_REQUEST, errors=errors)
+            else:
+                posts[index] = Post(blog=blog, profile=profile, **data)
+        create_posts(list(posts.values()))
+        for index, post in posts.items():
+            results[index] = self.get_result(index, status.HTTP_201_CREATED, id=post.pk)
+        return results
+
+
+class PostBatchPublishApiView(PostBatchApiView):
+    """
+    An api view to publish or archive up to POST_BATCH_MAX_ITEMS posts of the current profile with one request.
+    The fields of every item are id and is_published. The posts are changed with one UPDATE per state.
+    The result of a post has the status 200, its id, is_published and changed (False if it was in the state).
+    """
+    item_serializer_class = PostBatchPublishSerializer
+
+    def write(self, profile: Optional[Profile], items: Dict[int, Dict]) -> Dict[int, Dict]:
+        """
+        Publishes and archives the posts of the profile.
+        """
+        posts, results = self.get_posts(profile, items)
+        changed = set()
+        for is_published in (True, False):
+            selected = [post for index, post in posts.items() if items[index]['is_published'] == is_published]
+            changed.update(post.pk for post in set_posts_published(selected, is_published))
+        for index, post in posts.items():
+            results[index] = self.get_result(
+                index, status.HTTP_200_OK, id=post.pk, is_published=post.is_published, changed=post.pk in changed
+            )
+        return results
+
+
+class PostBatchDeleteApiView(PostBatchApiView):
+    """
+    An api view to delete up to POST_BATCH_MAX_ITEMS posts of the current profile with one request.
+    The field of every item is id. The result of a deleted post has the status 204 and its id.
+    """
+    item_serializer_class = PostBatchDeleteSerializer
+
+    def write(self, profile: Optional[Profile], items: Dict[int, Dict]) -> Dict[int, Dict]:
+        """
+        Deletes the posts of the profile.
+        """
+        posts, results = self.get_posts(profile, items)
+        delete_posts(post.pk for post in posts.values())
+        for index, post in posts.items():
+            results[index] = self.get_result(index, status.HTTP_204_NO_CONTENT, id=post.pk)
+        return results
+
+
+class JobDetailApiView(RetrieveAPIView):
+    """
+    An api view to poll the status of a background job.
+    Only the owner of the job can retrieve it.
+    """
+    serializer_class = JobSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        """
+        Retrieves only the jobs of the current user. Returns no jobs during the generation of the schema.
+        """
+        if getattr(self, 'swagger_fake_view', False):
+            return Job.objects.none()
+        return Job.objects.filter(owner=self.request.user)
+
+    def get(self, request: HttpRequest, *args, **kwargs) -> Response:
+        """
+        A get method to retrieve a job by its id. The fields in the response are:
+        id, name, status, attempts, max_attempts, result, created_at, finished_at.
+        The status is one of pending, running, done and failed.
+        """
+        return self.retrieve(request, *args, **kwargs)
+
+
+class PostUpdateApiView(ConditionalObjectMixin, RetrieveUpdateDestroyAPIView):
     """
     An api view to retrieve, update and destroy a Post instance.
     If the post is not published, only its owner can see it.
     If it is, the safe methods are available to any user.
     The owner of the post can perform all the available methods.
+    Supports the conditional requests (see ConditionalObjectMixin).
     """
     serializer_class = PostDetailSerializer
     permission_classes = [IsPostOwner]
-    queryset = Post.objects.select_related('profile').prefetch_related('images').all()
+    queryset = Post.objects.prefetch_related('images').all()
 
-    def check_publish(self, serializer: PostDetailSerializer) -> None:
+    def get_queryset(self) -> QuerySet:
         """
-        If the user change to True the field is_published, performs the publish() method
-        of the Post instance.
-        If the user change to False the field is_published, performs the archive() method
-        of the Post instance.
+        Locks the post for the conditional writes until the end of their transaction,
+        so the preconditions still hold when the post is written.
         """
-        cur_object = self.get_object()
-        before_save_published = cur_object.is_published
-        serializer.save()
-        cur_object = self.get_object()
-        if cur_object.is_published and cur_object.is_published != before_save_published:
-            cur_object.publish()
-        elif not cur_object.is_published and cur_object.is_published != before_save_published:
-            cur_object.archive()
+        queryset = super().get_queryset()
+        if self.request.method not in SAFE_METHODS and is_conditional(self.request):
+            queryset = queryset.select_for_update(of=('self',))
+        return queryset
 
     def update(self, request: HttpRequest, *args, **kwargs) -> Response:
         """
-        Overrides the default update method, adding to it the call to the self.check_publish(serializer)
-        method.
+        Updates the post with one read of it: the preconditions of the request are checked against
+        the retrieved post, the serializer writes only the changed fields and the response is built
+        from the updated instance without retrieving it again.
         """
         partial = kwargs.pop('partial', False)
-        instance = self.get_object()
-        serializer = self.get_serializer(instance, data=request.data, partial=partial)
-        serializer.is_valid(raise_exception=True)
-        self.check_publish(serializer)
-        new_serializer = PostDetailSerializer(instance=self.get_object())
-
-        if getattr(instance, '_prefetched_objects_cache', None):
-            instance._prefetched_objects_cache = {}
-
-        return Response(new_serializer.data)
+        with transaction.atomic():
+            instance = self.get_object()
+            if is_conditional(request):
+                response = check_validators(request, self.build_object_validators(instance))
+                if response is not None:
+                    return response
+            serializer = self.get_serializer(instance, data=request.data, partial=partial)
+            serializer.is_valid(raise_exception=True)
+            self.perform_update(serializer)
+        return set_validators(Response(serializer.data), self.build_object_validators(instance))
 
     def get(self, request: HttpRequest, *args, **kwargs) -> Response:
         """
@@ -294,6 +699,7 @@ class ImageCreateApiView(CreateModelMixin, GenericAPIView):
     """
     serializer_class = ImageCreateSerializer
     permission_classes = [IsAuthenticated]
+    throttle_scope = 'upload'
 
     def post(self, request: HttpRequest, *args, **kwargs) -> Response:
         """
@@ -308,7 +714,7 @@ class ImageCreateApiView(CreateModelMixin, GenericAPIView):
         only those posts related to the Profile.
         """
         context = super().get_serializer_context()
-        context['profile'] = Profile.objects.get(user=self.request.user)
+        context['profile'] = get_request_profile(self.request)
         return context
 
 
@@ -354,14 +760,198 @@ class ImageDetailApiView(RetrieveUpdateDestroyAPIView):
         return self.destroy(request, *args, **kwargs)
 
 
-class PostListApiView(ListModelMixin, GenericAPIView):
+class UploadMixin:
+    """
+    A mixin for the api views of an existing upload session: the sessions are retrieved
+    only from the sessions of the current user. The requests writing a chunk or finalizing the session
+    claim it first with a conditional UPDATE (see app_uploads.utils.claim_upload), so of the concurrent ones
+    only a single request writes the partial file and the others get 409.
+    """
+    serializer_class = UploadSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self) -> QuerySet:
+        """
+        Retrieves only the uploads of the current user. Returns no uploads during the generation of the schema.
+        """
+        if getattr(self, 'swagger_fake_view', False):
+            return Upload.objects.none()
+        return Upload.objects.filter(owner=self.request.user)
+
+    def get_conflict_response(self, upload: Upload, offset: int) -> Response:
+        """
+        Returns the response 409 with the current state of the upload the request has failed to claim at the offset.
+        """
+        upload.refresh_from_db()
+        if upload.is_finished():
+            return self.get_state_response(upload, status.HTTP_409_CONFLICT, f'The upload is {upload.status}.')
+        if upload.offset != offset:
+            return self.get_state_response(
+                upload, status.HTTP_409_CONFLICT, f'The upload has {upload.offset} of {upload.size} bytes.'
+            )
+        return self.get_state_response(upload, status.HTTP_409_CONFLICT, 'The upload is busy with another request.')
+
+    def get_state_response(self, upload: Upload, status_code: int = status.HTTP_200_OK,
+                           detail: Optional[str] = None) -> Response:
+        """
+        Returns the response with the state of the upload and, if some bytes were received,
+        the Range header with the received range, so the client knows where to resume.
+        """
+        data = self.get_serializer(upload).data
+        if detail is not None:
+            data = {'detail': detail, **data}
+        response = Response(data, status=status_code)
+        if upload.offset:
+            response['Range'] = f'bytes=0-{upload.offset - 1}'
+        return response
+
+
+class UploadCreateApiView(CreateModelMixin, GenericAPIView):
+    """
+    An api view to create a session of a chunked upload (see app_uploads).
+    Available only for the authenticated users.
+    """
+    serializer_class = UploadSerializer
+    permission_classes = [IsAuthenticated]
+    throttle_scope = 'upload'
+
+    def post(self, request: HttpRequest, *args, **kwargs) -> Response:
+        """
+        A post method to create a new upload session. The fields to fill are target (image or avatar),
+        filename, size, checksum (the hex SHA-256 digest of the file), and for the images title and post (id: int).
+        The file is then sent to the upload with PUT in chunks and attached to the target with
+        the finalize endpoint.
+        """
+        return self.create(request, *args, **kwargs)
+
+    def get_serializer_context(self):
+        """
+        Returns a context for the serializer with the current Profile instance to filter
+        only those posts related to the Profile.
+        """
+        context = super().get_serializer_context()
+        context['profile'] = get_request_profile(self.request)
+        return context
+
+
+class UploadDetailApiView(UploadMixin, RetrieveDestroyAPIView):
+    """
+    An api view to retrieve the state of an upload session, to send a chunk of its file and to cancel it.
+    Only the owner of the upload can access it.
+    """
+    throttle_scope = 'upload'
+
+    def get(self, request: HttpRequest, *args, **kwargs) -> Response:
+        """
+        A get method to retrieve the state of the upload: the fields of the session with offset,
+        the number of the received bytes to resume from, and the Range header with the received range.
+        """
+        return self.get_state_response(self.get_object())
+
+    def put(self, request: HttpRequest, *args, **kwargs) -> Response:
+        """
+        A put method to send a chunk of the file: the raw bytes in the body with the header
+        Content-Range: bytes start-end/size. The chunk should start at the offset of the upload
+        and be not larger than UPLOAD_CHUNK_MAX_SIZE. The optional Content-Digest header
+        (sha-256=:base64:) is verified too. A chunk not starting at the offset gets 409 with the state
+        of the upload, so the client resumes from the offset.
+        """
+        try:
+            start, end, size = parse_content_range(request.META.get('HTTP_CONTENT_RANGE', ''))
+        except ValueError:
+            raise ValidationError({'Content-Range': ['The header bytes start-end/size is required.']})
+        try:
+            digest = parse_content_digest(request.META.get('HTTP_CONTENT_DIGEST', ''))
+        except ValueError:
+            raise ValidationError({'Content-Digest': ['The SHA-256 digest is malformed.']})
+        length = end - start + 1
+        if length > settings.UPLOAD_CHUNK_MAX_SIZE:
+            raise ValidationError({
+                'Content-Range': [f'The chunk is larger than {settings.UPLOAD_CHUNK_MAX_SIZE} bytes.']
+            })
+        if int(request.META.get('CONTENT_LENGTH') or 0) != length:
+            raise ValidationError({'Content-Length': ['The length of the body does not match the Content-Range.']})
+
+        upload = self.get_object()
+        if upload.is_finished():
+            return self.get_state_response(upload, status.HTTP_409_CONFLICT, f'The upload is {upload.status}.')
+        if size != upload.size:
+            raise ValidationError({'Content-Range': ['The size does not match the size of the upload.']})
+        if start != upload.offset:
+            return self.get_state_response(
+                upload, status.HTTP_409_CONFLICT, f'The chunk should start at {upload.offset}.'
+            )
+        token = claim_upload(upload, start)
+        if token is None:
+            return self.get_conflict_response(upload, start)
+        try:
+            write_chunk(upload, request.stream, start, length, digest)
+        except UploadError as exc:
+            unlock_upload(upload, token)
+            raise ValidationError({'chunk': [str(exc)]})
+        if not unlock_upload(upload, token, offset=end + 1):
+            return self.get_conflict_response(upload, end + 1)
+        upload.offset = end + 1
+        return self.get_state_response(upload)
+
+    def delete(self, request: HttpRequest, *args, **kwargs) -> Response:
+        """
+        A delete method to cancel the upload and delete its received part.
+        """
+        return self.destroy(request, *args, **kwargs)
+
+    def perform_destroy(self, instance: Upload) -> None:
+        """
+        Deletes the partial file of the upload with the upload.
+        """
+        delete_part_file(instance)
+        instance.delete()
+
+
+class UploadFinalizeApiView(UploadMixin, GenericAPIView):
+    """
+    An api view to finalize a chunked upload: the received file is verified and attached to the target
+    of the upload. Only the owner of the upload can finalize it.
+    """
+
+    def post(self, request: HttpRequest, *args, **kwargs) -> Response:
+        """
+        A post method to finalize the upload with all the bytes received. The file should match the checksum
+        of the upload and be an image. Returns the created Image instance (id, title, image, image_srcset, post)
+        or the Profile instance with the new avatar. If the file is not valid, the upload fails.
+        """
+        upload = self.get_object()
+        if upload.is_finished():
+            return self.get_state_response(upload, status.HTTP_409_CONFLICT, f'The upload is {upload.status}.')
+        if upload.offset != upload.size:
+            return self.get_state_response(
+                upload, status.HTTP_409_CONFLICT, f'The upload has {upload.offset} of {upload.size} bytes.'
+            )
+        token = claim_upload(upload, upload.size)
+        if token is None:
+            return self.get_conflict_response(upload, upload.size)
+        try:
+            instance = finalize_upload(upload)
+        except UploadError as exc:
+            raise ValidationError({'file': [str(exc)]})
+        finally:
+            unlock_upload(upload, token)
+        serializer_class = ImageDetailSerializer if upload.target == Upload.IMAGE else ProfileSerializer
+        serializer = serializer_class(instance, context=self.get_serializer_context())
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+
+class PostListApiView(SparseListMixin, ListModelMixin, GenericAPIView):
     """
     An api view that returns a list of the published Post instances.
     Can be filtered by the username of the User instance related to the Profile instance related to the Post,
     by post's tag and its title.
+    Supports the sparse fieldsets and the compact representation (see SparseListMixin).
     """
     serializer_class = PostSerializer
-    queryset = Post.objects.select_related('profile', 'blog').prefetch_related('images').filter(is_published=True)
+    compact_serializer_class = PostCompactSerializer
+    pagination_class = PostKeysetPagination
+    queryset = Post.objects.filter(is_published=True)
     filter_backends = [filters.SearchFilter, DjangoFilterBackend]
     search_fields = 'title', 'tag',
     filterset_class = PostFilter
@@ -375,5 +965,52 @@ class PostListApiView(ListModelMixin, GenericAPIView):
         The blog field contains its own fields id and title.
         The profile field contains its owns fields id and username (username of the related User instance).
         The images field represents a nested list with id and title of every image.
+        The fields can be chosen with the fields and exclude parameters (comma-separated names).
+        With compact=true the content is truncated to an excerpt, the blog and the profile are represented
+        by their ids and the images by their number (image_count).
+        """
+        return self.list(request)
+
+
+class TagListApiView(ListModelMixin, GenericAPIView):
+    """
+    An api view that returns the tags of the published posts, the most used first.
+    The counts of the posts are stored in the tags, so the list is read by the index without aggregation.
+    """
+    serializer_class = TagSerializer
+    pagination_class = LimitOffsetPagination
+    queryset = Tag.objects.filter(post_count__gt=0).order_by('-post_count', 'slug')
+    filter_backends = []
+
+    def get(self, request: HttpRequest) -> Response:
+        """
+        A get method to retrieve a list of the tags with the fields id, name, slug
+        and post_count (the number of the published posts with the tag).
         """
         return self.list(request)
+
+
+class SearchApiView(GenericAPIView):
+    """
+    An api view for the full-text search of the published posts by their title, tag and content.
+    The results are ordered by relevance.
+    """
+    serializer_class = PostSearchSerializer
+    pagination_class = LimitOffsetPagination
+    filter_backends = []
+    search_query_param = 'q'
+
+    def get(self, request: HttpRequest) -> Response:
+        """
+        A get method to search the published posts by the words in the q parameter.
+        The last word is matched as a prefix.
+        The fields for every found post are: id, title, tag, published_at, blog, profile,
+        rank (the relevance), highlighted_title and snippet (the found words are in the <mark> tags).
+        Returns 400 if the q parameter is empty.
+        """
+        query = request.query_params.get(self.search_query_param, '').strip()
+        if not query:
+            raise ValidationError({self.search_query_param: ['This parameter is required.']})
+        page = self.paginate_queryset(SearchResults(query))
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
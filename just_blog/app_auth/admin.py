@@ -17,7 +17,7 @@ class PostInline(admin.StackedInline):
 
 @admin.register(Profile)
 class ProfileAdmin(admin.ModelAdmin):
-    list_display = 'pk', 'user',
+    list_display = 'pk', 'user', 'blog_count', 'post_count', 'published_count',
     inlines = [BlogInline, PostInline]
 
 
@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class AppAuthConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'app_auth'
+
+    def ready(self) -> None:
+        """
+        Connects the receivers of the app.
+        """
+        from . import receivers  # noqa: F401
@@ -0,0 +1,15 @@
+from django.http import HttpRequest
+from .utils import get_request_profile
+from django.utils.functional import SimpleLazyObject
+from typing import Dict, Optional
+
+
+def profile(request: HttpRequest) -> Dict[str, Optional[SimpleLazyObject]]:
+    """
+    Adds the lazily resolved Profile instance of the authenticated request.user to the context as profile
+    (None for the anonymous users), unless the view passes its own one.
+    """
+    user = getattr(request, 'user', None)
+    if user is None or not user.is_authenticated:
+        return {'profile': None}
+    return {'profile': SimpleLazyObject(lambda: get_request_profile(request))}
@@ -0,0 +1,26 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.http import HttpRequest, HttpResponse
+from django.utils.functional import SimpleLazyObject
+from .utils import get_request_profile
+from typing import Awaitable, Callable, Union
+
+
+class ProfileMiddleware:
+    """
+    Sets request.profile to the lazily resolved Profile instance of request.user (None for the anonymous users).
+    The profile is loaded at the first access and only once per request.
+    Should be placed after the AuthenticationMiddleware.
+    Supports both the sync and the async requests: the async views should resolve the profile
+    with aget_request_profile before request.profile is accessed.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response: Callable[[HttpRequest], Union[HttpResponse, Awaitable[HttpResponse]]]) -> None:
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request: HttpRequest) -> Union[HttpResponse, Awaitable[HttpResponse]]:
+        request.profile = SimpleLazyObject(lambda: get_request_profile(request))
+        return self.get_response(request)
@@ -0,0 +1,18 @@
+# Generated by Django 4.2 on 2026-10-18 04:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_auth', '0002_alter_profile_bio'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='avatar_derivatives',
+            field=models.JSONField(blank=True, default=dict, editable=False, verbose_name='avatar derivatives'),
+        ),
+    ]
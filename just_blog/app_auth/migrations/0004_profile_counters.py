@@ -0,0 +1,37 @@
+# Generated by Django 4.2 on 2026-10-18 05:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_auth', '0003_profile_avatar_derivatives'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='blog_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='blog count'),
+        ),
+        migrations.AddField(
+            model_name='profile',
+            name='image_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='image count'),
+        ),
+        migrations.AddField(
+            model_name='profile',
+            name='post_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='post count'),
+        ),
+        migrations.AddField(
+            model_name='profile',
+            name='published_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='published post count'),
+        ),
+        migrations.AddIndex(
+            model_name='profile',
+            index=models.Index(fields=['-published_count', 'id'], name='profile_activity_idx'),
+        ),
+    ]
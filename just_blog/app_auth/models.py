@@ -1,5 +1,6 @@
 from django.db import models
 from django.contrib.auth.models import User
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 from datetime import date
 from typing import Optional
@@ -8,11 +9,23 @@ from typing import Optional
 class Profile(models.Model):
     """
     Declares the model Profile related with One-to-One relationship with the default User model.
+    The numbers of the blogs, the posts, the published posts and the images of the profile
+    are stored in the counter fields, maintained by app_blog.
     """
     user = models.OneToOneField(User, on_delete=models.CASCADE, verbose_name=_('user'))
     age = models.DateField(blank=True, null=True, verbose_name=_('date of birth'))
     bio = models.CharField(max_length=256, blank=True, verbose_name=_('bio'))
     avatar = models.ImageField(upload_to='avatars/', null=True, blank=True, verbose_name=_('your photo'))
+    # The thumbnails and the WebP variants generated by app_media in the background.
+    avatar_derivatives = models.JSONField(
+        default=dict, blank=True, editable=False, verbose_name=_('avatar derivatives')
+    )
+    blog_count = models.PositiveIntegerField(default=0, editable=False, verbose_name=_('blog count'))
+    post_count = models.PositiveIntegerField(default=0, editable=False, verbose_name=_('post count'))
+    published_count = models.PositiveIntegerField(default=0, editable=False, verbose_name=_('published post count'))
+    image_count = models.PositiveIntegerField(default=0, editable=False, verbose_name=_('image count'))
+    # The ETag and the Last-Modified of the pages of the profile are computed from the time of the last update.
+    updated_at = models.DateTimeField(default=timezone.now, editable=False, verbose_name=_('updated at'))
 
     def __str__(self) -> str:
         """
@@ -23,6 +36,18 @@ class Profile(models.Model):
     class Meta:
         verbose_name_plural = _('profiles')
         verbose_name = _('profile')
+        indexes = [
+            models.Index(fields=['-published_count', 'id'], name='profile_activity_idx'),
+        ]
+
+    def save(self, *args, **kwargs) -> None:
+        """
+        Saves the profile. The time of the update is saved even if only some of the fields are updated.
+        """
+        self.updated_at = timezone.now()
+        if kwargs.get('update_fields'):
+            kwargs['update_fields'] = {'updated_at', *kwargs['update_fields']}
+        super().save(*args, **kwargs)
 
     def get_age(self) -> Optional[int]:
         """
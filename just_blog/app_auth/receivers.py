@@ -0,0 +1,35 @@
+"""
+Receivers remembering the id of the profile in the session at the login (see PROFILE_SESSION_CACHE),
+so the requests of the session load the profile by its primary key without writing the session,
+and keeping updated_at of the profile in sync with the changes of its user shown on the profile pages.
+"""
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.contrib.auth.signals import user_logged_in
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from django.utils import timezone
+from .models import Profile
+
+
+@receiver(user_logged_in)
+def remember_profile(sender, request, user, **kwargs) -> None:
+    """
+    Saves the id of the profile of the logged in user to the session.
+    """
+    if not settings.PROFILE_SESSION_CACHE or getattr(request, 'session', None) is None:
+        return
+    profile_pk = Profile.objects.filter(user=user).values_list('pk', flat=True).first()
+    if profile_pk is not None:
+        request.session[settings.PROFILE_SESSION_KEY] = profile_pk
+
+
+@receiver(post_save, sender=User)
+def touch_profile(sender, instance: User, created: bool, update_fields=None, raw: bool = False, **kwargs) -> None:
+    """
+    Sets updated_at of the profile of the changed user, as the names and the email are shown on the profile pages.
+    The updates of the time of the last login are skipped.
+    """
+    if created or raw or (update_fields is not None and set(update_fields) <= {'last_login'}):
+        return
+    Profile.objects.filter(user=instance).update(updated_at=timezone.now())
@@ -0,0 +1,26 @@
+"""
+The background tasks of the profiles: the saving of the uploaded avatar.
+"""
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.shortcuts import reverse
+from app_jobs.utils import task, PermanentJobError
+from .models import Profile
+import os
+from typing import Dict
+
+
+@task('save_avatar')
+def save_avatar(profile_id: int, path: str) -> Dict[str, str]:
+    """
+    Saves the staged file as the avatar of the profile and deletes the staged file.
+    """
+    profile = Profile.objects.filter(pk=profile_id).first()
+    if profile is None:
+        default_storage.delete(path)
+        raise PermanentJobError(f'The profile {profile_id} does not exist')
+    with default_storage.open(path, 'rb') as staged_file:
+        profile.avatar = File(staged_file, name=os.path.basename(path))
+        profile.save(update_fields=['avatar'])
+    default_storage.delete(path)
+    return {'url': reverse('app_auth:profile_detail', kwargs={'pk': profile.pk})}
@@ -1,4 +1,8 @@
-from django.test import TestCase
+from django.test import RequestFactory, TestCase, override_settings
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.http import Http404
+from app_auth.utils import get_profile_for_context, get_request_profile
 from django.shortcuts import reverse
 from string import ascii_letters
 from random import choices, random, randint
@@ -7,6 +11,9 @@ from app_auth.models import Profile
 from PIL import Image as PilImage
 import os
 from datetime import date, timedelta
+from app_jobs.models import Job
+from app_jobs.utils import run_pending_jobs
+from app_jobs.testing import TemporaryMediaTestMixin
 
 
 class GetStartedViewTestCase(TestCase):
@@ -51,7 +58,7 @@ class GetStartedViewTestCase(TestCase):
         self.assertContains(bad_response, 'errorlist')
 
 
-class UpdateViewTestCase(TestCase):
+class UpdateViewTestCase(TemporaryMediaTestMixin, TestCase):
     def get_age(self, random_date):
         today = date.today()
         birthdate = random_date
@@ -126,9 +133,17 @@ class UpdateViewTestCase(TestCase):
     def test_upload_avatar(self):
         self.client.force_login(user=self.user)
         with open(self.path_to_test_image, 'rb') as file:
-            self.client.post(self.url, {'avatar': file})
+            post_response = self.client.post(self.url, {**self.data, 'avatar': file})
+        job = Job.objects.get(owner=self.user, name='save_avatar')
+        self.assertRedirects(post_response, job.get_absolute_url())
         self.profile.refresh_from_db(fields=['avatar'])
-        self.assertIsNotNone(self.profile.avatar)
+        self.assertFalse(self.profile.avatar)
+
+        run_pending_jobs()
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.DONE)
+        self.profile.refresh_from_db(fields=['avatar'])
+        self.assertTrue(self.profile.avatar.name.startswith('avatars/'))
         self.client.logout()
 
     def test_forbidden_update(self):
@@ -268,6 +283,22 @@ class ProfilePublicViewTestCase(TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertContains(response, self.random_profile.user.username)
 
+    def test_profile_public_conditional(self):
+        self.client.force_login(user=self.random_profile.user)
+        response = self.client.get(self.url)
+        etag = response.headers['ETag']
+        last_modified = response.headers['Last-Modified']
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.assertEqual(self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=last_modified).status_code, 304)
+        profile = Profile.objects.get(pk=self.random_profile.pk)
+        profile.bio = 'a new conditional bio'
+        profile.save(update_fields=['bio'])
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertContains(response, 'a new conditional bio')
+        self.assertNotEqual(response.headers['ETag'], etag)
+        self.client.logout()
+
+
 
 
 
@@ -288,3 +319,66 @@ class ProfilePublicViewTestCase(TestCase):
 
 
 
+
+class RequestProfileTestCase(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='profile_user', password='profile_password')
+        cls.profile = Profile.objects.create(user=cls.user)
+        cls.user_without_profile = User.objects.create_user(username='no_profile', password='no_profile')
+
+    def get_request(self, user, session=None):
+        request = RequestFactory().get('/')
+        request.user = user
+        if session is not None:
+            request.session = session
+        return request
+
+    def test_resolved_once(self):
+        request = self.get_request(self.user)
+        with self.assertNumQueries(1):
+            profile = get_request_profile(request)
+            self.assertEqual(get_profile_for_context(request), profile)
+        self.assertEqual(profile, self.profile)
+        with self.assertNumQueries(0):
+            self.assertEqual(profile.user, self.user)
+
+    def test_anonymous_and_missing_profile(self):
+        with self.assertNumQueries(0):
+            self.assertIsNone(get_request_profile(self.get_request(AnonymousUser())))
+        request = self.get_request(self.user_without_profile)
+        self.assertIsNone(get_request_profile(request))
+        with self.assertRaises(Http404):
+            get_profile_for_context(request)
+
+    def test_user_changed(self):
+        request = self.get_request(self.user_without_profile)
+        self.assertIsNone(get_request_profile(request))
+        request.user = self.user
+        self.assertEqual(get_request_profile(request), self.profile)
+
+    def test_session_cache(self):
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.session[settings.PROFILE_SESSION_KEY], self.profile.pk)
+
+        session = {settings.PROFILE_SESSION_KEY: self.profile.pk + 100}
+        self.assertEqual(get_request_profile(self.get_request(self.user, session)), self.profile)
+        self.assertEqual(session[settings.PROFILE_SESSION_KEY], self.profile.pk)
+
+        session = {settings.PROFILE_SESSION_KEY: self.profile.pk}
+        self.assertIsNone(get_request_profile(self.get_request(self.user_without_profile, session)))
+        self.assertNotIn(settings.PROFILE_SESSION_KEY, session)
+
+    @override_settings(PROFILE_SESSION_CACHE=False)
+    def test_session_cache_disabled(self):
+        session = {}
+        self.assertEqual(get_request_profile(self.get_request(self.user, session)), self.profile)
+        self.assertEqual(session, {})
+
+    def test_request_attribute_and_context(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('app_auth:login'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['profile'], self.profile)
+        self.assertEqual(response.wsgi_request.profile, self.profile)
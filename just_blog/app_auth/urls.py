@@ -1,6 +1,6 @@
 from django.urls import path
 from django.shortcuts import reverse, redirect
-from .models import Profile
+from .utils import get_profile_for_context
 from .views import (
     GetStartedView,
     update_view,
@@ -19,6 +19,6 @@ urlpatterns = [
     path('profile-details/<int:pk>/', ProfileDetailView.as_view(), name='profile_detail'),
     path('login/', MyLoginView.as_view(), name='login'),
     path('logout/', MyLogoutView.as_view(), name='logout'),
-    path('', lambda req: redirect(reverse('app_auth:profile_detail', kwargs={'pk': Profile.objects.get(user=req.user).pk}))),
+    path('', lambda req: redirect(reverse('app_auth:profile_detail', kwargs={'pk': get_profile_for_context(req).pk}))),
     path('profile/<int:pk>/', ProfilePublicView.as_view(), name='profile_public')
 ]
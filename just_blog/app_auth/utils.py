@@ -1,7 +1,77 @@
 from app_auth.models import Profile
-from django.shortcuts import get_object_or_404
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.middleware import get_user
+from django.contrib.auth.models import AnonymousUser, User
 from django.http import HttpRequest, Http404
-from typing import Union
+from typing import Optional, Union
+
+
+def load_profile(request: HttpRequest) -> Optional[Profile]:
+    """
+    Loads the Profile instance of the authenticated request.user, or returns None if the user has no profile.
+    The already loaded user is attached to the profile, so the user table isn't joined.
+    With PROFILE_SESSION_CACHE the id of the profile is kept in the session
+    and the profile is loaded by its primary key.
+    """
+    user = request.user
+    session = getattr(request, 'session', None) if settings.PROFILE_SESSION_CACHE else None
+    session_pk = session.get(settings.PROFILE_SESSION_KEY) if session is not None else None
+    profile = None
+    if session_pk is not None:
+        profile = Profile.objects.filter(pk=session_pk, user_id=user.pk).first()
+    if profile is None:
+        profile = Profile.objects.filter(user_id=user.pk).first()
+    if profile is not None:
+        profile.user = user
+        if session is not None and session_pk != profile.pk:
+            session[settings.PROFILE_SESSION_KEY] = profile.pk
+    elif session_pk is not None:
+        del session[settings.PROFILE_SESSION_KEY]
+    return profile
+
+
+def get_request_profile(request: HttpRequest) -> Optional[Profile]:
+    """
+    Returns the Profile instance of request.user, resolving it once per request,
+    or None if the user is anonymous or has no profile.
+    Accepts the rest_framework requests too: the profile is remembered on the underlying HttpRequest,
+    and it is resolved again if the user of the request has changed, e.g. after the login.
+    """
+    user = getattr(request, 'user', None)
+    if user is None or not user.is_authenticated:
+        return None
+    http_request = getattr(request, '_request', request)
+    cached = getattr(http_request, '_cached_profile', None)
+    if cached is None or cached[0] != user.pk:
+        cached = user.pk, load_profile(request)
+        http_request._cached_profile = cached
+    return cached[1]
+
+
+async def aget_user(request: HttpRequest) -> Union[User, AnonymousUser]:
+    """
+    Returns request.user without blocking the event loop. The session and the user are loaded in a thread,
+    as the session and the authentication backends are synchronous, and only once per request.
+    A request without the session cookie is anonymous and is resolved without leaving the event loop.
+    """
+    session = getattr(request, 'session', None)
+    if hasattr(request, '_cached_user') or session is None or session.session_key is None:
+        return request.user
+    return await sync_to_async(get_user)(request)
+
+
+async def aget_request_profile(request: HttpRequest) -> Optional[Profile]:
+    """
+    The async version of get_request_profile. The profile is loaded in a thread, once per request.
+    """
+    user = await aget_user(request)
+    if not user.is_authenticated:
+        return None
+    cached = getattr(request, '_cached_profile', None)
+    if cached is not None and cached[0] == user.pk:
+        return cached[1]
+    return await sync_to_async(get_request_profile)(request)
 
 
 def get_profile_for_context(request: HttpRequest) -> Union[Profile, Http404]:
@@ -9,4 +79,7 @@ def get_profile_for_context(request: HttpRequest) -> Union[Profile, Http404]:
     This method returns the Profile instance getting it from the related User instance
     saved in request.user, if it exists, otherwise raises Http404.
     """
-    return get_object_or_404(Profile.objects.select_related('user'), user=request.user)
+    profile = get_request_profile(request)
+    if profile is None:
+        raise Http404('No Profile matches the given query.')
+    return profile
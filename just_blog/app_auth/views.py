@@ -1,4 +1,4 @@
-from django.shortcuts import render, reverse, redirect, get_object_or_404
+from django.shortcuts import render, reverse, redirect
 from django.http import HttpRequest, HttpResponse, HttpResponseRedirect
 from django.contrib.auth.views import LoginView, LogoutView
 from django.views import View
@@ -12,6 +12,11 @@ from django.urls import reverse_lazy
 from django.core.exceptions import PermissionDenied
 from .utils import get_profile_for_context
 from typing import Union, Dict
+from app_cache.conditional import ConditionalPageMixin
+from app_cache.utils import AnonymousPageCacheMixin
+from app_jobs.utils import enqueue, stage_file
+from app_throttle.throttling import LoginThrottleMixin
+from django.core.files.uploadedfile import UploadedFile
 
 
 class GetStartedView(CreateView):
@@ -66,6 +71,8 @@ def update_view(request: HttpRequest, pk: int) -> Union[HttpResponseRedirect, Ht
     last_name and email of the User model;
     and ProfileForm with the fields bio, age and avatar.
     If both forms a valid, saves the changes and redirects to the app_auth:profile_detail path.
+    A new avatar is saved in the background: the view enqueues the save_avatar job
+    and redirects to the status page of the job.
     """
 
     if request.user.profile.pk != pk:
@@ -74,7 +81,13 @@ def update_view(request: HttpRequest, pk: int) -> Union[HttpResponseRedirect, Ht
         user_form = MyUserChangeForm(request.POST, instance=request.user)
         profile_form = ProfileForm(request.POST, request.FILES, instance=request.user.profile)
         if user_form.is_valid() and profile_form.is_valid():
+            avatar = profile_form.cleaned_data.get('avatar')
             user_form.save()
+            if isinstance(avatar, UploadedFile):
+                profile_form.instance.avatar = profile_form.initial.get('avatar')
+                profile_form.save()
+                job = enqueue('save_avatar', owner=request.user, profile_id=pk, path=stage_file(avatar))
+                return redirect(job)
             profile_form.save()
             return redirect('app_auth:profile_detail', pk=pk)
 
@@ -91,9 +104,9 @@ def update_view(request: HttpRequest, pk: int) -> Union[HttpResponseRedirect, Ht
     return render(request, 'app_auth/profile_update.html', context=context)
 
 
-class MyLoginView(LoginView):
+class MyLoginView(LoginThrottleMixin, LoginView):
     """
-    A view for login.
+    A view for login. The attempts are throttled by the IP address (see LoginThrottleMixin).
     """
     template_name = 'app_auth/login.html'
     form_class = MyLoginForm
@@ -137,10 +150,13 @@ class ProfileDetailView(UserPassesTestMixin, DetailView):
             return pk == cur_profile.pk
 
 
-class ProfilePublicView(DetailView):
+class ProfilePublicView(AnonymousPageCacheMixin, ConditionalPageMixin, DetailView):
     """
     The same view as the ProfileDetailView, but available for any user.
+    The page rendered for the anonymous users is cached.
+    The conditional requests are answered with 304 while the profile hasn't changed.
     """
+    cache_groups = ('profile:{pk}',)
     queryset = (
         Profile.objects.select_related('user')
     )
@@ -0,0 +1,6 @@
+from django.apps import AppConfig
+
+
+class AppBenchConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'app_bench'
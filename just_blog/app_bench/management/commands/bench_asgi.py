@@ -0,0 +1,73 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+from django.urls import reverse
+from app_bench.utils import BENCH_HOST, run_asgi, run_wsgi
+from app_blog.models import Post
+import json
+
+
+class Command(BaseCommand):
+    """
+    Compares the throughput and the latency of the WSGI and the ASGI applications of the project
+    at the passed concurrency. The requests are sent in-process, without a server in between,
+    so the difference comes from the handlers, the middleware and the views themselves.
+    By default the async read path is requested: the main page, the latest posts, a post and the feed.
+    """
+    help = 'Compares the throughput of the WSGI and the ASGI applications at high concurrency.'
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument('--url', action='append', help='The url to request. The async read path by default.')
+        parser.add_argument('--requests', type=int, default=2000, help='The number of the requests per url.')
+        parser.add_argument('--concurrency', type=int, default=100, help='The number of the concurrent requests.')
+        parser.add_argument(
+            '--vary', action='store_true',
+            help='Add a unique query parameter to every request, so the pages are never served from the cache.'
+        )
+        parser.add_argument('--json', action='store_true', help='Print the results as JSON.')
+
+    def get_default_urls(self):
+        """
+        Returns the urls of the async read path.
+        """
+        post = Post.objects.filter(is_published=True).order_by('-published_at').only('pk').first()
+        if post is None:
+            raise CommandError('There are no published posts to request')
+        return [
+            reverse('app_main:index'),
+            reverse('app_blog:posts_latest'),
+            reverse('app_blog:post_detail', kwargs={'pk': post.pk}),
+            reverse('app_rss:posts_feed'),
+            reverse('app_api:post_list'),
+        ]
+
+    def handle(self, *args, **options) -> None:
+        if options['requests'] < 1 or options['concurrency'] < 1:
+            raise CommandError('--requests and --concurrency should be positive')
+
+        results = {}
+        # The query logging of the debug mode and the query budgets would be measured too,
+        # and the throttling would refuse the requests of the only client.
+        with override_settings(
+                DEBUG=False, QUERY_BUDGET_ENABLED=False, THROTTLE_ENABLED=False, ALLOWED_HOSTS=[BENCH_HOST]
+        ):
+            for url in options['url'] or self.get_default_urls():
+                separator = '&' if '?' in url else '?'
+                urls = [
+                    f'{url}{separator}_bench={number}' if options['vary'] else url
+                    for number in range(options['requests'])
+                ]
+                results[url] = {
+                    'wsgi': run_wsgi(urls, options['concurrency']),
+                    'asgi': run_asgi(urls, options['concurrency']),
+                }
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        for url, stats in results.items():
+            self.stdout.write(self.style.MIGRATE_HEADING(url))
+            for name, run in stats.items():
+                self.stdout.write(
+                    f'  {name}: {run["rps"]:8.1f} req/s  p50 {run["p50_ms"]:7.1f} ms  p95 {run["p95_ms"]:7.1f} ms  '
+                    f'p99 {run["p99_ms"]:7.1f} ms  errors {run["errors"]}'
+                )
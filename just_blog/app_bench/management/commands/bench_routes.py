@@ -0,0 +1,92 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+from app_bench.runner import compare_results, run_benchmark
+from app_bench.utils import BENCH_HOST
+import json
+
+
+class Command(BaseCommand):
+    """
+    Measures the latency percentiles and the queries per request of every named route of the project,
+    with --writes of the write path of the posts api, and with --serialization-rows the rows per second
+    of the lists of the api serialized by the model serializers and from the rows of values().
+    The results are written as JSON with --output. With --baseline the results are compared with a saved run,
+    and with --fail-on-regression the command fails when a route makes more queries, changes its status
+    or becomes slower than the tolerance allows, so it can guard the changes in CI.
+    """
+    help = 'Measures the latency and the queries per request of every route of the project.'
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument('--route', action='append', help='The name of the route to measure. All by default.')
+        parser.add_argument('--repeat', type=int, default=20, help='The number of the measured requests per route.')
+        parser.add_argument('--warmup', type=int, default=2, help='The number of the requests before measuring.')
+        parser.add_argument('--cold', action='store_true', help='Clear the cache before every request.')
+        parser.add_argument(
+            '--writes', action='store_true', help='Measure the writes of the posts api too. The post is restored.'
+        )
+        parser.add_argument(
+            '--serialization-rows', type=int, default=0,
+            help='Measure the serialization of the pages of so many rows of the lists of the api.'
+        )
+        parser.add_argument('--output', help='The path of the JSON file to write the results to.')
+        parser.add_argument('--baseline', help='The path of the JSON file with the results to compare with.')
+        parser.add_argument(
+            '--fail-on-regression', action='store_true', help='Fail if there are regressions against the baseline.'
+        )
+        parser.add_argument(
+            '--latency-tolerance', type=float, default=0.25,
+            help='The allowed growth of the p95 latency as a share of the baseline.'
+        )
+        parser.add_argument(
+            '--min-delta-ms', type=float, default=2.0,
+            help='The growth of the p95 latency in milliseconds that is never a regression.'
+        )
+
+    def handle(self, *args, **options) -> None:
+        if options['repeat'] < 1 or options['warmup'] < 0 or options['serialization_rows'] < 0:
+            raise CommandError('--repeat should be positive, --warmup and --serialization-rows not negative')
+        if options['fail_on_regression'] and not options['baseline']:
+            raise CommandError('--fail-on-regression needs --baseline')
+        baseline = None
+        if options['baseline']:
+            with open(options['baseline'], encoding='utf-8') as file:
+                baseline = json.load(file)
+
+        # The query logging of the debug mode and the query budgets would be measured too,
+        # and the throttling would refuse the requests of the only client.
+        with override_settings(
+                DEBUG=False, QUERY_BUDGET_ENABLED=False, THROTTLE_ENABLED=False,
+                ALLOWED_HOSTS=['testserver', BENCH_HOST]
+        ):
+            try:
+                results = run_benchmark(
+                    options['route'], repeat=options['repeat'], warmup=options['warmup'], cold=options['cold'],
+                    writes=options['writes'], serialization_rows=options['serialization_rows']
+                )
+            except LookupError as exc:
+                raise CommandError(f'{exc}. Generate the dataset with bench_seed first.')
+
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                json.dump(results, file, indent=2)
+        for key, result in results['routes'].items():
+            line = (
+                f'{key:55} {result["status"]}  p50 {result["p50_ms"]:7.1f} ms  p95 {result["p95_ms"]:7.1f} ms  '
+                f'p99 {result["p99_ms"]:7.1f} ms  queries {result["queries"]}'
+            )
+            if 'rows_per_s' in result:
+                line += f'  rows {result["rows"]}  {result["rows_per_s"]:9.0f} rows/s'
+            self.stdout.write(line)
+        for name in results['uncovered']:
+            self.stderr.write(f'{name} is not benchmarked')
+
+        if baseline is None:
+            return
+        regressions = compare_results(
+            baseline, results, latency_tolerance=options['latency_tolerance'], min_delta_ms=options['min_delta_ms']
+        )
+        for regression in regressions:
+            self.stderr.write(regression)
+        if regressions and options['fail_on_regression']:
+            raise CommandError(f'{len(regressions)} regressions against {options["baseline"]}')
+        self.stdout.write(self.style.SUCCESS(f'{len(regressions)} regressions against {options["baseline"]}'))
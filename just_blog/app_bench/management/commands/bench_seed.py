@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand, CommandError
+from app_bench.seed import delete_dataset, seed_dataset
+
+
+class Command(BaseCommand):
+    """
+    Generates the synthetic dataset of the benchmarks: the profiles with their blogs, posts and images.
+    The same seed always generates the same dataset, so the runs of bench_routes are comparable.
+    """
+    help = 'Generates the synthetic dataset of the benchmarks.'
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument('--profiles', type=int, default=100, help='The number of the profiles.')
+        parser.add_argument('--blogs-per-profile', type=int, default=2, help='The number of the blogs of a profile.')
+        parser.add_argument('--posts-per-blog', type=int, default=20, help='The number of the posts of a blog.')
+        parser.add_argument('--images-per-post', type=int, default=1, help='The number of the images of a post.')
+        parser.add_argument('--published-share', type=float, default=0.8, help='The share of the published posts.')
+        parser.add_argument('--seed', type=int, default=0, help='The seed of the random generator.')
+        parser.add_argument('--batch-size', type=int, default=1000, help='The number of the rows inserted at once.')
+        parser.add_argument('--clear', action='store_true', help='Delete the previously generated dataset first.')
+
+    def handle(self, *args, **options) -> None:
+        counts = [
+            options['profiles'], options['blogs_per_profile'], options['posts_per_blog'], options['images_per_post']
+        ]
+        if min(counts) < 0 or options['batch_size'] < 1:
+            raise CommandError('The numbers of the instances should not be negative and --batch-size positive')
+        if not 0 <= options['published_share'] <= 1:
+            raise CommandError('--published-share should be between 0 and 1')
+
+        if options['clear']:
+            self.stdout.write(f'{delete_dataset()} generated users deleted')
+        created = seed_dataset(
+            options['profiles'], options['blogs_per_profile'], options['posts_per_blog'], options['images_per_post'],
+            published_share=options['published_share'], seed=options['seed'], batch_size=options['batch_size']
+        )
+        self.stdout.write(self.style.SUCCESS(', '.join(f'{count} {name}' for name, count in created.items())))
@@ -0,0 +1,85 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings
+from app_bench.seed import SeedOptions, delete_dataset, get_next_number, seed_blog
+import time
+from typing import Dict
+
+
+class Command(BaseCommand):
+    """
+    Generates a production-size dataset: the users with their profiles, blogs, posts and images,
+    with the posts per author following a heavy-tailed distribution and a share of the drafts.
+    The rows are inserted in batches with a constant memory, optionally by several worker processes,
+    and the same seed always generates the same dataset.
+    """
+    help = 'Generates millions of users, profiles, blogs, posts and images with realistic distributions.'
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument('--profiles', type=int, default=1000, help='The number of the users with the profiles.')
+        parser.add_argument('--blogs-per-profile', type=float, default=2, help='The mean number of the blogs.')
+        parser.add_argument('--posts-per-profile', type=float, default=20, help='The mean number of the posts.')
+        parser.add_argument('--images-per-post', type=float, default=1, help='The mean number of the images.')
+        parser.add_argument('--draft-share', type=float, default=0.2, help='The share of the unpublished posts.')
+        parser.add_argument(
+            '--tail-alpha', type=float, default=1.5,
+            help='The shape of the distribution of the posts per author: the smaller, the heavier the tail.'
+        )
+        parser.add_argument(
+            '--max-posts', type=int, default=10000, help='The maximum number of the posts of a profile.'
+        )
+        parser.add_argument(
+            '--uniform', action='store_true', help='Give every profile exactly the mean numbers of the instances.'
+        )
+        parser.add_argument('--days', type=int, default=730, help='The posts are published within the last days.')
+        parser.add_argument('--seed', type=int, default=0, help='The seed of the random generator.')
+        parser.add_argument('--batch-size', type=int, default=1000, help='The number of the rows inserted at once.')
+        parser.add_argument(
+            '--shard-size', type=int, default=1000,
+            help='The number of the profiles generated in one transaction. Changes the generated dataset.'
+        )
+        parser.add_argument('--workers', type=int, default=1, help='The number of the worker processes.')
+        parser.add_argument('--clear', action='store_true', help='Delete the previously generated dataset first.')
+
+    def validate(self, options: Dict) -> None:
+        """
+        Raises CommandError if the options describe an impossible dataset.
+        """
+        if options['profiles'] < 0 or min(
+            options['blogs_per_profile'], options['posts_per_profile'], options['images_per_post']
+        ) < 0:
+            raise CommandError('The numbers of the instances should not be negative')
+        if min(options['batch_size'], options['shard_size'], options['workers'], options['max_posts']) < 1:
+            raise CommandError('--batch-size, --shard-size, --workers and --max-posts should be positive')
+        if not 0 <= options['draft_share'] <= 1:
+            raise CommandError('--draft-share should be between 0 and 1')
+        if options['tail_alpha'] <= 1:
+            raise CommandError('--tail-alpha should be more than 1, otherwise the mean is infinite')
+        if options['workers'] > 1 and connection.vendor == 'sqlite':
+            raise CommandError('SQLite allows one writer at a time, use --workers with a server database')
+
+    def handle(self, *args, **options) -> None:
+        self.validate(options)
+        if options['clear']:
+            self.stdout.write(f'{delete_dataset()} generated users deleted')
+
+        seed_options = SeedOptions(
+            options['profiles'], blogs_per_profile=options['blogs_per_profile'],
+            posts_per_profile=options['posts_per_profile'], images_per_post=options['images_per_post'],
+            draft_share=options['draft_share'], heavy_tailed=not options['uniform'], tail_alpha=options['tail_alpha'],
+            max_posts=options['max_posts'], days=options['days'], seed=options['seed'],
+            batch_size=options['batch_size'], shard_size=options['shard_size'], start=get_next_number()
+        )
+        started = time.perf_counter()
+
+        def progress(done: int, created: Dict[str, int]) -> None:
+            """
+            Reports the finished shards with the number of the created posts per second.
+            """
+            rate = created['posts'] / (time.perf_counter() - started)
+            self.stdout.write(f'{done}/{seed_options.shards} shards, {created["posts"]} posts, {rate:.0f} posts/s')
+
+        # The debug mode keeps the last queries in memory, and the bulk inserts are large.
+        with override_settings(DEBUG=False):
+            created = seed_blog(seed_options, workers=options['workers'], progress=progress)
+        self.stdout.write(self.style.SUCCESS(', '.join(f'{count} {name}' for name, count in created.items())))
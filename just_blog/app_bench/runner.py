@@ -0,0 +1,372 @@
+"""
+The benchmark of the routes of the project. Every named route is requested with the test client
+by an anonymous visitor and by the owner of the requested objects, and the latency percentiles
+and the number of the SQL queries of every route are collected. The results are JSON-serializable,
+so the runs can be saved and compared with compare_results().
+"""
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.test import Client, override_settings
+from django.urls import URLPattern, URLResolver, get_resolver, reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from app_auth.models import Profile
+from app_blog.models import Blog, Image, Post, Tag
+from app_jobs.models import Job
+from app_uploads.models import Upload
+from app_queries.utils import QueryRecorder
+from .utils import percentile
+import math
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple, Union
+
+ANONYMOUS = 'anonymous'
+OWNER = 'owner'
+
+# The routes that are never requested: they change the data or the session on GET, or accept only POST.
+EXCLUDED_ROUTES = {
+    'app_blog:publish_or_archive': 'publishes or archives the post on GET',
+    'app_auth:logout': 'ends the session of the owner',
+    'app_api:post_batch_create': 'accepts only POST',
+    'app_api:post_batch_publish': 'accepts only POST',
+    'app_api:post_batch_delete': 'accepts only POST',
+    'app_api:upload_create': 'accepts only POST',
+    'app_api:upload_finalize': 'accepts only POST',
+}
+
+Result = Dict[str, Union[str, int, float]]
+
+
+class BenchData:
+    """
+    The objects the routes are requested for: the latest published post with images,
+    its blog, its author (the owner) with the user, one of its images and tags and a job and an upload of the owner.
+    """
+
+    def __init__(self) -> None:
+        post = Post.objects.filter(is_published=True, images__isnull=False).order_by('-published_at', '-id').first()
+        if post is None:
+            raise LookupError('There are no published posts with images to request')
+        self.post: Post = post
+        self.blog: Blog = Blog.objects.get(pk=post.blog_id)
+        self.profile: Profile = Profile.objects.select_related('user').get(pk=post.profile_id)
+        self.image: Image = post.images.order_by('pk').first()
+        self.tag: Optional[Tag] = Tag.objects.filter(post_tags__post=post).order_by('slug').first()
+        self.job: Optional[Job] = Job.objects.filter(owner=self.profile.user).order_by('-pk').first()
+        self.upload: Optional[Upload] = Upload.objects.filter(owner=self.profile.user).order_by('-pk').first()
+        self.query = post.title.split()[0]
+
+
+class BenchRoute:
+    """
+    A route to request: the name, the function returning its url kwargs for the BenchData
+    (None if the data has no object for it), the query parameters and the visitors.
+    """
+
+    def __init__(
+            self, name: str, get_kwargs: Callable[[BenchData], Optional[Dict]] = lambda data: {},
+            get_params: Callable[[BenchData], Dict] = lambda data: {}, visitors: Tuple[str, ...] = (ANONYMOUS, OWNER)
+    ) -> None:
+        self.name = name
+        self.get_kwargs = get_kwargs
+        self.get_params = get_params
+        self.visitors = visitors
+
+
+def post_kwargs(data: BenchData) -> Dict[str, int]:
+    """
+    Returns the kwargs of the routes of the post.
+    """
+    return {'pk': data.post.pk}
+
+
+def blog_kwargs(data: BenchData) -> Dict[str, int]:
+    """
+    Returns the kwargs of the routes of the blog.
+    """
+    return {'pk': data.blog.pk}
+
+
+def profile_kwargs(data: BenchData) -> Dict[str, int]:
+    """
+    Returns the kwargs of the routes of the profile.
+    """
+    return {'pk': data.profile.pk}
+
+
+def search_params(data: BenchData) -> Dict[str, str]:
+    """
+    Returns the query of the search routes: the first word of the title of the post.
+    """
+    return {'q': data.query}
+
+
+ROUTES = [
+    BenchRoute('app_main:index'),
+    BenchRoute('app_main:about'),
+    BenchRoute('app_main:contacts'),
+    BenchRoute('app_auth:get_started', visitors=(ANONYMOUS,)),
+    BenchRoute('app_auth:login', visitors=(ANONYMOUS,)),
+    BenchRoute('app_auth:profile_detail', profile_kwargs),
+    BenchRoute('app_auth:profile_public', profile_kwargs),
+    BenchRoute('app_auth:profile_update', profile_kwargs),
+    BenchRoute('app_blog:posts_latest'),
+    BenchRoute('app_blog:post_detail', post_kwargs),
+    BenchRoute('app_blog:post_new', blog_kwargs),
+    BenchRoute('app_blog:post_edit', post_kwargs),
+    BenchRoute('app_blog:post_delete', post_kwargs),
+    BenchRoute('app_blog:user_blog_list', profile_kwargs),
+    BenchRoute('app_blog:blog_new'),
+    BenchRoute('app_blog:blog_detail', blog_kwargs),
+    BenchRoute('app_blog:blog_edit', blog_kwargs),
+    BenchRoute('app_blog:blog_delete', blog_kwargs),
+    BenchRoute('tag_posts', lambda data: {'slug': data.tag.slug} if data.tag else None),
+    BenchRoute('app_search:search', get_params=search_params),
+    BenchRoute('app_jobs:job_detail', lambda data: {'pk': data.job.pk} if data.job else None),
+    BenchRoute('app_rss:posts_feed'),
+    BenchRoute('app_rss:blog_feed', blog_kwargs),
+    BenchRoute('app_rss:profile_feed', profile_kwargs),
+    BenchRoute('django.contrib.sitemaps.views.sitemap'),
+    BenchRoute('post_sitemap_index'),
+    BenchRoute('post_sitemap_section', lambda data: {'section': 0}),
+    BenchRoute('javascript-catalog'),
+    BenchRoute('schema_swagger_ui'),
+    BenchRoute('app_api:post_list'),
+    BenchRoute('app_api:post_detail', post_kwargs),
+    BenchRoute('app_api:new_post'),
+    BenchRoute('app_api:post_import', blog_kwargs),
+    BenchRoute('app_api:blog_list'),
+    BenchRoute('app_api:blog_detail', blog_kwargs),
+    BenchRoute('app_api:new_blog'),
+    BenchRoute('app_api:profile_list'),
+    BenchRoute('app_api:profile_update', profile_kwargs),
+    BenchRoute('app_api:new_profile'),
+    BenchRoute('app_api:image_detail', lambda data: {'pk': data.image.pk}),
+    BenchRoute('app_api:new_image'),
+    BenchRoute('app_api:job_detail', lambda data: {'pk': data.job.pk} if data.job else None),
+    BenchRoute('app_api:upload_detail', lambda data: {'pk': data.upload.pk} if data.upload else None),
+    BenchRoute('app_api:search', get_params=search_params),
+    BenchRoute('app_api:tag_list'),
+]
+
+
+# The route of the measured writes and the PATCH payloads of every write, starting with the changed values.
+WRITE_ROUTE = 'app_api:post_detail'
+
+WRITES = {
+    'PATCH publication owner': lambda data: [{'is_published': False}, {'is_published': True}],
+    'PATCH title owner': lambda data: [{'title': f'{data.post.title[:120]} (ed.)'}, {'title': data.post.title}],
+}
+
+
+# The lists whose serialization is measured, by the name of the route and the variant, and their query parameters.
+SERIALIZATION_LISTS = {
+    'app_api:post_list': {},
+    'app_api:post_list compact': {'compact': 'true'},
+    'app_api:blog_list': {},
+    'app_api:profile_list': {},
+}
+
+
+def get_project_route_names(urlconf: Optional[str] = None, namespace: Optional[str] = None) -> Set[str]:
+    """
+    Returns the names of the routes of the project: the named routes of the root url configuration
+    and all the named routes of the included apps of the project (the namespaces starting with app_).
+    """
+    names = set()
+    for pattern in get_resolver(urlconf).url_patterns:
+        if isinstance(pattern, URLPattern) and pattern.name:
+            names.add(f'{namespace}:{pattern.name}' if namespace else pattern.name)
+        elif isinstance(pattern, URLResolver) and (pattern.namespace or '').startswith('app_'):
+            names.update(get_project_route_names(pattern.urlconf_name, pattern.namespace))
+    return names
+
+
+def get_uncovered_routes(routes: Iterable[BenchRoute] = ROUTES) -> Set[str]:
+    """
+    Returns the names of the routes of the project that are neither benchmarked nor excluded.
+    """
+    covered = {route.name for route in routes} | set(EXCLUDED_ROUTES)
+    return get_project_route_names() - covered
+
+
+def consume(response: HttpResponse) -> None:
+    """
+    Reads the content of the streaming responses, so their generation is measured too.
+    """
+    if response.streaming:
+        for _ in response.streaming_content:
+            pass
+        response.close()
+
+
+def measure_requests(send: Callable[[int], HttpResponse], url: str, repeat: int, warmup: int, cold: bool) -> Result:
+    """
+    Sends warmup requests without measuring, then repeat requests, and returns the status
+    of the last response, the percentiles of the latency in milliseconds and the queries per request.
+    send gets the number of the request and returns the response.
+    With cold the cache is cleared before every request, so the cached pages are never served.
+    """
+    latencies: List[float] = []
+    queries: List[int] = []
+    status = 0
+    for number in range(warmup + repeat):
+        if cold:
+            cache.clear()
+        with QueryRecorder() as recorder:
+            start = time.perf_counter()
+            response = send(number)
+            consume(response)
+            latency = time.perf_counter() - start
+        status = response.status_code
+        if number >= warmup:
+            latencies.append(latency)
+            queries.append(recorder.count)
+    return {
+        'url': url,
+        'status': status,
+        'requests': len(latencies),
+        'mean_ms': sum(latencies) / len(latencies) * 1000,
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p95_ms': percentile(latencies, 95) * 1000,
+        'p99_ms': percentile(latencies, 99) * 1000,
+        'max_ms': max(latencies) * 1000,
+        'queries': max(queries),
+        'queries_p50': percentile(queries, 50),
+    }
+
+
+def measure_route(client: Client, url: str, params: Dict, repeat: int, warmup: int, cold: bool) -> Result:
+    """
+    Measures the GET requests of the url with the query parameters (see measure_requests).
+    """
+    return measure_requests(lambda number: client.get(url, params), url, repeat, warmup, cold)
+
+
+def measure_writes(data: BenchData, repeat: int, warmup: int) -> Dict[str, Result]:
+    """
+    Measures the write path of the posts api: the owner toggles the publication of the post and edits its title
+    with PATCH. Every write alternates between the changed and the original values, and the original ones
+    are restored after the run, so the dataset stays the same.
+    """
+    url = reverse('app_api:post_detail', kwargs=post_kwargs(data))
+    client = APIClient()
+    client.force_authenticate(data.profile.user)
+    results = {}
+    for name, payloads in WRITES.items():
+        payloads = payloads(data)
+
+        def send(number: int) -> HttpResponse:
+            return client.patch(url, payloads[number % len(payloads)], format='json')
+
+        results[f'{WRITE_ROUTE} {name}'] = measure_requests(send, url, repeat, warmup, cold=False)
+        for number in range(warmup + repeat, math.ceil((warmup + repeat) / len(payloads)) * len(payloads)):
+            send(number)
+    return results
+
+
+def measure_serialization(rows: int, repeat: int, warmup: int, names: Iterable[str] = ()) -> Dict[str, Result]:
+    """
+    Measures the lists of the api with pages of rows objects, serialized by the model serializers
+    and by the ValuesSerializer (see API_VALUES_SERIALIZATION), and adds the number of the rows of a page
+    and the serialized rows per second to the results. The results are saved under the name of the list
+    and the serialization, e.g. 'app_api:post_list values'. Only the lists of the passed routes are measured, if any.
+    """
+    client = APIClient()
+    results = {}
+    for name, params in SERIALIZATION_LISTS.items():
+        route = name.split()[0]
+        if names and route not in names:
+            continue
+        url = reverse(route)
+        params = {'limit': rows, **params}
+        for serialization, enabled in (('serializer', False), ('values', True)):
+            responses: List[HttpResponse] = []
+
+            def send(number: int) -> HttpResponse:
+                responses[:] = [client.get(url, params)]
+                return responses[0]
+
+            with override_settings(API_VALUES_SERIALIZATION=enabled):
+                result = measure_requests(send, url, repeat, warmup, cold=False)
+            result['rows'] = len(responses[0].json()['results']) if result['status'] == 200 else 0
+            result['rows_per_s'] = result['rows'] / result['mean_ms'] * 1000 if result['mean_ms'] else 0.0
+            results[f'{name} {serialization}'] = result
+    return results
+
+
+def run_benchmark(
+        names: Optional[Iterable[str]] = None, repeat: int = 20, warmup: int = 2, cold: bool = False,
+        routes: Iterable[BenchRoute] = ROUTES, writes: bool = False, serialization_rows: int = 0
+) -> Dict:
+    """
+    Benchmarks the routes (all of them, or only the ones with the passed names)
+    and returns the results with the description of the run, the skipped and the uncovered routes.
+    The results of a route are saved under the name of the route and the visitor, e.g. 'app_blog:post_detail owner'.
+    With writes the write path of the posts api is measured too (see measure_writes),
+    its results are saved under the name of the route and the write, e.g. 'app_api:post_detail PATCH title owner'.
+    With serialization_rows the serialization of the pages of so many rows of the lists of the api is measured too
+    (see measure_serialization).
+    """
+    data = BenchData()
+    names = set(names or ())
+    results: Dict[str, Result] = {}
+    skipped: Dict[str, str] = dict(EXCLUDED_ROUTES)
+    for route in routes:
+        if names and route.name not in names:
+            continue
+        kwargs = route.get_kwargs(data)
+        if kwargs is None:
+            skipped[route.name] = 'there is no object to request'
+            continue
+        url = reverse(route.name, kwargs=kwargs)
+        for visitor in route.visitors:
+            client = Client()
+            if visitor == OWNER:
+                client.force_login(data.profile.user)
+            results[f'{route.name} {visitor}'] = measure_route(
+                client, url, route.get_params(data), repeat, warmup, cold
+            )
+    if writes and (not names or WRITE_ROUTE in names):
+        results.update(measure_writes(data, repeat, warmup))
+    if serialization_rows:
+        results.update(measure_serialization(serialization_rows, repeat, warmup, names))
+    return {
+        'meta': {
+            'created_at': timezone.now().isoformat(),
+            'repeat': repeat,
+            'warmup': warmup,
+            'cold': cold,
+            'writes': writes,
+            'serialization_rows': serialization_rows,
+            'posts': Post.objects.count(),
+            'profiles': Profile.objects.count(),
+        },
+        'routes': results,
+        'skipped': skipped,
+        'uncovered': sorted(get_uncovered_routes(routes)),
+    }
+
+
+def compare_results(
+        baseline: Dict, current: Dict, latency_tolerance: float = 0.25, min_delta_ms: float = 2.0
+) -> List[str]:
+    """
+    Compares the results of the current run with the baseline and returns the descriptions of the regressions:
+    a changed status, more queries per request, or the p95 latency grown by more than latency_tolerance
+    (a share of the baseline) and by more than min_delta_ms, so the noise of the fast routes is ignored.
+    The routes missing in one of the runs are not compared.
+    """
+    regressions = []
+    for key, result in sorted(current['routes'].items()):
+        base = baseline['routes'].get(key)
+        if base is None:
+            continue
+        if result['status'] != base['status']:
+            regressions.append(f'{key}: the status has changed from {base["status"]} to {result["status"]}')
+        if result['queries'] > base['queries']:
+            regressions.append(f'{key}: {result["queries"]} queries per request instead of {base["queries"]}')
+        delta = result['p95_ms'] - base['p95_ms']
+        if delta > min_delta_ms and result['p95_ms'] > base['p95_ms'] * (1 + latency_tolerance):
+            regressions.append(f'{key}: p95 {result["p95_ms"]:.1f} ms instead of {base["p95_ms"]:.1f} ms')
+    return regressions
@@ -0,0 +1,345 @@
+"""
+The synthetic dataset of the benchmarks. The profiles, blogs, posts and images are generated
+in the shapes of the fixtures of app_auth and app_blog: the titles, tags and paragraphs of the posts,
+the bios and the avatars of the profiles and the files of the images are taken from the fixtures,
+so the pages look like the real ones.
+
+The profiles are generated in shards of a fixed size, every shard with its own random generator seeded
+from the seed and the number of the shard, so the dataset is the same for the same seed whatever the number
+of the worker processes. The rows are created with bulk_create in batches and the created posts are dropped
+after every batch, so the memory doesn't grow with the size of the dataset. bulk_create doesn't call save(),
+so the counters are filled from the plan of the shard, the tags are synced for every batch
+and the search index is rebuilt at the end.
+"""
+from django.apps import apps
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connections, transaction
+from django.utils import timezone
+from app_auth.models import Profile
+from app_blog.models import Blog, Image, Post, Tag
+from app_search.backends import get_backend
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+from functools import lru_cache
+import django
+import itertools
+import json
+import math
+import os
+import random
+from typing import Callable, Dict, List, Optional, Tuple
+
+# The prefix of the usernames of the generated users, so the dataset can be deleted.
+BENCH_USERNAME_PREFIX = 'bench-'
+
+# The plan of a post: whether it is published and the number of its images.
+PostPlan = Tuple[bool, int]
+
+
+class Corpus:
+    """
+    The texts and the files of the fixtures the synthetic rows are built from.
+    """
+
+    def __init__(self) -> None:
+        posts = self.load('app_blog', 'posts.json')
+        profiles = self.load('app_auth', 'profiles.json')
+        self.titles = [post['title'] for post in posts]
+        self.tags = [post['tag'] for post in posts]
+        self.paragraphs = [
+            paragraph.strip() for post in posts for paragraph in post['content'].split('\n') if paragraph.strip()
+        ]
+        self.blog_descriptions = [blog['description'] for blog in self.load('app_blog', 'blogs.json')]
+        self.bios = [profile['bio'] for profile in profiles if profile['bio']]
+        self.avatars = [profile['avatar'] for profile in profiles if profile['avatar']]
+        self.images = [image['image'] for image in self.load('app_blog', 'images.json')]
+
+    @staticmethod
+    def load(app_label: str, name: str) -> List[Dict]:
+        """
+        Returns the fields of the objects of the fixture of the app.
+        """
+        path = os.path.join(apps.get_app_config(app_label).path, 'fixtures', name)
+        with open(path, encoding='utf-8') as fixture:
+            return [obj['fields'] for obj in json.load(fixture)]
+
+
+@lru_cache(maxsize=None)
+def get_corpus() -> Corpus:
+    """
+    Returns the corpus, loaded once per process.
+    """
+    return Corpus()
+
+
+class SeedOptions:
+    """
+    The shape of the dataset. The numbers of the blogs, the posts and the images are the means:
+    with heavy_tailed the posts of the profiles follow the Lomax (shifted Pareto) distribution
+    with the tail_alpha shape, so most authors write a few posts and a few authors write thousands
+    (at most max_posts), and the blogs and the images are distributed exponentially.
+    Without heavy_tailed every profile gets exactly the passed numbers.
+    draft_share of the posts are drafts, the rest are published within the last days days.
+    The rows are inserted by batch_size, and the profiles are generated in the shards of shard_size.
+    The usernames are numbered from start.
+    """
+
+    def __init__(
+            self, profiles: int, blogs_per_profile: float = 2, posts_per_profile: float = 20,
+            images_per_post: float = 1, draft_share: float = 0.2, heavy_tailed: bool = True, tail_alpha: float = 1.5,
+            max_posts: int = 10000, max_images: int = 10, days: int = 730, seed: int = 0, batch_size: int = 1000,
+            shard_size: int = 1000, start: int = 0
+    ) -> None:
+        self.profiles = profiles
+        self.blogs_per_profile = blogs_per_profile
+        self.posts_per_profile = posts_per_profile
+        self.images_per_post = images_per_post
+        self.draft_share = draft_share
+        self.heavy_tailed = heavy_tailed
+        self.tail_alpha = tail_alpha
+        self.max_posts = max_posts
+        self.max_images = max_images
+        self.days = days
+        self.seed = seed
+        self.batch_size = batch_size
+        self.shard_size = shard_size
+        self.start = start
+
+    @property
+    def shards(self) -> int:
+        """
+        Returns the number of the shards.
+        """
+        return math.ceil(self.profiles / self.shard_size)
+
+    def get_blog_count(self, rng: random.Random) -> int:
+        """
+        Returns the number of the blogs of a profile. With heavy_tailed every profile has at least one blog
+        unless the mean is zero.
+        """
+        if not self.heavy_tailed:
+            return round(self.blogs_per_profile)
+        if self.blogs_per_profile <= 1:
+            return math.ceil(self.blogs_per_profile)
+        return 1 + round(rng.expovariate(1 / (self.blogs_per_profile - 1)))
+
+    def get_post_count(self, rng: random.Random) -> int:
+        """
+        Returns the number of the posts of a profile.
+        """
+        if not self.heavy_tailed:
+            return round(self.posts_per_profile)
+        # The mean of the Lomax distribution with the scale s is s / (alpha - 1).
+        scale = self.posts_per_profile * (self.tail_alpha - 1)
+        return min(self.max_posts, int(scale * (rng.paretovariate(self.tail_alpha) - 1)))
+
+    def get_image_count(self, rng: random.Random) -> int:
+        """
+        Returns the number of the images of a post.
+        """
+        if not self.heavy_tailed:
+            return round(self.images_per_post)
+        if self.images_per_post <= 0:
+            return 0
+        return min(self.max_images, round(rng.expovariate(1 / self.images_per_post)))
+
+    def plan_profile(self, rng: random.Random) -> List[List[PostPlan]]:
+        """
+        Returns the plan of a profile: the plans of the posts of every blog.
+        """
+        blogs: List[List[PostPlan]] = [[] for _ in range(self.get_blog_count(rng))]
+        if not blogs:
+            return blogs
+        for number in range(self.get_post_count(rng)):
+            blog = rng.randrange(len(blogs)) if self.heavy_tailed else number % len(blogs)
+            blogs[blog].append((rng.random() >= self.draft_share, self.get_image_count(rng)))
+        return blogs
+
+
+def get_counters(plans: List[List[PostPlan]]) -> Dict[str, int]:
+    """
+    Returns the values of the counters of the posts of the plans.
+    """
+    posts = [post for plan in plans for post in plan]
+    return {
+        'post_count': len(posts),
+        'published_count': sum(published for published, _ in posts),
+        'image_count': sum(images for _, images in posts),
+    }
+
+
+def create_posts(posts: List[Tuple[Post, int]], rng: random.Random, corpus: Corpus) -> Dict[str, int]:
+    """
+    Creates the batch of the posts with their images and tags. Returns the numbers of the created instances.
+    """
+    created = Post.objects.bulk_create([post for post, _ in posts])
+    images = Image.objects.bulk_create([
+        Image(post=post, title=f'image {number}', image=rng.choice(corpus.images))
+        for post, count in posts for number in range(count)
+    ])
+    Tag.objects.sync_posts(created)
+    return {
+        'posts': len(created),
+        'published': sum(post.is_published for post in created),
+        'images': len(images),
+    }
+
+
+def seed_shard(options: SeedOptions, shard: int) -> Dict[str, int]:
+    """
+    Generates the profiles of the shard with their users, blogs, posts and images in one transaction.
+    Returns the numbers of the created instances.
+    """
+    rng = random.Random(f'{options.seed}:{shard}')
+    corpus = get_corpus()
+    now = timezone.now()
+    password = make_password(None)
+    first = shard * options.shard_size
+    numbers = range(first, min(first + options.shard_size, options.profiles))
+    plans = [options.plan_profile(rng) for _ in numbers]
+    created = Counter()
+
+    with transaction.atomic():
+        users = User.objects.bulk_create(
+            [
+                User(
+                    username=f'{BENCH_USERNAME_PREFIX}{options.start + number}', password=password,
+                    first_name=f'Author {options.start + number}'
+                )
+                for number in numbers
+            ],
+            batch_size=options.batch_size
+        )
+        profiles = Profile.objects.bulk_create(
+            [
+                Profile(
+                    user=user, bio=rng.choice(corpus.bios), avatar=rng.choice(corpus.avatars),
+                    blog_count=len(plan), **get_counters(plan)
+                )
+                for user, plan in zip(users, plans)
+            ],
+            batch_size=options.batch_size
+        )
+        blog_plans = [(profile, blog_plan) for profile, plan in zip(profiles, plans) for blog_plan in plan]
+        blogs = Blog.objects.bulk_create(
+            [
+                Blog(
+                    profile=profile, title=rng.choice(corpus.titles), description=rng.choice(corpus.blog_descriptions),
+                    **get_counters([blog_plan])
+                )
+                for profile, blog_plan in blog_plans
+            ],
+            batch_size=options.batch_size
+        )
+        created.update(profiles=len(profiles), blogs=len(blogs))
+
+        batch: List[Tuple[Post, int]] = []
+        for blog, (_, blog_plan) in zip(blogs, blog_plans):
+            for is_published, images in blog_plan:
+                paragraphs = rng.sample(corpus.paragraphs, min(len(corpus.paragraphs), rng.randint(2, 8)))
+                minutes = rng.randint(0, 60 * 24 * options.days)
+                batch.append((
+                    Post(
+                        blog=blog,
+                        profile_id=blog.profile_id,
+                        title=rng.choice(corpus.titles),
+                        tag=rng.choice(corpus.tags),
+                        content='\r\n\r\n'.join(paragraphs),
+                        is_published=is_published,
+                        published_at=now - timedelta(minutes=minutes) if is_published else None,
+                    ),
+                    images
+                ))
+                if len(batch) >= options.batch_size:
+                    created.update(create_posts(batch, rng, corpus))
+                    batch = []
+        if batch:
+            created.update(create_posts(batch, rng, corpus))
+    return dict(created)
+
+
+def init_worker() -> None:
+    """
+    Prepares a worker process: sets up Django if the process was spawned
+    and drops the database connections inherited from the parent if it was forked.
+    """
+    if not apps.ready:
+        django.setup()
+    for connection in connections.all(initialized_only=True):
+        connection.close()
+
+
+def seed_blog(
+        options: SeedOptions, workers: int = 1, progress: Optional[Callable[[int, Dict[str, int]], None]] = None
+) -> Dict[str, int]:
+    """
+    Generates the dataset shard by shard, in the worker processes if workers is more than one,
+    then recounts the posts of the tags, rebuilds the search index and clears the cache.
+    The progress is called with the number of the finished shards and the numbers created so far.
+    Returns the numbers of the created instances of every model.
+    """
+    created = Counter(profiles=0, blogs=0, posts=0, published=0, images=0)
+    shards = range(options.shards)
+    if workers > 1:
+        # The forked workers must not share the connections of the parent.
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=workers, initializer=init_worker) as executor:
+            results = executor.map(seed_shard, itertools.repeat(options), shards)
+            for done, result in enumerate(results, start=1):
+                created.update(result)
+                if progress:
+                    progress(done, dict(created))
+    else:
+        for shard in shards:
+            created.update(seed_shard(options, shard))
+            if progress:
+                progress(shard + 1, dict(created))
+
+    # The concurrent workers may have recounted the same tags from the different snapshots.
+    Tag.objects.update_post_counts(Tag.objects.values('pk'))
+    get_backend().rebuild()
+    # The cached pages and feeds don't know about the rows created without the signals.
+    cache.clear()
+    return dict(created)
+
+
+def get_next_number() -> int:
+    """
+    Returns the number of the next generated user, so the repeated runs don't reuse the usernames.
+    """
+    return User.objects.filter(username__startswith=BENCH_USERNAME_PREFIX).count()
+
+
+def seed_dataset(
+        profiles: int, blogs_per_profile: int, posts_per_blog: int, images_per_post: int,
+        published_share: float = 0.8, seed: int = 0, batch_size: int = 1000
+) -> Dict[str, int]:
+    """
+    Generates the profiles with their users, blogs_per_profile blogs of every profile, posts_per_blog posts
+    of every blog (published_share of them published) and images_per_post images of every post.
+    Returns the number of the created instances of every model.
+    """
+    options = SeedOptions(
+        profiles, blogs_per_profile=blogs_per_profile, posts_per_profile=blogs_per_profile * posts_per_blog,
+        images_per_post=images_per_post, draft_share=1 - published_share, heavy_tailed=False, seed=seed,
+        batch_size=batch_size, start=get_next_number()
+    )
+    return seed_blog(options)
+
+
+def delete_dataset(batch_size: int = 100) -> int:
+    """
+    Deletes the generated users with their profiles, blogs, posts and images by batch_size users at once,
+    so the deletion of a large dataset doesn't collect all the rows in memory. Returns the number of the users.
+    """
+    users = User.objects.filter(username__startswith=BENCH_USERNAME_PREFIX)
+    count = 0
+    while True:
+        pks = list(users.values_list('pk', flat=True)[:batch_size])
+        if not pks:
+            return count
+        User.objects.filter(pk__in=pks).delete()
+        count += len(pks)
@@ -0,0 +1,213 @@
+from django.contrib.auth.models import User
+from django.core.management import CommandError, call_command
+from django.test import SimpleTestCase, TestCase, TransactionTestCase
+from django.shortcuts import reverse
+from app_auth.models import Profile
+from app_bench.runner import ROUTES, compare_results, get_project_route_names, get_uncovered_routes
+from app_bench.seed import BENCH_USERNAME_PREFIX, SeedOptions, delete_dataset, seed_blog, seed_dataset
+from app_bench.utils import percentile, summarize
+from app_blog.models import Blog, Image, Post, Tag
+from app_blog.utils import reconcile_counters
+from io import StringIO
+import json
+import os
+import random
+import tempfile
+
+
+class BenchUtilsTestCase(SimpleTestCase):
+
+    def test_percentile(self):
+        values = [0.5, 0.1, 0.4, 0.2, 0.3]
+        self.assertEqual(percentile(values, 50), 0.3)
+        self.assertEqual(percentile(values, 99), 0.5)
+        self.assertEqual(percentile(values, 1), 0.1)
+        self.assertEqual(percentile([], 50), 0)
+
+    def test_summarize(self):
+        stats = summarize([0.01, 0.02, 0.03, 0.04], 2, 1)
+        self.assertEqual(stats['requests'], 4)
+        self.assertEqual(stats['errors'], 1)
+        self.assertEqual(stats['rps'], 2)
+        self.assertAlmostEqual(stats['p50_ms'], 20)
+        self.assertAlmostEqual(stats['max_ms'], 40)
+
+
+class BenchAsgiCommandTestCase(TransactionTestCase):
+
+    def test_bench_asgi(self):
+        url = reverse('app_main:about')
+        out = StringIO()
+        call_command('bench_asgi', url=[url], requests=20, concurrency=5, json=True, stdout=out)
+        results = json.loads(out.getvalue())
+        for handler in ('wsgi', 'asgi'):
+            self.assertEqual(results[url][handler]['requests'], 20)
+            self.assertEqual(results[url][handler]['errors'], 0)
+            self.assertGreater(results[url][handler]['rps'], 0)
+
+
+class BenchSeedTestCase(TestCase):
+
+    def test_seed_dataset(self):
+        created = seed_dataset(3, 2, 4, 1, published_share=0.5, seed=1)
+        self.assertEqual(created['profiles'], 3)
+        self.assertEqual(created['blogs'], 6)
+        self.assertEqual(created['posts'], 24)
+        self.assertEqual(created['images'], 24)
+        self.assertEqual(created['published'], Post.objects.filter(is_published=True).count())
+        self.assertEqual(reconcile_counters(dry_run=True), {'app_blog.Blog': 0, 'app_auth.Profile': 0})
+        profile = Profile.objects.filter(user__username__startswith=BENCH_USERNAME_PREFIX).first()
+        self.assertEqual(profile.blog_count, 2)
+        self.assertEqual(profile.post_count, 8)
+        self.assertEqual(delete_dataset(), 3)
+        self.assertFalse(Post.objects.exists())
+        self.assertFalse(Blog.objects.exists())
+
+    def test_seed_is_deterministic(self):
+        seed_dataset(2, 1, 5, 0, seed=7)
+        first = list(Post.objects.order_by('pk').values_list('title', 'tag', 'content', 'is_published'))
+        delete_dataset()
+        seed_dataset(2, 1, 5, 0, seed=7)
+        second = list(Post.objects.order_by('pk').values_list('title', 'tag', 'content', 'is_published'))
+        self.assertEqual(first, second)
+        self.assertFalse(Image.objects.exists())
+
+    def test_bench_seed_command(self):
+        out = StringIO()
+        call_command('bench_seed', profiles=2, blogs_per_profile=1, posts_per_blog=2, images_per_post=1, stdout=out)
+        call_command(
+            'bench_seed', profiles=1, blogs_per_profile=1, posts_per_blog=1, images_per_post=1, clear=True, stdout=out
+        )
+        self.assertEqual(User.objects.filter(username__startswith=BENCH_USERNAME_PREFIX).count(), 1)
+        with self.assertRaises(CommandError):
+            call_command('bench_seed', published_share=2, stdout=out)
+
+    def test_heavy_tailed_distribution(self):
+        options = SeedOptions(1, posts_per_profile=20, draft_share=0.3)
+        rng = random.Random(0)
+        counts = sorted(options.get_post_count(rng) for _ in range(5000))
+        mean = sum(counts) / len(counts)
+        self.assertLess(counts[len(counts) // 2], mean)
+        self.assertGreater(counts[-1], mean * 10)
+        self.assertLessEqual(counts[-1], options.max_posts)
+        plans = [options.plan_profile(rng) for _ in range(200)]
+        posts = [post for plan in plans for blog in plan for post in blog]
+        self.assertAlmostEqual(sum(not published for published, _ in posts) / len(posts), 0.3, delta=0.05)
+        self.assertTrue(all(plan for plan in plans))
+
+    def test_seed_blog_shards_are_deterministic(self):
+        options = SeedOptions(5, posts_per_profile=6, seed=3, shard_size=2, batch_size=4)
+        created = seed_blog(options)
+        self.assertEqual(created['profiles'], 5)
+        self.assertEqual(created['posts'], Post.objects.count())
+        self.assertEqual(created['images'], Image.objects.count())
+        self.assertEqual(reconcile_counters(dry_run=True), {'app_blog.Blog': 0, 'app_auth.Profile': 0})
+        tag = Tag.objects.order_by('-post_count').first()
+        self.assertEqual(tag.post_count, Post.objects.filter(tags=tag, is_published=True).count())
+        first = list(Post.objects.order_by('profile__user__username', 'pk').values_list('title', 'is_published'))
+        delete_dataset()
+        seed_blog(options)
+        second = list(Post.objects.order_by('profile__user__username', 'pk').values_list('title', 'is_published'))
+        self.assertEqual(first, second)
+
+    def test_seed_blog_command(self):
+        out = StringIO()
+        call_command('seed_blog', profiles=3, posts_per_profile=4, seed=1, shard_size=2, stdout=out)
+        self.assertIn('2/2 shards', out.getvalue())
+        self.assertEqual(Profile.objects.filter(user__username__startswith=BENCH_USERNAME_PREFIX).count(), 3)
+        for options in ({'draft_share': 2}, {'tail_alpha': 1}, {'workers': 0}, {'workers': 2}):
+            with self.subTest(options=options), self.assertRaises(CommandError):
+                call_command('seed_blog', profiles=1, stdout=out, **options)
+
+
+class BenchRoutesTestCase(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        seed_dataset(2, 1, 3, 1, published_share=1)
+
+    def test_every_route_is_covered(self):
+        self.assertEqual(get_uncovered_routes(), set())
+        names = get_project_route_names()
+        self.assertIn('app_rss:posts_feed', names)
+        self.assertIn('post_sitemap_index', names)
+        self.assertEqual({route.name for route in ROUTES} - names, set())
+
+    def test_compare_results(self):
+        baseline = {'routes': {
+            'a anonymous': {'status': 200, 'queries': 3, 'p95_ms': 10.0},
+            'b anonymous': {'status': 200, 'queries': 3, 'p95_ms': 1.0},
+        }}
+        current = {'routes': {
+            'a anonymous': {'status': 200, 'queries': 3, 'p95_ms': 11.0},
+            'b anonymous': {'status': 200, 'queries': 3, 'p95_ms': 2.5},
+            'c anonymous': {'status': 200, 'queries': 9, 'p95_ms': 90.0},
+        }}
+        self.assertEqual(compare_results(baseline, current), [])
+        current['routes']['a anonymous'].update(queries=4, p95_ms=20.0)
+        current['routes']['b anonymous']['status'] = 500
+        regressions = compare_results(baseline, current)
+        self.assertEqual(len(regressions), 3)
+        self.assertTrue(regressions[0].startswith('a anonymous'))
+
+    def test_bench_routes_command(self):
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, 'results.json')
+            routes = ['app_blog:post_detail', 'app_rss:posts_feed', 'post_sitemap_section']
+            call_command('bench_routes', route=routes, repeat=2, warmup=1, output=output, stdout=StringIO())
+            with open(output, encoding='utf-8') as file:
+                results = json.load(file)
+            self.assertEqual(len(results['routes']), 6)
+            for key, result in results['routes'].items():
+                self.assertEqual(result['status'], 200, key)
+                self.assertEqual(result['requests'], 2)
+            self.assertEqual(results['uncovered'], [])
+            self.assertIn('app_blog:publish_or_archive', results['skipped'])
+
+            for result in results['routes'].values():
+                result['queries'] = 0
+            with open(output, 'w', encoding='utf-8') as file:
+                json.dump(results, file)
+            with self.assertRaises(CommandError):
+                call_command(
+                    'bench_routes', route=routes[:1], repeat=1, warmup=0, baseline=output, fail_on_regression=True,
+                    stdout=StringIO(), stderr=StringIO()
+                )
+
+    def test_bench_writes(self):
+        post = Post.objects.filter(is_published=True, images__isnull=False).order_by('-published_at', '-id').first()
+        out = StringIO()
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, 'results.json')
+            call_command(
+                'bench_routes', route=['app_api:post_detail'], repeat=3, warmup=0, writes=True, output=output,
+                stdout=out
+            )
+            with open(output, encoding='utf-8') as file:
+                results = json.load(file)
+        for key in ('app_api:post_detail PATCH publication owner', 'app_api:post_detail PATCH title owner'):
+            self.assertEqual(results['routes'][key]['status'], 200)
+            self.assertEqual(results['routes'][key]['requests'], 3)
+        restored = Post.objects.get(pk=post.pk)
+        self.assertEqual((restored.title, restored.is_published), (post.title, True))
+        self.assertEqual(reconcile_counters(dry_run=True), {'app_blog.Blog': 0, 'app_auth.Profile': 0})
+
+    def test_bench_serialization(self):
+        out = StringIO()
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, 'results.json')
+            call_command(
+                'bench_routes', route=['app_api:post_list', 'app_api:blog_list'], repeat=2, warmup=0,
+                serialization_rows=2, output=output, stdout=out
+            )
+            with open(output, encoding='utf-8') as file:
+                results = json.load(file)
+        self.assertEqual(results['meta']['serialization_rows'], 2)
+        for key in (
+                'app_api:post_list serializer', 'app_api:post_list values', 'app_api:post_list compact values',
+                'app_api:blog_list serializer', 'app_api:blog_list values',
+        ):
+            self.assertEqual(results['routes'][key]['rows'], 2)
+            self.assertGreater(results['routes'][key]['rows_per_s'], 0)
+        self.assertNotIn('app_api:profile_list values', results['routes'])
+        self.assertIn('rows/s', out.getvalue())
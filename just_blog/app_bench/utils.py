@@ -0,0 +1,163 @@
+"""
+The helpers of the benchmarks: the in-process drivers sending the requests to the WSGI and the ASGI
+applications of the project with the given concurrency, without a server in between,
+and the statistics of the measured latencies.
+"""
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.db import connections
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+import asyncio
+import math
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+BENCH_HOST = 'localhost'
+
+
+def percentile(values: Sequence[float], percent: float) -> float:
+    """
+    Returns the percentile of the values with the nearest-rank method, or 0 if there are no values.
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(percent / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def summarize(latencies: Sequence[float], elapsed: float, errors: int) -> Dict[str, float]:
+    """
+    Returns the statistics of a run: the number of the requests and the errors, the throughput
+    and the percentiles of the latency in milliseconds.
+    """
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'rps': len(latencies) / elapsed if elapsed else 0.0,
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p95_ms': percentile(latencies, 95) * 1000,
+        'p99_ms': percentile(latencies, 99) * 1000,
+        'max_ms': max(latencies, default=0.0) * 1000,
+    }
+
+
+def split_url(url: str) -> Tuple[str, str]:
+    """
+    Splits the url into the path and the query string.
+    """
+    path, _, query_string = url.partition('?')
+    return path, query_string
+
+
+def run_wsgi(urls: Sequence[str], concurrency: int) -> Dict[str, float]:
+    """
+    Sends the GET requests to the WSGI application from a pool of concurrency threads,
+    like a threaded WSGI server does, and returns the statistics of the run.
+    """
+    handler = WSGIHandler()
+
+    def request(url: str) -> Tuple[float, bool]:
+        path, query_string = split_url(url)
+        environ = {
+            'REQUEST_METHOD': 'GET',
+            'PATH_INFO': path,
+            'QUERY_STRING': query_string,
+            'SCRIPT_NAME': '',
+            'SERVER_NAME': BENCH_HOST,
+            'SERVER_PORT': '80',
+            'SERVER_PROTOCOL': 'HTTP/1.1',
+            'HTTP_HOST': BENCH_HOST,
+            'wsgi.input': BytesIO(),
+            'wsgi.errors': BytesIO(),
+            'wsgi.url_scheme': 'http',
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': False,
+            'wsgi.run_once': False,
+            'wsgi.version': (1, 0),
+        }
+        statuses: List[str] = []
+        start = time.perf_counter()
+        response = handler(environ, lambda status, headers, exc_info=None: statuses.append(status))
+        try:
+            for _ in response:
+                pass
+        finally:
+            response.close()
+        return time.perf_counter() - start, statuses[0].startswith('200')
+
+    def close_connections(_) -> None:
+        connections.close_all()
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        start = time.perf_counter()
+        results = list(executor.map(request, urls))
+        elapsed = time.perf_counter() - start
+        list(executor.map(close_connections, range(concurrency)))
+    return summarize([latency for latency, _ in results], elapsed, sum(1 for _, ok in results if not ok))
+
+
+async def run_asgi_requests(urls: Sequence[str], concurrency: int) -> Tuple[List[Tuple[float, bool]], float]:
+    """
+    Sends the GET requests to the ASGI application from concurrency tasks on the event loop
+    and returns the latency and the success of every request with the total time.
+    """
+    handler = ASGIHandler()
+    queue: asyncio.Queue = asyncio.Queue()
+    for url in urls:
+        queue.put_nowait(url)
+    results: List[Tuple[float, bool]] = []
+
+    async def request(url: str) -> Tuple[float, bool]:
+        path, query_string = split_url(url)
+        scope = {
+            'type': 'http',
+            'asgi': {'version': '3.0'},
+            'http_version': '1.1',
+            'method': 'GET',
+            'scheme': 'http',
+            'path': path,
+            'raw_path': path.encode('ascii'),
+            'query_string': query_string.encode('ascii'),
+            'root_path': '',
+            'headers': [(b'host', BENCH_HOST.encode('ascii'))],
+            'client': ('127.0.0.1', 50000),
+            'server': (BENCH_HOST, 80),
+        }
+        status: Optional[int] = None
+        received = False
+
+        async def receive() -> Dict:
+            nonlocal received
+            if received:
+                # The client never disconnects before the response is sent.
+                await asyncio.Future()
+            received = True
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+        async def send(message: Dict) -> None:
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+
+        start = time.perf_counter()
+        await handler(scope, receive, send)
+        return time.perf_counter() - start, status == 200
+
+    async def worker() -> None:
+        while not queue.empty():
+            results.append(await request(queue.get_nowait()))
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return results, time.perf_counter() - start
+
+
+def run_asgi(urls: Sequence[str], concurrency: int) -> Dict[str, float]:
+    """
+    Runs the ASGI requests on a new event loop and returns the statistics of the run.
+    """
+    results, elapsed = asyncio.run(run_asgi_requests(urls, concurrency))
+    connections.close_all()
+    return summarize([latency for latency, _ in results], elapsed, sum(1 for _, ok in results if not ok))
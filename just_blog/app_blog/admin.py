@@ -1,8 +1,8 @@
 from django.contrib import admin
-from .models import Blog, Post, Image
+from .models import Blog, Post, Image, Tag
 
 """
-Register the models Blog, Post and Image in the admin panel.
+Register the models Blog, Post, Image and Tag in the admin panel.
 """
 
 
@@ -16,7 +16,7 @@ class ImageInline(admin.StackedInline):
 
 @admin.register(Blog)
 class BlogAdmin(admin.ModelAdmin):
-    list_display = 'pk', 'title', 'profile',
+    list_display = 'pk', 'title', 'profile', 'post_count', 'published_count', 'image_count',
     inlines = [PostInline]
 
 
@@ -29,3 +29,9 @@ class PostAdmin(admin.ModelAdmin):
 @admin.register(Image)
 class ImageAdmin(admin.ModelAdmin):
     list_display = 'pk', 'title', 'post',
+
+
+@admin.register(Tag)
+class TagAdmin(admin.ModelAdmin):
+    list_display = 'pk', 'name', 'slug', 'post_count',
+    search_fields = 'name', 'slug',
@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class AppBlogConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'app_blog'
+
+    def ready(self) -> None:
+        """
+        Connects the receivers of the app.
+        """
+        from . import receivers  # noqa: F401
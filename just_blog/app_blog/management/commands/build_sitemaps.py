@@ -0,0 +1,40 @@
+from django.conf import settings
+from django.contrib.sites.models import Site
+from django.core.management.base import BaseCommand
+from app_blog.sitemap import PostSiteMap, get_state_etag, get_precomputed_path, write_section
+import glob
+import os
+
+
+class Command(BaseCommand):
+    """
+    Generates the gzipped sections of the sitemap of the published posts.
+    The sections that haven't changed since the last run are skipped,
+    and the outdated files are deleted.
+    """
+    help = 'Generates the gzipped sections of the sitemap of the published posts.'
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument('--protocol', default='https', help='The protocol of the urls in the sitemap.')
+
+    def handle(self, *args, **options) -> None:
+        os.makedirs(settings.SITEMAP_ROOT, exist_ok=True)
+        site_url = f'{options["protocol"]}://{Site.objects.get_current().domain}'
+        sitemap = PostSiteMap()
+        current_files = set()
+
+        for row in sitemap.sections():
+            section = row['section']
+            etag = get_state_etag(sitemap.section_items(section))
+            path = get_precomputed_path(section, etag)
+            current_files.add(path)
+            if os.path.exists(path):
+                continue
+            write_section(site_url, section, etag)
+            self.stdout.write(f'Section {section} is written to {path}')
+
+        for path in glob.glob(os.path.join(settings.SITEMAP_ROOT, 'sitemap-posts-*.xml.gz')):
+            if path not in current_files:
+                os.remove(path)
+
+        self.stdout.write(self.style.SUCCESS(f'{len(current_files)} sections are up to date'))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from app_blog.utils import reconcile_counters
+
+
+class Command(BaseCommand):
+    """
+    Recounts the denormalized counters of the blogs, the profiles and the tags
+    and fixes the ones that drifted, e.g. after the rows were changed with raw SQL or loaded from fixtures.
+    """
+    help = 'Recounts the denormalized counters of the blogs, the profiles and the tags.'
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument('--dry-run', action='store_true', help='Only report the drifted counters.')
+
+    def handle(self, *args, **options) -> None:
+        drifted = reconcile_counters(dry_run=options['dry_run'])
+        action = 'drifted' if options['dry_run'] else 'fixed'
+        for label, count in drifted.items():
+            self.stdout.write(self.style.SUCCESS(f'{label}: {count} {action}'))
@@ -0,0 +1,50 @@
+# Generated by Django 4.2 on 2026-10-18 04:35
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_auth', '0002_alter_profile_bio'),
+        ('app_blog', '0003_alter_blog_profile'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='post',
+            options={'verbose_name': 'post', 'verbose_name_plural': 'posts'},
+        ),
+        migrations.AlterField(
+            model_name='post',
+            name='blog',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='posts', to='app_blog.blog', verbose_name='blog'),
+        ),
+        migrations.AlterField(
+            model_name='post',
+            name='is_published',
+            field=models.BooleanField(default=False, verbose_name='is published'),
+        ),
+        migrations.AlterField(
+            model_name='post',
+            name='profile',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='posts', to='app_auth.profile', verbose_name='profile'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['is_published', '-published_at'], name='post_is_published_at_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(condition=models.Q(('is_published', True)), fields=['-published_at', '-id'], name='post_published_timeline_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['blog', '-created_at'], name='post_blog_created_at_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['profile', 'is_published'], name='post_profile_is_published_idx'),
+        ),
+    ]
@@ -0,0 +1,94 @@
+# Generated by Django 4.2 on 2026-10-18 05:00
+
+from django.db import migrations, models
+from django.utils.text import slugify
+import django.db.models.deletion
+
+
+def parse_existing_tags(apps, schema_editor):
+    """
+    Creates the tags from the tag field of the existing posts, links the posts to them
+    and counts the published posts of every tag. The posts are read in chunks.
+    """
+    Post = apps.get_model('app_blog', 'Post')
+    Tag = apps.get_model('app_blog', 'Tag')
+    PostTag = apps.get_model('app_blog', 'PostTag')
+    tag_ids = {}
+    counts = {}
+    links = []
+    for pk, value, is_published in Post.objects.values_list('pk', 'tag', 'is_published').iterator(chunk_size=2000):
+        slugs = []
+        for word in value.replace('#', ' ').split():
+            slug = slugify(word, allow_unicode=True)
+            if not slug or slug in slugs:
+                continue
+            slugs.append(slug)
+            if slug not in tag_ids:
+                tag_ids[slug] = Tag.objects.create(slug=slug, name=word[:70]).pk
+                counts[slug] = 0
+            links.append(PostTag(post_id=pk, tag_id=tag_ids[slug]))
+            counts[slug] += is_published
+        if len(links) >= 2000:
+            PostTag.objects.bulk_create(links)
+            links = []
+    PostTag.objects.bulk_create(links)
+    for slug, count in counts.items():
+        if count:
+            Tag.objects.filter(pk=tag_ids[slug]).update(post_count=count)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_blog', '0005_image_image_derivatives'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostTag',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+            ],
+            options={
+                'verbose_name': 'tag of the post',
+                'verbose_name_plural': 'tags of the posts',
+            },
+        ),
+        migrations.CreateModel(
+            name='Tag',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=70, verbose_name='name')),
+                ('slug', models.SlugField(allow_unicode=True, max_length=70, unique=True, verbose_name='slug')),
+                ('post_count', models.PositiveIntegerField(default=0, editable=False, verbose_name='post count')),
+            ],
+            options={
+                'verbose_name': 'tag',
+                'verbose_name_plural': 'tags',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='tag',
+            index=models.Index(fields=['-post_count', 'slug'], name='tag_post_count_idx'),
+        ),
+        migrations.AddField(
+            model_name='posttag',
+            name='post',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='post_tags', to='app_blog.post', verbose_name='post'),
+        ),
+        migrations.AddField(
+            model_name='posttag',
+            name='tag',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='post_tags', to='app_blog.tag', verbose_name='tag'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='tags',
+            field=models.ManyToManyField(blank=True, related_name='posts', through='app_blog.PostTag', to='app_blog.tag', verbose_name='tags'),
+        ),
+        migrations.AddConstraint(
+            model_name='posttag',
+            constraint=models.UniqueConstraint(fields=('tag', 'post'), name='post_tag_unique'),
+        ),
+        migrations.RunPython(parse_existing_tags, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,66 @@
+# Generated by Django 4.2 on 2026-10-18 05:04
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_related(queryset, field):
+    """
+    Returns the number of the rows of the queryset related to the outer row by the field.
+    """
+    return Coalesce(Subquery(
+        queryset.filter(**{field: OuterRef('pk')}).order_by().values(field).annotate(count=Count('pk')).values('count')
+    ), 0)
+
+
+def fill_counters(apps, schema_editor):
+    """
+    Counts the blogs, the posts, the published posts and the images of the existing blogs and profiles.
+    """
+    Blog = apps.get_model('app_blog', 'Blog')
+    Post = apps.get_model('app_blog', 'Post')
+    Image = apps.get_model('app_blog', 'Image')
+    Profile = apps.get_model('app_auth', 'Profile')
+    Blog.objects.update(
+        post_count=count_related(Post.objects.all(), 'blog'),
+        published_count=count_related(Post.objects.filter(is_published=True), 'blog'),
+        image_count=count_related(Image.objects.all(), 'post__blog'),
+    )
+    Profile.objects.update(
+        blog_count=count_related(Blog.objects.all(), 'profile'),
+        post_count=count_related(Post.objects.all(), 'profile'),
+        published_count=count_related(Post.objects.filter(is_published=True), 'profile'),
+        image_count=count_related(Image.objects.all(), 'post__profile'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_auth', '0004_profile_counters'),
+        ('app_blog', '0006_tags'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='blog',
+            name='image_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='image count'),
+        ),
+        migrations.AddField(
+            model_name='blog',
+            name='post_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='post count'),
+        ),
+        migrations.AddField(
+            model_name='blog',
+            name='published_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='published post count'),
+        ),
+        migrations.AddIndex(
+            model_name='blog',
+            index=models.Index(fields=['-published_count', 'id'], name='blog_activity_idx'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
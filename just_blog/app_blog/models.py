@@ -1,24 +1,96 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Count, F, OuterRef, Q, QuerySet, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+from django.utils.text import slugify
 from django.utils.translation import gettext_lazy as _
 from app_auth.models import Profile
-import datetime
-from django.utils.timezone import make_aware
-from typing import Union
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+import functools
+import itertools
+import operator
+from typing import DefaultDict, Dict, Iterable, Iterator, Optional, Tuple, Type, Union
 from django.shortcuts import reverse
+from .signals import post_published, post_archived
+
+# The deltas of the counters collected inside defer_counters(), by the model and the pk of the instance.
+deferred_counters: ContextVar[Optional[DefaultDict[Tuple[Type[models.Model], int], Counter]]] = ContextVar(
+    'deferred_counters', default=None
+)
+
+
+def update_counters(model: Type[models.Model], pk: Optional[int], **deltas: int) -> None:
+    """
+    Adds the deltas to the counter fields of the instance of the model with one UPDATE,
+    so the concurrent changes are never lost. The counters never go below zero.
+    The counters are shown on the pages of the instance, so its updated_at is set too.
+    Inside defer_counters() the deltas are only collected.
+    """
+    deltas = {field: delta for field, delta in deltas.items() if delta}
+    if pk is None or not deltas:
+        return
+    deferred = deferred_counters.get()
+    if deferred is not None:
+        deferred[(model, pk)].update(deltas)
+        return
+    model.objects.filter(pk=pk).update(
+        updated_at=timezone.now(), **{field: Greatest(F(field) + delta, Value(0)) for field, delta in deltas.items()}
+    )
+
+
+@contextmanager
+def defer_counters() -> Iterator[None]:
+    """
+    Collects the deltas passed to update_counters() inside the block and applies them when it ends,
+    with one UPDATE per instance instead of one per change. Is used by the batch writes, whose posts
+    change the counters of the same blogs and profiles many times. Should be used inside a transaction.
+    The nested blocks are applied by the outermost one.
+    """
+    if deferred_counters.get() is not None:
+        yield
+        return
+    deferred = defaultdict(Counter)
+    token = deferred_counters.set(deferred)
+    try:
+        yield
+    finally:
+        deferred_counters.reset(token)
+    for (model, pk), counters in deferred.items():
+        update_counters(model, pk, **counters)
+
+
+def touch(queryset: QuerySet) -> None:
+    """
+    Sets updated_at of the instances of the queryset to the current moment with one UPDATE.
+    Is used when the related objects shown on the pages of the instances change.
+    """
+    queryset.update(updated_at=timezone.now())
 
 
 class Blog(models.Model):
     """
     A model describing a Blog. Has a One-to-Many relationship with Profile.
+    The numbers of the posts, the published posts and the images of the blog are stored in the counter fields,
+    which are updated in the same transaction as the posts and the images.
     """
-    class Meta:
-        verbose_name_plural = _('blogs')
-        verbose_name = _('blog')
-
     title = models.CharField(max_length=128, verbose_name=_('title'))
     description = models.CharField(max_length=256, verbose_name=_('description'))
     created_at = models.DateTimeField(auto_now_add=True, verbose_name=_('created at'))
     profile = models.ForeignKey(Profile, on_delete=models.CASCADE, verbose_name=_('profile'), related_name='blogs')
+    post_count = models.PositiveIntegerField(default=0, editable=False, verbose_name=_('post count'))
+    published_count = models.PositiveIntegerField(default=0, editable=False, verbose_name=_('published post count'))
+    image_count = models.PositiveIntegerField(default=0, editable=False, verbose_name=_('image count'))
+    # Changes with the blog, its posts and their images. The ETag and the Last-Modified of its pages are based on it.
+    updated_at = models.DateTimeField(default=timezone.now, editable=False, verbose_name=_('updated at'))
+
+    class Meta:
+        verbose_name_plural = _('blogs')
+        verbose_name = _('blog')
+        indexes = [
+            models.Index(fields=['-published_count', 'id'], name='blog_activity_idx'),
+        ]
 
     def __str__(self) -> str:
         """
@@ -26,6 +98,150 @@ class Blog(models.Model):
         """
         return f'{self.title}#{self.pk}'
 
+    # The fields whose saved values are remembered to update the counters only when they change.
+    tracked_fields = 'profile_id',
+
+    @classmethod
+    def from_db(cls, db, field_names, values) -> 'Blog':
+        """
+        Remembers the loaded values of the tracked fields.
+        """
+        instance = super().from_db(db, field_names, values)
+        instance._saved_state = instance.get_state()
+        return instance
+
+    def get_state(self) -> Dict[str, int]:
+        """
+        Returns the current values of the tracked fields. The deferred fields are skipped.
+        """
+        return {field: self.__dict__[field] for field in self.tracked_fields if field in self.__dict__}
+
+    def save(self, *args, **kwargs) -> None:
+        """
+        Saves the blog and, in the same transaction, increments the number of the blogs of its profile
+        if it is new, or moves it from the previous profile if the blog has been given to another one.
+        The time of the update is saved even if only some of the fields are updated.
+        """
+        adding = self._state.adding
+        saved_state = {} if adding else getattr(self, '_saved_state', {})
+        self.updated_at = timezone.now()
+        if kwargs.get('update_fields'):
+            kwargs['update_fields'] = {'updated_at', *kwargs['update_fields']}
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            state = self.get_state()
+            if adding:
+                update_counters(Profile, self.profile_id, blog_count=1)
+            elif 'profile_id' in saved_state and saved_state['profile_id'] != state.get('profile_id'):
+                update_counters(Profile, saved_state['profile_id'], blog_count=-1)
+                update_counters(Profile, self.profile_id, blog_count=1)
+        self._saved_state = state
+
+
+def parse_tags(value: str) -> Dict[str, str]:
+    """
+    Splits the string of the space-separated words into the tags, ignoring the # symbols.
+    Returns a dictionary with the slug of the tag as a key and its first spelling as a value.
+    The words with the same slug are the same tag.
+    """
+    tags = {}
+    for word in value.replace('#', ' ').split():
+        slug = slugify(word, allow_unicode=True)
+        if slug and slug not in tags:
+            tags[slug] = word[:Tag._meta.get_field('name').max_length]
+    return tags
+
+
+class TagManager(models.Manager):
+    """
+    The manager of the Tag model with the methods keeping the tags of the posts in sync with their tag field.
+    """
+
+    def get_for_slugs(self, tags: Dict[str, str]) -> Dict[str, 'Tag']:
+        """
+        Returns the Tag instances for the passed slugs and names (see parse_tags) with the slug as a key.
+        The missing tags are created with one query.
+        """
+        if not tags:
+            return {}
+        self.bulk_create(
+            [Tag(slug=slug, name=name) for slug, name in tags.items()], ignore_conflicts=True
+        )
+        return self.in_bulk(list(tags), field_name='slug')
+
+    def update_post_counts(self, tag_ids: Union[Iterable[int], QuerySet]) -> None:
+        """
+        Recounts the published posts of the passed tags with one UPDATE.
+        The ids can be passed as a queryset, which is used as a subquery.
+        """
+        if not isinstance(tag_ids, QuerySet):
+            tag_ids = set(tag_ids)
+            if not tag_ids:
+                return
+        published = PostTag.objects.filter(tag=OuterRef('pk'), post__is_published=True).values(
+            'tag'
+        ).annotate(count=Count('pk')).values('count')
+        self.filter(pk__in=tag_ids).update(post_count=Coalesce(Subquery(published), 0))
+
+    def sync_posts(self, posts: Iterable['Post']) -> None:
+        """
+        Updates the tags of the passed saved posts from their tag field: creates the missing tags,
+        adds and deletes the links and recounts the published posts of the affected tags.
+        Is used for the posts created with bulk_create, which doesn't call Post.save().
+        """
+        posts = [post for post in posts if post.pk is not None]
+        if not posts:
+            return
+        parsed = {post.pk: parse_tags(post.tag) for post in posts}
+        tags = self.get_for_slugs({slug: name for post_tags in parsed.values() for slug, name in post_tags.items()})
+        wanted = {(post_pk, tags[slug].pk) for post_pk, post_tags in parsed.items() for slug in post_tags}
+        existing = set(PostTag.objects.filter(post__in=list(parsed)).values_list('post_id', 'tag_id'))
+
+        stale = existing - wanted
+        if stale:
+            PostTag.objects.filter(
+                functools.reduce(operator.or_, (Q(post_id=post_pk, tag_id=tag_pk) for post_pk, tag_pk in stale))
+            ).delete()
+        PostTag.objects.bulk_create(
+            [PostTag(post_id=post_pk, tag_id=tag_pk) for post_pk, tag_pk in wanted - existing], ignore_conflicts=True
+        )
+        self.update_post_counts(tag_pk for _, tag_pk in wanted | existing)
+        for post in posts:
+            post._saved_state = post.get_state()
+
+
+class Tag(models.Model):
+    """
+    A model describing a Tag of the posts. The tags are parsed from the tag field of the Post
+    and linked to the posts through the PostTag model.
+    The number of the published posts with the tag is stored in post_count,
+    so the tag clouds are served without aggregation.
+    """
+    name = models.CharField(max_length=70, verbose_name=_('name'))
+    slug = models.SlugField(max_length=70, unique=True, allow_unicode=True, verbose_name=_('slug'))
+    post_count = models.PositiveIntegerField(default=0, editable=False, verbose_name=_('post count'))
+
+    objects = TagManager()
+
+    class Meta:
+        verbose_name_plural = _('tags')
+        verbose_name = _('tag')
+        indexes = [
+            models.Index(fields=['-post_count', 'slug'], name='tag_post_count_idx'),
+        ]
+
+    def __str__(self) -> str:
+        """
+        Returns the name of the tag with the # symbol.
+        """
+        return f'#{self.name}'
+
+    def get_absolute_url(self) -> str:
+        """
+        Generates absolute url for the timeline of the tag.
+        """
+        return reverse('tag_posts', kwargs={'slug': self.slug})
+
 
 class Post(models.Model):
     """
@@ -38,12 +254,33 @@ class Post(models.Model):
     created_at = models.DateTimeField(auto_now_add=True, verbose_name=_('created at'))
     is_published = models.BooleanField(default=False, verbose_name=_('is published'))
     published_at = models.DateTimeField(verbose_name=_('published at'), null=True, blank=True)
-    blog = models.ForeignKey(to=Blog, on_delete=models.CASCADE, related_name='posts', verbose_name=_('blog'))
-    profile = models.ForeignKey(to=Profile, on_delete=models.CASCADE, related_name='posts', verbose_name=_('profile'))
+    # The single-column foreign key indexes are covered by the composite indexes declared in Meta.
+    blog = models.ForeignKey(
+        to=Blog, on_delete=models.CASCADE, related_name='posts', verbose_name=_('blog'), db_index=False
+    )
+    profile = models.ForeignKey(
+        to=Profile, on_delete=models.CASCADE, related_name='posts', verbose_name=_('profile'), db_index=False
+    )
+    # Changes with the post and its images. The ETag and the Last-Modified of its pages are based on it.
+    updated_at = models.DateTimeField(default=timezone.now, editable=False, verbose_name=_('updated at'))
+    # The tags parsed from the tag field, kept in sync by save().
+    tags = models.ManyToManyField(
+        to=Tag, through='PostTag', related_name='posts', blank=True, verbose_name=_('tags')
+    )
 
     class Meta:
         verbose_name_plural = _('posts')
         verbose_name = _('post')
+        indexes = [
+            models.Index(fields=['is_published', '-published_at'], name='post_is_published_at_idx'),
+            models.Index(
+                fields=['-published_at', '-id'],
+                condition=models.Q(is_published=True),
+                name='post_published_timeline_idx'
+            ),
+            models.Index(fields=['blog', '-created_at'], name='post_blog_created_at_idx'),
+            models.Index(fields=['profile', 'is_published'], name='post_profile_is_published_idx'),
+        ]
 
     def __str__(self) -> str:
         """
@@ -51,6 +288,66 @@ class Post(models.Model):
         """
         return self.title
 
+    # The fields whose saved values are remembered to update the tags and the counters only when they change.
+    tracked_fields = 'tag', 'is_published', 'blog_id', 'profile_id'
+
+    @classmethod
+    def from_db(cls, db, field_names, values) -> 'Post':
+        """
+        Remembers the loaded values of the tracked fields.
+        """
+        instance = super().from_db(db, field_names, values)
+        instance._saved_state = instance.get_state()
+        return instance
+
+    def get_state(self) -> Dict[str, Union[str, bool, int]]:
+        """
+        Returns the current values of the tracked fields. The deferred fields are skipped.
+        """
+        return {field: self.__dict__[field] for field in self.tracked_fields if field in self.__dict__}
+
+    def get_counter_deltas(self, state: Dict[str, Union[str, bool, int]], sign: int = 1) \
+            -> Dict[Tuple[Type[models.Model], int], Dict[str, int]]:
+        """
+        Returns the contribution of the post with the passed state to the counters of its blog and its profile,
+        multiplied by the sign. Returns nothing if the state is incomplete.
+        """
+        if 'is_published' not in state or 'blog_id' not in state or 'profile_id' not in state:
+            return {}
+        counters = {'post_count': sign, 'published_count': sign * int(state['is_published'])}
+        return {(Blog, state['blog_id']): counters, (Profile, state['profile_id']): counters}
+
+    def save(self, *args, **kwargs) -> None:
+        """
+        Saves the post and, in the same transaction, updates the counters of its blog and its profile,
+        its tags and the counts of the published posts of the tags, if the tracked fields have changed.
+        The page of the blog lists its posts, so updated_at of the blog is set too.
+        The time of the update is saved even if only some of the fields are updated.
+        """
+        adding = self._state.adding
+        saved_state = {} if adding else getattr(self, '_saved_state', None)
+        self.updated_at = timezone.now()
+        if kwargs.get('update_fields'):
+            kwargs['update_fields'] = {'updated_at', *kwargs['update_fields']}
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            state = self.get_state()
+            deltas = defaultdict(Counter)
+            if saved_state is not None and saved_state != state:
+                for key, counters in itertools.chain(
+                        self.get_counter_deltas(saved_state, sign=-1).items(), self.get_counter_deltas(state).items()
+                ):
+                    deltas[key].update(counters)
+                for (model, pk), counters in deltas.items():
+                    update_counters(model, pk, **counters)
+            if not any(deltas[(Blog, self.blog_id)].values()):
+                touch(Blog.objects.filter(pk=self.blog_id))
+            if saved_state is None or saved_state.get('tag') != self.tag:
+                Tag.objects.sync_posts([self])
+            elif saved_state.get('is_published') != self.is_published:
+                Tag.objects.update_post_counts(self.post_tags.values('tag_id'))
+        self._saved_state = state
+
     def short_title(self) -> Union[models.CharField, str]:
         """
         Returns the title with the length limit of 80 characters. If longer, returns
@@ -60,21 +357,48 @@ class Post(models.Model):
             return f'{self.title[:80]}...'
         return self.title
 
+    def set_published(self, is_published: bool) -> bool:
+        """
+        Publishes or archives the post with one conditional UPDATE of is_published, published_at and updated_at,
+        which changes the row only if the post isn't in the requested state yet. Of the concurrent toggles
+        only one changes the post, so the published counters of its blog, its profile and its tags
+        are updated once, in the same transaction. Returns True if the post has changed.
+        """
+        now = timezone.now()
+        published_at = now if is_published else None
+        with transaction.atomic():
+            changed = Post.objects.filter(pk=self.pk).exclude(is_published=is_published).update(
+                is_published=is_published, published_at=published_at, updated_at=now
+            )
+            if changed:
+                delta = 1 if is_published else -1
+                update_counters(Blog, self.blog_id, published_count=delta)
+                update_counters(Profile, self.profile_id, published_count=delta)
+                Tag.objects.update_post_counts(self.post_tags.values('tag_id'))
+        self.is_published = is_published
+        if not changed:
+            return False
+        self.published_at = published_at
+        self.updated_at = now
+        if getattr(self, '_saved_state', None) is not None:
+            self._saved_state['is_published'] = is_published
+        return True
+
     def publish(self) -> None:
         """
-        Sets the is_publish value to True and sets the published_at value to the current moment.
+        Sets the is_publish value to True and sets the published_at value to the current moment,
+        writing only these columns with set_published(). Sends the post_published signal if the post has changed.
         """
-        self.is_published = True
-        self.published_at = make_aware(datetime.datetime.now())
-        self.save(force_update=['is_published', 'published_at'])
+        if self.set_published(True):
+            post_published.send(sender=self.__class__, instance=self)
 
     def archive(self) -> None:
         """
-        Sets the is_publish value to False and sets the published_at value to None.
+        Sets the is_publish value to False and sets the published_at value to None,
+        writing only these columns with set_published(). Sends the post_archived signal if the post has changed.
         """
-        self.is_published = False
-        self.published_at = None
-        self.save(force_update=['is_published', 'published_at'])
+        if self.set_published(False):
+            post_archived.send(sender=self.__class__, instance=self)
 
     def short_content(self) -> Union[models.TextField, str]:
         """
@@ -100,16 +424,61 @@ class Post(models.Model):
         return reverse('app_blog:post_detail', kwargs={'pk': self.pk})
 
 
+class PostTag(models.Model):
+    """
+    A model linking the posts to their tags. The unique index on (tag, post)
+    serves the timelines of the tags.
+    """
+    tag = models.ForeignKey(
+        to=Tag, on_delete=models.CASCADE, related_name='post_tags', verbose_name=_('tag'), db_index=False
+    )
+    post = models.ForeignKey(to=Post, on_delete=models.CASCADE, related_name='post_tags', verbose_name=_('post'))
+
+    class Meta:
+        verbose_name_plural = _('tags of the posts')
+        verbose_name = _('tag of the post')
+        constraints = [
+            models.UniqueConstraint(fields=['tag', 'post'], name='post_tag_unique'),
+        ]
+
+
 class Image(models.Model):
     """
     A model to describe a Image.
     """
     title = models.CharField(max_length=20, verbose_name=_('title'))
     image = models.ImageField(upload_to='images/', verbose_name=_('image'))
+    # The thumbnails and the WebP variants generated by app_media in the background.
+    image_derivatives = models.JSONField(default=dict, blank=True, editable=False, verbose_name=_('image derivatives'))
     post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='images', verbose_name=_('post'))
 
     class Meta:
         verbose_name = _('image')
         verbose_name_plural = _('images')
 
+    def update_owner_counters(self, delta: int) -> None:
+        """
+        Adds the delta to the numbers of the images of the blog and the profile of the post of the image
+        and sets updated_at of the post, whose pages show the image.
+        """
+        owners = Post.objects.filter(pk=self.post_id).values_list('blog_id', 'profile_id').first()
+        if owners is not None:
+            update_counters(Blog, owners[0], image_count=delta)
+            update_counters(Profile, owners[1], image_count=delta)
+            touch(Post.objects.filter(pk=self.post_id))
+
+    def save(self, *args, **kwargs) -> None:
+        """
+        Saves the image and, if it is new, increments the numbers of the images of the blog and the profile
+        of its post in the same transaction. Otherwise sets updated_at of the post and the blog showing the image.
+        """
+        adding = self._state.adding
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if adding:
+                self.update_owner_counters(1)
+            else:
+                touch(Post.objects.filter(pk=self.post_id))
+                touch(Blog.objects.filter(posts=self.post_id))
+
 
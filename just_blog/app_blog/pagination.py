@@ -0,0 +1,219 @@
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from binascii import Error as BinasciiError
+from django.core.exceptions import ValidationError
+from django.db.models import F, Q, QuerySet, Model
+from django.db.models.expressions import OrderBy
+import json
+from types import SimpleNamespace
+from typing import Any, List, Optional, Sequence, Tuple, Union
+
+
+class InvalidCursor(Exception):
+    """
+    Raised when a cursor token can't be decoded or doesn't match the ordering of the paginator.
+    """
+
+
+class KeysetPage:
+    """
+    A page of objects retrieved by the KeysetPaginator.
+    Unlike django.core.paginator.Page, it knows nothing about the total number of objects
+    and only keeps the tokens to the neighbouring pages.
+    """
+
+    def __init__(self, object_list: List[Model], next_cursor: Optional[str], previous_cursor: Optional[str]) -> None:
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self) -> int:
+        return len(self.object_list)
+
+    def has_next(self) -> bool:
+        return self.next_cursor is not None
+
+    def has_previous(self) -> bool:
+        return self.previous_cursor is not None
+
+    def has_other_pages(self) -> bool:
+        return self.has_next() or self.has_previous()
+
+
+class KeysetPaginator:
+    """
+    Paginates a queryset by the values of its ordering fields instead of OFFSET.
+    Every page is retrieved with a WHERE clause comparing the ordering fields to the values
+    of the last (or first) object of the neighbouring page, so it costs the same at any depth
+    and never runs COUNT(*).
+    The comparison is bounded by a range of the leading field (e.g. published_at <= the value of the cursor),
+    so the database seeks to the cursor in the index instead of scanning it from the beginning.
+    The last ordering field must be unique and non-nullable (usually the id). The NULLs of the other
+    nullable fields (e.g. published_at of a post published without it) are ordered after all the values
+    in both directions, and the comparisons take them into account. The range of the leading field excludes
+    its NULLs, so a page reaching the end of the values is completed with a second query of the NULLs.
+    A previous page shorter than per_page (its cursor is near the beginning) is refilled to the first page.
+    The queryset may also return the rows of values() with the ordering fields.
+    """
+
+    def __init__(self, queryset: QuerySet, per_page: int, ordering: Sequence[str] = ('-published_at', '-id')) -> None:
+        self.queryset = queryset
+        self.per_page = int(per_page)
+        self.ordering = tuple(ordering)
+        self.fields = [name.lstrip('-') for name in self.ordering]
+        self.descending = [name.startswith('-') for name in self.ordering]
+        self.nullable = [queryset.model._meta.get_field(field).null for field in self.fields]
+
+    def encode_cursor(self, obj: Model, reverse: bool = False) -> str:
+        """
+        Builds an opaque token from the values of the ordering fields of the passed object.
+        The reverse flag marks the token pointing to the previous page.
+        """
+        if isinstance(obj, dict):
+            obj = SimpleNamespace(**obj)
+        values = [
+            None if getattr(obj, field) is None else self.queryset.model._meta.get_field(field).value_to_string(obj)
+            for field in self.fields
+        ]
+        payload = json.dumps({'v': values, 'r': int(reverse)}, separators=(',', ':'))
+        return urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+    def decode_cursor(self, cursor: str) -> Tuple[List[Any], bool]:
+        """
+        Returns the values of the ordering fields and the reverse flag stored in the token.
+        Raises InvalidCursor if the token is malformed.
+        """
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            payload = json.loads(urlsafe_b64decode(padded.encode('ascii')).decode('utf-8'))
+            raw_values, reverse = payload['v'], bool(payload['r'])
+            if len(raw_values) != len(self.fields):
+                raise InvalidCursor(cursor)
+            values = [
+                self.queryset.model._meta.get_field(field).to_python(value)
+                for field, value in zip(self.fields, raw_values)
+            ]
+        except (ValueError, KeyError, TypeError, UnicodeError, BinasciiError, ValidationError) as exc:
+            raise InvalidCursor(cursor) from exc
+        return values, reverse
+
+    def _seek(self, values: List[Any], reverse: bool) -> Q:
+        """
+        Builds the lexicographic comparison of the ordering fields with the passed values:
+        (a, b) after (x, y) is expanded to a > x OR (a = x AND b > y).
+        The NULLs are after all the values: after x they match too, and after NULL nothing does.
+        """
+        condition = Q()
+        for index, field in enumerate(self.fields):
+            value = values[index]
+            if value is None:
+                if not reverse:
+                    continue
+                step = Q(**{f'{field}__isnull': False})
+            else:
+                after = self.descending[index] != reverse
+                step = Q(**{f'{field}__lt' if after else f'{field}__gt': value})
+                if self.nullable[index] and not reverse:
+                    step |= Q(**{f'{field}__isnull': True})
+            for prev_field, prev_value in zip(self.fields[:index], values[:index]):
+                step &= Q(**{f'{prev_field}__isnull': True} if prev_value is None else {prev_field: prev_value})
+            condition |= step
+        return condition
+
+    def _bound(self, values: List[Any], reverse: bool) -> Q:
+        """
+        Builds the range of the leading ordering field the page lies in, which the index can seek to:
+        the values up to (or from) the value of the cursor, or the NULLs after a NULL.
+        """
+        field, value = self.fields[0], values[0]
+        if value is None:
+            return Q() if reverse else Q(**{f'{field}__isnull': True})
+        after = self.descending[0] != reverse
+        return Q(**{f'{field}__lte' if after else f'{field}__gte': value})
+
+    def get_ordering(self, reverse: bool) -> List[Union[str, OrderBy]]:
+        """
+        Returns the ordering of the page, inverted for a reverse cursor.
+        The nullable fields are ordered with their NULLs after the values (before them when inverted).
+        """
+        ordering = []
+        for field, descending, nullable in zip(self.fields, self.descending, self.nullable):
+            descending = descending != reverse
+            if nullable:
+                nulls = {'nulls_first': True} if reverse else {'nulls_last': True}
+                ordering.append(F(field).desc(**nulls) if descending else F(field).asc(**nulls))
+            else:
+                ordering.append(f'-{field}' if descending else field)
+        return ordering
+
+    def get_page_queryset(self, cursor: Optional[str] = None) -> Tuple[QuerySet, bool]:
+        """
+        Returns the queryset of the page following (or, for a reverse token, preceding) the passed cursor
+        with one extra object to know if there are more, and the reverse flag of the cursor.
+        """
+        reverse = False
+        queryset = self.queryset
+        if cursor:
+            values, reverse = self.decode_cursor(cursor)
+            queryset = queryset.filter(self._bound(values, reverse), self._seek(values, reverse))
+
+        return queryset.order_by(*self.get_ordering(reverse))[:self.per_page + 1], reverse
+
+    def get_null_queryset(self, cursor: Optional[str], count: int) -> Optional[QuerySet]:
+        """
+        Returns the queryset of the first objects with the NULL leading field, which follow a page
+        after a value of a nullable leading field but are excluded by its range, or None if there are none to add.
+        """
+        if not cursor or not self.nullable[0] or count > self.per_page:
+            return None
+        values, reverse = self.decode_cursor(cursor)
+        if reverse or values[0] is None:
+            return None
+        queryset = self.queryset.filter(**{f'{self.fields[0]}__isnull': True})
+        return queryset.order_by(*self.get_ordering(reverse))[:self.per_page + 1 - count]
+
+    def build_page(self, object_list: List[Model], cursor: Optional[str], reverse: bool) -> KeysetPage:
+        """
+        Builds the page from the retrieved objects and the tokens to the neighbouring pages.
+        """
+        has_more = len(object_list) > self.per_page
+        object_list = object_list[:self.per_page]
+        if reverse:
+            object_list.reverse()
+
+        next_cursor = previous_cursor = None
+        if object_list:
+            if has_more or reverse:
+                next_cursor = self.encode_cursor(object_list[-1])
+            if (has_more and reverse) or (cursor and not reverse):
+                previous_cursor = self.encode_cursor(object_list[0], reverse=True)
+        return KeysetPage(object_list, next_cursor, previous_cursor)
+
+    def page(self, cursor: Optional[str] = None) -> KeysetPage:
+        """
+        Returns the page following (or, for a reverse token, preceding) the passed cursor.
+        Without a cursor returns the first page.
+        """
+        queryset, reverse = self.get_page_queryset(cursor)
+        object_list = list(queryset)
+        null_queryset = self.get_null_queryset(cursor, len(object_list))
+        if null_queryset is not None:
+            object_list += list(null_queryset)
+        if reverse and len(object_list) < self.per_page:
+            return self.page()
+        return self.build_page(object_list, cursor, reverse)
+
+    async def apage(self, cursor: Optional[str] = None) -> KeysetPage:
+        """
+        The async version of page(), retrieving the objects with the async ORM.
+        """
+        queryset, reverse = self.get_page_queryset(cursor)
+        object_list = [obj async for obj in queryset]
+        null_queryset = self.get_null_queryset(cursor, len(object_list))
+        if null_queryset is not None:
+            object_list += [obj async for obj in null_queryset]
+        if reverse and len(object_list) < self.per_page:
+            return await self.apage()
+        return self.build_page(object_list, cursor, reverse)
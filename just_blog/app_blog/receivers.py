@@ -0,0 +1,68 @@
+"""
+Receivers keeping the denormalized counters in sync when the blogs, the posts and the images are deleted,
+including the cascade deletions. The deletion runs in a transaction together with the receivers,
+so the counters are updated atomically with the rows.
+The links of a post to its tags are deleted by the cascade before post_delete is sent,
+so the ids of the tags are remembered in pre_delete.
+The posts of a changed user are touched, as their pages show the name of the author.
+"""
+from django.contrib.auth.models import User
+from django.db.models.signals import pre_delete, post_delete, post_save
+from django.dispatch import receiver
+from app_auth.models import Profile
+from .models import Blog, Image, Post, Tag, touch, update_counters
+
+
+@receiver(pre_delete, sender=Post)
+def remember_tags(sender, instance: Post, **kwargs) -> None:
+    """
+    Remembers the ids of the tags of the published post before it is deleted.
+    """
+    instance._deleted_tag_ids = list(instance.post_tags.values_list('tag_id', flat=True)) \
+        if instance.is_published else []
+
+
+@receiver(post_delete, sender=Post)
+def update_tag_counts(sender, instance: Post, **kwargs) -> None:
+    """
+    Recounts the published posts of the tags of the deleted post.
+    """
+    Tag.objects.update_post_counts(getattr(instance, '_deleted_tag_ids', []))
+
+
+@receiver(post_delete, sender=Post)
+def decrement_post_counters(sender, instance: Post, **kwargs) -> None:
+    """
+    Decrements the numbers of the posts and the published posts of the blog and the profile of the deleted post.
+    """
+    state = getattr(instance, '_saved_state', None) or instance.get_state()
+    for (model, pk), counters in instance.get_counter_deltas(state, sign=-1).items():
+        update_counters(model, pk, **counters)
+
+
+@receiver(post_delete, sender=Image)
+def decrement_image_counters(sender, instance: Image, **kwargs) -> None:
+    """
+    Decrements the numbers of the images of the blog and the profile of the post of the deleted image.
+    The images are deleted before their post, so the post can still be read.
+    """
+    instance.update_owner_counters(-1)
+
+
+@receiver(post_delete, sender=Blog)
+def decrement_blog_counter(sender, instance: Blog, **kwargs) -> None:
+    """
+    Decrements the number of the blogs of the profile of the deleted blog.
+    """
+    update_counters(Profile, instance.profile_id, blog_count=-1)
+
+
+@receiver(post_save, sender=User)
+def touch_author_posts(sender, instance: User, created: bool, update_fields=None, raw: bool = False, **kwargs) -> None:
+    """
+    Sets updated_at of the posts of the changed user, so the validators of their pages change with the name
+    of the author. The updates of the time of the last login are skipped.
+    """
+    if created or raw or (update_fields is not None and set(update_fields) <= {'last_login'}):
+        return
+    touch(Post.objects.filter(profile__user=instance))
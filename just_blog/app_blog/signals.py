@@ -0,0 +1,11 @@
+"""
+Signals sent by the Post model when it is published or archived.
+Both are sent with the sender (the Post class) and the instance arguments.
+The posts_imported signal is sent after the posts are created from a csv file with bulk_create,
+which doesn't send post_save. It is sent with the sender (the Post class), the blog and the count arguments.
+"""
+from django.dispatch import Signal
+
+post_published = Signal()
+post_archived = Signal()
+posts_imported = Signal()
@@ -1,15 +1,234 @@
+from django.conf import settings
 from django.contrib.sitemaps import Sitemap
+from django.contrib.sites.shortcuts import get_current_site
+from django.core.cache import cache
+from django.db.models import QuerySet, Count, Max, F
+from django.db.models.functions import Coalesce
+from django.http import Http404, HttpRequest, HttpResponse, StreamingHttpResponse, FileResponse
+from django.shortcuts import reverse
+from django.utils.cache import get_conditional_response, patch_vary_headers, quote_etag
+from django.views.decorators.http import condition
 from .models import Post
-from django.db.models import QuerySet
+from app_cache.utils import get_group_versions
+from datetime import datetime
+from hashlib import md5
+import gzip
+import os
+from typing import Iterator, Optional, Tuple
+from xml.sax.saxutils import escape
+
+SITEMAP_HEADER = '<?xml version="1.0" encoding="UTF-8"?>\n'
+URLSET_OPEN = '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
+URLSET_CLOSE = '</urlset>\n'
+INDEX_OPEN = '<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
+INDEX_CLOSE = '</sitemapindex>\n'
+
+# The suffix of the ETag of the precomputed gzipped section, as its bytes differ from the plain section.
+GZIP_ETAG_SUFFIX = '-gzip'
+
+SITEMAP_CACHE_PREFIX = 'sitemap'
+
+
+def get_lastmod() -> Coalesce:
+    """
+    Returns the expression of the date of the last modification of a post: the date of its publication,
+    or of its last update for the posts published without it.
+    """
+    return Coalesce('published_at', 'updated_at')
 
 
 class PostSiteMap(Sitemap):
     """
     Sitemap object for published Posts.
+    The items are (pk, lastmod) tuples, so the Post instances are never built.
+    The posts are split into sections by their pk: the section n contains the posts
+    with pk from n * limit + 1 to (n + 1) * limit, so a section never exceeds the limit of urls.
     """
+
+    @property
+    def limit(self) -> int:
+        """
+        Returns the maximum number of the urls of a section, SITEMAP_SECTION_SIZE.
+        """
+        return settings.SITEMAP_SECTION_SIZE
+
+    def __init__(self) -> None:
+        path = reverse('app_blog:post_detail', kwargs={'pk': 0})
+        self.location_template = path.replace('/0/', '/{pk}/')
+
     def items(self) -> QuerySet:
-        return Post.objects.filter(is_published=True)
+        return Post.objects.filter(is_published=True).order_by('pk').values_list('pk', get_lastmod())
+
+    def location(self, item: Tuple[int, datetime]) -> str:
+        return self.location_template.format(pk=item[0])
+
+    def lastmod(self, item: Tuple[int, datetime]) -> datetime:
+        return item[1]
+
+    def section_items(self, section: int) -> QuerySet:
+        """
+        Returns the items of the passed section.
+        """
+        return self.items().filter(pk__gt=section * self.limit, pk__lte=(section + 1) * self.limit)
 
-    def lastmod(self, obj: Post):
-        print(type(obj.published_at))
-        return obj.published_at
+    def sections(self) -> QuerySet:
+        """
+        Returns the non-empty sections with the date of the latest publication in every one of them.
+        """
+        return Post.objects.filter(is_published=True).annotate(
+            section=(F('pk') - 1) / self.limit
+        ).values('section').annotate(lastmod=Max(get_lastmod())).order_by('section')
+
+
+def get_site_url(request: HttpRequest, sitemap: PostSiteMap) -> str:
+    """
+    Returns the protocol and the domain of the current site.
+    """
+    return f'{sitemap.get_protocol(request.scheme)}://{get_current_site(request).domain}'
+
+
+def get_state_etag(queryset: QuerySet) -> str:
+    """
+    Builds an ETag from the number of the published posts and the date of the latest publication,
+    so the etag changes whenever a post is published, archived or deleted.
+    """
+    state = queryset.aggregate(count=Count('pk'), lastmod=Max(get_lastmod()))
+    return md5(f'{state["count"]}:{state["lastmod"]}'.encode('utf-8')).hexdigest()
+
+
+def get_cached_state_etag(name: str, queryset: QuerySet) -> str:
+    """
+    Returns the etag of the state of the published posts of the queryset (see get_state_etag),
+    cached under the version of the timeline group of pages. The version changes whenever a published post
+    changes (see app_cache.signals), so the conditional requests are answered without aggregating the posts.
+    """
+    key = f'{SITEMAP_CACHE_PREFIX}:{get_group_versions(["timeline"])[0]}:{name}'
+    etag = cache.get(key)
+    if etag is None:
+        etag = get_state_etag(queryset)
+        cache.set(key, etag, timeout=settings.SITEMAP_CACHE_TIMEOUT)
+    return etag
+
+
+def get_precomputed_path(section: int, etag: str) -> str:
+    """
+    Returns the path to the gzipped section generated by the build_sitemaps command.
+    The etag of the section is a part of the file name, so a file is only found
+    while the section is unchanged.
+    """
+    return os.path.join(settings.SITEMAP_ROOT, f'sitemap-posts-{section}-{etag}.xml.gz')
+
+
+def get_gzip_path(request: HttpRequest, section: int, etag: str) -> Optional[str]:
+    """
+    Returns the path to the precomputed gzipped section if the client accepts gzip and the file
+    of the current version of the section exists, otherwise None.
+    """
+    if 'gzip' not in request.headers.get('Accept-Encoding', ''):
+        return None
+    path = get_precomputed_path(section, etag)
+    return path if os.path.exists(path) else None
+
+
+def index_etag(request: HttpRequest) -> str:
+    """
+    Returns the etag of the sitemap index.
+    """
+    return get_cached_state_etag('index', Post.objects.filter(is_published=True))
+
+
+def section_etag(request: HttpRequest, section: int) -> str:
+    """
+    Returns the etag of the section of the sitemap. The precomputed gzipped section gets its own etag,
+    so the plain and the gzipped responses never share a validator.
+    """
+    etag = get_cached_state_etag(f'section:{section}', PostSiteMap().section_items(section))
+    return f'{etag}{GZIP_ETAG_SUFFIX}' if get_gzip_path(request, section, etag) else etag
+
+
+def render_index(request: HttpRequest, sitemap: PostSiteMap) -> Iterator[str]:
+    """
+    Yields the sitemap index with a link to every non-empty section.
+    """
+    site_url = get_site_url(request, sitemap)
+    yield SITEMAP_HEADER
+    yield INDEX_OPEN
+    for section in sitemap.sections().iterator():
+        location = reverse('post_sitemap_section', kwargs={'section': section['section']})
+        yield (
+            f'<sitemap><loc>{escape(site_url + location)}</loc>'
+            f'<lastmod>{section["lastmod"].isoformat()}</lastmod></sitemap>\n'
+        )
+    yield INDEX_CLOSE
+
+
+def render_section(site_url: str, sitemap: PostSiteMap, section: int) -> Iterator[str]:
+    """
+    Yields the urlset of the section, reading the posts from the database in chunks.
+    """
+    yield SITEMAP_HEADER
+    yield URLSET_OPEN
+    for item in sitemap.section_items(section).iterator(chunk_size=2000):
+        yield (
+            f'<url><loc>{escape(site_url + sitemap.location(item))}</loc>'
+            f'<lastmod>{sitemap.lastmod(item).isoformat()}</lastmod></url>\n'
+        )
+    yield URLSET_CLOSE
+
+
+@condition(etag_func=index_etag)
+def post_sitemap_index(request: HttpRequest) -> StreamingHttpResponse:
+    """
+    Streams the sitemap index of the published posts.
+    """
+    sitemap = PostSiteMap()
+    return StreamingHttpResponse(render_index(request, sitemap), content_type='application/xml')
+
+
+def post_sitemap_section(request: HttpRequest, section: int) -> HttpResponse:
+    """
+    Streams the section of the sitemap of the published posts, or returns 404 if it has no published posts.
+    If the client accepts gzip and the current version of the section was generated
+    by the build_sitemaps command, sends the precomputed file.
+    The conditional requests are checked against the etag of the section, computed once for the request.
+    """
+    etag = section_etag(request, section)
+    response = get_conditional_response(request, etag=quote_etag(etag))
+    if response is None:
+        response = get_section_response(request, section, etag)
+    if request.method in ('GET', 'HEAD'):
+        response.headers.setdefault('ETag', quote_etag(etag))
+    return response
+
+
+def get_section_response(request: HttpRequest, section: int, etag: str) -> HttpResponse:
+    """
+    Returns the response with the section of the sitemap of the passed etag.
+    """
+    sitemap = PostSiteMap()
+    if etag.endswith(GZIP_ETAG_SUFFIX):
+        path = get_precomputed_path(section, etag.removesuffix(GZIP_ETAG_SUFFIX))
+        response = FileResponse(open(path, 'rb'), content_type='application/xml')
+        response.headers['Content-Encoding'] = 'gzip'
+        patch_vary_headers(response, ('Accept-Encoding',))
+        return response
+    if not sitemap.section_items(section).exists():
+        raise Http404('The section of the sitemap has no posts.')
+    site_url = get_site_url(request, sitemap)
+    response = StreamingHttpResponse(render_section(site_url, sitemap, section), content_type='application/xml')
+    patch_vary_headers(response, ('Accept-Encoding',))
+    return response
+
+
+def write_section(site_url: str, section: int, etag: str) -> str:
+    """
+    Writes the gzipped section of the sitemap and returns the path to the file.
+    The file is written to a temporary path first, so the view never sends a partial file.
+    """
+    path = get_precomputed_path(section, etag)
+    temp_path = f'{path}.tmp'
+    with gzip.open(temp_path, 'wt', encoding='utf-8') as file:
+        for chunk in render_section(site_url, PostSiteMap(), section):
+            file.write(chunk)
+    os.replace(temp_path, path)
+    return path
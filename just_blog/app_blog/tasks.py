@@ -0,0 +1,61 @@
+"""
+The background tasks of the blogs: the import of the posts from a csv file and the saving of the images of a post.
+The uploaded files are staged in the storage by the views and deleted by the tasks once they are processed.
+"""
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.shortcuts import reverse
+from app_jobs.utils import task, PermanentJobError
+from .models import Blog, Post, Image
+from .utils import import_posts_from_csv, CsvImportError
+import os
+from typing import Dict, List, Union
+
+
+@task('import_posts')
+def import_posts(blog_id: int, profile_id: int, path: str) -> Dict[str, Union[int, str, List]]:
+    """
+    Imports the posts from the staged csv file into the blog.
+    Returns the report of the import and the url of the new post, or of the blog if several posts were imported.
+    """
+    blog = Blog.objects.filter(pk=blog_id, profile_id=profile_id).select_related('profile').first()
+    if blog is None:
+        default_storage.delete(path)
+        raise PermanentJobError(f'The blog {blog_id} of the profile {profile_id} does not exist')
+    try:
+        with default_storage.open(path, 'rb') as file:
+            report = import_posts_from_csv(file, blog=blog, profile=blog.profile)
+    except CsvImportError as exc:
+        default_storage.delete(path)
+        raise PermanentJobError(str(exc))
+    default_storage.delete(path)
+
+    result = report.to_dict()
+    if report.created == 1:
+        result['url'] = report.last_post.get_absolute_url()
+    else:
+        result['url'] = reverse('app_blog:blog_detail', kwargs={'pk': blog.pk})
+    return result
+
+
+@task('save_post_images')
+def save_post_images(post_id: int, files: List[List[str]]) -> Dict[str, Union[int, str]]:
+    """
+    Creates the Image instances of the post from the staged files, passed as [title, path] pairs.
+    Every staged file is deleted as soon as its image is saved, so a retried job doesn't duplicate the images.
+    """
+    post = Post.objects.filter(pk=post_id).first()
+    if post is None:
+        for _, path in files:
+            default_storage.delete(path)
+        raise PermanentJobError(f'The post {post_id} does not exist')
+
+    count = 0
+    for title, path in files:
+        if not default_storage.exists(path):
+            continue
+        with default_storage.open(path, 'rb') as staged_file:
+            Image.objects.create(title=title, image=File(staged_file, name=os.path.basename(path)), post=post)
+        default_storage.delete(path)
+        count += 1
+    return {'images': count, 'url': post.get_absolute_url()}
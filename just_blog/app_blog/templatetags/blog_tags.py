@@ -1,9 +1,6 @@
 from django import template
 import re
 from django.utils.safestring import SafeString
-from app_blog.models import Post
-from app_auth.models import Profile
-from django.db.models import QuerySet
 
 register = template.Library()
 
@@ -50,13 +47,3 @@ def change_class_for_cvs_new(safe_string: SafeString) -> str:
 
     return safe_string
 
-
-@register.filter(name="cur_profile")
-def cur_profile(post: Post, profiles: QuerySet) -> Profile:
-    """
-    Goes through the queryset of Profile instances and returns the one that
-    matches the passed Post instance
-    """
-    for profile in profiles:
-        if post.profile == profile:
-            return profile
@@ -2,17 +2,34 @@ import bs4
 from django.test import TestCase
 from django.shortcuts import reverse
 from app_auth.models import Profile
-from app_blog.models import Blog, Post, Image
+from app_blog.models import Blog, Post, Image, Tag, PostTag
 from django.contrib.auth.models import User
 from string import ascii_letters
 from random import choice, choices
 from bs4 import BeautifulSoup
 import re
-from django.db.models import Q
+from django.db.models import F, Q
 from PIL import Image as PilImage
 import os
 import csv
 from contextlib import ExitStack
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.core.management import call_command
+from django.test import override_settings
+from unittest import mock
+from app_blog.pagination import KeysetPaginator
+from app_blog.utils import import_posts_from_csv, reconcile_counters
+from django.core.files.uploadedfile import SimpleUploadedFile
+from app_jobs.models import Job
+from app_jobs.utils import run_pending_jobs
+from app_jobs.testing import TemporaryMediaTestMixin
+import gzip
+from django.utils import timezone
+from django.utils.http import http_date
+import time
+import tempfile
 
 
 class UserBlogListViewTestCase(TestCase):
@@ -132,6 +149,21 @@ class BlogDetailViewTestCase(TestCase):
         for link in self.unsafe_links:
             self.assertContains(response, link)
 
+    def test_blog_detail_conditional(self):
+        # Some blogs of the fixtures have no posts.
+        post = Post.objects.create(
+            title='conditional', tag='tag', content='content', blog=self.random_blog, profile=self.random_blog.profile
+        )
+        self.client.force_login(user=self.user)
+        etag = self.client.get(self.url).headers['ETag']
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        post.content = 'a new conditional content'
+        post.save()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.headers['ETag'], etag)
+        self.client.logout()
+
 
 class BlogDeleteViewTestCase(TestCase):
 
@@ -254,7 +286,7 @@ class PostDeleteViewTestCase(TestCase):
         )
 
 
-class PostCreateViewTestCase(TestCase):
+class PostCreateViewTestCase(TemporaryMediaTestMixin, TestCase):
 
     @classmethod
     def setUpClass(cls):
@@ -321,6 +353,11 @@ class PostCreateViewTestCase(TestCase):
                 self.url,
                 data=self.post_test_data,
             )
+        self.post_test_data.pop('images')
+
+        job = Job.objects.get(owner=self.user, name='save_post_images')
+        self.assertRedirects(post_response, job.get_absolute_url(), fetch_redirect_response=False)
+        run_pending_jobs()
 
         new_post_query = Post.objects.filter(Q(title=self.post_test_data['title']) & Q(images__isnull=False))
         self.assertTrue(new_post_query.exists())
@@ -328,13 +365,10 @@ class PostCreateViewTestCase(TestCase):
         new_post = new_post_query[0]
         self.assertEqual(new_post.images.count(), 3)
 
+        job.refresh_from_db()
         new_url = reverse('app_blog:post_detail', kwargs={'pk': new_post.pk})
-        self.assertRedirects(
-            post_response,
-            new_url
-        )
-
-        self.post_test_data.pop('images')
+        self.assertEqual(job.result['url'], new_url)
+        self.assertContains(self.client.get(job.get_absolute_url()), new_url)
         self.client.logout()
 
     def test_post_create_csv(self):
@@ -345,6 +379,9 @@ class PostCreateViewTestCase(TestCase):
                 self.url,
                 {"file": file}
             )
+        job = Job.objects.get(owner=self.user, name='import_posts')
+        self.assertRedirects(post_response, job.get_absolute_url(), fetch_redirect_response=False)
+        run_pending_jobs()
 
         new_post_query = Post.objects.filter(
             Q(title=self.post_test_data['title']) & Q(images__isnull=True)
@@ -352,10 +389,9 @@ class PostCreateViewTestCase(TestCase):
         self.assertTrue(new_post_query.exists())
 
         new_url = reverse('app_blog:post_detail', kwargs={'pk': new_post_query[0].pk})
-        self.assertRedirects(
-            post_response,
-            new_url
-        )
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.DONE)
+        self.assertEqual(job.result['url'], new_url)
 
         self.client.logout()
 
@@ -367,6 +403,43 @@ class PostCreateViewTestCase(TestCase):
         self.assertIsNotNone(invalid_response.context.get('error'))
         self.client.logout()
 
+    def test_post_create_csv_report(self):
+        self.client.force_login(user=self.user)
+        content = (
+            'first title,first tag,"content, with a comma"\r\n'
+            'second title,second tag,"multiline\ncontent"\r\n'
+            f'{"t" * 129},third tag,content\r\n'
+            'fourth title,only two columns\r\n'
+        )
+        csv_file = SimpleUploadedFile('posts.csv', content.encode('utf-8'), content_type='text/csv')
+        self.client.post(self.url, {'file': csv_file})
+        run_pending_jobs()
+
+        job = Job.objects.get(owner=self.user, name='import_posts')
+        self.assertEqual(job.result['created'], 2)
+        self.assertEqual([error['row'] for error in job.result['errors']], [3, 4])
+        self.assertContains(self.client.get(job.get_absolute_url()), 'Row 4:')
+        self.assertEqual(
+            Post.objects.get(blog=self.blog, title='first title').content, 'content, with a comma'
+        )
+        self.assertEqual(
+            Post.objects.get(blog=self.blog, title='second title').content, 'multiline\ncontent'
+        )
+        self.client.logout()
+
+    def test_import_posts_from_csv_batches(self):
+        rows = '\n'.join(f'title {i};tag {i};content, {i}' for i in range(5))
+        csv_file = SimpleUploadedFile('posts.csv', f'\ufeff{rows}'.encode('utf-8'))
+        report = import_posts_from_csv(csv_file, blog=self.blog, profile=self.profile, batch_size=2)
+
+        self.assertEqual(report.created, 5)
+        self.assertEqual(report.errors, [])
+        imported_posts = Post.objects.filter(blog=self.blog, title__startswith='title ').order_by('pk')
+        self.assertEqual(
+            list(imported_posts.values_list('content', flat=True)),
+            [f'content, {i}' for i in range(5)]
+        )
+
     def test_post_create_invalid_img(self):
         self.client.force_login(user=self.user)
         with open(self.csv_file, 'r') as file:
@@ -452,6 +525,96 @@ class PostDetailViewTestCase(TestCase):
 
         self.client.logout()
 
+    async def test_post_detail_async(self):
+        await cache.aclear()
+        self.addCleanup(cache.clear)
+        response = await self.async_client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context.get('post').pk, self.random_post.pk)
+        await Post.objects.filter(pk=self.random_post.pk).aupdate(is_published=False)
+        cache.clear()
+        redirect_response = await self.async_client.get(self.url)
+        self.assertEqual(redirect_response.status_code, 302)
+        missing_response = await self.async_client.get(reverse('app_blog:post_detail', kwargs={'pk': 0}))
+        self.assertEqual(missing_response.status_code, 404)
+
+    def test_post_detail_conditional(self):
+        self.client.force_login(user=self.random_post.profile.user)
+        response = self.client.get(self.url)
+        etag = response.headers['ETag']
+        self.assertIn('Last-Modified', response.headers)
+        with self.assertNumQueries(2):
+            not_modified_response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(not_modified_response.status_code, 304)
+        self.assertEqual(not_modified_response.headers['ETag'], etag)
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH='"other"').status_code, 200)
+
+        self.client.force_login(user=self.bad_profile.user)
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+        self.client.force_login(user=self.random_post.profile.user)
+
+        post = Post.objects.get(pk=self.random_post.pk)
+        post.title = 'a new conditional title'
+        post.save()
+        edited_response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(edited_response.status_code, 200)
+        self.assertNotEqual(edited_response.headers['ETag'], etag)
+
+        etag = edited_response.headers['ETag']
+        Image.objects.create(title='image', image='images/image.jpg', post=post)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+        # The page shows the name of the author.
+        etag = response.headers['ETag']
+        user = self.random_post.profile.user
+        user.username = 'renamed-author'
+        user.save()
+        renamed_response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(renamed_response.status_code, 200)
+        self.assertContains(renamed_response, 'renamed-author')
+        self.client.logout()
+
+    def test_draft_post_detail_conditional(self):
+        self.random_post.archive()
+        cache.clear()
+        self.addCleanup(cache.clear)
+        future = http_date(time.time() + 3600)
+        anonymous_response = self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=future)
+        self.assertEqual(anonymous_response.status_code, 302)
+        self.assertNotIn('ETag', anonymous_response.headers)
+
+        self.client.force_login(user=self.bad_profile.user)
+        forbidden_response = self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=future)
+        self.assertEqual(forbidden_response.status_code, 403)
+        self.assertNotIn('ETag', forbidden_response.headers)
+
+        self.client.force_login(user=self.random_post.profile.user)
+        self.assertEqual(self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=future).status_code, 304)
+        self.client.logout()
+
+    async def test_draft_post_detail_conditional_async(self):
+        await Post.objects.filter(pk=self.random_post.pk).aupdate(is_published=False)
+        await cache.aclear()
+        self.addCleanup(cache.clear)
+        future = http_date(time.time() + 3600)
+        response = await self.async_client.get(self.url, headers={'If-Modified-Since': future})
+        self.assertEqual(response.status_code, 302)
+        self.assertNotIn('ETag', response.headers)
+
+    async def test_post_detail_conditional_async(self):
+        await cache.aclear()
+        self.addCleanup(cache.clear)
+        response = await self.async_client.get(self.url)
+        etag = response.headers['ETag']
+        await cache.aclear()
+        not_modified_response = await self.async_client.get(self.url, headers={'If-None-Match': etag})
+        self.assertEqual(not_modified_response.status_code, 304)
+        await Post.objects.filter(pk=self.random_post.pk).aupdate(updated_at=timezone.now())
+        modified_response = await self.async_client.get(self.url, headers={'If-None-Match': etag})
+        self.assertEqual(modified_response.status_code, 200)
+        self.assertNotEqual(modified_response.headers['ETag'], etag)
+
 
 class BlogEditViewTestCase(TestCase):
     fixtures = [
@@ -505,7 +668,7 @@ class BlogEditViewTestCase(TestCase):
         self.assertEqual(old_title, self.random_blog.title)
 
 
-class PostEditViewTestCase(TestCase):
+class PostEditViewTestCase(TemporaryMediaTestMixin, TestCase):
     fixtures = [
         'app_auth/fixtures/users.json',
         'app_auth/fixtures/profiles.json',
@@ -548,10 +711,9 @@ class PostEditViewTestCase(TestCase):
             new_test_data['images'] = images
             response = self.client.post(self.url, new_test_data)
 
-        self.assertRedirects(
-            response,
-            reverse('app_blog:post_detail', kwargs={'pk': self.random_post.pk})
-        )
+        job = Job.objects.get(owner=self.random_post.profile.user, name='save_post_images')
+        self.assertRedirects(response, job.get_absolute_url())
+        run_pending_jobs()
         self.random_post.refresh_from_db()
 
         images = Image.objects.filter(post=self.random_post)
@@ -583,6 +745,7 @@ class PublishOrArchiveTestCase(TestCase):
         'app_auth/fixtures/profiles.json',
         'app_blog/fixtures/blogs.json',
         'app_blog/fixtures/posts.json',
+        'app_blog/fixtures/images.json',
     ]
 
     def setUp(self) -> None:
@@ -617,6 +780,28 @@ class PublishOrArchiveTestCase(TestCase):
         self.assertEqual(response.status_code, 403)
         self.client.logout()
 
+    def test_concurrent_toggles(self):
+        Tag.objects.sync_posts(Post.objects.all())
+        self.random_post.archive()
+        first = Post.objects.get(pk=self.random_post.pk)
+        second = Post.objects.get(pk=self.random_post.pk)
+        with CaptureQueriesContext(connection) as queries:
+            first.publish()
+        updates = [query['sql'] for query in queries if query['sql'].startswith('UPDATE "app_blog_post"')]
+        self.assertEqual(len(updates), 1)
+        self.assertNotIn('"title"', updates[0])
+        self.assertNotIn('"content"', updates[0])
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertFalse(second.set_published(True))
+        self.assertEqual(len([query for query in queries if not query['sql'].endswith('"')]), 1)
+        self.assertTrue(second.is_published)
+        self.assertEqual(reconcile_counters(dry_run=True), {'app_blog.Blog': 0, 'app_auth.Profile': 0})
+        for tag in Tag.objects.filter(post_tags__post=self.random_post):
+            self.assertEqual(tag.post_count, Post.objects.filter(tags=tag, is_published=True).count())
+        published_at = Post.objects.get(pk=self.random_post.pk).published_at
+        self.assertEqual(first.published_at, published_at)
+
 
 class LatestPostsViewTestCase(TestCase):
     fixtures = [
@@ -631,10 +816,88 @@ class LatestPostsViewTestCase(TestCase):
         self.publish_posts = Post.objects.filter(is_published=True)
 
     def test_latest_posts_view(self):
-        response = self.client.get(self.url)
+        response = self.client.get(self.url, {'page': 1})
         self.assertEqual(response.status_code, 200)
         self.assertEqual(self.publish_posts.count(), response.context.get('paginator').count)
 
+    def test_latest_posts_view_cursor(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(response.context.get('paginator'))
+
+        displayed_posts = []
+        while True:
+            page = response.context.get('page_obj')
+            displayed_posts.extend(post.pk for post in response.context.get('posts'))
+            if not page.has_next():
+                break
+            response = self.client.get(self.url, {'cursor': page.next_cursor})
+
+        expected_posts = list(self.publish_posts.order_by('-published_at', '-id').values_list('pk', flat=True))
+        self.assertEqual(displayed_posts, expected_posts)
+
+        if page.has_previous():
+            previous_response = self.client.get(self.url, {'cursor': page.previous_cursor})
+            previous_posts = [post.pk for post in previous_response.context.get('posts')]
+            self.assertEqual(previous_posts, displayed_posts[-len(page) - 5:-len(page)])
+
+    def test_keyset_paginator_nullable_field(self):
+        post = self.publish_posts.first()
+        for title in ('first without a date', 'second without a date'):
+            Post.objects.create(title=title, tag='tag', content='content', blog=post.blog, profile=post.profile,
+                                is_published=True)
+        self.assertEqual(self.publish_posts.filter(published_at__isnull=True).count(), 2)
+        paginator = KeysetPaginator(self.publish_posts, 3)
+
+        pages = [paginator.page()]
+        while pages[-1].has_next():
+            pages.append(paginator.page(pages[-1].next_cursor))
+        displayed_posts = [post.pk for page in pages for post in page]
+        expected_posts = list(self.publish_posts.order_by(
+            F('published_at').desc(nulls_last=True), '-id'
+        ).values_list('pk', flat=True))
+        self.assertEqual(displayed_posts, expected_posts)
+
+        # The previous pages are the same pages, back to the first one.
+        for index in range(len(pages) - 1, 0, -1):
+            previous_page = paginator.page(pages[index].previous_cursor)
+            self.assertEqual([post.pk for post in previous_page], [post.pk for post in pages[index - 1]])
+
+    def test_keyset_paginator_index_seek(self):
+        paginator = KeysetPaginator(self.publish_posts, 3)
+        next_cursor = paginator.page().next_cursor
+        for cursor in (next_cursor, paginator.page(next_cursor).previous_cursor):
+            queryset, _ = paginator.get_page_queryset(cursor)
+            plan = queryset.explain()
+            self.assertIn('SEARCH app_blog_post USING INDEX post_published_timeline_idx (published_at', plan)
+            self.assertNotIn('USE TEMP B-TREE', plan)
+
+    def test_keyset_paginator_short_previous_page(self):
+        paginator = KeysetPaginator(self.publish_posts, 5)
+        first_page = paginator.page()
+        second_page = paginator.page(first_page.next_cursor)
+        Post.objects.filter(pk__in=[post.pk for post in first_page.object_list[:2]]).delete()
+        previous_page = paginator.page(second_page.previous_cursor)
+        self.assertEqual(len(previous_page), 5)
+        self.assertFalse(previous_page.has_previous())
+        self.assertEqual([post.pk for post in previous_page], [post.pk for post in paginator.page()])
+
+    def test_latest_posts_view_invalid_cursor(self):
+        response = self.client.get(self.url, {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 404)
+
+    def test_latest_posts_view_num_queries(self):
+        cache.clear()
+        with self.assertNumQueries(2):
+            response = self.client.get(self.url)
+        for post in response.context.get('posts'):
+            self.assertEqual(post.author.pk, post.profile_id)
+
+        next_cursor = response.context.get('page_obj').next_cursor
+        if next_cursor:
+            with self.assertNumQueries(2):
+                self.client.get(self.url, {'cursor': next_cursor})
+
     def test_latest_posts_view_context_profile(self):
         random_profile = choice(Profile.objects.all())
         self.client.force_login(user=random_profile.user)
@@ -644,8 +907,363 @@ class LatestPostsViewTestCase(TestCase):
             response.context.get('profile')
         )
 
+    async def test_latest_posts_view_async(self):
+        await cache.aclear()
+        self.addCleanup(cache.clear)
+        response = await self.async_client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        expected_posts = [pk async for pk in self.publish_posts.order_by('-published_at', '-id').values_list(
+            'pk', flat=True
+        )[:5]]
+        self.assertEqual([post.pk for post in response.context.get('posts')], expected_posts)
+        invalid_response = await self.async_client.get(self.url, {'cursor': 'not-a-cursor'})
+        self.assertEqual(invalid_response.status_code, 404)
+        missing_tag_response = await self.async_client.get(reverse('tag_posts', kwargs={'slug': 'no-such-tag'}))
+        self.assertEqual(missing_tag_response.status_code, 404)
+
+
+class TagTestCase(TestCase):
+    fixtures = [
+        'app_auth/fixtures/users.json',
+        'app_auth/fixtures/profiles.json',
+        'app_blog/fixtures/blogs.json',
+        'app_blog/fixtures/posts.json',
+    ]
+
+    def setUp(self) -> None:
+        cache.clear()
+        self.blog = Blog.objects.select_related('profile').first()
+        self.post = Post.objects.create(
+            title='tagged post', tag='#Gardening roses gardening', content='content',
+            blog=self.blog, profile=self.blog.profile
+        )
+
+    def get_slugs(self, post):
+        return sorted(post.tags.values_list('slug', flat=True))
+
+    def get_count(self, slug):
+        return Tag.objects.get(slug=slug).post_count
+
+    def test_tags_are_parsed_on_save(self):
+        self.assertEqual(self.get_slugs(self.post), ['gardening', 'roses'])
+        self.assertEqual(Tag.objects.get(slug='gardening').name, 'Gardening')
+        self.assertEqual(self.get_count('gardening'), 0)
+
+        self.post.tag = 'roses tulips'
+        self.post.save()
+        self.assertEqual(self.get_slugs(self.post), ['roses', 'tulips'])
+
+    def test_post_counts_follow_publication(self):
+        self.post.publish()
+        self.assertEqual(self.get_count('gardening'), 1)
+        self.assertEqual(self.get_count('roses'), 1)
+
+        self.post.tag = 'roses'
+        self.post.save()
+        self.assertEqual(self.get_count('gardening'), 0)
+        self.assertEqual(self.get_count('roses'), 1)
+
+        self.post.archive()
+        self.assertEqual(self.get_count('roses'), 0)
+
+    def test_post_counts_after_delete(self):
+        self.post.publish()
+        Post.objects.filter(pk=self.post.pk).delete()
+        self.assertEqual(self.get_count('gardening'), 0)
+        self.assertFalse(PostTag.objects.filter(post_id=self.post.pk).exists())
+
+    def test_unchanged_post_is_not_synced(self):
+        post = Post.objects.get(pk=self.post.pk)
+        post.title = 'a new title'
+        with CaptureQueriesContext(connection) as queries:
+            post.save()
+        self.assertFalse([query for query in queries if 'app_blog_posttag' in query['sql']])
+
+    def test_imported_posts_are_tagged(self):
+        csv_file = SimpleUploadedFile('posts.csv', 'first,gardening tulips,content\nsecond,tulips,content\n'.encode())
+        report = import_posts_from_csv(csv_file, self.blog, self.blog.profile)
+        self.assertEqual(report.created, 2)
+        self.assertEqual(Tag.objects.get(slug='tulips').posts.count(), 2)
+        self.assertEqual(Tag.objects.get(slug='gardening').posts.count(), 2)
+
+    def test_tag_posts_view(self):
+        self.post.publish()
+        Post.objects.create(
+            title='draft', tag='gardening', content='content', blog=self.blog, profile=self.blog.profile
+        )
+        tag = Tag.objects.get(slug='gardening')
+        response = self.client.get(tag.get_absolute_url())
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([post.pk for post in response.context.get('posts')], [self.post.pk])
+        self.assertEqual(response.context.get('tag'), tag)
+        self.assertContains(response, '#Gardening')
+
+    def test_tag_posts_view_unknown_tag(self):
+        response = self.client.get(reverse('tag_posts', kwargs={'slug': 'no-such-tag'}))
+        self.assertEqual(response.status_code, 404)
+
+    def test_post_detail_links_tags(self):
+        self.post.publish()
+        response = self.client.get(reverse('app_blog:post_detail', kwargs={'pk': self.post.pk}))
+        self.assertContains(response, reverse('tag_posts', kwargs={'slug': 'roses'}))
+
+
+
+
+
+
+
+
+class CountersTestCase(TestCase):
+    fixtures = [
+        'app_auth/fixtures/users.json',
+        'app_auth/fixtures/profiles.json',
+        'app_blog/fixtures/blogs.json',
+        'app_blog/fixtures/posts.json',
+        'app_blog/fixtures/images.json',
+    ]
+
+    def setUp(self) -> None:
+        self.blog = Blog.objects.select_related('profile').first()
+        self.profile = self.blog.profile
+
+    def get_counters(self):
+        blog = Blog.objects.get(pk=self.blog.pk)
+        profile = Profile.objects.get(pk=self.profile.pk)
+        return (
+            (blog.post_count, blog.published_count, blog.image_count),
+            (profile.blog_count, profile.post_count, profile.published_count, profile.image_count),
+        )
+
+    def assertCountersChanged(self, before, blog_deltas, profile_deltas):
+        expected = (
+            tuple(value + delta for value, delta in zip(before[0], blog_deltas)),
+            tuple(value + delta for value, delta in zip(before[1], profile_deltas)),
+        )
+        self.assertEqual(self.get_counters(), expected)
+
+    def test_reconcile_counters(self):
+        self.assertEqual(set(reconcile_counters(dry_run=True).values()), {0})
+        blog = Blog.objects.get(pk=self.blog.pk)
+        self.assertEqual(blog.post_count, blog.posts.count())
+        self.assertEqual(blog.published_count, blog.posts.filter(is_published=True).count())
+        self.assertEqual(blog.image_count, Image.objects.filter(post__blog=blog).count())
+
+        Blog.objects.filter(pk=self.blog.pk).update(post_count=100)
+        self.assertEqual(reconcile_counters(dry_run=True)['app_blog.Blog'], 1)
+        call_command('reconcile_counters', stdout=open(os.devnull, 'w'))
+        self.assertEqual(Blog.objects.get(pk=self.blog.pk).post_count, blog.post_count)
+
+    def test_post_counters(self):
+        before = self.get_counters()
+        post = Post.objects.create(
+            title='title', tag='tag', content='content', blog=self.blog, profile=self.profile
+        )
+        self.assertCountersChanged(before, (1, 0, 0), (0, 1, 0, 0))
+
+        post.publish()
+        self.assertCountersChanged(before, (1, 1, 0), (0, 1, 1, 0))
+        post.title = 'a new title'
+        post.save()
+        self.assertCountersChanged(before, (1, 1, 0), (0, 1, 1, 0))
+
+        post = Post.objects.get(pk=post.pk)
+        post.archive()
+        self.assertCountersChanged(before, (1, 0, 0), (0, 1, 0, 0))
+
+        post.publish()
+        post.delete()
+        self.assertEqual(self.get_counters(), before)
+
+    def test_image_and_blog_counters(self):
+        before = self.get_counters()
+        blog = Blog.objects.create(title='title', description='description', profile=self.profile)
+        post = Post.objects.create(title='title', tag='tag', content='content', blog=blog, profile=self.profile)
+        post.publish()
+        Image.objects.create(title='image', image='images/image.jpg', post=post)
+        blog.refresh_from_db()
+        self.assertEqual((blog.post_count, blog.published_count, blog.image_count), (1, 1, 1))
+        self.assertCountersChanged(before, (0, 0, 0), (1, 1, 1, 1))
+
+        with mock.patch('django.db.models.fields.files.FieldFile.delete'):
+            blog.delete()
+        self.assertEqual(self.get_counters(), before)
+
+    def test_imported_posts_counters(self):
+        before = self.get_counters()
+        csv_file = SimpleUploadedFile('posts.csv', 'first,tag,content\nsecond,tag,content\n'.encode())
+        import_posts_from_csv(csv_file, self.blog, self.profile)
+        self.assertCountersChanged(before, (2, 0, 0), (0, 2, 0, 0))
+
+    def test_reassigned_blog_counters(self):
+        other = Profile.objects.exclude(pk=self.profile.pk).first()
+        other_count = other.blog_count
+        before = self.get_counters()
+        blog = Blog.objects.get(pk=self.blog.pk)
+        blog.profile = other
+        blog.save()
+        self.assertCountersChanged(before, (0, 0, 0), (-1, 0, 0, 0))
+        self.assertEqual(Profile.objects.get(pk=other.pk).blog_count, other_count + 1)
+        self.assertEqual(reconcile_counters(dry_run=True), {'app_blog.Blog': 0, 'app_auth.Profile': 0})
+
+        blog.save(update_fields=['title'])
+        self.assertCountersChanged(before, (0, 0, 0), (-1, 0, 0, 0))
+
+    def test_counters_are_rolled_back(self):
+        before = self.get_counters()
+        with mock.patch('app_blog.models.Tag.objects.sync_posts', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                Post.objects.create(title='title', tag='tag', content='content', blog=self.blog, profile=self.profile)
+        self.assertEqual(self.get_counters(), before)
+
+
+class PostIndexesTestCase(TestCase):
+    fixtures = [
+        'app_auth/fixtures/users.json',
+        'app_auth/fixtures/profiles.json',
+        'app_blog/fixtures/blogs.json',
+        'app_blog/fixtures/posts.json',
+    ]
+
+    def setUp(self) -> None:
+        self.random_post = choice(Post.objects.all())
+
+    def assertUsesIndex(self, queryset, index_name):
+        plan = queryset.explain()
+        self.assertIn(f'USING INDEX {index_name}', plan)
+        self.assertNotIn('USE TEMP B-TREE', plan)
+
+    def test_published_timeline_index(self):
+        self.assertUsesIndex(
+            Post.objects.filter(is_published=True).order_by('-published_at'),
+            'post_published_timeline_idx'
+        )
+        self.assertUsesIndex(
+            Post.objects.filter(is_published=True).order_by('-published_at', '-id'),
+            'post_published_timeline_idx'
+        )
+
+    def test_blog_created_at_index(self):
+        self.assertUsesIndex(
+            Post.objects.filter(blog=self.random_post.blog_id).order_by('-created_at'),
+            'post_blog_created_at_idx'
+        )
 
+    def test_profile_is_published_index(self):
+        self.assertUsesIndex(
+            Post.objects.filter(profile=self.random_post.profile_id, is_published=True),
+            'post_profile_is_published_idx'
+        )
+
+    def test_post_tag_index(self):
+        # The unique constraint is created by SQLite as an automatic index on (tag_id, post_id).
+        self.assertIn('USING COVERING INDEX', PostTag.objects.filter(tag=1).values('post').explain())
+        self.assertUsesIndex(Tag.objects.filter(post_count__gt=0).order_by('-post_count', 'slug'), 'tag_post_count_idx')
 
 
+class PostSitemapTestCase(TestCase):
+    fixtures = [
+        'app_auth/fixtures/users.json',
+        'app_auth/fixtures/profiles.json',
+        'app_blog/fixtures/blogs.json',
+        'app_blog/fixtures/posts.json',
+    ]
 
+    def setUp(self) -> None:
+        self.url = reverse('post_sitemap_index')
+        self.published_posts = Post.objects.filter(is_published=True)
+        section_settings = override_settings(SITEMAP_SECTION_SIZE=5)
+        section_settings.enable()
+        self.addCleanup(section_settings.disable)
+        # The etags are cached under the version of the timeline, which the rolled back tests don't restore.
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def get_section_urls(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        soup = BeautifulSoup(b''.join(response.streaming_content), 'xml')
+        return [loc.text for loc in soup.find_all('loc')]
+
+    def test_post_sitemap_index(self):
+        section_urls = self.get_section_urls()
+        expected_sections = {(post.pk - 1) // 5 for post in self.published_posts}
+        self.assertEqual(len(section_urls), len(expected_sections))
+
+        post_urls = []
+        for section_url in section_urls:
+            response = self.client.get(section_url)
+            soup = BeautifulSoup(b''.join(response.streaming_content), 'xml')
+            locations = [loc.text for loc in soup.find_all('loc')]
+            self.assertLessEqual(len(locations), 5)
+            post_urls.extend(locations)
+
+        expected_urls = {
+            f'http://example.com{reverse("app_blog:post_detail", kwargs={"pk": post.pk})}'
+            for post in self.published_posts
+        }
+        self.assertEqual(set(post_urls), expected_urls)
+        self.assertEqual(len(post_urls), len(expected_urls))
 
+    def test_post_sitemap_conditional(self):
+        response = self.client.get(self.url)
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+
+        section_url = self.get_section_urls()[0]
+        section_response = self.client.get(section_url)
+        self.assertEqual(self.client.get(section_url, HTTP_IF_NONE_MATCH=section_response['ETag']).status_code, 304)
+
+        choice(list(self.published_posts)).archive()
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 200)
+
+    def test_post_sitemap_cached_etag(self):
+        etag = self.client.get(self.url)['ETag']
+        section_url = self.get_section_urls()[0]
+        section_etag = self.client.get(section_url)['ETag']
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+            self.assertEqual(self.client.get(section_url, HTTP_IF_NONE_MATCH=section_etag).status_code, 304)
+
+        choice(list(self.published_posts)).archive()
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_post_sitemap_without_published_at(self):
+        post = choice(list(self.published_posts))
+        Post.objects.filter(pk=post.pk).update(published_at=None)
+        updated_at = Post.objects.get(pk=post.pk).updated_at
+        post_url = f'http://example.com{reverse("app_blog:post_detail", kwargs={"pk": post.pk})}'
+
+        section_urls = self.get_section_urls()
+        self.assertEqual(len(section_urls), len({(post.pk - 1) // 5 for post in self.published_posts}))
+        section_url = reverse('post_sitemap_section', kwargs={'section': (post.pk - 1) // 5})
+        soup = BeautifulSoup(b''.join(self.client.get(section_url).streaming_content), 'xml')
+        entry = next(url for url in soup.find_all('url') if url.loc.text == post_url)
+        self.assertEqual(entry.lastmod.text, updated_at.isoformat())
+        self.assertIsNotNone(soup.find('urlset'))
+
+    def test_post_sitemap_missing_section(self):
+        last_section = (self.published_posts.order_by('-pk').first().pk - 1) // 5
+        url = reverse('post_sitemap_section', kwargs={'section': last_section + 1})
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+    def test_build_sitemaps(self):
+        with tempfile.TemporaryDirectory() as sitemap_root, override_settings(SITEMAP_ROOT=sitemap_root):
+            call_command('build_sitemaps', '--protocol', 'http', stdout=open(os.devnull, 'w'))
+            section_url = self.get_section_urls()[0]
+            plain_response = self.client.get(section_url)
+            gzip_response = self.client.get(section_url, HTTP_ACCEPT_ENCODING='gzip')
+            self.assertEqual(gzip_response['Content-Encoding'], 'gzip')
+            self.assertEqual(
+                gzip.decompress(b''.join(gzip_response.streaming_content)),
+                b''.join(plain_response.streaming_content)
+            )
+            # The plain and the gzipped responses have their own validators.
+            self.assertNotEqual(gzip_response['ETag'], plain_response['ETag'])
+            response = self.client.get(
+                section_url, HTTP_IF_NONE_MATCH=plain_response['ETag'], HTTP_ACCEPT_ENCODING='gzip'
+            )
+            self.assertEqual((response.status_code, response['Content-Encoding']), (200, 'gzip'))
+            response = self.client.get(
+                section_url, HTTP_IF_NONE_MATCH=gzip_response['ETag'], HTTP_ACCEPT_ENCODING='gzip'
+            )
+            self.assertEqual(response.status_code, 304)
@@ -1,23 +1,300 @@
-from .models import Blog, Post
-from csv import reader
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files import File
+from django.db import transaction
+from django.db.models import Count, F, Model, OuterRef, Q, QuerySet, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+from .models import Blog, Image, Post, PostTag, Tag, defer_counters, update_counters
+from .signals import post_archived, post_published, posts_imported
 from app_auth.models import Profile
-from typing import Optional
+from collections import Counter
+import codecs
+import csv
+import functools
+import itertools
+import operator
+from typing import Optional, Dict, Iterable, Iterator, List, Tuple, Type, Union
 
+CSV_COLUMNS = 'title', 'tag', 'content'
+CSV_DELIMITERS = ',;\t'
+CSV_SAMPLE_SIZE = 4096
 
-def save_post_from_csv(csv_reader: reader, profile: Profile, kwargs) -> Optional[Post]:
+
+class CsvImportError(Exception):
+    """
+    Raised when the uploaded file can't be read as a utf-8 csv file.
+    """
+
+
+class CsvImportReport:
+    """
+    The result of the import of the posts from a csv file: the number of the created posts,
+    the last created Post instance and the errors of the rows that were skipped.
+    Every error is a dictionary with the number of the row and the list of the messages.
+    """
+
+    def __init__(self) -> None:
+        self.created = 0
+        self.last_post: Optional[Post] = None
+        self.errors: List[Dict[str, Union[int, List[str]]]] = []
+
+    def add_error(self, row: int, messages: List[str]) -> None:
+        """
+        Adds the messages of the skipped row to the report.
+        """
+        self.errors.append({'row': row, 'messages': messages})
+
+    def to_dict(self) -> Dict[str, Union[int, List[Dict[str, Union[int, List[str]]]]]]:
+        """
+        Returns the report as a dictionary with the keys created and errors.
+        """
+        return {'created': self.created, 'errors': self.errors}
+
+
+def iter_csv_lines(file: File) -> Iterator[str]:
+    """
+    Reads the uploaded file line by line, chunk after chunk, and decodes every line,
+    so the file is never loaded into memory at once. The byte order mark is skipped.
+    """
+    decoder = codecs.getincrementaldecoder('utf-8-sig')()
+    try:
+        for line in file:
+            yield decoder.decode(line)
+        yield decoder.decode(b'', final=True)
+    except UnicodeDecodeError as exc:
+        raise CsvImportError(str(exc))
+
+
+def is_utf8_text(file: File) -> bool:
+    """
+    Checks if the beginning of the file is a utf-8 text, to reject the binary files
+    before they are passed to the background import. Rewinds the file.
+    """
+    decoder = codecs.getincrementaldecoder('utf-8-sig')()
+    try:
+        text = decoder.decode(file.read(CSV_SAMPLE_SIZE))
+    except UnicodeDecodeError:
+        return False
+    finally:
+        file.seek(0)
+    return '\x00' not in text
+
+
+def detect_delimiter(line: str) -> str:
+    """
+    Detects the delimiter by the first line of the file: returns the first of the supported delimiters
+    that splits the line into the expected columns. Defaults to the comma.
+    """
+    for delimiter in CSV_DELIMITERS:
+        row = next(csv.reader([line], delimiter=delimiter, quotechar='"'), [])
+        if len(row) == len(CSV_COLUMNS):
+            return delimiter
+    return CSV_DELIMITERS[0]
+
+
+def validate_csv_row(row: List[str], blog: Blog, profile: Profile) -> Tuple[Optional[Post], List[str]]:
+    """
+    Builds a new Post instance from the title, tag and content of the row and validates its fields.
+    Returns the instance, or None and the list of the error messages if the row is invalid.
+    """
+    if len(row) != len(CSV_COLUMNS):
+        return None, [str(_('The row should contain three columns: title, tag and content'))]
+    post = Post(blog=blog, profile=profile, **dict(zip(CSV_COLUMNS, row)))
+    try:
+        post.clean_fields(exclude=['blog', 'profile'])
+    except ValidationError as exc:
+        return None, [f'{field}: {message}' for field, messages in exc.message_dict.items() for message in messages]
+    return post, []
+
+
+def import_posts_from_csv(file: File, blog: Blog, profile: Profile,
+                          batch_size: Optional[int] = None) -> CsvImportReport:
+    """
+    Creates new Post instances in the blog from the rows of the csv file with the columns title, tag and content.
+    The file is read as a stream, the delimiter is detected once by its first line,
+    the rows are validated and saved with bulk_create in batches of batch_size posts
+    together with the links to their tags and the counters of the blog and the profile, all in one transaction.
+    The invalid rows are skipped and listed in the returned report.
+    Raises CsvImportError if the file isn't a utf-8 text file.
+    """
+    batch_size = batch_size or settings.POST_IMPORT_BATCH_SIZE
+    report = CsvImportReport()
+    lines = iter_csv_lines(file)
+    first_line = next(lines, '')
+    csv_reader = csv.reader(
+        itertools.chain([first_line], lines), delimiter=detect_delimiter(first_line), quotechar='"'
+    )
+    batch: List[Post] = []
+
+    def save_batch() -> None:
+        Post.objects.bulk_create(batch)
+        Tag.objects.sync_posts(batch)
+        update_counters(Blog, blog.pk, post_count=len(batch))
+        update_counters(Profile, profile.pk, post_count=len(batch))
+        report.created += len(batch)
+        report.last_post = batch[-1]
+        batch.clear()
+
+    with transaction.atomic():
+        try:
+            for row_number, row in enumerate(csv_reader, start=1):
+                if not row:
+                    continue
+                post, messages = validate_csv_row(row, blog, profile)
+                if post is None:
+                    report.add_error(row_number, messages)
+                    continue
+                batch.append(post)
+                if len(batch) >= batch_size:
+                    save_batch()
+        except csv.Error as exc:
+            raise CsvImportError(str(exc))
+        if batch:
+            save_batch()
+
+    if report.created:
+        posts_imported.send(sender=Post, blog=blog, count=report.created)
+    return report
+
+
+def create_posts(posts: List[Post]) -> List[Post]:
     """
-    Takes title, tag and content from every row of the reader and creates a new Post instance.
+    Creates the validated posts, built with the instances of their blogs, with bulk_create in one transaction
+    together with the links to their tags and the counters of their blogs and profiles, which are updated
+    once per blog and profile. Sends posts_imported for every blog, as the new posts are not published.
+    Returns the created posts.
     """
-    for row in csv_reader:
-        title = row[0]
-        tag = row[1]
-        content = row[2]
-        if not len(title) <= 70 and not len(row) == 3:
-            return None
-        blog_pk = kwargs.get('pk')
-        blog_instance: Blog = Blog.objects.get(pk=blog_pk)
-        profile_instance = profile
-        new_post = Post(content=content, blog=blog_instance, title=title, tag=tag, profile=profile_instance)
-        new_post.save()
+    if not posts:
+        return []
+    with transaction.atomic(), defer_counters():
+        Post.objects.bulk_create(posts)
+        Tag.objects.sync_posts(posts)
+        for post in posts:
+            for (model, pk), counters in post.get_counter_deltas(post.get_state()).items():
+                update_counters(model, pk, **counters)
+    for blog, count in Counter(post.blog for post in posts).items():
+        posts_imported.send(sender=Post, blog=blog, count=count)
+    return posts
+
 
-        return new_post
+def set_posts_published(posts: List[Post], is_published: bool) -> List[Post]:
+    """
+    Publishes or archives the posts, which should be locked in the current transaction, with one UPDATE
+    of is_published, published_at and updated_at of the posts that are not in the requested state yet.
+    The published counters of their blogs, profiles and tags are updated once per instance.
+    Sends post_published or post_archived for every changed post and returns the changed posts.
+    """
+    changed = [post for post in posts if post.is_published != is_published]
+    if not changed:
+        return []
+    now = timezone.now()
+    published_at = now if is_published else None
+    with transaction.atomic(), defer_counters():
+        Post.objects.filter(pk__in=[post.pk for post in changed], is_published=not is_published).update(
+            is_published=is_published, published_at=published_at, updated_at=now
+        )
+        for post in changed:
+            delta = 1 if is_published else -1
+            update_counters(Blog, post.blog_id, published_count=delta)
+            update_counters(Profile, post.profile_id, published_count=delta)
+        Tag.objects.update_post_counts(PostTag.objects.filter(post__in=changed).values('tag_id'))
+    signal = post_published if is_published else post_archived
+    for post in changed:
+        post.is_published, post.published_at, post.updated_at = is_published, published_at, now
+        post._saved_state = post.get_state()
+        signal.send(sender=Post, instance=post)
+    return changed
+
+
+def delete_posts(pks: Iterable[int]) -> int:
+    """
+    Deletes the posts with their images in one transaction. The counters of their blogs and profiles
+    are updated once per instance. Returns the number of the deleted posts.
+    """
+    with transaction.atomic(), defer_counters():
+        _, deleted = Post.objects.filter(pk__in=list(pks)).delete()
+    return deleted.get(Post._meta.label, 0)
+
+
+def get_authors_queryset() -> QuerySet:
+    """
+    Returns the Profile instances with only the fields needed to display the author of a post:
+    avatar with its derivatives, username and first name.
+    """
+    return Profile.objects.select_related('user').only(
+        'avatar', 'avatar_derivatives', 'user__username', 'user__first_name'
+    )
+
+
+def get_post_authors(posts: Iterable[Post]) -> Dict[int, Profile]:
+    """
+    Retrieves with one query the authors of the passed posts (see get_authors_queryset).
+    Returns a dictionary with the pk of the profile as a key.
+    """
+    profile_ids = {post.profile_id for post in posts}
+    if not profile_ids:
+        return {}
+    return get_authors_queryset().in_bulk(profile_ids)
+
+
+async def aget_post_authors(posts: Iterable[Post]) -> Dict[int, Profile]:
+    """
+    The async version of get_post_authors.
+    """
+    profile_ids = {post.profile_id for post in posts}
+    if not profile_ids:
+        return {}
+    return {profile.pk: profile async for profile in get_authors_queryset().filter(pk__in=profile_ids)}
+
+
+def count_related(queryset: QuerySet, field: str) -> Coalesce:
+    """
+    Returns the expression counting the rows of the queryset related to the outer row by the field.
+    """
+    return Coalesce(Subquery(
+        queryset.filter(**{field: OuterRef('pk')}).order_by().values(field).annotate(count=Count('pk')).values('count')
+    ), 0)
+
+
+def get_counter_expressions() -> Dict[Type[Model], Dict[str, Coalesce]]:
+    """
+    Returns the expressions computing the actual values of the denormalized counters of the blogs and the profiles.
+    """
+    published = Post.objects.filter(is_published=True)
+    return {
+        Blog: {
+            'post_count': count_related(Post.objects.all(), 'blog'),
+            'published_count': count_related(published, 'blog'),
+            'image_count': count_related(Image.objects.all(), 'post__blog'),
+        },
+        Profile: {
+            'blog_count': count_related(Blog.objects.all(), 'profile'),
+            'post_count': count_related(Post.objects.all(), 'profile'),
+            'published_count': count_related(published, 'profile'),
+            'image_count': count_related(Image.objects.all(), 'post__profile'),
+        },
+    }
+
+
+def reconcile_counters(dry_run: bool = False) -> Dict[str, int]:
+    """
+    Compares the denormalized counters of the blogs and the profiles with the actual numbers of the related rows
+    and fixes the drifted ones. Returns the number of the drifted instances of every model.
+    The counts of the posts of the tags are recounted too, unless dry_run is True.
+    """
+    drifted = {}
+    for model, expressions in get_counter_expressions().items():
+        stale = model.objects.alias(
+            **{f'actual_{field}': expression for field, expression in expressions.items()}
+        ).filter(
+            functools.reduce(operator.or_, (~Q(**{field: F(f'actual_{field}')}) for field in expressions))
+        ).values_list('pk', flat=True)
+        drifted[model._meta.label] = stale.count()
+        if drifted[model._meta.label] and not dry_run:
+            with transaction.atomic():
+                model.objects.filter(pk__in=list(stale)).update(**expressions)
+    if not dry_run:
+        Tag.objects.update_post_counts(Tag.objects.values_list('pk', flat=True))
+    return drifted
@@ -1,21 +1,39 @@
+from asgiref.sync import sync_to_async
 from django.core.exceptions import PermissionDenied
 from django.shortcuts import render, reverse, redirect, get_object_or_404, get_list_or_404
 from django.views.generic import ListView, CreateView, DetailView, UpdateView, DeleteView
-from .models import Blog, Post, Image
+from .models import Blog, Post, Image, Tag
 from app_auth.models import Profile
 from .forms import BlogForm, PostForm, PostFileForm
-from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
+from django.contrib.auth.mixins import AccessMixin, LoginRequiredMixin, UserPassesTestMixin
 from django.contrib.auth.decorators import login_required
-from csv import reader
+from django.contrib.auth.models import AnonymousUser, User
 from django.http import HttpRequest, HttpResponseRedirect, Http404, HttpResponse
-from app_auth.utils import get_profile_for_context
-from .utils import save_post_from_csv
+from app_auth.utils import aget_request_profile, get_profile_for_context
+from .utils import aget_post_authors, get_post_authors, is_utf8_text
 from django.utils.translation import gettext_lazy as _
-from django.db.models import F, Q, Prefetch, QuerySet
-from typing import Union, Dict, List, Optional
+from django.db.models import F, OuterRef, Q, QuerySet, Subquery
+from typing import Union, Dict, List, Optional, Tuple
 from django.views import View
 from django.forms.forms import Form
 from django.core.paginator import Paginator, Page
+from .pagination import KeysetPaginator, KeysetPage, InvalidCursor
+from app_cache.conditional import ConditionalPageMixin
+from app_cache.utils import AnonymousPageCacheMixin
+from app_jobs.models import Job
+from app_jobs.utils import enqueue, stage_file
+
+
+def enqueue_post_images(request: HttpRequest, post: Post) -> Optional[Job]:
+    """
+    Stages the images uploaded in the request and enqueues the job that creates
+    their Image instances for the post. Returns None if no images were uploaded.
+    """
+    images = request.FILES.getlist('images')
+    if not images:
+        return None
+    files = [[img.name, stage_file(img)] for img in images]
+    return enqueue('save_post_images', owner=request.user, post_id=post.pk, files=files)
 
 
 class UserBlogListView(ListView):
@@ -35,11 +53,16 @@ class UserBlogListView(ListView):
     def get_queryset(self) -> Optional[QuerySet]:
         """
         Takes the self.profile_pk to filter the Blog objects.
+        Instead of prefetching all the posts and their images, annotates every blog
+        with the name of a random image of its posts (cover_image) in the same query.
         """
         try:
             blogs = get_list_or_404(
-                Blog.objects.select_related('profile').
-                prefetch_related(Prefetch('posts', queryset=Post.objects.prefetch_related('images'))),
+                Blog.objects.select_related('profile').annotate(
+                    cover_image=Subquery(
+                        Image.objects.filter(post__blog=OuterRef('pk')).order_by('?').values('image')[:1]
+                    )
+                ),
                 profile__pk=self.profile_pk
             )
         except Http404 as exc:
@@ -96,12 +119,15 @@ class BlogCreateView(LoginRequiredMixin, CreateView):
         return reverse('app_blog:blog_detail', kwargs={'pk': self.object.pk})
 
 
-class BlogDetailView(DetailView):
+class BlogDetailView(AnonymousPageCacheMixin, ConditionalPageMixin, DetailView):
     """
     A view to display the details of a Blog instance.
+    The page rendered for the anonymous users is cached.
+    The conditional requests are answered with 304 while the blog and its posts haven't changed.
     """
+    cache_groups = ('blog:{pk}',)
     queryset = (
-        Blog.objects.select_related('profile').prefetch_related('posts')
+        Blog.objects.select_related('profile')
     )
     template_name = 'app_blog/blog_detail.html'
     context_object_name = 'blog'
@@ -277,17 +303,15 @@ class PostCreateView(UserPassesTestMixin, CreateView):
     def form_valid(self, form: PostForm) -> HttpResponseRedirect:
         """
         Adds Blog instance and Profile to the new Post instance's fields and saves it in the self.object attribute.
-        Also checks if any images were uploaded and if they were create their new instances,
-        passing the new post (self.object) to the post field.
+        Also checks if any images were uploaded and if they were, enqueues the job
+        that creates their instances and redirects to the status page of the job.
         """
         form.instance.blog = self.blog
         form.instance.profile = self.profile
         self.object = form.save()
-        if self.request.FILES:
-            images = self.request.FILES.getlist('images')
-            for img in images:
-                image_instance = Image(title=img.name, image=img, post=self.object)
-                image_instance.save()
+        job = enqueue_post_images(self.request, self.object)
+        if job:
+            return redirect(job)
         return super().form_valid(form)
 
     def get_context_data(self, **kwargs) -> Dict[str, Union[PostForm, PostFileForm, View, Profile]]:
@@ -317,99 +341,100 @@ class PostCreateView(UserPassesTestMixin, CreateView):
         """
         Overrides the default post method.
         If the PostForm is valid, returns self.form_valid(form), as usual.
-        If the PostFileForm is valid, creates a new Post instance from a cvs file.
-        During the creation also checks if the uploaded file is correct. Ig not, returns
-        the self.get_invalid_context() method.
+        If the PostFileForm is valid and the file is a text file, enqueues the import_posts job
+        and redirects to the status page of the job, which shows the report of the import.
+        If the file isn't a text file, returns the self.get_invalid_context() method.
         If none of the forms are valid, returns the self.form_invalid(form) method.
         """
         form = self.get_form()
         form_2 = self.form_class_1(request.POST, request.FILES)
-        profile = get_profile_for_context(self.request)
 
         if form.is_valid():
             return self.form_valid(form)
 
         elif form_2.is_valid():
-            try:
-                csv_file = form_2.cleaned_data['file'].read()
-                csv_file_str = csv_file.decode('utf-8').splitlines()
-            except Exception:
+            csv_file = form_2.cleaned_data['file']
+            if not is_utf8_text(csv_file):
                 return self.get_invalid_context()
-            try:
-                csv_reader = reader(csv_file_str, delimiter=',', quotechar='"')
-                result = save_post_from_csv(
-                    csv_reader=csv_reader,
-                    profile=profile,
-                    kwargs=self.kwargs
-                    )
-                if not result:
-                    return self.get_invalid_context()
-
-            except IndexError:
-                csv_reader = reader(csv_file_str, delimiter=';', quotechar='"')
-                result = save_post_from_csv(
-                    csv_reader=csv_reader,
-                    profile=profile,
-                    kwargs=self.kwargs
-                )
-                if not result:
-                    return self.get_invalid_context()
-            return redirect(self.get_success_url(new_object=result))
+            job = enqueue(
+                'import_posts',
+                owner=request.user,
+                blog_id=self.blog.pk,
+                profile_id=self.profile.pk,
+                path=stage_file(csv_file),
+            )
+            return redirect(job)
         else:
             self.object = None
             return self.form_invalid(form)
 
 
-class PostDetailView(UserPassesTestMixin, DetailView):
+class PostDetailView(AnonymousPageCacheMixin, ConditionalPageMixin, AccessMixin, DetailView):
     """
     A view class for  details of a Post instance.
+    The page rendered for the anonymous users is cached. As they can only see the published posts,
+    only the pages of the published posts get to the cache.
+    The conditional requests are answered with 304 while the post and its images haven't changed,
+    only for the users who may see it.
+    The view is async: the post and the profile are retrieved with the async ORM.
     """
+    cache_groups = ('post:{pk}',)
     queryset = (
         Post.objects.select_related('blog', 'profile').
-        prefetch_related('images').
+        prefetch_related('images', 'tags').
         annotate(blog_pk=F('blog__pk')).
         annotate(profile_pk=F('profile__pk')).
         annotate(profile_name=F('profile__user__username'))
     )
     template_name = 'app_blog/post_detail.html'
     context_object_name = 'post'
+    profile = None
 
-    def setup(self, request: HttpRequest, *args, **kwargs) -> None:
+    async def get(self, request: HttpRequest, *args, **kwargs) -> HttpResponse:
         """
-        Overrides the default setup method. Initiates a new attribute self.profile where saves
-        the Profile instance related to the request.user, providing he is authenticated.
-        Declares the self.object attribute.
+        Retrieves the Profile instance related to the request.user, providing he is authenticated,
+        and the requested post. Renders the post if the user passes the self.test_func(),
+        otherwise returns 403 for the authenticated users and redirects the anonymous ones to the login page.
         """
-        super().setup(request, *args, **kwargs)
-        if request.user.is_authenticated:
-            self.profile = get_profile_for_context(request)
-        self.object = self.get_object()
+        self.profile = await aget_request_profile(request)
+        try:
+            self.object = await self.get_queryset().aget(pk=self.kwargs.get(self.pk_url_kwarg))
+        except Post.DoesNotExist:
+            raise Http404(_('No %(verbose_name)s found matching the query') % {'verbose_name': Post._meta.verbose_name})
+        if not self.test_func():
+            return self.handle_no_permission()
+        context = self.get_context_data(object=self.object)
+        return self.render_to_response(context)
 
-    def get(self, request: HttpRequest, *args, **kwargs) -> HttpResponse:
+    @classmethod
+    def get_visible_filter(cls, user: Union[User, AnonymousUser]) -> Q:
         """
-        Overrides the default self.get() method, deleting from it
-        the declaration of the self.object attribute, as it was declared
-        before in self.setup().
+        Returns the filter of the posts the user may see, as test_func() checks them:
+        the published ones, the own ones and all of them for the superuser.
         """
-        context = self.get_context_data(object=self.object)
-        return self.render_to_response(context)
+        if user.is_superuser:
+            return Q()
+        if user.is_authenticated:
+            return Q(is_published=True) | Q(profile__user=user)
+        return Q(is_published=True)
 
     def test_func(self) -> bool:
         """
         Checks if the user is the owner of the requested post, if he is the superuser or if the post is published.
         Otherwise returns false.
         """
-        cur_profile = None
-        if self.request.user.is_authenticated:
-            cur_profile = self.profile
-        return self.object.is_published or cur_profile == self.object.profile or self.request.user.is_superuser
+        if self.object.is_published:
+            return True
+        if self.profile is not None and self.profile.pk == self.object.profile_id:
+            return True
+        return self.request.user.is_superuser
 
     def get_context_data(self, **kwargs) -> Dict[str, Union[Post, Profile, View]]:
         """
         Adds Profile instance saved in the request.user if he is authenticated.
         """
         context = super().get_context_data(**kwargs)
-        if self.request.user.is_authenticated:
+        if self.profile is not None:
             context['profile'] = self.profile
         return context
 
@@ -528,16 +553,16 @@ class PostEditView(LoginRequiredMixin, UserPassesTestMixin, UpdateView):
         Saves the posted form.
         Checks if the user marked checkbox inputs with the saved ids of the already uploaded images.
         If marked, deletes them.
-        Also checks if there were new images uploaded and if they were, creates new Image instances.
+        Also checks if there were new images uploaded and if they were, enqueues the job
+        that creates their instances and redirects to the status page of the job.
         """
         self.object = form.save()
         for current_image in self.images:
             if self.request.POST.get(str(current_image.pk)) == 'on':
                 current_image.delete()
-        if self.request.FILES:
-            images = self.request.FILES.getlist('images')
-            for img in images:
-                self.object.images.create(title=img.name, image=img)
+        job = enqueue_post_images(self.request, self.object)
+        if job:
+            return redirect(job)
         return super().form_valid(form)
 
 
@@ -559,31 +584,113 @@ def publish_or_archive(request: HttpRequest, pk: int) -> HttpResponseRedirect:
     return redirect(reverse('app_blog:post_detail', kwargs={'pk': pk}))
 
 
-class LatestPostsView(ListView):
+class LatestPostsView(AnonymousPageCacheMixin, ListView):
     """
     A view to display the latest published posts.
+    The pages rendered for the anonymous users are cached.
+    The view is async: the page of the posts and their authors are retrieved with the async ORM.
     """
+    cache_groups = ('timeline',)
     queryset = (
-        Post.objects.select_related('blog', 'profile').prefetch_related('images').
-        filter(is_published=True).order_by('-published_at')
+        Post.objects.filter(is_published=True).order_by('-published_at')
     )
     paginate_by = 5
     context_object_name = 'posts'
+    cursor_kwarg = 'cursor'
+    cursor_ordering = ('-published_at', '-id')
+    keyset_page = None
+    authors = None
 
     template_name = 'app_blog/latest_posts.html'
 
+    async def get(self, request: HttpRequest, *args, **kwargs) -> HttpResponse:
+        """
+        Retrieves the profile of the authenticated user, the page of the posts by the cursor and their authors.
+        The old links with the page parameter are paginated by the default Paginator in a thread.
+        """
+        await aget_request_profile(request)
+        self.object_list = self.get_queryset()
+        if self.page_kwarg in request.GET:
+            context = await sync_to_async(self.get_context_data)()
+        else:
+            paginator = KeysetPaginator(self.object_list, self.paginate_by, ordering=self.cursor_ordering)
+            try:
+                self.keyset_page = await paginator.apage(request.GET.get(self.cursor_kwarg))
+            except InvalidCursor:
+                raise Http404(_('Invalid cursor'))
+            self.authors = await aget_post_authors(self.keyset_page)
+            context = self.get_context_data()
+        return self.render_to_response(context)
+
+    def paginate_queryset(self, queryset: QuerySet, page_size: int) -> \
+            Tuple[Optional[Paginator], Union[Page, KeysetPage], List[Post], bool]:
+        """
+        Overrides the default paginate_queryset method.
+        The old links with the page parameter are still paginated by the default Paginator.
+        Otherwise, the posts are paginated by the KeysetPaginator, so the page is retrieved
+        by an indexed seek on (published_at, id) at any depth and without COUNT(*).
+        The page retrieved in self.get() is used, if there is one.
+        """
+        if self.page_kwarg in self.request.GET:
+            return super().paginate_queryset(queryset, page_size)
+        page = self.keyset_page
+        if page is None:
+            paginator = KeysetPaginator(queryset, page_size, ordering=self.cursor_ordering)
+            try:
+                page = paginator.page(self.request.GET.get(self.cursor_kwarg))
+            except InvalidCursor:
+                raise Http404(_('Invalid cursor'))
+        return None, page, page.object_list, page.has_other_pages()
+
     def get_context_data(self, *, object_list=None, **kwargs) -> \
-            Dict[str, Union[Paginator, Page, bool, QuerySet, View, Profile]]:
+            Dict[str, Union[Paginator, Page, KeysetPage, bool, QuerySet, View, Profile]]:
         """
         Adds to the context Profile instance related to the User instance saved
-        in the request.user and Profile instances related to the retrieved posts.
+        in the request.user and the authors of the posts of the current page.
+        The authors are retrieved with one query, unless self.get() has retrieved them,
+        and saved in the author attribute of every post.
         """
         context = super().get_context_data(object_list=None, **kwargs)
         if self.request.user.is_authenticated:
             context['profile'] = get_profile_for_context(self.request)
-        profiles = Profile.objects.select_related('user').\
-            prefetch_related('blogs', 'posts').filter(Q(posts__in=context['posts']))
-        context['profiles'] = profiles
+        authors = self.authors
+        if authors is None:
+            authors = get_post_authors(context['posts'])
+        for post in context['posts']:
+            post.author = authors.get(post.profile_id)
+        context['authors'] = authors
 
         return context
 
+
+class TagPostsView(LatestPostsView):
+    """
+    A view to display the latest published posts with the tag.
+    The posts are found through the index of the links to the tags and paginated by the cursor
+    like the latest posts. The pages rendered for the anonymous users are cached.
+    """
+
+    async def get(self, request: HttpRequest, *args, **kwargs) -> HttpResponse:
+        """
+        Retrieves the requested Tag instance, saves it in the self.tag attribute and renders the posts.
+        """
+        try:
+            self.tag = await Tag.objects.aget(slug=self.kwargs.get('slug'))
+        except Tag.DoesNotExist:
+            raise Http404(_('No %(verbose_name)s found matching the query') % {'verbose_name': Tag._meta.verbose_name})
+        return await super().get(request, *args, **kwargs)
+
+    def get_queryset(self) -> QuerySet:
+        """
+        Returns the published posts linked to the tag.
+        """
+        return super().get_queryset().filter(post_tags__tag=self.tag)
+
+    def get_context_data(self, *, object_list=None, **kwargs) -> \
+            Dict[str, Union[Paginator, Page, KeysetPage, bool, QuerySet, View, Profile, Tag]]:
+        """
+        Adds the Tag instance to the context.
+        """
+        context = super().get_context_data(object_list=object_list, **kwargs)
+        context['tag'] = self.tag
+        return context
@@ -0,0 +1,12 @@
+from django.apps import AppConfig
+
+
+class AppCacheConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'app_cache'
+
+    def ready(self) -> None:
+        """
+        Connects the receivers that invalidate the cached pages.
+        """
+        from . import signals  # noqa: F401
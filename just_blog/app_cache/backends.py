@@ -0,0 +1,43 @@
+"""
+The cache backends shared by the processes of the project.
+"""
+from django.core.cache.backends import filebased
+from django.core.files import locks
+import os
+import pickle
+import time
+import zlib
+from typing import Any, Optional
+
+
+class FileBasedCache(filebased.FileBasedCache):
+    """
+    The file-based cache with the atomic incr() and decr(), needed by the token buckets of the throttling.
+    They read and write the value holding an exclusive lock on a file of the cache directory,
+    so the concurrent requests of the processes of the host never lose the increments of each other.
+    """
+    lock_name = 'incr.lock'
+
+    def incr(self, key: str, delta: int = 1, version: Optional[int] = None) -> Any:
+        """
+        Adds delta to the value of the key under the lock and returns the new value.
+        Raises ValueError if the key doesn't exist. The key keeps its expiration time.
+        """
+        self._createdir()
+        with open(os.path.join(self._dir, self.lock_name), 'ab') as lock_file:
+            locks.lock(lock_file, locks.LOCK_EX)
+            try:
+                try:
+                    with open(self._key_to_file(key, version), 'rb') as file:
+                        expiry = pickle.load(file)
+                        value = pickle.loads(zlib.decompress(file.read()))
+                except FileNotFoundError:
+                    expiry, value = -1, None
+                timeout = None if expiry is None else expiry - time.time()
+                if value is None or (timeout is not None and timeout <= 0):
+                    raise ValueError(f"Key '{key}' not found")
+                value += delta
+                self.set(key, value, timeout, version)
+                return value
+            finally:
+                locks.unlock(lock_file)
@@ -0,0 +1,183 @@
+"""
+The validators of the conditional requests. The ETag and the Last-Modified of a page of an object
+are computed from the updated_at field of the object, so a conditional request is answered
+after one lookup by the primary key, without retrieving the object and rendering the page.
+The ETag also depends on the variant of the page: the language and the visitor for the HTML pages,
+the format for the api, so the different representations never share a validator.
+"""
+from asgiref.sync import iscoroutinefunction
+from django.contrib.auth.models import AnonymousUser, User
+from django.db.models import Model, Q
+from django.http import HttpRequest, HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from django.utils.translation import get_language
+from functools import wraps
+from hashlib import md5
+import datetime
+from typing import Callable, Optional, Tuple, Type, Union
+from app_auth.utils import aget_user
+
+# The ETag and the Last-Modified timestamp of a page.
+Validators = Tuple[str, int]
+
+CONDITIONAL_HEADERS = 'HTTP_IF_NONE_MATCH', 'HTTP_IF_MODIFIED_SINCE', 'HTTP_IF_MATCH', 'HTTP_IF_UNMODIFIED_SINCE'
+
+
+def build_validators(model: Type[Model], pk: Union[int, str], updated_at: datetime.datetime, *variant) -> Validators:
+    """
+    Builds the ETag and the Last-Modified timestamp of the page of the instance of the model
+    from the time of its last update and the variant of the page.
+    """
+    key = ':'.join(str(part) for part in (model._meta.label, pk, updated_at.isoformat(), *variant))
+    return f'"{md5(key.encode("utf-8")).hexdigest()}"', int(updated_at.timestamp())
+
+
+def get_validators(model: Type[Model], pk: Union[int, str], *variant, lock: bool = False,
+                   condition: Optional[Q] = None) -> Optional[Validators]:
+    """
+    Returns the validators of the page of the instance of the model, reading only its updated_at by the primary key.
+    With lock the row is locked until the end of the transaction, so it isn't changed between the check
+    of the preconditions and the update. Returns None if there is no such instance or it doesn't match the condition.
+    """
+    queryset = model.objects.select_for_update() if lock else model.objects.all()
+    updated_at = queryset.filter(condition or Q(), pk=pk).values_list('updated_at', flat=True).first()
+    if updated_at is None:
+        return None
+    return build_validators(model, pk, updated_at, *variant)
+
+
+async def aget_validators(model: Type[Model], pk: Union[int, str], *variant,
+                          condition: Optional[Q] = None) -> Optional[Validators]:
+    """
+    The async version of get_validators.
+    """
+    updated_at = await model.objects.filter(condition or Q(), pk=pk).values_list('updated_at', flat=True).afirst()
+    if updated_at is None:
+        return None
+    return build_validators(model, pk, updated_at, *variant)
+
+
+def is_conditional(request: HttpRequest) -> bool:
+    """
+    Checks if the request has any of the conditional headers.
+    """
+    return any(header in request.META for header in CONDITIONAL_HEADERS)
+
+
+def set_validators(response: HttpResponse, validators: Optional[Validators]) -> HttpResponse:
+    """
+    Adds the ETag and the Last-Modified headers to the response, unless it already has them.
+    """
+    if validators is not None:
+        etag, last_modified = validators
+        response.headers.setdefault('ETag', etag)
+        response.headers.setdefault('Last-Modified', http_date(last_modified))
+    return response
+
+
+def check_validators(request: HttpRequest, validators: Optional[Validators]) -> Optional[HttpResponse]:
+    """
+    Evaluates the conditional headers of the request against the validators.
+    Returns the response 304 (Not Modified) or 412 (Precondition Failed) with the validators
+    if the request should not be processed, otherwise None.
+    """
+    if validators is None:
+        return None
+    response = get_conditional_response(request, etag=validators[0], last_modified=validators[1])
+    return set_validators(response, validators) if response is not None else None
+
+
+def get_response_object(response: HttpResponse) -> Optional[Model]:
+    """
+    Returns the object of the template response of a detail view, if it has updated_at.
+    """
+    context = getattr(response, 'context_data', None) or {}
+    obj = context.get('object')
+    return obj if obj is not None and getattr(obj, 'updated_at', None) is not None else None
+
+
+def add_page_validators(response: HttpResponse, model: Type[Model], variant: Tuple) -> HttpResponse:
+    """
+    Adds the validators built from the object of the successful response to it.
+    """
+    obj = get_response_object(response) if response.status_code == 200 else None
+    if obj is not None:
+        set_validators(response, build_validators(model, obj.pk, obj.updated_at, *variant))
+    return response
+
+
+def conditional_page(model: Type[Model], lookup: str = 'pk',
+                     visible: Optional[Callable[[Union[User, AnonymousUser]], Q]] = None) -> Callable:
+    """
+    A decorator for the detail views of the instances of the model, whose pk is passed in the lookup url kwarg.
+    The conditional GET and HEAD requests are checked against the validators read from the database
+    before the view is called, and 304 is returned if the page of the visitor hasn't changed.
+    The validators are read only for the instances matching the filter returned by visible for the user,
+    so the other ones are left to the access checks of the view and never reveal their validators.
+    The successful responses get the validators from the object of their context, with no extra query.
+    The variant of the page is the language and the id of the user, as the page shows the visitor.
+    The async views are wrapped with an async wrapper using the async ORM.
+    """
+
+    def decorator(view_func: Callable) -> Callable:
+        if iscoroutinefunction(view_func):
+            @wraps(view_func)
+            async def async_wrapper(request: HttpRequest, *args, **kwargs) -> HttpResponse:
+                if request.method not in ('GET', 'HEAD'):
+                    return await view_func(request, *args, **kwargs)
+                user = await aget_user(request)
+                variant = get_language(), user.pk
+                if is_conditional(request):
+                    condition = visible(user) if visible is not None else None
+                    validators = await aget_validators(model, kwargs[lookup], *variant, condition=condition)
+                    response = check_validators(request, validators)
+                    if response is not None:
+                        return response
+                response = await view_func(request, *args, **kwargs)
+                return add_page_validators(response, model, variant)
+
+            return async_wrapper
+
+        @wraps(view_func)
+        def wrapper(request: HttpRequest, *args, **kwargs) -> HttpResponse:
+            if request.method not in ('GET', 'HEAD'):
+                return view_func(request, *args, **kwargs)
+            variant = get_language(), request.user.pk
+            if is_conditional(request):
+                condition = visible(request.user) if visible is not None else None
+                validators = get_validators(model, kwargs[lookup], *variant, condition=condition)
+                response = check_validators(request, validators)
+                if response is not None:
+                    return response
+            response = view_func(request, *args, **kwargs)
+            return add_page_validators(response, model, variant)
+
+        return wrapper
+
+    return decorator
+
+
+class ConditionalPageMixin:
+    """
+    A mixin for the class-based detail views that answers the conditional requests
+    with the conditional_page decorator. Should be placed after AnonymousPageCacheMixin,
+    so the cached pages are served with their stored validators before the database is touched.
+    The views of the objects that are not visible to everyone override get_visible_filter.
+    """
+
+    @classmethod
+    def get_visible_filter(cls, user: Union[User, AnonymousUser]) -> Q:
+        """
+        Returns the filter of the objects whose page the user may see. All of them by default.
+        """
+        return Q()
+
+    @classmethod
+    def as_view(cls, **initkwargs) -> Callable:
+        """
+        Wraps the view function with the conditional_page decorator for the model of the view.
+        """
+        view = super().as_view(**initkwargs)
+        model = cls.model or cls.queryset.model
+        return conditional_page(model, lookup=cls.pk_url_kwarg, visible=cls.get_visible_filter)(view)
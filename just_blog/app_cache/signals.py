@@ -0,0 +1,113 @@
+"""
+Receivers that invalidate the cached pages when the objects displayed on them change.
+The groups of pages are:
+    timeline - the main page and the latest posts page;
+    post:<pk> - the page of the post;
+    blog:<pk> - the page of the blog;
+    profile:<pk> - the public page of the profile.
+"""
+from django.contrib.auth.models import User
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+from app_auth.models import Profile
+from app_blog.models import Blog, Post, Image
+from app_blog.signals import post_published, post_archived, posts_imported
+from .utils import invalidate_groups
+
+
+@receiver(pre_save, sender=Post)
+def remember_publication(sender, instance: Post, raw: bool = False, **kwargs) -> None:
+    """
+    Before an unpublished post is saved, checks if it was published,
+    so archiving it with a simple save also invalidates the timeline.
+    """
+    instance._was_published = bool(
+        instance.pk and not instance.is_published and not raw and
+        Post.objects.filter(pk=instance.pk, is_published=True).exists()
+    )
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def invalidate_post_pages(sender, instance: Post, **kwargs) -> None:
+    """
+    Invalidates the pages of the post and its blog. The timeline is invalidated
+    only if the post is or was published.
+    """
+    groups = [f'post:{instance.pk}', f'blog:{instance.blog_id}']
+    if instance.is_published or getattr(instance, '_was_published', False):
+        groups.append('timeline')
+    invalidate_groups(*groups)
+
+
+@receiver(post_published, sender=Post)
+@receiver(post_archived, sender=Post)
+def invalidate_publication_pages(sender, instance: Post, **kwargs) -> None:
+    """
+    Invalidates the timeline and the pages of the post and its blog
+    when the post is published or archived.
+    """
+    invalidate_groups('timeline', f'post:{instance.pk}', f'blog:{instance.blog_id}')
+
+
+@receiver(posts_imported, sender=Post)
+def invalidate_imported_posts_pages(sender, blog: Blog, **kwargs) -> None:
+    """
+    Invalidates the page of the blog after the posts are imported into it.
+    The imported posts are not published, so the timeline stays the same.
+    """
+    invalidate_groups(f'blog:{blog.pk}')
+
+
+@receiver(post_save, sender=Blog)
+@receiver(post_delete, sender=Blog)
+def invalidate_blog_pages(sender, instance: Blog, **kwargs) -> None:
+    """
+    Invalidates the page of the blog.
+    """
+    invalidate_groups(f'blog:{instance.pk}')
+
+
+@receiver(post_save, sender=Image)
+@receiver(post_delete, sender=Image)
+def invalidate_image_pages(sender, instance: Image, **kwargs) -> None:
+    """
+    Invalidates the pages of the post of the image and of the blog of this post.
+    """
+    groups = [f'post:{instance.post_id}']
+    blog_pk = Post.objects.filter(pk=instance.post_id).values_list('blog_id', flat=True).first()
+    if blog_pk is not None:
+        groups.append(f'blog:{blog_pk}')
+    invalidate_groups(*groups)
+
+
+@receiver(post_save, sender=Profile)
+@receiver(post_delete, sender=Profile)
+def invalidate_profile_pages(sender, instance: Profile, **kwargs) -> None:
+    """
+    Invalidates the public page of the profile. The timeline displays the avatars and the names
+    of the authors, so it is invalidated too if the profile has published posts.
+    """
+    groups = [f'profile:{instance.pk}']
+    if Post.objects.filter(profile_id=instance.pk, is_published=True).exists():
+        groups.append('timeline')
+    invalidate_groups(*groups)
+
+
+@receiver(post_save, sender=User)
+def invalidate_user_pages(sender, instance: User, created: bool, update_fields=None, raw: bool = False,
+                          **kwargs) -> None:
+    """
+    Invalidates the pages showing the name of the changed user: the public page of the profile,
+    the pages of the posts and the timeline if some of them are published.
+    The updates of the time of the last login are skipped.
+    """
+    if created or raw or (update_fields is not None and set(update_fields) <= {'last_login'}):
+        return
+    groups = [f'profile:{pk}' for pk in Profile.objects.filter(user=instance).values_list('pk', flat=True)]
+    posts = Post.objects.filter(profile__user=instance).values_list('pk', 'is_published')
+    for pk, is_published in posts:
+        groups.append(f'post:{pk}')
+        if is_published and 'timeline' not in groups:
+            groups.append('timeline')
+    invalidate_groups(*groups)
@@ -0,0 +1,126 @@
+from django.test import TestCase
+from django.shortcuts import reverse
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from app_auth.models import Profile
+from app_blog.models import Blog, Post, Image
+from random import choice
+
+
+class AnonymousPageCacheTestCase(TestCase):
+    fixtures = [
+        'app_auth/fixtures/users.json',
+        'app_auth/fixtures/profiles.json',
+        'app_blog/fixtures/blogs.json',
+        'app_blog/fixtures/posts.json',
+        'app_blog/fixtures/images.json',
+    ]
+
+    def setUp(self) -> None:
+        cache.clear()
+        self.random_post = choice(Post.objects.select_related('blog', 'profile').filter(is_published=True))
+        self.urls = [
+            reverse('app_main:index'),
+            reverse('app_blog:posts_latest'),
+            reverse('app_blog:post_detail', kwargs={'pk': self.random_post.pk}),
+            reverse('app_blog:blog_detail', kwargs={'pk': self.random_post.blog.pk}),
+            reverse('app_auth:profile_public', kwargs={'pk': self.random_post.profile.pk}),
+        ]
+
+    def test_cached_pages_without_queries(self):
+        for url in self.urls:
+            first_response = self.client.get(url)
+            self.assertEqual(first_response.status_code, 200)
+            with self.assertNumQueries(0):
+                second_response = self.client.get(url)
+            self.assertEqual(second_response.status_code, 200)
+
+    def test_cached_pages_per_language(self):
+        url = reverse('app_blog:posts_latest')
+        self.client.get(url, HTTP_ACCEPT_LANGUAGE='en')
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url, HTTP_ACCEPT_LANGUAGE='ru')
+        self.assertGreater(len(queries), 0)
+        with self.assertNumQueries(0):
+            self.client.get(url, HTTP_ACCEPT_LANGUAGE='ru')
+
+    def test_cached_pages_csrf_token(self):
+        url = reverse('app_blog:posts_latest')
+        self.client.get(url)
+        response = self.client.get(url)
+        self.assertNotContains(response, '__csrf_token_placeholder__')
+        self.assertIn('csrftoken', response.cookies)
+
+    def test_authenticated_not_cached(self):
+        url = reverse('app_blog:post_detail', kwargs={'pk': self.random_post.pk})
+        self.client.get(url)
+        self.client.force_login(user=self.random_post.profile.user)
+        response = self.client.get(url)
+        self.assertEqual(response.context.get('profile'), self.random_post.profile)
+        self.client.logout()
+
+    def test_post_save_invalidation(self):
+        url = reverse('app_blog:post_detail', kwargs={'pk': self.random_post.pk})
+        self.client.get(url)
+        self.random_post.title = 'a new cached title'
+        self.random_post.save()
+        self.assertContains(self.client.get(url), 'a new cached title')
+
+    def test_archive_invalidation(self):
+        latest_url = reverse('app_blog:posts_latest')
+        post_url = reverse('app_blog:post_detail', kwargs={'pk': self.random_post.pk})
+        self.client.get(latest_url)
+        self.client.get(post_url)
+        self.random_post.archive()
+        self.assertNotContains(self.client.get(latest_url), post_url)
+        self.assertNotEqual(self.client.get(post_url).status_code, 200)
+
+    def test_publish_invalidation(self):
+        draft = Post.objects.create(
+            title='a new draft', tag='tag', content='content',
+            blog=self.random_post.blog, profile=self.random_post.profile
+        )
+        url = reverse('app_main:index')
+        self.assertNotContains(self.client.get(url), 'A New Draft')
+        draft.publish()
+        self.assertContains(self.client.get(url), 'A New Draft')
+
+    def test_blog_and_image_invalidation(self):
+        url = reverse('app_blog:blog_detail', kwargs={'pk': self.random_post.blog.pk})
+        self.client.get(url)
+        Blog.objects.filter(pk=self.random_post.blog.pk).first().delete()
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+        image = Image.objects.select_related('post').filter(post__is_published=True).first()
+        post_url = reverse('app_blog:post_detail', kwargs={'pk': image.post.pk})
+        self.assertContains(self.client.get(post_url), image.image.url)
+        image.delete()
+        self.assertNotContains(self.client.get(post_url), image.image.url)
+
+    def test_profile_invalidation(self):
+        url = reverse('app_auth:profile_public', kwargs={'pk': self.random_post.profile.pk})
+        self.client.get(url)
+        profile = Profile.objects.get(pk=self.random_post.profile.pk)
+        profile.bio = 'a new cached bio'
+        profile.save()
+        self.assertContains(self.client.get(url), 'a new cached bio')
+
+    def test_user_invalidation(self):
+        url = reverse('app_blog:post_detail', kwargs={'pk': self.random_post.pk})
+        etag = self.client.get(url).headers['ETag']
+        user = self.random_post.profile.user
+        user.username = 'renamed-author'
+        user.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'renamed-author')
+
+    def test_cached_pages_conditional(self):
+        for url in self.urls[2:]:
+            etag = self.client.get(url).headers['ETag']
+            with self.assertNumQueries(0):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 304)
+            self.assertEqual(response.headers['ETag'], etag)
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH='"other"').status_code, 200)
@@ -0,0 +1,218 @@
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpRequest, HttpResponse
+from django.middleware.csrf import get_token
+from django.utils.cache import get_conditional_response
+from django.utils.http import parse_http_date_safe
+from django.utils.translation import get_language
+from functools import wraps
+from hashlib import md5
+import re
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Union
+from app_auth.utils import aget_user
+
+PAGE_CACHE_PREFIX = 'pages'
+CSRF_PLACEHOLDER = '__csrf_token_placeholder__'
+CSRF_INPUT_PATTERN = re.compile(r'(name="csrfmiddlewaretoken" value=")[^"]*(")')
+
+
+def get_version_key(group: str) -> str:
+    """
+    Returns the cache key that stores the version of the passed group of pages.
+    """
+    return f'{PAGE_CACHE_PREFIX}:version:{group}'
+
+
+def get_group_versions(groups: Iterable[str]) -> List[str]:
+    """
+    Returns the current versions of the passed groups of pages, reading all of them with one cache call.
+    The missing versions are initialized with the current time, so a version evicted from the cache
+    never matches the pages stored before the eviction.
+    """
+    keys = [get_version_key(group) for group in groups]
+    versions: Dict[str, Union[int, str]] = cache.get_many(keys)
+    missing = {key: time.time_ns() for key in keys if key not in versions}
+    if missing:
+        cache.set_many(missing, timeout=None)
+        versions.update(missing)
+    return [str(versions[key]) for key in keys]
+
+
+async def aget_group_versions(groups: Iterable[str]) -> List[str]:
+    """
+    The async version of get_group_versions.
+    """
+    keys = [get_version_key(group) for group in groups]
+    versions: Dict[str, Union[int, str]] = await cache.aget_many(keys)
+    missing = {key: time.time_ns() for key in keys if key not in versions}
+    if missing:
+        await cache.aset_many(missing, timeout=None)
+        versions.update(missing)
+    return [str(versions[key]) for key in keys]
+
+
+def invalidate_groups(*groups: str) -> None:
+    """
+    Makes every page cached for the passed groups stale by changing the versions of the groups.
+    """
+    if groups:
+        version = time.time_ns()
+        cache.set_many({get_version_key(group): version for group in groups}, timeout=None)
+
+
+def get_page_cache_key(request: HttpRequest, groups: Iterable[str]) -> str:
+    """
+    Generates a key for the page from its absolute url, the active language
+    and the versions of the groups the page depends on.
+    """
+    return build_page_cache_key(request, get_group_versions(groups))
+
+
+async def aget_page_cache_key(request: HttpRequest, groups: Iterable[str]) -> str:
+    """
+    The async version of get_page_cache_key.
+    """
+    return build_page_cache_key(request, await aget_group_versions(groups))
+
+
+def build_page_cache_key(request: HttpRequest, versions: List[str]) -> str:
+    """
+    Builds the key of the page from its absolute url, the active language and the versions of its groups.
+    """
+    url = md5(f'{request.build_absolute_uri()}#{":".join(versions)}'.encode('utf-8')).hexdigest()
+    return f'{PAGE_CACHE_PREFIX}:page:{get_language()}:{url}'
+
+
+def get_cached_page(response: HttpResponse) -> Dict[str, str]:
+    """
+    Returns the content of the rendered response with its validators to save to the cache.
+    The CSRF tokens are replaced with a placeholder, so they are never shared between the visitors.
+    """
+    content = response.content.decode(response.charset)
+    content = CSRF_INPUT_PATTERN.sub(rf'\g<1>{CSRF_PLACEHOLDER}\g<2>', content)
+    return {
+        'content': content,
+        'content_type': response['Content-Type'],
+        'etag': response.get('ETag'),
+        'last_modified': response.get('Last-Modified'),
+    }
+
+
+def store_page(key: str, response: HttpResponse, timeout: Optional[int] = None) -> None:
+    """
+    Saves the content of the rendered response to the cache.
+    """
+    cache.set(key, get_cached_page(response), settings.PAGE_CACHE_TIMEOUT if timeout is None else timeout)
+
+
+async def astore_page(key: str, response: HttpResponse, timeout: Optional[int] = None) -> None:
+    """
+    The async version of store_page.
+    """
+    await cache.aset(key, get_cached_page(response), settings.PAGE_CACHE_TIMEOUT if timeout is None else timeout)
+
+
+def build_cached_response(request: HttpRequest, cached_page: Dict[str, str]) -> HttpResponse:
+    """
+    Builds the response from the cached page, inserting a CSRF token of the current visitor.
+    If the page was stored with the validators, the conditional requests are answered with 304.
+    """
+    etag, last_modified = cached_page.get('etag'), cached_page.get('last_modified')
+    if etag or last_modified:
+        response = get_conditional_response(
+            request, etag=etag, last_modified=parse_http_date_safe(last_modified) if last_modified else None
+        )
+        if response is not None:
+            return add_cached_validators(response, cached_page)
+    content = cached_page['content']
+    if CSRF_PLACEHOLDER in content:
+        content = content.replace(CSRF_PLACEHOLDER, get_token(request))
+    return add_cached_validators(HttpResponse(content, content_type=cached_page['content_type']), cached_page)
+
+
+def add_cached_validators(response: HttpResponse, cached_page: Dict[str, str]) -> HttpResponse:
+    """
+    Adds the ETag and the Last-Modified headers stored with the cached page to the response.
+    """
+    if cached_page.get('etag'):
+        response.headers['ETag'] = cached_page['etag']
+    if cached_page.get('last_modified'):
+        response.headers['Last-Modified'] = cached_page['last_modified']
+    return response
+
+
+def cache_anonymous_page(*groups: str, timeout: Optional[int] = None) -> Callable:
+    """
+    A decorator for the views that caches the pages rendered for the anonymous users.
+    The groups are format strings filled with the url kwargs of the view, for example 'post:{pk}'.
+    The cached page is served before the view is set up, so a cache hit doesn't touch the database.
+    Only successful GET and HEAD responses that don't set any cookies are cached.
+    The async views are wrapped with an async wrapper using the async cache API.
+    """
+
+    def decorator(view_func: Callable) -> Callable:
+        if iscoroutinefunction(view_func):
+            @wraps(view_func)
+            async def async_wrapper(request: HttpRequest, *args, **kwargs) -> HttpResponse:
+                if request.method not in ('GET', 'HEAD') or (await aget_user(request)).is_authenticated:
+                    return await view_func(request, *args, **kwargs)
+
+                key = await aget_page_cache_key(request, [group.format(**kwargs) for group in groups])
+                cached_page = await cache.aget(key)
+                if cached_page is not None:
+                    return build_cached_response(request, cached_page)
+
+                response = await view_func(request, *args, **kwargs)
+                if response.status_code != 200 or response.streaming or response.cookies:
+                    return response
+                if callable(getattr(response, 'render', None)) and not response.is_rendered:
+                    # The template responses are rendered by the handler in a thread, so the callback is sync.
+                    response.add_post_render_callback(lambda rendered: store_page(key, rendered, timeout))
+                else:
+                    await astore_page(key, response, timeout)
+                return response
+
+            return async_wrapper
+
+        @wraps(view_func)
+        def wrapper(request: HttpRequest, *args, **kwargs) -> HttpResponse:
+            if request.method not in ('GET', 'HEAD') or request.user.is_authenticated:
+                return view_func(request, *args, **kwargs)
+
+            key = get_page_cache_key(request, [group.format(**kwargs) for group in groups])
+            cached_page = cache.get(key)
+            if cached_page is not None:
+                return build_cached_response(request, cached_page)
+
+            response = view_func(request, *args, **kwargs)
+            if response.status_code != 200 or response.streaming or response.cookies:
+                return response
+            if callable(getattr(response, 'render', None)) and not response.is_rendered:
+                response.add_post_render_callback(lambda rendered: store_page(key, rendered, timeout))
+            else:
+                store_page(key, response, timeout)
+            return response
+
+        return wrapper
+
+    return decorator
+
+
+class AnonymousPageCacheMixin:
+    """
+    A mixin for the class-based views that caches the pages rendered for the anonymous users
+    with the cache_anonymous_page decorator.
+    The groups of the page are declared in the cache_groups attribute.
+    """
+    cache_groups = ()
+    cache_timeout = None
+
+    @classmethod
+    def as_view(cls, **initkwargs) -> Callable:
+        """
+        Wraps the view function with the cache_anonymous_page decorator.
+        """
+        view = super().as_view(**initkwargs)
+        return cache_anonymous_page(*cls.cache_groups, timeout=cls.cache_timeout)(view)
@@ -0,0 +1,12 @@
+from django.contrib import admin
+from .models import Job
+
+"""
+Register the model Job in the admin panel.
+"""
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = 'pk', 'name', 'status', 'attempts', 'owner', 'created_at',
+    list_filter = 'status', 'name',
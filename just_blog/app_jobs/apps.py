@@ -0,0 +1,13 @@
+from django.apps import AppConfig
+from django.utils.module_loading import autodiscover_modules
+
+
+class AppJobsConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'app_jobs'
+
+    def ready(self) -> None:
+        """
+        Imports the tasks modules of the installed apps, so their tasks are registered.
+        """
+        autodiscover_modules('tasks')
@@ -0,0 +1,64 @@
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from app_jobs.utils import get_worker_name, run_pending_jobs
+import multiprocessing
+import time
+
+
+def work(once: bool, sleep: float) -> None:
+    """
+    Runs the pending jobs in the current process. If once is False, waits for the new jobs
+    for sleep seconds after the queue becomes empty, until the process is interrupted.
+    """
+    worker = get_worker_name()
+    try:
+        while True:
+            count = run_pending_jobs(worker)
+            if once:
+                return
+            if not count:
+                time.sleep(sleep)
+    except KeyboardInterrupt:
+        return
+    finally:
+        connections.close_all()
+
+
+class Command(BaseCommand):
+    """
+    Starts the workers that run the background jobs.
+    Every worker is a separate process with its own database connection, so the workers
+    can be started on several cores and on several nodes sharing the same database.
+    """
+    help = 'Starts the workers that run the background jobs.'
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument('--processes', type=int, default=1, help='The number of the worker processes.')
+        parser.add_argument('--sleep', type=float, default=1.0, help='Seconds to wait when there are no jobs.')
+        parser.add_argument('--once', action='store_true', help='Run the pending jobs and exit.')
+
+    def handle(self, *args, **options) -> None:
+        if isinstance(caches['default'], LocMemCache):
+            # The jobs invalidate the cached pages, which the web processes would never see.
+            raise CommandError('The workers need a cache shared with the web processes, not the local memory one.')
+        if options['processes'] <= 1:
+            work(options['once'], options['sleep'])
+            return
+
+        # The connections can't be shared with the child processes.
+        connections.close_all()
+        processes = [
+            multiprocessing.Process(target=work, args=(options['once'], options['sleep']))
+            for _ in range(options['processes'])
+        ]
+        for process in processes:
+            process.start()
+        try:
+            for process in processes:
+                process.join()
+        except KeyboardInterrupt:
+            for process in processes:
+                process.join()
+        self.stdout.write(self.style.SUCCESS(f'{len(processes)} workers have stopped'))
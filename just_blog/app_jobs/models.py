@@ -0,0 +1,63 @@
+from django.contrib.auth.models import User
+from django.db import models
+from django.shortcuts import reverse
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+
+
+class Job(models.Model):
+    """
+    A model describing a background job: the name of the registered task and the keyword arguments
+    to call it with. The jobs are claimed and run by the workers started with the run_jobs command.
+    """
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = (
+        (PENDING, _('pending')),
+        (RUNNING, _('running')),
+        (DONE, _('done')),
+        (FAILED, _('failed')),
+    )
+
+    name = models.CharField(max_length=100, verbose_name=_('name'))
+    payload = models.JSONField(default=dict, blank=True, verbose_name=_('payload'))
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING, verbose_name=_('status'))
+    attempts = models.PositiveSmallIntegerField(default=0, verbose_name=_('attempts'))
+    max_attempts = models.PositiveSmallIntegerField(default=3, verbose_name=_('max attempts'))
+    result = models.JSONField(null=True, blank=True, verbose_name=_('result'))
+    error = models.TextField(blank=True, verbose_name=_('error'))
+    owner = models.ForeignKey(
+        User, on_delete=models.CASCADE, null=True, blank=True, related_name='jobs', verbose_name=_('owner')
+    )
+    run_after = models.DateTimeField(default=timezone.now, verbose_name=_('run after'))
+    locked_by = models.CharField(max_length=100, blank=True, verbose_name=_('locked by'))
+    locked_at = models.DateTimeField(null=True, blank=True, verbose_name=_('locked at'))
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name=_('created at'))
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name=_('finished at'))
+
+    class Meta:
+        verbose_name_plural = _('jobs')
+        verbose_name = _('job')
+        indexes = [
+            models.Index(fields=['status', 'run_after'], name='job_status_run_after_idx'),
+        ]
+
+    def __str__(self) -> str:
+        """
+        Returns the name and the id of the job.
+        """
+        return f'{self.name}#{self.pk}'
+
+    def is_finished(self) -> bool:
+        """
+        Checks if the job is done or failed, so its status won't change anymore.
+        """
+        return self.status in (self.DONE, self.FAILED)
+
+    def get_absolute_url(self) -> str:
+        """
+        Generates absolute url for the status page of the job.
+        """
+        return reverse('app_jobs:job_detail', kwargs={'pk': self.pk})
@@ -0,0 +1,26 @@
+"""
+The test helpers of the views staging the uploaded files for the jobs.
+"""
+from django.test import override_settings
+import shutil
+import tempfile
+
+
+class TemporaryMediaTestMixin:
+    """
+    A mixin for the test cases saving files to the storage: MEDIA_ROOT is a temporary directory
+    for the whole test case, deleted after it, so the staged files of the jobs that are never run
+    and the saved images don't stay in the media of the project.
+    """
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        """
+        Overrides MEDIA_ROOT before the test data of the test case is created.
+        """
+        media_root = tempfile.mkdtemp()
+        cls.addClassCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        media_settings = override_settings(MEDIA_ROOT=media_root)
+        media_settings.enable()
+        cls.addClassCleanup(media_settings.disable)
+        super().setUpClass()
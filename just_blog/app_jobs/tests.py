@@ -0,0 +1,132 @@
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command, CommandError
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from app_jobs.models import Job
+from app_jobs.testing import TemporaryMediaTestMixin
+from app_jobs.utils import task, enqueue, claim_job, run_job, run_pending_jobs, stage_file, PermanentJobError
+from datetime import timedelta
+import os
+
+CALLS = []
+
+
+@task('test_echo')
+def echo(value: int) -> dict:
+    CALLS.append(value)
+    return {'value': value}
+
+
+@task('test_flaky')
+def flaky() -> None:
+    raise ValueError('flaky')
+
+
+@task('test_permanent')
+def permanent() -> None:
+    raise PermanentJobError('permanent')
+
+
+class JobQueueTestCase(TemporaryMediaTestMixin, TestCase):
+
+    def setUp(self) -> None:
+        CALLS.clear()
+        Job.objects.all().delete()
+
+    def test_run_job(self):
+        job = enqueue('test_echo', value=7)
+        self.assertEqual(job.status, Job.PENDING)
+        self.assertEqual(run_pending_jobs(), 1)
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.DONE)
+        self.assertEqual(job.result, {'value': 7})
+        self.assertEqual(job.attempts, 1)
+        self.assertIsNotNone(job.finished_at)
+        self.assertEqual(CALLS, [7])
+
+    def test_enqueue_unknown_task(self):
+        with self.assertRaises(KeyError):
+            enqueue('test_unknown')
+
+    @override_settings(JOB_RETRY_DELAY=10)
+    def test_retry_and_fail(self):
+        job = enqueue('test_flaky', max_attempts=2)
+        with self.assertLogs('app_jobs.utils', level='ERROR'):
+            run_pending_jobs()
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.PENDING)
+        self.assertIn('ValueError', job.error)
+        self.assertGreater(job.run_after, timezone.now())
+        self.assertEqual(run_pending_jobs(), 0)
+
+        Job.objects.filter(pk=job.pk).update(run_after=timezone.now())
+        with self.assertLogs('app_jobs.utils', level='ERROR'):
+            run_pending_jobs()
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.FAILED)
+        self.assertEqual(job.attempts, 2)
+
+    def test_permanent_error(self):
+        job = enqueue('test_permanent')
+        with self.assertLogs('app_jobs.utils', level='ERROR'):
+            run_pending_jobs()
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.FAILED)
+        self.assertEqual(job.attempts, 1)
+
+    def test_claim_once(self):
+        job = enqueue('test_echo', value=1)
+        claimed = claim_job('worker-1')
+        self.assertEqual(claimed.pk, job.pk)
+        self.assertEqual(claimed.locked_by, 'worker-1')
+        self.assertIsNone(claim_job('worker-2'))
+
+    @override_settings(JOB_LOCK_TIMEOUT=60)
+    def test_reclaim_abandoned_job(self):
+        job = enqueue('test_echo', value=2)
+        claim_job('worker-1')
+        Job.objects.filter(pk=job.pk).update(locked_at=timezone.now() - timedelta(minutes=5))
+
+        reclaimed = claim_job('worker-2')
+        self.assertEqual(reclaimed.pk, job.pk)
+        self.assertEqual(reclaimed.attempts, 2)
+        run_job(reclaimed)
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.DONE)
+        self.assertEqual(job.locked_by, '')
+
+    @override_settings(JOB_LOCK_TIMEOUT=60)
+    def test_abandoned_job_fails_after_max_attempts(self):
+        job = enqueue('test_echo', max_attempts=2, value=3)
+        for worker in ('worker-1', 'worker-2'):
+            self.assertEqual(claim_job(worker).pk, job.pk)
+            Job.objects.filter(pk=job.pk).update(locked_at=timezone.now() - timedelta(minutes=5))
+
+        self.assertIsNone(claim_job('worker-3'))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts, job.locked_by), (Job.FAILED, 2, ''))
+        self.assertTrue(job.error)
+        self.assertIsNotNone(job.finished_at)
+
+    def test_run_jobs_command(self):
+        for value in range(3):
+            enqueue('test_echo', value=value)
+        call_command('run_jobs', '--once')
+        self.assertEqual(sorted(CALLS), [0, 1, 2])
+        self.assertFalse(Job.objects.exclude(status=Job.DONE).exists())
+
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def test_run_jobs_local_cache(self):
+        enqueue('test_echo', value=1)
+        with self.assertRaises(CommandError):
+            call_command('run_jobs', '--once')
+        self.assertEqual(CALLS, [])
+
+    def test_stage_file(self):
+        path = stage_file(SimpleUploadedFile('posts.csv', b'title;tag;content\n'))
+        directory, name = os.path.split(path)
+        self.assertEqual(directory, 'jobs')
+        self.assertTrue(name.endswith('-posts.csv'))
+        default_storage.delete(path)
+        self.assertEqual(default_storage.listdir('jobs'), ([], []))
@@ -0,0 +1,9 @@
+from django.urls import path
+from .views import JobDetailView
+
+
+app_name = 'app_jobs'
+
+urlpatterns = [
+    path('job/<int:pk>/', JobDetailView.as_view(), name='job_detail'),
+]
@@ -0,0 +1,156 @@
+"""
+The database-backed job queue. The tasks are registered with the task decorator in the tasks modules
+of the installed apps and enqueued with enqueue(). The workers started with the run_jobs command
+claim the jobs with a conditional UPDATE, so several workers on different cores or nodes
+sharing the same database never run the same job twice.
+"""
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import UploadedFile
+from django.db.models import F, Q
+from django.utils import timezone
+from .models import Job
+from datetime import timedelta
+import logging
+import os
+import socket
+import traceback
+import uuid
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+TASKS: Dict[str, Callable[..., Any]] = {}
+
+
+class PermanentJobError(Exception):
+    """
+    Raised by a task when retrying it makes no sense, e.g. the object it works with was deleted.
+    The job fails at once.
+    """
+
+
+def task(name: str) -> Callable[[Callable[..., Any]], Callable[..., Any]]:
+    """
+    Registers the decorated function as a task with the passed name.
+    The function is called with the payload of the job as keyword arguments
+    and should return a JSON-serializable result.
+    """
+    def decorator(func: Callable[..., Any]) -> Callable[..., Any]:
+        TASKS[name] = func
+        return func
+    return decorator
+
+
+def enqueue(name: str, owner: Optional[User] = None, max_attempts: Optional[int] = None, **payload) -> Job:
+    """
+    Creates a new pending job of the registered task. The payload should be JSON-serializable.
+    """
+    if name not in TASKS:
+        raise KeyError(f'The task {name} is not registered')
+    return Job.objects.create(
+        name=name,
+        payload=payload,
+        owner=owner,
+        max_attempts=max_attempts or settings.JOB_MAX_ATTEMPTS,
+    )
+
+
+def stage_file(file: UploadedFile) -> str:
+    """
+    Saves the uploaded file to the storage, so a worker can read it after the request is finished.
+    The file is saved directly to JOB_FILES_DIR under a unique name, so nothing is left when the task deletes it.
+    Returns the name of the saved file to pass it in the payload of a job.
+    """
+    name = f'{uuid.uuid4().hex}-{os.path.basename(file.name)}'
+    return default_storage.save(os.path.join(settings.JOB_FILES_DIR, name), file)
+
+
+def get_worker_name() -> str:
+    """
+    Returns the name of the current worker process: the host name and the process id.
+    """
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def claim_job(worker: str) -> Optional[Job]:
+    """
+    Claims the next pending job, or a running job whose worker hasn't finished it in JOB_LOCK_TIMEOUT seconds.
+    The job is claimed with an UPDATE conditioned on its current status and lock,
+    so only one of the competing workers gets it. Returns None if there is nothing to run.
+    An abandoned job that has used all its attempts (e.g. its task kills the worker every time) fails instead.
+    """
+    now = timezone.now()
+    stale = Q(status=Job.RUNNING, locked_at__lt=now - timedelta(seconds=settings.JOB_LOCK_TIMEOUT))
+    Job.objects.filter(stale, attempts__gte=F('max_attempts')).update(
+        status=Job.FAILED, error='The worker running the job has stopped responding', locked_by='', finished_at=now
+    )
+    candidates = Job.objects.filter(
+        Q(status=Job.PENDING, run_after__lte=now) | (stale & Q(attempts__lt=F('max_attempts')))
+    ).order_by('run_after', 'pk').values_list('pk', 'status', 'locked_at')[:settings.JOB_CLAIM_CANDIDATES]
+
+    for pk, status, locked_at in candidates:
+        claimed = Job.objects.filter(pk=pk, status=status, locked_at=locked_at).update(
+            status=Job.RUNNING, locked_by=worker, locked_at=now, attempts=F('attempts') + 1
+        )
+        if claimed:
+            return Job.objects.get(pk=pk)
+    return None
+
+
+def run_job(job: Job) -> Job:
+    """
+    Runs the task of the claimed job and saves the result.
+    If the task raises an exception, the job is retried with an exponential delay
+    until it reaches max_attempts, then it fails.
+    The job is updated only while it is still locked by the same worker.
+    """
+    now = timezone.now()
+    try:
+        func = TASKS.get(job.name)
+        if func is None:
+            raise PermanentJobError(f'The task {job.name} is not registered')
+        result = func(**job.payload)
+    except Exception as exc:
+        logger.exception('The job %s has failed', job)
+        job.error = traceback.format_exc()
+        if isinstance(exc, PermanentJobError) or job.attempts >= job.max_attempts:
+            job.status = Job.FAILED
+            job.finished_at = now
+        else:
+            job.status = Job.PENDING
+            job.run_after = now + timedelta(seconds=settings.JOB_RETRY_DELAY * 2 ** (job.attempts - 1))
+        job.result = None
+    else:
+        job.status = Job.DONE
+        job.result = result
+        job.error = ''
+        job.finished_at = timezone.now()
+
+    Job.objects.filter(pk=job.pk, locked_by=job.locked_by).update(
+        status=job.status,
+        result=job.result,
+        error=job.error,
+        run_after=job.run_after,
+        finished_at=job.finished_at,
+        locked_by='',
+        locked_at=None,
+    )
+    return job
+
+
+def run_pending_jobs(worker: Optional[str] = None, limit: Optional[int] = None) -> int:
+    """
+    Claims and runs the jobs one by one until there is nothing to run or the limit is reached.
+    Returns the number of the jobs that were run.
+    """
+    worker = worker or get_worker_name()
+    count = 0
+    while limit is None or count < limit:
+        job = claim_job(worker)
+        if job is None:
+            break
+        run_job(job)
+        count += 1
+    return count
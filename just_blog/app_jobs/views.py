@@ -0,0 +1,30 @@
+from django.contrib.auth.mixins import LoginRequiredMixin
+from django.db.models import QuerySet
+from django.views.generic import DetailView
+from app_auth.models import Profile
+from app_auth.utils import get_profile_for_context
+from .models import Job
+from typing import Dict, Union
+
+
+class JobDetailView(LoginRequiredMixin, DetailView):
+    """
+    A view for the status of a background job. Only the owner of the job can see it.
+    While the job is not finished, the page reloads itself to poll the status.
+    """
+    template_name = 'app_jobs/job_detail.html'
+    context_object_name = 'job'
+
+    def get_queryset(self) -> QuerySet:
+        """
+        Retrieves only the jobs of the current user.
+        """
+        return Job.objects.filter(owner=self.request.user)
+
+    def get_context_data(self, **kwargs) -> Dict[str, Union[Job, Profile]]:
+        """
+        Adds the Profile instance of the current user to the context.
+        """
+        context = super().get_context_data(**kwargs)
+        context['profile'] = get_profile_for_context(self.request)
+        return context
@@ -1,4 +1,5 @@
 from django.test import TestCase
+from django.core.cache import cache
 from django.shortcuts import reverse
 from app_blog.models import Post
 from random import choice
@@ -25,6 +26,16 @@ class IndexViewTestCase(TestCase):
         for response_title, db_title in zip(response.context.get('latest_posts').values_list('title', flat=True), self.latest_posts):
             self.assertEqual(response_title, db_title)
 
+    async def test_index_view_async(self):
+        await cache.aclear()
+        self.addCleanup(cache.clear)
+        response = await self.async_client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [post.title for post in response.context.get('latest_posts')],
+            [title async for title in self.latest_posts]
+        )
+
 
 class AboutViewTestCase(TestCase):
     fixtures = [
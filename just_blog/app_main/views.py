@@ -1,30 +1,32 @@
 from django.views.generic import TemplateView
 from app_auth.models import Profile
 from app_rss.feeds import LatestPostsFeed
-from app_auth.utils import get_profile_for_context
+from app_auth.utils import aget_request_profile, get_profile_for_context
 from typing import Dict, Union
-from django.db.models import QuerySet
+from django.http import HttpRequest, HttpResponse
 from django.views import View
+from app_cache.utils import AnonymousPageCacheMixin
 
 
-class IndexView(TemplateView):
+class IndexView(AnonymousPageCacheMixin, TemplateView):
     """
     A view to display the main page.
+    The page rendered for the anonymous users is cached.
+    The view is async: the profile and the latest posts are retrieved with the async ORM.
     """
+    cache_groups = ('timeline',)
     template_name = 'app_main/index.html'
 
-    def get_context_data(self, **kwargs) -> Dict[str, Union[View, Profile, QuerySet]]:
+    async def get(self, request: HttpRequest, *args, **kwargs) -> HttpResponse:
         """
-        Adds Profile instance related to the authenticated user and feeds to the context.
+        Adds Profile instance related to the authenticated user and the latest posts of the feed to the context.
         """
-        context = super().get_context_data(**kwargs)
-        if self.request.user.is_authenticated:
-            profile = get_profile_for_context(self.request)
+        context = self.get_context_data(**kwargs)
+        profile = await aget_request_profile(request)
+        if profile is not None:
             context['profile'] = profile
-        latest_posts_feed = LatestPostsFeed()
-        latest_posts = latest_posts_feed.get_context_data()
-        context.update(latest_posts)
-        return context
+        context['latest_posts'] = await LatestPostsFeed().aitems()
+        return self.render_to_response(context)
 
 
 class AboutView(TemplateView):
@@ -0,0 +1,13 @@
+from django.apps import AppConfig
+
+
+class AppMediaConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'app_media'
+
+    def ready(self) -> None:
+        """
+        Connects the receivers that enqueue the generation of the derivatives of the uploaded images
+        and count the references to the stored files.
+        """
+        from . import signals  # noqa: F401
@@ -0,0 +1,130 @@
+"""
+The conversion of the media files stored before the content-addressed storage (see app_media.storage).
+Every file of the image fields from DERIVATIVE_FIELDS that is not named by its content yet is stored
+under its content-addressed name, or replaced with the stored file of the same content,
+and the rows referencing it are saved with the new name. The derivatives are copied to the names
+of the new file, unless the new file has its own. The references are counted before the rows are saved,
+so the old files and their derivatives are deleted when their last row is saved (see app_media.references).
+The files of the content-addressed directories that no row references are skipped and only counted:
+renamed by their content they would still be referenced by nothing, so the reference counting would
+never delete them, and their old names are the only hint of where they came from. They are left
+for the administrator to check and delete.
+"""
+from django.apps import apps
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import Storage, default_storage
+from django.db.models import Model
+from .derivatives import DERIVATIVE_FIELDS, Derivatives, get_derivative_name, get_derivatives_field
+from .references import reconcile_references
+from .storage import get_content_addressed_dir, get_content_name, hash_content, is_content_name
+import os
+from typing import Dict, Iterator, Optional, Set, Type
+
+
+def get_stored_derivatives(model: Type[Model], field_name: str, name: str) -> Optional[Derivatives]:
+    """
+    Returns the derivatives generated from the file with the passed name for one of the rows referencing it.
+    """
+    derivatives_field = get_derivatives_field(field_name)
+    return model._default_manager.filter(
+        **{field_name: name, f'{derivatives_field}__name': name}
+    ).exclude(**{f'{derivatives_field}__has_key': 'error'}).values_list(derivatives_field, flat=True).first()
+
+
+def copy_derivatives(storage: Storage, derivatives: Derivatives, name: str) -> Derivatives:
+    """
+    Copies the files of the derivatives to the names of the derivatives of the file with the passed name
+    and returns the derivatives of this file.
+    """
+    variants = []
+    for variant in derivatives['variants']:
+        target = get_derivative_name(name, variant['width'], variant['format'])
+        if storage.exists(target):
+            storage.delete(target)
+        with storage.open(variant['name'], 'rb') as file:
+            target = storage.save(target, File(file))
+        variants.append({**variant, 'name': target})
+    return {**derivatives, 'name': name, 'variants': variants}
+
+
+def list_files(storage: Storage, directory: str) -> Iterator[str]:
+    """
+    Yields the names of the files of the directory of the storage and of its subdirectories.
+    """
+    if not storage.exists(directory):
+        return
+    directories, files = storage.listdir(directory)
+    for file_name in files:
+        yield os.path.join(directory, file_name)
+    for directory_name in directories:
+        yield from list_files(storage, os.path.join(directory, directory_name))
+
+
+def count_unreferenced_files(storage: Storage, referenced: Set[str]) -> int:
+    """
+    Returns the number of the files of MEDIA_CONTENT_ADDRESSED_DIRS that are not named by their content
+    and are not referenced by any row.
+    """
+    return sum(
+        1 for directory in settings.MEDIA_CONTENT_ADDRESSED_DIRS for name in list_files(storage, directory)
+        if not is_content_name(name) and name not in referenced
+    )
+
+
+def deduplicate_files(dry_run: bool = False) -> Dict[str, int]:
+    """
+    Converts the files of the image fields to the content-addressed names. Returns the numbers of the files
+    checked, converted, replaced with an identical stored file, missing in the storage and skipped
+    as not referenced by any row, and the number of the bytes freed by the replaced ones.
+    With dry_run only counts them.
+    """
+    stats = {'files': 0, 'converted': 0, 'duplicates': 0, 'missing': 0, 'skipped': 0, 'freed_bytes': 0}
+    targets = set()
+    referenced = set()
+    if not dry_run:
+        reconcile_references()
+    for label, field_name in DERIVATIVE_FIELDS.items():
+        model = apps.get_model(label)
+        storage = model._meta.get_field(field_name).storage
+        derivatives_field = get_derivatives_field(field_name)
+        names = model._default_manager.exclude(**{field_name: ''}).exclude(
+            **{f'{field_name}__isnull': True}
+        ).order_by(field_name).values_list(field_name, flat=True).distinct()
+        names = list(names)
+        referenced.update(names)
+        for name in names:
+            stats['files'] += 1
+            directory = get_content_addressed_dir(name)
+            if directory is None or is_content_name(name):
+                continue
+            if not storage.exists(name):
+                stats['missing'] += 1
+                continue
+            with storage.open(name, 'rb') as file:
+                target = get_content_name(directory, hash_content(File(file)), os.path.splitext(name)[1])
+            stats['converted'] += 1
+            if target in targets or storage.exists(target):
+                stats['duplicates'] += 1
+                stats['freed_bytes'] += storage.size(name)
+            targets.add(target)
+            if dry_run:
+                continue
+            if not storage.exists(target):
+                with storage.open(name, 'rb') as file:
+                    storage.save(name, File(file))
+
+            derivatives = get_stored_derivatives(model, field_name, target)
+            if derivatives is None:
+                derivatives = get_stored_derivatives(model, field_name, name)
+                derivatives = copy_derivatives(storage, derivatives, target) if derivatives else {}
+            # The rows are saved one by one, so the receivers release the old file and invalidate the cached pages.
+            for instance in model._default_manager.filter(**{field_name: name}):
+                setattr(instance, field_name, target)
+                setattr(instance, derivatives_field, derivatives)
+                instance.save(update_fields=[field_name, derivatives_field])
+    # The converted files are referenced by the rows, so only the files left unreferenced before are counted.
+    stats['skipped'] = count_unreferenced_files(default_storage, referenced)
+    if not dry_run:
+        reconcile_references()
+    return stats
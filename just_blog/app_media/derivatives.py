@@ -0,0 +1,204 @@
+"""
+The derivatives of the uploaded images: the thumbnails of the fixed widths from IMAGE_DERIVATIVE_WIDTHS
+in the format of the original and in WebP.
+The derivatives of an image field are described in the JSON field with the same name and the _derivatives suffix:
+the name of the original file they were generated from, its size and the list of the variants,
+so the templates and the serializers build the srcset without touching the storage.
+If the file can't be read as an image, the error is saved instead of the variants,
+so the generation is not retried until the file is replaced.
+"""
+from django.apps import apps
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db.models import Model
+from django.db.models.fields.files import FieldFile
+from PIL import Image as PilImage, ImageOps
+from io import BytesIO
+import os
+from typing import Dict, List, Optional, Union
+
+# The image fields with the derivatives: the label of the model and the name of the field.
+DERIVATIVE_FIELDS = {
+    'app_blog.image': 'image',
+    'app_auth.profile': 'avatar',
+}
+
+WEBP = 'webp'
+
+Derivatives = Dict[str, Union[str, int, List[Dict[str, Union[str, int]]]]]
+
+
+def get_derivatives_field(field_name: str) -> str:
+    """
+    Returns the name of the JSON field with the derivatives of the image field.
+    """
+    return f'{field_name}_derivatives'
+
+
+def get_derivatives(instance: Model, field_name: str) -> Optional[Derivatives]:
+    """
+    Returns the derivatives of the image field, if they were generated from its current file.
+    """
+    file: FieldFile = getattr(instance, field_name)
+    derivatives = getattr(instance, get_derivatives_field(field_name)) or {}
+    if not file or derivatives.get('name') != file.name or 'error' in derivatives:
+        return None
+    return derivatives
+
+
+def get_derivatives_error(instance: Model, field_name: str) -> Optional[str]:
+    """
+    Returns the error of the generation of the derivatives of the current file of the image field, if it failed.
+    """
+    file: FieldFile = getattr(instance, field_name)
+    derivatives = getattr(instance, get_derivatives_field(field_name)) or {}
+    if not file or derivatives.get('name') != file.name:
+        return None
+    return derivatives.get('error')
+
+
+def get_variant_names(derivatives: Optional[Derivatives], name: str) -> List[str]:
+    """
+    Returns the names of the files of the derivatives, if they were generated from the file with the passed name.
+    """
+    if not derivatives or derivatives.get('name') != name:
+        return []
+    return [variant['name'] for variant in derivatives.get('variants', [])]
+
+
+def is_file_referenced(name: str) -> bool:
+    """
+    Checks if a row of one of the image fields references the file with the passed name.
+    The identical uploads share one file in the content-addressed storage (see app_media.storage).
+    """
+    return any(
+        apps.get_model(label)._default_manager.filter(**{field_name: name}).exists()
+        for label, field_name in DERIVATIVE_FIELDS.items()
+    )
+
+
+def get_shared_derivatives(instance: Model, field_name: str) -> Optional[Derivatives]:
+    """
+    Returns the derivatives of the current file of the image field generated for another row sharing the file,
+    or None if there are none.
+    """
+    name = getattr(instance, field_name).name
+    derivatives_field = get_derivatives_field(field_name)
+    return type(instance)._default_manager.filter(
+        **{field_name: name, f'{derivatives_field}__name': name}
+    ).exclude(pk=instance.pk).exclude(
+        **{f'{derivatives_field}__has_key': 'error'}
+    ).values_list(derivatives_field, flat=True).first()
+
+
+def get_derivative_name(name: str, width: int, extension: str) -> str:
+    """
+    Returns the name of the derivative of the passed width and format of the original file.
+    """
+    root = os.path.splitext(name)[0]
+    return os.path.join(settings.IMAGE_DERIVATIVES_DIR, f'{root}-{width}w.{extension}')
+
+
+def get_srcset(instance: Model, field_name: str, image_format: Optional[str] = None) -> str:
+    """
+    Returns the srcset of the image field with the variants of the passed format
+    (the format of the original, if None) and the original itself.
+    Returns an empty string if there are no derivatives of the current file.
+    """
+    derivatives = get_derivatives(instance, field_name)
+    if derivatives is None:
+        return ''
+    file: FieldFile = getattr(instance, field_name)
+    image_format = image_format or derivatives['format']
+    candidates = [
+        f'{file.storage.url(variant["name"])} {variant["width"]}w'
+        for variant in derivatives['variants'] if variant['format'] == image_format
+    ]
+    if image_format == derivatives['format']:
+        candidates.append(f'{file.url} {derivatives["width"]}w')
+    return ', '.join(candidates)
+
+
+def encode_image(image: PilImage.Image, image_format: str) -> ContentFile:
+    """
+    Encodes the image in the passed format with the quality from IMAGE_DERIVATIVE_QUALITY.
+    """
+    buffer = BytesIO()
+    if image_format == 'jpeg' and image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+    image.save(buffer, format=image_format, quality=settings.IMAGE_DERIVATIVE_QUALITY, optimize=True)
+    return ContentFile(buffer.getvalue())
+
+
+def generate_derivatives(file: FieldFile) -> Derivatives:
+    """
+    Generates the derivatives of the image file: a thumbnail of every width from IMAGE_DERIVATIVE_WIDTHS
+    smaller than the original in the format of the original (JPEG or PNG), and a WebP variant
+    of every thumbnail and of the original. The existing files with the same names are overwritten.
+    """
+    with file.open('rb'):
+        with PilImage.open(file) as original:
+            image_format = 'png' if original.format == 'PNG' else 'jpeg'
+            image = ImageOps.exif_transpose(original)
+            image.load()
+    width, height = image.size
+
+    variants = []
+    widths = [derivative_width for derivative_width in settings.IMAGE_DERIVATIVE_WIDTHS if derivative_width < width]
+    for derivative_width in widths + [width]:
+        if derivative_width < width:
+            resized = image.resize(
+                (derivative_width, max(1, round(height * derivative_width / width))), PilImage.LANCZOS
+            )
+            formats = (image_format, WEBP)
+        else:
+            resized = image
+            formats = (WEBP,)
+        for derivative_format in formats:
+            name = get_derivative_name(file.name, derivative_width, derivative_format)
+            if file.storage.exists(name):
+                file.storage.delete(name)
+            name = file.storage.save(name, encode_image(resized, derivative_format))
+            variants.append({'width': derivative_width, 'format': derivative_format, 'name': name})
+
+    return {'name': file.name, 'format': image_format, 'width': width, 'height': height, 'variants': variants}
+
+
+def delete_derivatives(instance: Model, field_name: str) -> None:
+    """
+    Deletes the files of the derivatives saved in the JSON field of the image field.
+    """
+    derivatives = getattr(instance, get_derivatives_field(field_name)) or {}
+    storage = getattr(instance, field_name).storage
+    for variant in derivatives.get('variants', []):
+        storage.delete(variant['name'])
+
+
+def save_derivatives(instance: Model, field_name: str) -> Derivatives:
+    """
+    Generates the derivatives of the current file of the image field, deletes the derivatives
+    of the previous file, unless another row still references it, and saves the new ones to the JSON field.
+    The instance is saved with update_fields, so the receivers of post_save invalidate the cached pages.
+    """
+    derivatives_field = get_derivatives_field(field_name)
+    previous = getattr(instance, derivatives_field) or {}
+    derivatives = generate_derivatives(getattr(instance, field_name))
+    previous_name = previous.get('name')
+    if previous_name and previous_name != derivatives['name'] and not is_file_referenced(previous_name):
+        delete_derivatives(instance, field_name)
+    setattr(instance, derivatives_field, derivatives)
+    instance.save(update_fields=[derivatives_field])
+    return derivatives
+
+
+def save_derivatives_error(instance: Model, field_name: str, error: str) -> Derivatives:
+    """
+    Saves the error of the generation of the derivatives of the current file of the image field to the JSON field,
+    so the generation is not enqueued again for the same file. The derivatives of the previous file
+    were released with it (see app_media.signals).
+    """
+    derivatives_field = get_derivatives_field(field_name)
+    derivatives = {'name': getattr(instance, field_name).name, 'error': error}
+    setattr(instance, derivatives_field, derivatives)
+    instance.save(update_fields=[derivatives_field])
+    return derivatives
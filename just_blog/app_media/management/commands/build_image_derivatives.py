@@ -0,0 +1,48 @@
+from django.apps import apps
+from django.core.management.base import BaseCommand
+from app_jobs.utils import enqueue
+from app_media.derivatives import (
+    DERIVATIVE_FIELDS, get_derivatives, get_derivatives_field, save_derivatives, save_derivatives_error
+)
+from PIL import UnidentifiedImageError
+
+
+class Command(BaseCommand):
+    """
+    Generates the derivatives of the existing images that don't have them yet.
+    With --enqueue creates a job for every image instead, so the workers share the backfill.
+    """
+    help = 'Generates the derivatives of the existing images that don\'t have them yet.'
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument(
+            '--model', action='append', choices=sorted(DERIVATIVE_FIELDS),
+            help='The label of the model to process. All the models by default.'
+        )
+        parser.add_argument('--force', action='store_true', help='Regenerate the existing derivatives too.')
+        parser.add_argument('--enqueue', action='store_true', help='Enqueue the jobs instead of running them.')
+        parser.add_argument('--chunk-size', type=int, default=500, help='The number of the instances read at once.')
+
+    def handle(self, *args, **options) -> None:
+        for label in options['model'] or sorted(DERIVATIVE_FIELDS):
+            field_name = DERIVATIVE_FIELDS[label]
+            model = apps.get_model(label)
+            queryset = model.objects.exclude(**{field_name: ''}).exclude(**{f'{field_name}__isnull': True}).only(
+                'pk', field_name, get_derivatives_field(field_name)
+            ).order_by('pk')
+            processed = failed = 0
+            for instance in queryset.iterator(chunk_size=options['chunk_size']):
+                if not options['force'] and get_derivatives(instance, field_name) is not None:
+                    continue
+                if options['enqueue']:
+                    enqueue('generate_image_derivatives', model=label, pk=instance.pk, field=field_name)
+                    processed += 1
+                    continue
+                try:
+                    save_derivatives(instance, field_name)
+                    processed += 1
+                except (UnidentifiedImageError, FileNotFoundError) as exc:
+                    save_derivatives_error(instance, field_name, str(exc))
+                    failed += 1
+                    self.stderr.write(f'{label}#{instance.pk}: {exc}')
+            self.stdout.write(self.style.SUCCESS(f'{label}: {processed} processed, {failed} failed'))
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+from app_media.dedupe import deduplicate_files
+
+
+class Command(BaseCommand):
+    """
+    Converts the existing images and avatars to the content-addressed storage: every file is renamed
+    by its content, the identical files are replaced with one stored file and the references are counted.
+    The files of the image directories that no row references are skipped and only counted.
+    With --dry-run only reports how many files would be converted and how many bytes would be freed.
+    """
+    help = 'Converts the existing images and avatars to the content-addressed storage, removing the duplicates.'
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument('--dry-run', action='store_true', help='Only count the files to convert.')
+
+    def handle(self, *args, **options) -> None:
+        stats = deduplicate_files(dry_run=options['dry_run'])
+        verb = 'Would convert' if options['dry_run'] else 'Converted'
+        self.stdout.write(
+            f'{stats["files"]} files checked, {stats["missing"]} missing in the storage, '
+            f'{stats["skipped"]} unreferenced files skipped'
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'{verb} {stats["converted"]} files, {stats["duplicates"]} duplicates, '
+            f'{stats["freed_bytes"]} bytes freed'
+        ))
@@ -0,0 +1,23 @@
+from django.db import models
+from django.utils.translation import gettext_lazy as _
+
+
+class MediaFile(models.Model):
+    """
+    A model describing a stored media file shared by the rows of the image fields (see app_media.references):
+    the name of the file in the storage and the number of the rows referencing it.
+    The file is deleted when the number drops to zero.
+    """
+    name = models.CharField(max_length=255, unique=True, verbose_name=_('name'))
+    references = models.PositiveIntegerField(default=0, verbose_name=_('references'))
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name=_('created at'))
+
+    class Meta:
+        verbose_name_plural = _('media files')
+        verbose_name = _('media file')
+
+    def __str__(self) -> str:
+        """
+        Returns the name of the file.
+        """
+        return self.name
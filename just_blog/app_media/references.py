@@ -0,0 +1,95 @@
+"""
+The reference counting of the media files shared by the rows of the image fields from DERIVATIVE_FIELDS.
+The content-addressed storage stores the identical uploads once (see app_media.storage), so a file
+may be referenced by many images and avatars. Every MediaFile counts the rows referencing its file:
+the content-addressed storage acquires a reference when it saves a new file of a row
+(the receivers of app_media.signals acquire it when a row is saved with the name of a stored file),
+and the receivers release it when the file of the row is replaced or the row is deleted. The file and its derivatives
+are deleted after the commit of the transaction releasing the last reference.
+The files without a MediaFile (e.g. saved before the counting) are never deleted.
+The counters drifted by the bulk updates are fixed with reconcile_references().
+"""
+from django.apps import apps
+from django.core.files.storage import Storage
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F
+from .derivatives import DERIVATIVE_FIELDS, is_file_referenced
+from .models import MediaFile
+from collections import Counter
+from contextlib import nullcontext
+from typing import Dict, Iterable
+
+
+def acquire(name: str) -> None:
+    """
+    Adds a reference to the file with the passed name, creating its MediaFile if there is none.
+    """
+    if MediaFile.objects.filter(name=name).update(references=F('references') + 1):
+        return
+    try:
+        with transaction.atomic():
+            MediaFile.objects.create(name=name, references=1)
+    except IntegrityError:
+        # The file was acquired concurrently.
+        MediaFile.objects.filter(name=name).update(references=F('references') + 1)
+
+
+def release(name: str, storage: Storage, derivatives: Iterable[str] = ()) -> None:
+    """
+    Removes a reference to the file with the passed name. When the last one is removed, the file
+    and the passed derivatives are deleted from the storage after the commit.
+    """
+    MediaFile.objects.filter(name=name, references__gt=0).update(references=F('references') - 1)
+    deleted, _ = MediaFile.objects.filter(name=name, references=0).delete()
+    if deleted:
+        derivatives = list(derivatives)
+        transaction.on_commit(lambda: delete_unreferenced(name, storage, derivatives))
+
+
+def delete_unreferenced(name: str, storage: Storage, derivatives: Iterable[str] = ()) -> None:
+    """
+    Deletes the file and its derivatives from the storage, unless the file was acquired again in between.
+    The file is checked and deleted holding the lock of the content-addressed storage.
+    """
+    with storage.lock() if hasattr(storage, 'lock') else nullcontext():
+        if MediaFile.objects.filter(name=name).exists() or is_file_referenced(name):
+            return
+        storage.delete(name)
+    for derivative in derivatives:
+        storage.delete(derivative)
+
+
+def count_references() -> Counter:
+    """
+    Returns the actual numbers of the rows of the image fields referencing every file.
+    """
+    counts = Counter()
+    for label, field_name in DERIVATIVE_FIELDS.items():
+        rows = apps.get_model(label)._default_manager.exclude(**{field_name: ''}).exclude(
+            **{f'{field_name}__isnull': True}
+        ).values(field_name).annotate(count=Count('pk')).values_list(field_name, 'count')
+        counts.update(dict(rows))
+    return counts
+
+
+def reconcile_references(dry_run: bool = False) -> Dict[str, int]:
+    """
+    Compares the counters of the MediaFile instances with the actual numbers of the referencing rows
+    and fixes them: creates the missing instances, updates the drifted ones and deletes the ones
+    of the files no row references. The files themselves are not deleted.
+    Returns the numbers of the created, the updated and the deleted instances.
+    """
+    actual = count_references()
+    stored = dict(MediaFile.objects.values_list('name', 'references'))
+    created = [name for name in actual if name not in stored]
+    updated = [name for name in actual if name in stored and stored[name] != actual[name]]
+    deleted = [name for name in stored if name not in actual]
+    if not dry_run:
+        with transaction.atomic():
+            MediaFile.objects.bulk_create(
+                [MediaFile(name=name, references=actual[name]) for name in created], batch_size=500
+            )
+            for name in updated:
+                MediaFile.objects.filter(name=name).update(references=actual[name])
+            MediaFile.objects.filter(name__in=deleted).delete()
+    return {'created': len(created), 'updated': len(updated), 'deleted': len(deleted)}
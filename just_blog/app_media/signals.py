@@ -0,0 +1,90 @@
+"""
+Receivers that enqueue the generation of the derivatives when a new image is uploaded
+to one of the fields from DERIVATIVE_FIELDS, and count the references of the rows to the shared media files
+(see app_media.references).
+"""
+from django.apps import apps
+from django.db.models import Model
+from django.db.models.signals import post_delete, post_save, pre_save
+from app_jobs.utils import enqueue
+from .derivatives import (
+    DERIVATIVE_FIELDS, get_derivatives, get_derivatives_error, get_derivatives_field, get_variant_names
+)
+from .references import acquire, release
+
+
+def enqueue_derivatives(sender, instance: Model, raw: bool = False, update_fields=None, **kwargs) -> None:
+    """
+    Enqueues the generate_image_derivatives job if the image field has a file without the derivatives.
+    The saves of the derivatives themselves, the loading of the fixtures and the files
+    whose derivatives could not be generated (see get_derivatives_error) are skipped.
+    """
+    field_name = DERIVATIVE_FIELDS[sender._meta.label_lower]
+    if raw or (update_fields and get_derivatives_field(field_name) in update_fields):
+        return
+    if getattr(instance, field_name) and get_derivatives(instance, field_name) is None \
+            and get_derivatives_error(instance, field_name) is None:
+        enqueue('generate_image_derivatives', model=sender._meta.label_lower, pk=instance.pk, field=field_name)
+
+
+def remember_file(sender, instance: Model, raw: bool = False, update_fields=None, **kwargs) -> None:
+    """
+    Remembers the name and the derivatives of the stored file of the image field before the row is saved,
+    so the reference to it can be released if the file is replaced, and if the new file is not saved
+    to the storage yet, as the content-addressed storage acquires the reference when it saves it.
+    The new rows have no stored file, and the saves without the image field and the loading of the fixtures
+    are skipped.
+    """
+    field_name = DERIVATIVE_FIELDS[sender._meta.label_lower]
+    if raw or (update_fields and field_name not in update_fields):
+        return
+    file = getattr(instance, field_name)
+    acquired = bool(file) and not file._committed
+    if instance._state.adding or instance.pk is None:
+        instance._stored_file = ('', None, acquired)
+        return
+    stored = sender._base_manager.filter(pk=instance.pk).values_list(
+        field_name, get_derivatives_field(field_name)
+    ).first() or ('', None)
+    instance._stored_file = (*stored, acquired)
+
+
+def update_file_references(sender, instance: Model, raw: bool = False, **kwargs) -> None:
+    """
+    Acquires a reference to the new file of the saved row, unless the storage has acquired it,
+    and releases the reference to the replaced one.
+    """
+    stored = instance.__dict__.pop('_stored_file', None)
+    if raw or stored is None:
+        return
+    field_name = DERIVATIVE_FIELDS[sender._meta.label_lower]
+    file = getattr(instance, field_name)
+    previous, derivatives, acquired = stored[0] or '', stored[1], stored[2]
+    if (file.name or '') == previous:
+        if acquired and previous:
+            # The same content was uploaded again, the row keeps its reference.
+            release(previous, file.storage)
+        return
+    if file.name and not acquired:
+        acquire(file.name)
+    if previous:
+        release(previous, file.storage, get_variant_names(derivatives, previous))
+
+
+def release_file_reference(sender, instance: Model, **kwargs) -> None:
+    """
+    Releases the reference of the deleted row to its file.
+    """
+    field_name = DERIVATIVE_FIELDS[sender._meta.label_lower]
+    file = getattr(instance, field_name)
+    if file.name:
+        derivatives = getattr(instance, get_derivatives_field(field_name))
+        release(file.name, file.storage, get_variant_names(derivatives, file.name))
+
+
+for label in DERIVATIVE_FIELDS:
+    model = apps.get_model(label)
+    post_save.connect(enqueue_derivatives, sender=model, dispatch_uid=f'derivatives:{label}')
+    pre_save.connect(remember_file, sender=model, dispatch_uid=f'file_references:remember:{label}')
+    post_save.connect(update_file_references, sender=model, dispatch_uid=f'file_references:update:{label}')
+    post_delete.connect(release_file_reference, sender=model, dispatch_uid=f'file_references:release:{label}')
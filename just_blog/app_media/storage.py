@@ -0,0 +1,116 @@
+"""
+The content-addressed storage of the uploaded images. The files saved to the directories
+from MEDIA_CONTENT_ADDRESSED_DIRS are named by the SHA-256 of their content and sharded
+into two levels of subdirectories by the first characters of the hash, e.g. images/3f/a2/3fa2...9c.jpg,
+so the same image uploaded many times is stored once and keeps the same url.
+A file that already exists is not written again. The files are shared by the rows referencing them,
+so they are deleted only when their last reference is released (see app_media.references).
+The storage acquires the reference of the row before it checks if the file exists, holding the lock
+of the storage that delete_unreferenced() holds too, so a concurrent release of the last reference
+never deletes the file whose name was just returned.
+The other files (the derivatives, the staged files of the jobs) are saved as by FileSystemStorage.
+"""
+from django.conf import settings
+from django.core.files import File, locks
+from django.core.files.storage import FileSystemStorage
+from django.core.files.utils import validate_file_name
+from django.utils.deconstruct import deconstructible
+from contextlib import contextmanager
+from hashlib import sha256
+import os
+import re
+from typing import Iterator, Optional
+from .references import acquire
+
+# The number of the levels of the subdirectories and the number of the characters of the hash per level.
+SHARD_LEVELS = 2
+SHARD_WIDTH = 2
+
+CONTENT_NAME_RE = re.compile(r'^(?:[0-9a-f]{%d}/){%d}([0-9a-f]{64})(\.\w+)?$' % (SHARD_WIDTH, SHARD_LEVELS))
+
+
+def hash_content(content: File) -> str:
+    """
+    Returns the hex SHA-256 of the content of the file, read by chunks from the beginning.
+    """
+    hasher = sha256()
+    for chunk in content.chunks():
+        hasher.update(chunk.encode('utf-8') if isinstance(chunk, str) else chunk)
+    if hasattr(content, 'seek'):
+        content.seek(0)
+    return hasher.hexdigest()
+
+
+def get_content_addressed_dir(name: str) -> Optional[str]:
+    """
+    Returns the directory from MEDIA_CONTENT_ADDRESSED_DIRS the file name belongs to, or None.
+    """
+    name = name.replace('\\', '/')
+    for directory in settings.MEDIA_CONTENT_ADDRESSED_DIRS:
+        if name.startswith(directory):
+            return directory
+    return None
+
+
+def is_content_name(name: str) -> bool:
+    """
+    Checks if the name is a content-addressed name of one of the directories from MEDIA_CONTENT_ADDRESSED_DIRS.
+    """
+    directory = get_content_addressed_dir(name)
+    return directory is not None and CONTENT_NAME_RE.match(name.replace('\\', '/')[len(directory):]) is not None
+
+
+def get_content_name(directory: str, digest: str, extension: str) -> str:
+    """
+    Returns the sharded name of the file with the passed hash in the directory.
+    """
+    shards = [digest[level * SHARD_WIDTH:(level + 1) * SHARD_WIDTH] for level in range(SHARD_LEVELS)]
+    return f'{directory}{"/".join(shards)}/{digest}{extension.lower()}'
+
+
+@deconstructible(path='app_media.storage.ContentAddressedStorage')
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    The file system storage naming the files of the directories from MEDIA_CONTENT_ADDRESSED_DIRS
+    by their content. Saving a file with the same content returns the name of the stored file.
+    """
+    lock_name = '.references.lock'
+
+    @contextmanager
+    def lock(self) -> Iterator[None]:
+        """
+        Holds the exclusive lock of the storage, shared by the processes of the host.
+        """
+        os.makedirs(self.location, exist_ok=True)
+        with open(os.path.join(self.location, self.lock_name), 'ab') as lock_file:
+            locks.lock(lock_file, locks.LOCK_EX)
+            try:
+                yield
+            finally:
+                locks.unlock(lock_file)
+
+    def save(self, name: Optional[str], content, max_length: Optional[int] = None) -> str:
+        """
+        Saves the content under its content-addressed name, unless a file with the same content is stored,
+        acquires a reference to it for the row being saved and returns the name.
+        The files of the other directories are saved as usual.
+        """
+        if name is None:
+            name = content.name
+        directory = get_content_addressed_dir(name)
+        if directory is None:
+            return super().save(name, content, max_length=max_length)
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+
+        name = get_content_name(directory, hash_content(content), os.path.splitext(name)[1])
+        validate_file_name(name, allow_relative_path=True)
+        with self.lock():
+            acquire(name)
+            if self.exists(name):
+                return name
+        saved = self._save(name, content)
+        if saved != name:
+            # The same content was saved concurrently under the name, so the copy is not needed.
+            self.delete(saved)
+        return name
@@ -0,0 +1,35 @@
+"""
+The background task that generates the derivatives of an uploaded image.
+"""
+from django.apps import apps
+from app_jobs.utils import task, PermanentJobError
+from .derivatives import (
+    get_derivatives, get_derivatives_field, get_shared_derivatives, save_derivatives, save_derivatives_error
+)
+from PIL import UnidentifiedImageError
+from typing import Dict
+
+
+@task('generate_image_derivatives')
+def generate_image_derivatives(model: str, pk: int, field: str) -> Dict[str, int]:
+    """
+    Generates the derivatives of the image field of the instance of the model (passed by its label).
+    Skips the instances that were deleted, have no file or already have the derivatives of the current file.
+    The file shared with another row that has its derivatives already (see app_media.storage)
+    gets the same derivatives without generating them again.
+    If the file can't be read, the error is saved to the derivatives, so the job is not enqueued again for it.
+    """
+    instance = apps.get_model(model).objects.filter(pk=pk).first()
+    if instance is None or not getattr(instance, field) or get_derivatives(instance, field) is not None:
+        return {'variants': 0}
+    shared = get_shared_derivatives(instance, field)
+    if shared is not None:
+        setattr(instance, get_derivatives_field(field), shared)
+        instance.save(update_fields=[get_derivatives_field(field)])
+        return {'variants': len(shared['variants'])}
+    try:
+        derivatives = save_derivatives(instance, field)
+    except (UnidentifiedImageError, FileNotFoundError) as exc:
+        save_derivatives_error(instance, field, str(exc))
+        raise PermanentJobError(str(exc))
+    return {'variants': len(derivatives['variants'])}
@@ -0,0 +1,34 @@
+from django import template
+from django.db.models import Model
+from django.utils.html import format_html, format_html_join
+from django.utils.safestring import SafeString
+from app_media.derivatives import get_srcset, WEBP
+
+register = template.Library()
+
+
+@register.simple_tag
+def srcset(instance: Model, field_name: str, image_format: str = '') -> str:
+    """
+    Returns the srcset of the image field of the instance. Empty if there are no derivatives yet.
+    """
+    return get_srcset(instance, field_name, image_format or None)
+
+
+@register.simple_tag
+def responsive_image(instance: Model, field_name: str, sizes: str = '100vw', **attrs) -> SafeString:
+    """
+    Renders the picture element with the WebP and the original sources of the image field and the img element
+    with the passed attributes (e.g. class or alt). Falls back to the plain img element with the original
+    while the derivatives are not generated.
+    """
+    file = getattr(instance, field_name)
+    img_attrs = format_html_join(' ', '{}="{}"', attrs.items())
+    original_srcset = get_srcset(instance, field_name)
+    if not original_srcset:
+        return format_html('<img src="{}" {}>', file.url, img_attrs)
+    return format_html(
+        '<picture><source type="image/webp" srcset="{}" sizes="{}">'
+        '<img src="{}" srcset="{}" sizes="{}" loading="lazy" {}></picture>',
+        get_srcset(instance, field_name, WEBP), sizes, file.url, original_srcset, sizes, img_attrs
+    )
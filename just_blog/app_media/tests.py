@@ -0,0 +1,261 @@
+from django.contrib.auth.models import User
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.template import Context, Template
+from django.test import TestCase, override_settings
+from app_auth.models import Profile
+from app_blog.models import Blog, Post, Image
+from app_jobs.models import Job
+from app_jobs.utils import run_pending_jobs
+from app_media.derivatives import get_srcset
+from app_media.models import MediaFile
+from app_media.storage import ContentAddressedStorage, is_content_name
+from PIL import Image as PilImage
+from hashlib import sha256
+from io import BytesIO, StringIO
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+
+def get_image_file(name: str, width: int = 1000, height: int = 500) -> ContentFile:
+    buffer = BytesIO()
+    PilImage.new('RGB', (width, height), color='red').save(buffer, format='JPEG')
+    return ContentFile(buffer.getvalue(), name=name)
+
+
+@override_settings(IMAGE_DERIVATIVE_WIDTHS=(160, 640, 1280), IMAGE_DERIVATIVES_DIR='derivatives/')
+class ImageDerivativesTestCase(TestCase):
+
+    def setUp(self) -> None:
+        self.media_root = tempfile.mkdtemp()
+        media_settings = override_settings(MEDIA_ROOT=self.media_root)
+        media_settings.enable()
+        self.addCleanup(media_settings.disable)
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+
+        user = User.objects.create_user(username='derivatives', password='derivatives')
+        self.profile = Profile.objects.create(user=user)
+        blog = Blog.objects.create(profile=self.profile, title='blog', description='description')
+        self.post = Post.objects.create(title='post', tag='tag', content='content', blog=blog, profile=self.profile)
+
+    def test_derivatives_on_upload(self):
+        image = Image.objects.create(title='image', image=get_image_file('photo.jpg'), post=self.post)
+        self.assertTrue(Job.objects.filter(name='generate_image_derivatives', payload__pk=image.pk).exists())
+        self.assertEqual(get_srcset(image, 'image'), '')
+
+        run_pending_jobs()
+        image.refresh_from_db()
+        variants = {(variant['width'], variant['format']) for variant in image.image_derivatives['variants']}
+        self.assertEqual(variants, {(160, 'jpeg'), (640, 'jpeg'), (160, 'webp'), (640, 'webp'), (1000, 'webp')})
+        for variant in image.image_derivatives['variants']:
+            self.assertTrue(default_storage.exists(variant['name']))
+            with default_storage.open(variant['name']) as file, PilImage.open(file) as derivative:
+                self.assertEqual(derivative.width, variant['width'])
+                self.assertEqual(derivative.format.lower(), variant['format'])
+
+        self.assertEqual(get_srcset(image, 'image').split(', ')[-1], f'{image.image.url} 1000w')
+        self.assertEqual(len(get_srcset(image, 'image', 'webp').split(', ')), 3)
+
+    def test_replaced_image(self):
+        image = Image.objects.create(title='image', image=get_image_file('first.jpg'), post=self.post)
+        run_pending_jobs()
+        image.refresh_from_db()
+        old_names = [variant['name'] for variant in image.image_derivatives['variants']]
+
+        image.image = get_image_file('second.jpg', width=400)
+        image.save()
+        self.assertEqual(get_srcset(image, 'image'), '')
+        run_pending_jobs()
+        image.refresh_from_db()
+        self.assertEqual(len(image.image_derivatives['variants']), 3)
+        self.assertFalse(any(default_storage.exists(name) for name in old_names))
+
+    def test_unreadable_image(self):
+        broken = ContentFile(b'not an image', name='broken.jpg')
+        image = Image.objects.create(title='image', image=broken, post=self.post)
+        run_pending_jobs()
+        self.assertEqual(Job.objects.get(name='generate_image_derivatives').status, Job.FAILED)
+        image.refresh_from_db()
+        self.assertEqual(image.image_derivatives['name'], image.image.name)
+        self.assertIn('error', image.image_derivatives)
+        self.assertEqual(get_srcset(image, 'image'), '')
+
+        image.title = 'renamed'
+        image.save()
+        self.assertEqual(Job.objects.filter(name='generate_image_derivatives').count(), 1)
+
+        image.image = get_image_file('fixed.jpg')
+        image.save()
+        self.assertEqual(Job.objects.filter(name='generate_image_derivatives', status=Job.PENDING).count(), 1)
+        run_pending_jobs()
+        image.refresh_from_db()
+        self.assertNotIn('error', image.image_derivatives)
+        self.assertTrue(get_srcset(image, 'image'))
+
+    def test_responsive_image_tag(self):
+        self.profile.avatar = get_image_file('avatar.jpg')
+        self.profile.save()
+        template = Template("{% load media_tags %}{% responsive_image profile 'avatar' sizes='80px' class='avatar' %}")
+
+        html = template.render(Context({'profile': self.profile}))
+        self.assertNotIn('<picture>', html)
+        self.assertIn(f'src="{self.profile.avatar.url}"', html)
+
+        run_pending_jobs()
+        self.profile.refresh_from_db()
+        html = template.render(Context({'profile': self.profile}))
+        self.assertIn('<source type="image/webp"', html)
+        self.assertIn('sizes="80px"', html)
+        self.assertIn('class="avatar"', html)
+        self.assertIn(get_srcset(self.profile, 'avatar'), html)
+
+    def test_build_image_derivatives(self):
+        image = Image.objects.create(title='image', image=get_image_file('backfill.jpg'), post=self.post)
+        Job.objects.all().delete()
+        call_command('build_image_derivatives', '--model', 'app_blog.image', stdout=open(os.devnull, 'w'))
+        image.refresh_from_db()
+        self.assertEqual(image.image_derivatives['name'], image.image.name)
+        self.assertFalse(Job.objects.exists())
+
+        call_command('build_image_derivatives', '--enqueue', '--force', stdout=open(os.devnull, 'w'))
+        self.assertEqual(Job.objects.filter(name='generate_image_derivatives').count(), 1)
+
+
+@override_settings(IMAGE_DERIVATIVE_WIDTHS=(160,), IMAGE_DERIVATIVES_DIR='derivatives/')
+class ContentAddressedStorageTestCase(TestCase):
+
+    def setUp(self) -> None:
+        self.media_root = tempfile.mkdtemp()
+        media_settings = override_settings(MEDIA_ROOT=self.media_root)
+        media_settings.enable()
+        self.addCleanup(media_settings.disable)
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+
+        user = User.objects.create_user(username='dedupe', password='dedupe')
+        self.profile = Profile.objects.create(user=user)
+        blog = Blog.objects.create(profile=self.profile, title='blog', description='description')
+        self.post = Post.objects.create(title='post', tag='tag', content='content', blog=blog, profile=self.profile)
+        self.content = get_image_file('photo.jpg').read()
+
+    def get_references(self, name: str) -> int:
+        return MediaFile.objects.filter(name=name).values_list('references', flat=True).first() or 0
+
+    def test_content_names(self):
+        digest = sha256(self.content).hexdigest()
+        first = Image.objects.create(title='first', image=ContentFile(self.content, name='a.JPG'), post=self.post)
+        second = Image.objects.create(title='second', image=ContentFile(self.content, name='b.jpg'), post=self.post)
+        self.assertEqual(first.image.name, f'images/{digest[:2]}/{digest[2:4]}/{digest}.jpg')
+        self.assertEqual(second.image.name, first.image.name)
+        self.assertTrue(is_content_name(first.image.name))
+        self.assertEqual(len(os.listdir(os.path.dirname(first.image.path))), 1)
+        self.assertEqual(self.get_references(first.image.name), 2)
+
+        # The files of the other directories keep their names.
+        self.assertEqual(default_storage.save('jobs/a.jpg', ContentFile(self.content)), 'jobs/a.jpg')
+        self.assertNotEqual(default_storage.save('jobs/a.jpg', ContentFile(self.content)), 'jobs/a.jpg')
+
+    def test_shared_file_deletion(self):
+        first = Image.objects.create(title='first', image=ContentFile(self.content, name='a.jpg'), post=self.post)
+        second = Image.objects.create(title='second', image=ContentFile(self.content, name='b.jpg'), post=self.post)
+        run_pending_jobs()
+        first.refresh_from_db()
+        second.refresh_from_db()
+        # The derivatives of the shared file are generated once and shared too.
+        self.assertEqual(first.image_derivatives, second.image_derivatives)
+        variants = [variant['name'] for variant in first.image_derivatives['variants']]
+
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+        self.assertTrue(default_storage.exists(second.image.name))
+        self.assertEqual(self.get_references(second.image.name), 1)
+
+        # Replacing the file releases the old one, deleted with its derivatives as the last reference.
+        name = second.image.name
+        with self.captureOnCommitCallbacks(execute=True):
+            second.image = get_image_file('other.jpg', width=400)
+            second.save()
+        self.assertFalse(default_storage.exists(name))
+        self.assertFalse(any(default_storage.exists(variant) for variant in variants))
+        self.assertFalse(MediaFile.objects.filter(name=name).exists())
+        self.assertEqual(self.get_references(second.image.name), 1)
+
+        self.profile.avatar = ContentFile(self.content, name='avatar.jpg')
+        self.profile.save()
+        self.assertTrue(self.profile.avatar.name.startswith('avatars/'))
+        self.assertEqual(self.get_references(self.profile.avatar.name), 1)
+
+    def test_duplicate_upload_during_release(self):
+        first = Image.objects.create(title='first', image=ContentFile(self.content, name='a.jpg'), post=self.post)
+        name = first.image.name
+        save = ContentAddressedStorage.save
+
+        def save_during_release(storage, *args, **kwargs):
+            # The last reference is released after the storage returns the name, before the row is saved.
+            saved = save(storage, *args, **kwargs)
+            with self.captureOnCommitCallbacks(execute=True):
+                first.delete()
+            return saved
+
+        with mock.patch.object(ContentAddressedStorage, 'save', save_during_release):
+            second = Image.objects.create(title='second', image=ContentFile(self.content, name='b.jpg'), post=self.post)
+        self.assertEqual(second.image.name, name)
+        self.assertTrue(default_storage.exists(name))
+        self.assertEqual(self.get_references(name), 1)
+
+        # Uploading the same content again to the row keeps its only reference.
+        second.image = ContentFile(self.content, name='c.jpg')
+        second.save()
+        self.assertEqual(self.get_references(name), 1)
+
+    def test_dedupe_media(self):
+        # The files stored before the content-addressed storage, the first two identical.
+        os.makedirs(os.path.join(self.media_root, 'images'))
+        contents = [self.content, self.content, get_image_file('other.jpg', width=300).read()]
+        legacy = []
+        for index, content in enumerate(contents):
+            with open(os.path.join(self.media_root, 'images', f'legacy-{index}.jpg'), 'wb') as file:
+                file.write(content)
+            image = Image.objects.create(title=f'legacy{index}', image=f'images/legacy-{index}.jpg', post=self.post)
+            legacy.append(image)
+        # A file no row references is skipped.
+        with open(os.path.join(self.media_root, 'images', 'orphan.jpg'), 'wb') as file:
+            file.write(self.content)
+        MediaFile.objects.all().delete()
+        run_pending_jobs()
+        old_variants = []
+        for image in legacy:
+            image.refresh_from_db()
+            old_variants += [variant['name'] for variant in image.image_derivatives['variants']]
+
+        out = StringIO()
+        call_command('dedupe_media', '--dry-run', stdout=out)
+        self.assertIn(f'Would convert 3 files, 1 duplicates, {len(self.content)} bytes freed', out.getvalue())
+        self.assertIn('1 unreferenced files skipped', out.getvalue())
+        self.assertTrue(default_storage.exists('images/legacy-0.jpg'))
+
+        out = StringIO()
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('dedupe_media', stdout=out)
+        self.assertIn('Converted 3 files, 1 duplicates', out.getvalue())
+        for image in legacy:
+            image.refresh_from_db()
+            self.assertTrue(is_content_name(image.image.name))
+            self.assertTrue(default_storage.exists(image.image.name))
+            # The derivatives are moved to the new file.
+            self.assertEqual(image.image_derivatives['name'], image.image.name)
+            for variant in image.image_derivatives['variants']:
+                self.assertTrue(default_storage.exists(variant['name']))
+        self.assertEqual(legacy[0].image.name, legacy[1].image.name)
+        self.assertEqual(self.get_references(legacy[0].image.name), 2)
+        self.assertEqual(self.get_references(legacy[2].image.name), 1)
+        self.assertFalse(any(default_storage.exists(f'images/legacy-{index}.jpg') for index in range(3)))
+        self.assertFalse(any(default_storage.exists(variant) for variant in old_variants))
+        self.assertTrue(default_storage.exists('images/orphan.jpg'))
+        self.assertIn('1 unreferenced files skipped', out.getvalue())
+
+        out = StringIO()
+        call_command('dedupe_media', stdout=out)
+        self.assertIn('Converted 0 files', out.getvalue())
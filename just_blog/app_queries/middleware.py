@@ -0,0 +1,73 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.http import HttpRequest, HttpResponse
+from .utils import QueryBudgetExceeded, QueryRecorder, get_budget_errors, get_query_budget, get_view_name
+import logging
+from typing import Awaitable, Callable, Union
+
+logger = logging.getLogger(__name__)
+
+
+class QueryBudgetMiddleware:
+    """
+    Records the SQL queries of every request while QUERY_BUDGET_ENABLED is True.
+    Adds the number of the queries, the duplicates and the database time to the response
+    in the X-Query-Count, X-Query-Duplicates and Server-Timing headers. The requests with the methods
+    from QUERY_BUDGET_METHODS are checked as well: a warning is logged
+    when the request exceeds the budget of its view or repeats a statement too many times.
+    With QUERY_BUDGET_STRICT the violation raises QueryBudgetExceeded instead.
+    Supports both the sync and the async requests. The async ORM runs the queries of a request
+    in the same thread, so the recorder is installed on the connections of that thread.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response: Callable[[HttpRequest], Union[HttpResponse, Awaitable[HttpResponse]]]) -> None:
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request: HttpRequest) -> Union[HttpResponse, Awaitable[HttpResponse]]:
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not settings.QUERY_BUDGET_ENABLED:
+            return self.get_response(request)
+
+        with QueryRecorder() as recorder:
+            response = self.get_response(request)
+        return self.process_queries(request, response, recorder)
+
+    async def __acall__(self, request: HttpRequest) -> HttpResponse:
+        """
+        Records the queries of the async request.
+        """
+        if not settings.QUERY_BUDGET_ENABLED:
+            return await self.get_response(request)
+
+        recorder = QueryRecorder()
+        await sync_to_async(recorder.__enter__)()
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(recorder.__exit__)(None, None, None)
+        return self.process_queries(request, response, recorder)
+
+    def process_queries(self, request: HttpRequest, response: HttpResponse, recorder: QueryRecorder) -> HttpResponse:
+        """
+        Adds the headers to the response and checks the recorded queries against the budget of the view.
+        """
+        response.headers['X-Query-Count'] = str(recorder.count)
+        response.headers['X-Query-Duplicates'] = str(recorder.duplicates)
+        response.headers['Server-Timing'] = f'db;dur={recorder.duration * 1000:.1f};desc="{recorder.count} queries"'
+
+        if request.method not in settings.QUERY_BUDGET_METHODS:
+            return response
+
+        view_name = get_view_name(request.path_info)
+        errors = get_budget_errors(recorder, get_query_budget(view_name))
+        if errors:
+            message = f'{request.method} {request.path} ({view_name}): {"; ".join(errors)}'
+            if settings.QUERY_BUDGET_STRICT:
+                raise QueryBudgetExceeded(message)
+            logger.warning('%s\n%s', message, recorder.get_report())
+        return response
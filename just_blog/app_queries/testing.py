@@ -0,0 +1,34 @@
+"""
+The test helpers checking the queries of the views against their budgets.
+"""
+from django.http import HttpResponse
+from django.urls import resolve
+from .utils import QueryRecorder, get_budget_errors, get_query_budget
+from typing import Optional
+
+
+class QueryBudgetTestMixin:
+    """
+    A mixin for the test cases with the assertions on the number of the queries of a request.
+    """
+
+    def request_within_budget(self, method: str, url: str, budget: Optional[int] = None, **kwargs) -> HttpResponse:
+        """
+        Makes the request with the test client and fails if it exceeds the budget
+        (the budget of the view from QUERY_BUDGETS by default) or repeats a statement too many times.
+        Returns the response.
+        """
+        if budget is None:
+            budget = get_query_budget(resolve(url.split('?')[0]).view_name)
+        with QueryRecorder() as recorder:
+            response = getattr(self.client, method.lower())(url, **kwargs)
+        errors = get_budget_errors(recorder, budget)
+        if errors:
+            self.fail(f'{method} {url}: {"; ".join(errors)}\n{recorder.get_report()}')
+        return response
+
+    def assertWithinBudget(self, url: str, budget: Optional[int] = None, **kwargs) -> HttpResponse:
+        """
+        Makes a GET request within the budget (see request_within_budget). Returns the response.
+        """
+        return self.request_within_budget('get', url, budget, **kwargs)
@@ -0,0 +1,208 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import URLPattern, URLResolver, get_resolver, reverse
+from django.utils.module_loading import import_string
+from app_auth.models import Profile
+from app_blog.models import Post, Tag
+from app_jobs.models import Job
+from app_uploads.models import Upload
+from app_queries.testing import QueryBudgetTestMixin
+from app_queries.utils import QueryRecorder, get_budget_errors, get_query_budget
+import logging
+
+# The url configurations whose routes should all have a query budget test.
+COVERED_URLCONFS = 'app_blog.urls', 'app_auth.urls', 'app_main.urls', 'app_api.urls'
+
+
+def get_route_names(urlconf: str):
+    """
+    Returns the names with the namespace of all the named routes of the url configuration.
+    """
+    resolver = get_resolver(urlconf)
+    namespace = getattr(resolver.urlconf_module, 'app_name')
+    names = set()
+    for pattern in resolver.url_patterns:
+        if isinstance(pattern, URLPattern) and pattern.name:
+            names.add(f'{namespace}:{pattern.name}')
+        elif isinstance(pattern, URLResolver):
+            names.update(get_route_names(pattern.urlconf_name))
+    return names
+
+
+class QueryRecorderTestCase(TestCase):
+
+    def test_recorder_counts_queries(self):
+        with QueryRecorder() as recorder:
+            for pk in range(5):
+                Profile.objects.filter(pk=pk).exists()
+            Profile.objects.filter(pk=1).exists()
+        self.assertEqual(recorder.count, 6)
+        self.assertEqual(recorder.duplicates, 1)
+        self.assertGreaterEqual(recorder.duration, 0)
+        self.assertEqual(list(recorder.get_repeated(threshold=3).values()), [6])
+        self.assertEqual(recorder.get_repeated(threshold=6), {})
+
+    def test_budget_errors(self):
+        with QueryRecorder() as recorder:
+            for pk in range(3):
+                Profile.objects.filter(pk=pk).exists()
+        self.assertEqual(get_budget_errors(recorder, 3), [])
+        with self.settings(QUERY_BUDGET_MAX_REPEATS=2):
+            self.assertEqual(len(get_budget_errors(recorder, 2)), 2)
+
+    @override_settings(QUERY_BUDGETS={'app_main:about': 1}, QUERY_BUDGET_DEFAULT=7)
+    def test_get_query_budget(self):
+        self.assertEqual(get_query_budget('app_main:about'), 1)
+        self.assertEqual(get_query_budget('app_main:index'), 7)
+        self.assertEqual(get_query_budget(None), 7)
+
+
+class QueryBudgetMiddlewareTestCase(TestCase):
+
+    def setUp(self) -> None:
+        cache.clear()
+
+    @override_settings(QUERY_BUDGET_ENABLED=True)
+    def test_headers(self):
+        response = self.client.get(reverse('app_main:about'))
+        self.assertEqual(response.headers['X-Query-Count'], '0')
+        self.assertEqual(response.headers['X-Query-Duplicates'], '0')
+        self.assertIn('db;dur=', response.headers['Server-Timing'])
+
+    @override_settings(QUERY_BUDGET_ENABLED=False)
+    def test_disabled(self):
+        response = self.client.get(reverse('app_main:about'))
+        self.assertNotIn('X-Query-Count', response.headers)
+
+    @override_settings(QUERY_BUDGET_ENABLED=True, QUERY_BUDGETS={'app_main:index': 0})
+    def test_budget_exceeded_warning(self):
+        with self.assertLogs('app_queries.middleware', logging.WARNING) as logs:
+            response = self.client.get(reverse('app_main:index'))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('app_main:index', logs.output[0])
+
+    @override_settings(QUERY_BUDGET_ENABLED=True, QUERY_BUDGET_STRICT=True, QUERY_BUDGETS={'app_main:index': 0})
+    def test_budget_exceeded_strict(self):
+        from app_queries.utils import QueryBudgetExceeded
+        with self.assertRaises(QueryBudgetExceeded):
+            self.client.get(reverse('app_main:index'))
+
+    @override_settings(QUERY_BUDGET_ENABLED=True, QUERY_BUDGET_STRICT=True, QUERY_BUDGETS={'app_main:index': 0})
+    def test_budget_not_checked_for_other_methods(self):
+        response = self.client.post(reverse('app_main:index'))
+        self.assertIn('X-Query-Count', response.headers)
+
+    def test_middleware_async_capable(self):
+        for path in settings.MIDDLEWARE:
+            middleware = import_string(path)
+            self.assertTrue(getattr(middleware, 'async_capable', False), path)
+
+    @override_settings(QUERY_BUDGET_ENABLED=True)
+    async def test_async_headers(self):
+        response = await self.async_client.get(reverse('app_main:index'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers['X-Query-Count'], '1')
+
+
+class RouteQueryBudgetTestCase(QueryBudgetTestMixin, TestCase):
+    """
+    Requests every route of the covered url configurations as an anonymous visitor and as the owner
+    of the objects, and fails when a request exceeds the budget of its view from QUERY_BUDGETS.
+    """
+    fixtures = [
+        'app_auth/fixtures/users.json',
+        'app_auth/fixtures/profiles.json',
+        'app_blog/fixtures/blogs.json',
+        'app_blog/fixtures/posts.json',
+        'app_blog/fixtures/images.json',
+    ]
+
+    @classmethod
+    def setUpTestData(cls):
+        Tag.objects.sync_posts(Post.objects.all())
+        cls.post = Post.objects.filter(is_published=True, images__isnull=False).order_by('pk').first()
+        cls.blog = cls.post.blog
+        cls.profile = Profile.objects.select_related('user').get(pk=cls.post.profile_id)
+        cls.image = cls.post.images.first()
+        cls.job = Job.objects.create(name='import_posts', owner=cls.profile.user)
+        cls.upload = Upload.objects.create(
+            owner=cls.profile.user, target=Upload.AVATAR, filename='avatar.png', size=10, checksum='0' * 64
+        )
+
+    def setUp(self) -> None:
+        cache.clear()
+
+    def get_routes(self):
+        """
+        Returns the routes to request: the name of the route, its kwargs and the query parameters.
+        """
+        profile, blog, post = {'pk': self.profile.pk}, {'pk': self.blog.pk}, {'pk': self.post.pk}
+        routes = [
+            ('app_blog:user_blog_list', profile, {}),
+            ('app_blog:blog_new', {}, {}),
+            ('app_blog:blog_detail', blog, {}),
+            ('app_blog:post_new', blog, {}),
+            ('app_blog:post_detail', post, {}),
+            ('app_blog:post_edit', post, {}),
+            ('app_blog:posts_latest', {}, {}),
+            ('app_blog:blog_edit', blog, {}),
+            ('app_blog:blog_delete', blog, {}),
+            ('app_blog:post_delete', post, {}),
+            ('app_blog:publish_or_archive', post, {}),
+            ('app_auth:get_started', {}, {}),
+            ('app_auth:profile_update', profile, {}),
+            ('app_auth:profile_detail', profile, {}),
+            ('app_auth:login', {}, {}),
+            ('app_auth:logout', {}, {}),
+            ('app_auth:profile_public', profile, {}),
+            ('app_main:index', {}, {}),
+            ('app_main:about', {}, {}),
+            ('app_main:contacts', {}, {}),
+            ('app_api:profile_list', {}, {}),
+            ('app_api:new_profile', {}, {}),
+            ('app_api:new_blog', {}, {}),
+            ('app_api:blog_list', {}, {}),
+            ('app_api:blog_detail', blog, {}),
+            ('app_api:new_post', {}, {}),
+            ('app_api:post_import', blog, {}),
+            ('app_api:post_detail', post, {}),
+            ('app_api:new_image', {}, {}),
+            ('app_api:image_detail', {'pk': self.image.pk}, {}),
+            ('app_api:post_list', {}, {}),
+            ('app_api:post_batch_create', {}, {}),
+            ('app_api:post_batch_publish', {}, {}),
+            ('app_api:post_batch_delete', {}, {}),
+            ('app_api:profile_update', profile, {}),
+            ('app_api:job_detail', {'pk': self.job.pk}, {}),
+            ('app_api:upload_create', {}, {}),
+            ('app_api:upload_detail', {'pk': self.upload.pk}, {}),
+            ('app_api:upload_finalize', {'pk': self.upload.pk}, {}),
+            ('app_api:search', {}, {'q': 'diversity'}),
+            ('app_api:tag_list', {}, {}),
+        ]
+        return routes
+
+    def test_every_route_is_covered(self):
+        covered = {name for name, _, _ in self.get_routes()}
+        for urlconf in COVERED_URLCONFS:
+            self.assertEqual(get_route_names(urlconf) - covered, set(), urlconf)
+
+    def test_routes_within_budget(self):
+        for name, kwargs, params in self.get_routes():
+            url = reverse(name, kwargs=kwargs)
+            # The registration and the login pages are only for the anonymous visitors.
+            visitors = (False,) if name in ('app_auth:get_started', 'app_auth:login') else (False, True)
+            for authenticated in visitors:
+                with self.subTest(route=name, authenticated=authenticated):
+                    if authenticated:
+                        self.client.force_login(self.profile.user)
+                    else:
+                        self.client.logout()
+                    cache.clear()
+                    self.assertWithinBudget(url, data=params)
+
+    def test_unnamed_routes_within_budget(self):
+        self.client.force_login(self.profile.user)
+        self.assertWithinBudget('/users/', budget=get_query_budget('app_auth:profile_detail'))
+        self.assertWithinBudget('/blogs/', budget=get_query_budget('app_blog:posts_latest'))
@@ -0,0 +1,129 @@
+"""
+The instrumentation of the database queries. The QueryRecorder counts the SQL queries executed
+on all the connections, their total time and the repeated ones: the same statement with the same
+parameters (a duplicate) or the same statement with different parameters executed many times,
+the usual sign of an N+1 pattern. The budgets of the views are taken from the QUERY_BUDGETS setting.
+"""
+from django.conf import settings
+from django.db import connections
+from django.urls import Resolver404, resolve
+from collections import Counter
+from contextlib import ExitStack
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+
+class QueryBudgetExceeded(Exception):
+    """
+    Raised by the QueryBudgetMiddleware in the strict mode when a request exceeds its budget
+    or repeats a statement too many times.
+    """
+
+
+class QueryRecorder:
+    """
+    A context manager recording the queries executed on all the database connections inside it.
+    The statements are recorded with the placeholders, so the queries differing only in the parameters
+    are recognized as the same statement.
+    """
+
+    def __init__(self) -> None:
+        self.queries: List[Tuple[str, Any, float]] = []
+        self._stack: Optional[ExitStack] = None
+
+    def __call__(self, execute: Callable, sql: str, params: Any, many: bool, context: Dict[str, Any]) -> Any:
+        """
+        The execute wrapper of the connections: runs the query and records its statement, parameters and time.
+        """
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append((sql, params, time.perf_counter() - start))
+
+    def __enter__(self) -> 'QueryRecorder':
+        self._stack = ExitStack()
+        for connection in connections.all():
+            self._stack.enter_context(connection.execute_wrapper(self))
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self._stack.close()
+        self._stack = None
+
+    @property
+    def count(self) -> int:
+        """
+        The number of the executed queries.
+        """
+        return len(self.queries)
+
+    @property
+    def duration(self) -> float:
+        """
+        The total time of the queries in seconds.
+        """
+        return sum(duration for _, _, duration in self.queries)
+
+    def get_statements(self) -> Counter:
+        """
+        Returns the number of the executions of every statement, ignoring the savepoints of the transactions.
+        """
+        return Counter(sql for sql, _, _ in self.queries if not sql.startswith(('SAVEPOINT', 'RELEASE SAVEPOINT')))
+
+    @property
+    def duplicates(self) -> int:
+        """
+        The number of the queries repeating an earlier query with the same statement and parameters.
+        """
+        executed = Counter(
+            (sql, repr(params)) for sql, params, _ in self.queries
+            if not sql.startswith(('SAVEPOINT', 'RELEASE SAVEPOINT'))
+        )
+        return sum(times - 1 for times in executed.values())
+
+    def get_repeated(self, threshold: Optional[int] = None) -> Dict[str, int]:
+        """
+        Returns the statements executed more than the threshold times (QUERY_BUDGET_MAX_REPEATS by default)
+        with the number of their executions.
+        """
+        threshold = settings.QUERY_BUDGET_MAX_REPEATS if threshold is None else threshold
+        return {sql: times for sql, times in self.get_statements().items() if times > threshold}
+
+    def get_report(self) -> str:
+        """
+        Returns the description of the recorded queries for the logs and the failed assertions.
+        """
+        lines = [f'{self.count} queries, {self.duplicates} duplicates, {self.duration * 1000:.1f} ms']
+        lines.extend(f'{times}x {sql}' for sql, times in self.get_statements().most_common() if times > 1)
+        return '\n'.join(lines)
+
+
+def get_view_name(path: str) -> Optional[str]:
+    """
+    Returns the name of the view with the namespace resolved from the path, or None if it can't be resolved.
+    """
+    try:
+        return resolve(path).view_name
+    except Resolver404:
+        return None
+
+
+def get_query_budget(view_name: Optional[str]) -> int:
+    """
+    Returns the maximum number of the queries of the view from QUERY_BUDGETS or QUERY_BUDGET_DEFAULT.
+    """
+    return settings.QUERY_BUDGETS.get(view_name, settings.QUERY_BUDGET_DEFAULT)
+
+
+def get_budget_errors(recorder: QueryRecorder, budget: int) -> List[str]:
+    """
+    Returns the descriptions of the violations of the budget and of the repeated statements.
+    """
+    errors = []
+    if recorder.count > budget:
+        errors.append(f'{recorder.count} queries executed, the budget is {budget}')
+    errors.extend(
+        f'the statement is executed {times} times: {sql}' for sql, times in recorder.get_repeated().items()
+    )
+    return errors
@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class AppRssConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'app_rss'
+
+    def ready(self) -> None:
+        """
+        Connects the receivers that delete the cached feeds.
+        """
+        from . import signals  # noqa: F401
@@ -1,28 +1,123 @@
+from asgiref.sync import markcoroutinefunction, sync_to_async
+from django.conf import settings
 from django.contrib.syndication.views import Feed
+from django.core.cache import cache
 from django.db.models import QuerySet
-from django.shortcuts import reverse
+from django.http import HttpRequest, HttpResponse
+from django.shortcuts import reverse, get_object_or_404
+from django.utils.cache import get_conditional_response
 from django.utils.feedgenerator import Atom1Feed
-from app_blog.models import Post
+from django.utils.http import http_date, parse_http_date_safe
+from app_auth.models import Profile
+from app_blog.models import Blog, Post
+from app_cache.utils import aget_group_versions
 from django.db.models import F
+from datetime import datetime
+from hashlib import md5
 import re
-from typing import Dict, Union
-from django.contrib.sites.requests import RequestSite
+from typing import Dict, Optional, Union
 
-class LatestPostsFeed(Feed):
+FEED_CACHE_PREFIX = 'feeds'
+
+
+def get_feed_group(name: str, pk: Optional[int] = None) -> str:
+    """
+    Returns the group of the feed with the passed name and the pk of its object (see app_cache.utils).
+    """
+    if pk is None:
+        return f'{FEED_CACHE_PREFIX}:{name}'
+    return f'{FEED_CACHE_PREFIX}:{name}:{pk}'
+
+
+def get_feed_cache_key(group: str, version: str) -> str:
+    """
+    Returns the cache key of the serialized feed of the group with the passed version.
+    """
+    return f'{group}:{version}'
+
+
+class CachedFeed(Feed):
+    """
+    A feed that serves the serialized XML from the cache. The XML is generated only if it's missing
+    in the cache, so the feed readers polling it don't touch the database.
+    The feed has absolute urls, so the cache key of the feed holds the XML of every scheme and host
+    it was requested with. The key contains the version of the group of the feed, which the receivers
+    in app_rss.signals change to invalidate all of them at once, so a feed rendered concurrently
+    with the invalidation is stored under the old version and never served.
+    The feeds expire after FEED_CACHE_TIMEOUT seconds.
+    Every response has the ETag and Last-Modified headers, and the conditional requests
+    get the 304 response.
+    The feed is an async view: the cached feed is served without leaving the event loop,
+    and only a missing feed is generated by the synchronous syndication framework in a thread.
+    """
+    cache_name = 'posts'
+
+    def __init__(self) -> None:
+        super().__init__()
+        markcoroutinefunction(self)
+
+    def get_cache_group(self, *args, **kwargs) -> str:
+        """
+        Returns the group of the feed. Uses the pk from the url kwargs, if there is one.
+        """
+        return get_feed_group(self.cache_name, kwargs.get('pk'))
+
+    def generate(self, request: HttpRequest, *args, **kwargs) -> Dict[str, Union[bytes, str, Optional[int]]]:
+        """
+        Renders the feed and returns its content with the validators for the conditional requests.
+        """
+        response = super().__call__(request, *args, **kwargs)
+        return {
+            'content': response.content,
+            'content_type': response['Content-Type'],
+            'etag': f'"{md5(response.content).hexdigest()}"',
+            'last_modified': parse_http_date_safe(response.get('Last-Modified', '')),
+        }
+
+    async def __call__(self, request: HttpRequest, *args, **kwargs) -> HttpResponse:
+        """
+        Returns the cached feed, generating it if needed. Returns 304 if the client already has it.
+        """
+        group = self.get_cache_group(*args, **kwargs)
+        key = get_feed_cache_key(group, (await aget_group_versions([group]))[0])
+        site_url = f'{request.scheme}://{request.get_host()}'
+        feeds = await cache.aget(key) or {}
+        feed = feeds.get(site_url)
+        if feed is None:
+            feed = await sync_to_async(self.generate)(request, *args, **kwargs)
+            await cache.aset(key, {**feeds, site_url: feed}, timeout=settings.FEED_CACHE_TIMEOUT)
+
+        response = get_conditional_response(request, etag=feed['etag'], last_modified=feed['last_modified'])
+        if response is None:
+            response = HttpResponse(feed['content'], content_type=feed['content_type'])
+        response.headers['ETag'] = feed['etag']
+        if feed['last_modified'] is not None:
+            response.headers['Last-Modified'] = http_date(feed['last_modified'])
+        return response
+
+
+class LatestPostsFeed(CachedFeed):
     """
     A feed that shows the last five published posts.
     """
     title = 'Posts'
     link = '/siteposts/'
     description = 'The latest published posts'
+    items_limit = 5
 
     feed_type = Atom1Feed
 
-    def items(self) -> QuerySet:
+    def get_queryset(self, obj=None) -> QuerySet:
+        """
+        Returns the published posts with the username of their authors.
+        """
+        return Post.objects.annotate(profile_username=F('profile__user__username')).filter(is_published=True)
+
+    def items(self, obj=None) -> QuerySet:
         """
         Retrieves five latest published Post instances.
         """
-        return Post.objects.select_related('profile').annotate(profile_username=F('profile__user__username')).filter(is_published=True).order_by('-published_at')[:5]
+        return self.get_queryset(obj).order_by('-published_at', '-id')[:self.items_limit]
 
     def item_title(self, item: Post) -> str:
         """
@@ -44,15 +139,99 @@ class LatestPostsFeed(Feed):
 
     def item_author_name(self, item: Post) -> str:
         """
-        Returns the profile field (the Profile model has an __str__ method that returns the field user.username)
-        of the retrieved Post instance.
+        Returns the username of the author annotated in the queryset, so it doesn't
+        query the Profile and User instances for every item.
+        """
+        return item.profile_username
+
+    def item_pubdate(self, item: Post) -> datetime:
+        """
+        Returns the publication date of the post. Also used for the Last-Modified header.
+        """
+        return item.published_at
+
+    async def aitems(self, obj=None) -> QuerySet:
+        """
+        Returns the items with their results retrieved with the async ORM,
+        so iterating over them doesn't query the database.
+        """
+        items = self.items(obj)
+        async for _ in items:
+            pass
+        return items
+
+
+class BlogPostsFeed(LatestPostsFeed):
+    """
+    A feed that shows the latest published posts of the blog.
+    """
+    cache_name = 'blog'
+    items_limit = 20
+
+    def get_object(self, request: HttpRequest, pk: int) -> Blog:
+        """
+        Retrieves the Blog instance by the pk passed in the url.
+        """
+        return get_object_or_404(Blog, pk=pk)
+
+    def title(self, obj: Blog) -> str:
+        """
+        Returns the title of the blog.
+        """
+        return obj.title
+
+    def link(self, obj: Blog) -> str:
+        """
+        Generates a link to the page of the blog.
+        """
+        return reverse('app_blog:blog_detail', kwargs={'pk': obj.pk})
+
+    def description(self, obj: Blog) -> str:
+        """
+        Returns the description of the blog.
+        """
+        return obj.description
+
+    def get_queryset(self, obj: Blog = None) -> QuerySet:
+        """
+        Returns the published posts of the blog.
+        """
+        return super().get_queryset(obj).filter(blog=obj)
+
+
+class ProfilePostsFeed(LatestPostsFeed):
+    """
+    A feed that shows the latest published posts of the author.
+    """
+    cache_name = 'profile'
+    items_limit = 20
+
+    def get_object(self, request: HttpRequest, pk: int) -> Profile:
+        """
+        Retrieves the Profile instance by the pk passed in the url.
+        """
+        return get_object_or_404(Profile.objects.select_related('user'), pk=pk)
+
+    def title(self, obj: Profile) -> str:
+        """
+        Returns the title with the username of the author.
+        """
+        return f'Posts by {obj.user.username}'
+
+    def link(self, obj: Profile) -> str:
+        """
+        Generates a link to the public page of the author.
+        """
+        return reverse('app_auth:profile_public', kwargs={'pk': obj.pk})
+
+    def description(self, obj: Profile) -> str:
+        """
+        Returns the description with the username of the author.
         """
-        return item.profile
+        return f'The latest published posts by {obj.user.username}'
 
-    def get_context_data(self, **kwargs) -> Dict[str, Union[Post, RequestSite, QuerySet]]:
+    def get_queryset(self, obj: Profile = None) -> QuerySet:
         """
-        Adds 'latest_posts' key to the context with the passed items as a value.
+        Returns the published posts of the author.
         """
-        context = super().get_context_data(**kwargs)
-        context['latest_posts'] = self.items()
-        return context
+        return super().get_queryset(obj).filter(profile=obj)
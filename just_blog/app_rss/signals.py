@@ -0,0 +1,84 @@
+"""
+Receivers that invalidate the cached feeds (see app_rss.feeds.CachedFeed) by changing the versions
+of their groups, so they are generated again on the next request.
+The feeds are invalidated when a post is published or archived, when a published post
+is changed or deleted, when the blog of the feed is changed, and when the author of the posts
+(the profile or the name of the user) is changed.
+"""
+from django.contrib.auth.models import User
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from app_auth.models import Profile
+from app_blog.models import Blog, Post
+from app_blog.signals import post_published, post_archived
+from app_cache.utils import invalidate_groups
+from .feeds import get_feed_group
+
+
+def invalidate_post_feeds(post: Post) -> None:
+    """
+    Invalidates the latest posts feed and the feeds of the blog and the author of the post.
+    """
+    invalidate_groups(
+        get_feed_group('posts'),
+        get_feed_group('blog', post.blog_id),
+        get_feed_group('profile', post.profile_id),
+    )
+
+
+@receiver(post_published, sender=Post)
+@receiver(post_archived, sender=Post)
+def invalidate_feeds_on_publication(sender, instance: Post, **kwargs) -> None:
+    """
+    Invalidates the feeds when the post is published or archived.
+    """
+    invalidate_post_feeds(instance)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def invalidate_feeds_on_change(sender, instance: Post, **kwargs) -> None:
+    """
+    Invalidates the feeds when a published post is changed or deleted.
+    """
+    if instance.is_published:
+        invalidate_post_feeds(instance)
+
+
+@receiver(post_save, sender=Blog)
+@receiver(post_delete, sender=Blog)
+def invalidate_blog_feed(sender, instance: Blog, **kwargs) -> None:
+    """
+    Invalidates the feed of the blog when its title or description is changed.
+    """
+    invalidate_groups(get_feed_group('blog', instance.pk))
+
+
+@receiver(post_save, sender=Profile)
+@receiver(post_delete, sender=Profile)
+def invalidate_profile_feed(sender, instance: Profile, **kwargs) -> None:
+    """
+    Invalidates the feed of the author when the profile is changed.
+    """
+    invalidate_groups(get_feed_group('profile', instance.pk))
+
+
+@receiver(post_save, sender=User)
+def invalidate_user_feeds(sender, instance: User, created: bool, update_fields=None, raw: bool = False,
+                          **kwargs) -> None:
+    """
+    Invalidates the feeds showing the name of the changed user: the feeds of its profiles and,
+    if some of its posts are published, the latest posts feed and the feeds of their blogs.
+    The updates of the time of the last login are skipped.
+    """
+    if created or raw or (update_fields is not None and set(update_fields) <= {'last_login'}):
+        return
+    profile_ids = Profile.objects.filter(user=instance).values_list('pk', flat=True)
+    groups = [get_feed_group('profile', pk) for pk in profile_ids]
+    blog_ids = list(Post.objects.filter(profile__user=instance, is_published=True).order_by().values_list(
+        'blog_id', flat=True
+    ).distinct())
+    if blog_ids:
+        groups.append(get_feed_group('posts'))
+        groups.extend(get_feed_group('blog', blog_id) for blog_id in blog_ids)
+    invalidate_groups(*groups)
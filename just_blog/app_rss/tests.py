@@ -1,3 +1,132 @@
 from django.test import TestCase
+from django.shortcuts import reverse
+from django.core.cache import cache
+from app_blog.models import Post
+from app_rss.feeds import CachedFeed
+from app_rss.signals import invalidate_post_feeds
+from unittest import mock
+from random import choice
 
-# Create your tests here.
+
+class PostsFeedTestCase(TestCase):
+    fixtures = [
+        'app_auth/fixtures/users.json',
+        'app_auth/fixtures/profiles.json',
+        'app_blog/fixtures/blogs.json',
+        'app_blog/fixtures/posts.json',
+    ]
+
+    def setUp(self) -> None:
+        cache.clear()
+        self.url = reverse('app_rss:posts_feed')
+        self.random_post = choice(Post.objects.select_related('profile__user').filter(is_published=True))
+
+    def test_posts_feed(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('ETag', response)
+        self.assertIn('Last-Modified', response)
+        latest_post = Post.objects.filter(is_published=True).order_by('-published_at', '-id').first()
+        self.assertContains(response, reverse('app_blog:post_detail', kwargs={'pk': latest_post.pk}))
+
+        with self.assertNumQueries(0):
+            cached_response = self.client.get(self.url)
+        self.assertEqual(cached_response.content, response.content)
+
+    async def test_posts_feed_async(self):
+        await cache.aclear()
+        self.addCleanup(cache.clear)
+        response = await self.async_client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        etag_response = await self.async_client.get(self.url, headers={'If-None-Match': response['ETag']})
+        self.assertEqual(etag_response.status_code, 304)
+
+    def test_posts_feed_conditional(self):
+        response = self.client.get(self.url)
+        etag_response = self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(etag_response.status_code, 304)
+        date_response = self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(date_response.status_code, 304)
+        stale_response = self.client.get(self.url, HTTP_IF_NONE_MATCH='"stale"')
+        self.assertEqual(stale_response.status_code, 200)
+
+    def test_posts_feed_regenerated(self):
+        response = self.client.get(self.url)
+        draft = Post.objects.create(
+            title='a new feed post', tag='tag', content='content',
+            blog=self.random_post.blog, profile=self.random_post.profile
+        )
+        self.assertEqual(self.client.get(self.url).content, response.content)
+        draft.publish()
+        new_response = self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(new_response.status_code, 200)
+        self.assertContains(new_response, 'a new feed post')
+        draft.archive()
+        self.assertNotContains(self.client.get(self.url), 'a new feed post')
+
+    def test_blog_and_profile_feeds(self):
+        blog_url = reverse('app_rss:blog_feed', kwargs={'pk': self.random_post.blog.pk})
+        blog_response = self.client.get(blog_url)
+        self.assertEqual(blog_response.status_code, 200)
+        self.assertContains(blog_response, self.random_post.blog.title)
+        self.assertContains(blog_response, reverse('app_blog:post_detail', kwargs={'pk': self.random_post.pk}))
+
+        profile_url = reverse('app_rss:profile_feed', kwargs={'pk': self.random_post.profile.pk})
+        profile_response = self.client.get(profile_url)
+        self.assertEqual(profile_response.status_code, 200)
+        self.assertContains(profile_response, self.random_post.profile.user.username)
+
+        self.random_post.archive()
+        self.assertNotContains(
+            self.client.get(blog_url),
+            reverse('app_blog:post_detail', kwargs={'pk': self.random_post.pk})
+        )
+
+    def test_missing_blog_feed(self):
+        response = self.client.get(reverse('app_rss:blog_feed', kwargs={'pk': 10 ** 6}))
+        self.assertEqual(response.status_code, 404)
+
+    def test_posts_feed_per_site(self):
+        response = self.client.get(self.url)
+        self.assertContains(response, 'http://')
+        secure_response = self.client.get(self.url, secure=True)
+        self.assertContains(secure_response, 'https://')
+        self.assertNotContains(secure_response, 'http://example.com')
+        self.assertEqual(self.client.get(self.url).content, response.content)
+
+    def test_feed_invalidated_while_rendering(self):
+        latest_post = Post.objects.filter(is_published=True).order_by('-published_at', '-id').first()
+        generate = CachedFeed.generate
+
+        def generate_stale(feed, *args, **kwargs):
+            result = generate(feed, *args, **kwargs)
+            # The post is renamed and the feeds are invalidated while the feed is rendering.
+            Post.objects.filter(pk=latest_post.pk).update(title='a renamed feed post')
+            invalidate_post_feeds(latest_post)
+            return result
+
+        with mock.patch.object(CachedFeed, 'generate', generate_stale):
+            stale_response = self.client.get(self.url)
+        self.assertNotContains(stale_response, 'a renamed feed post')
+        self.assertContains(self.client.get(self.url), 'a renamed feed post')
+
+    def test_feeds_invalidated_on_author_change(self):
+        latest_post = Post.objects.select_related('profile__user').filter(is_published=True).order_by(
+            '-published_at', '-id'
+        ).first()
+        urls = [
+            self.url,
+            reverse('app_rss:blog_feed', kwargs={'pk': latest_post.blog_id}),
+            reverse('app_rss:profile_feed', kwargs={'pk': latest_post.profile_id}),
+        ]
+        for url in urls:
+            self.client.get(url)
+        user = latest_post.profile.user
+        user.username = 'renamed-feed-author'
+        user.save()
+        for url in urls:
+            self.assertContains(self.client.get(url), 'renamed-feed-author')
+
+        user.save(update_fields=['last_login'])
+        with self.assertNumQueries(0):
+            self.client.get(self.url)
@@ -1,9 +1,11 @@
 from django.urls import path
-from .feeds import LatestPostsFeed
+from .feeds import LatestPostsFeed, BlogPostsFeed, ProfilePostsFeed
 
 
 app_name = 'app_rss'
 
 urlpatterns = [
-    path('', LatestPostsFeed(), name='posts_feed')
-]
\ No newline at end of file
+    path('', LatestPostsFeed(), name='posts_feed'),
+    path('blog/<int:pk>/', BlogPostsFeed(), name='blog_feed'),
+    path('author/<int:pk>/', ProfilePostsFeed(), name='profile_feed'),
+]
@@ -0,0 +1,12 @@
+from django.apps import AppConfig
+
+
+class AppSearchConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'app_search'
+
+    def ready(self) -> None:
+        """
+        Connects the receivers that keep the search index in sync with the published posts.
+        """
+        from . import signals  # noqa: F401
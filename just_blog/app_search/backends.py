@@ -0,0 +1,247 @@
+"""
+The search backends. Every backend keeps an index of the published posts (their title, tag and content),
+and returns the ids of the posts matching a query ranked by relevance, with the highlighted title and
+a snippet of the content. The backend is chosen with the SEARCH_BACKEND setting.
+"""
+from django.conf import settings
+from django.db import connection
+from django.db.models import Case, IntegerField, Q, QuerySet, Value, When
+from django.utils.html import escape
+from django.utils.module_loading import import_string
+from django.utils.safestring import SafeString, mark_safe
+from app_blog.models import Post
+from functools import lru_cache
+import re
+from typing import List, Optional
+
+# The markers of the matched terms in the highlighted text. The text is escaped first
+# and then the markers are replaced with the <mark> tags, so the tags are the only markup in the result.
+MARK_START = '\x02'
+MARK_END = '\x03'
+ELLIPSIS = '…'
+
+
+class SearchHit:
+    """
+    A post matching the query: its id, the relevance (the higher, the better),
+    the highlighted title and the highlighted snippet of the content.
+    """
+
+    def __init__(self, pk: int, rank: float, title: str, snippet: str) -> None:
+        self.pk = pk
+        self.rank = rank
+        self.title = title
+        self.snippet = snippet
+
+
+def get_terms(query: str) -> List[str]:
+    """
+    Splits the query into the lowercase words, ignoring the punctuation and the operators of the search syntax.
+    """
+    return re.findall(r'\w+', query.lower())[:settings.SEARCH_MAX_TERMS]
+
+
+def render_marks(text: str) -> SafeString:
+    """
+    Escapes the text and replaces the markers of the matched terms with the <mark> tags.
+    """
+    return mark_safe(escape(text).replace(MARK_START, '<mark>').replace(MARK_END, '</mark>'))
+
+
+class BaseSearchBackend:
+    """
+    The interface of the search backends.
+    """
+
+    def index(self, post: Post) -> None:
+        """
+        Adds the published post to the index or updates it. Removes the post if it isn't published.
+        """
+        raise NotImplementedError
+
+    def remove(self, pk: int) -> None:
+        """
+        Removes the post from the index.
+        """
+        raise NotImplementedError
+
+    def rebuild(self) -> int:
+        """
+        Recreates the index from all the published posts and returns their number.
+        """
+        raise NotImplementedError
+
+    def search(self, query: str, limit: int, offset: int = 0) -> List[SearchHit]:
+        """
+        Returns the slice of the posts matching the query, the most relevant first.
+        """
+        raise NotImplementedError
+
+    def count(self, query: str) -> int:
+        """
+        Returns the number of the posts matching the query.
+        """
+        raise NotImplementedError
+
+
+class Fts5SearchBackend(BaseSearchBackend):
+    """
+    A backend using the SQLite FTS5 virtual table created by the migration of app_search.
+    The rowid of the table is the id of the post. The posts are ranked with bm25,
+    where a match in the title weighs more than in the tag, and in the tag more than in the content.
+    """
+    table = 'app_search_post_fts'
+    weights = (10.0, 5.0, 1.0)
+    snippet_tokens = 24
+
+    def build_match(self, query: str) -> Optional[str]:
+        """
+        Builds the MATCH expression: all the words of the query, the last one as a prefix,
+        so the results appear while the user is typing. Returns None if there are no words.
+        """
+        terms = get_terms(query)
+        if not terms:
+            return None
+        return ' '.join(f'"{term}"' for term in terms) + '*'
+
+    def index(self, post: Post) -> None:
+        self.remove(post.pk)
+        if post.is_published:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f'INSERT INTO {self.table} (rowid, title, tag, content) VALUES (%s, %s, %s, %s)',
+                    [post.pk, post.title, post.tag, post.content]
+                )
+
+    def remove(self, pk: int) -> None:
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.table} WHERE rowid = %s', [pk])
+
+    def rebuild(self) -> int:
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.table}')
+            cursor.execute(
+                f'INSERT INTO {self.table} (rowid, title, tag, content) '
+                f'SELECT id, title, tag, content FROM {Post._meta.db_table} WHERE is_published'
+            )
+            count = cursor.rowcount
+            cursor.execute(f"INSERT INTO {self.table} ({self.table}) VALUES ('optimize')")
+        return count
+
+    def search(self, query: str, limit: int, offset: int = 0) -> List[SearchHit]:
+        match = self.build_match(query)
+        if match is None:
+            return []
+        weights = ', '.join(str(weight) for weight in self.weights)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT rowid, bm25({self.table}, {weights}) AS rank, '
+                f'highlight({self.table}, 0, %s, %s), '
+                f'snippet({self.table}, 2, %s, %s, %s, %s) '
+                f'FROM {self.table} WHERE {self.table} MATCH %s ORDER BY rank LIMIT %s OFFSET %s',
+                [MARK_START, MARK_END, MARK_START, MARK_END, ELLIPSIS, self.snippet_tokens, match, limit, offset]
+            )
+            return [
+                SearchHit(pk, -rank, render_marks(title), render_marks(snippet))
+                for pk, rank, title, snippet in cursor.fetchall()
+            ]
+
+    def count(self, query: str) -> int:
+        match = self.build_match(query)
+        if match is None:
+            return 0
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT count(*) FROM {self.table} WHERE {self.table} MATCH %s', [match])
+            return cursor.fetchone()[0]
+
+
+class DatabaseSearchBackend(BaseSearchBackend):
+    """
+    A backend for the databases without full-text search. It needs no index
+    and looks for the words of the query in the title, tag and content of the published posts with icontains.
+    The posts are ranked by the fields where the words were found.
+    """
+    weights = {'title': 10, 'tag': 5, 'content': 1}
+    snippet_length = 160
+
+    def index(self, post: Post) -> None:
+        pass
+
+    def remove(self, pk: int) -> None:
+        pass
+
+    def rebuild(self) -> int:
+        return Post.objects.filter(is_published=True).count()
+
+    def get_queryset(self, terms: List[str]) -> QuerySet:
+        """
+        Returns the published posts containing every word in any of the fields.
+        """
+        queryset = Post.objects.filter(is_published=True)
+        for term in terms:
+            queryset = queryset.filter(
+                Q(title__icontains=term) | Q(tag__icontains=term) | Q(content__icontains=term)
+            )
+        return queryset
+
+    def mark(self, text: str, terms: List[str]) -> str:
+        """
+        Surrounds the words of the query found in the text with the markers.
+        """
+        pattern = '|'.join(re.escape(term) for term in terms)
+        return re.sub(f'({pattern})', f'{MARK_START}\\1{MARK_END}', text, flags=re.IGNORECASE)
+
+    def get_snippet(self, content: str, terms: List[str]) -> str:
+        """
+        Cuts the part of the content around the first found word.
+        """
+        lower_content = content.lower()
+        positions = [lower_content.find(term) for term in terms if term in lower_content]
+        start = max(0, min(positions, default=0) - self.snippet_length // 4)
+        snippet = content[start:start + self.snippet_length]
+        if start:
+            snippet = ELLIPSIS + snippet
+        if start + self.snippet_length < len(content):
+            snippet += ELLIPSIS
+        return self.mark(snippet, terms)
+
+    def search(self, query: str, limit: int, offset: int = 0) -> List[SearchHit]:
+        terms = get_terms(query)
+        if not terms:
+            return []
+        rank = sum(
+            (
+                Case(
+                    When(**{f'{field}__icontains': term}, then=Value(weight)),
+                    default=Value(0),
+                    output_field=IntegerField()
+                )
+                for field, weight in self.weights.items() for term in terms
+            ),
+            Value(0)
+        )
+        posts = self.get_queryset(terms).annotate(
+            search_rank=rank
+        ).order_by('-search_rank', '-published_at', '-id').values_list(
+            'pk', 'search_rank', 'title', 'content'
+        )[offset:offset + limit]
+        return [
+            SearchHit(
+                pk, float(rank), render_marks(self.mark(title, terms)), render_marks(self.get_snippet(content, terms))
+            )
+            for pk, rank, title, content in posts
+        ]
+
+    def count(self, query: str) -> int:
+        terms = get_terms(query)
+        if not terms:
+            return 0
+        return self.get_queryset(terms).count()
+
+
+@lru_cache(maxsize=None)
+def get_backend() -> BaseSearchBackend:
+    """
+    Returns the instance of the backend from the SEARCH_BACKEND setting.
+    """
+    return import_string(settings.SEARCH_BACKEND)()
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from app_search.backends import get_backend
+
+
+class Command(BaseCommand):
+    """
+    Recreates the search index from all the published posts.
+    """
+    help = 'Recreates the search index from all the published posts.'
+
+    def handle(self, *args, **options) -> None:
+        count = get_backend().rebuild()
+        self.stdout.write(self.style.SUCCESS(f'{count} posts are indexed'))
@@ -0,0 +1,41 @@
+from django.db import migrations
+
+FTS_TABLE = 'app_search_post_fts'
+
+
+def create_index(apps, schema_editor) -> None:
+    """
+    Creates the FTS5 table of the published posts and fills it. Only on SQLite.
+    """
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} "
+        f"USING fts5(title, tag, content, tokenize='unicode61 remove_diacritics 2')"
+    )
+    schema_editor.execute(
+        f'INSERT INTO {FTS_TABLE} (rowid, title, tag, content) '
+        f'SELECT id, title, tag, content FROM app_blog_post WHERE is_published'
+    )
+
+
+def drop_index(apps, schema_editor) -> None:
+    """
+    Drops the FTS5 table.
+    """
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('app_blog', '0005_image_image_derivatives'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
@@ -0,0 +1,39 @@
+"""
+Receivers that keep the search index in sync with the published posts.
+The changes made with QuerySet.update() or bulk_create() are not tracked:
+run the rebuild_search_index command after them.
+"""
+from django.core.signals import setting_changed
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from app_blog.models import Post
+from app_blog.signals import post_published, post_archived
+from .backends import get_backend
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_published, sender=Post)
+@receiver(post_archived, sender=Post)
+def index_post(sender, instance: Post, **kwargs) -> None:
+    """
+    Adds the post to the index or updates it. Removes it if it isn't published.
+    Post.publish() and Post.archive() update the post without saving it, so their signals are received too.
+    """
+    get_backend().index(instance)
+
+
+@receiver(post_delete, sender=Post)
+def remove_post(sender, instance: Post, **kwargs) -> None:
+    """
+    Removes the deleted post from the index.
+    """
+    get_backend().remove(instance.pk)
+
+
+@receiver(setting_changed)
+def reset_backend(setting: str, **kwargs) -> None:
+    """
+    Resets the instance of the backend when the SEARCH_BACKEND setting is changed in the tests.
+    """
+    if setting == 'SEARCH_BACKEND':
+        get_backend.cache_clear()
@@ -0,0 +1,125 @@
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection
+from django.shortcuts import reverse
+from django.test import TestCase, override_settings
+from rest_framework import status
+from rest_framework.test import APITestCase
+from app_auth.models import Profile
+from app_blog.models import Blog, Post
+from app_search.backends import Fts5SearchBackend, DatabaseSearchBackend
+from app_search.utils import SearchResults
+import os
+
+
+class SearchTestMixin:
+
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user(username='searcher', password='searcher-password')
+        profile = Profile.objects.create(user=user)
+        blog = Blog.objects.create(profile=profile, title='search blog', description='description')
+        cls.title_post = Post.objects.create(
+            title='Gardening in winter', tag='plants', content='How to keep the roses alive.',
+            blog=blog, profile=profile
+        )
+        cls.content_post = Post.objects.create(
+            title='A diary', tag='life', content='Today I read about gardening and <script>tags</script>.',
+            blog=blog, profile=profile
+        )
+        cls.draft = Post.objects.create(
+            title='Gardening draft', tag='plants', content='Not published yet.', blog=blog, profile=profile
+        )
+        cls.title_post.publish()
+        cls.content_post.publish()
+
+
+class Fts5SearchBackendTestCase(SearchTestMixin, TestCase):
+    backend_class = Fts5SearchBackend
+
+    def setUp(self) -> None:
+        self.backend = self.backend_class()
+
+    def test_ranked_results(self):
+        hits = self.backend.search('gardening', limit=10)
+        self.assertEqual([hit.pk for hit in hits], [self.title_post.pk, self.content_post.pk])
+        self.assertGreater(hits[0].rank, hits[1].rank)
+        self.assertEqual(self.backend.count('gardening'), 2)
+
+    def test_highlight_and_escape(self):
+        hit = self.backend.search('gardening', limit=10)[1]
+        self.assertIn('<mark>gardening</mark>', hit.snippet)
+        self.assertNotIn('<script>', hit.snippet)
+        self.assertIn('&lt;script&gt;', hit.snippet)
+        self.assertIn('<mark>Gardening</mark>', self.backend.search('gardening', limit=1)[0].title)
+
+    def test_prefix_and_syntax(self):
+        self.assertEqual(self.backend.count('gard'), 2)
+        self.assertEqual(self.backend.count('roses gard'), 1)
+        self.assertEqual(self.backend.count('"gardening" (*'), 2)
+        self.assertEqual(self.backend.count('!!!'), 0)
+
+    def test_index_sync(self):
+        self.title_post.archive()
+        self.assertEqual(self.backend.count('gardening'), 1)
+        self.draft.publish()
+        self.assertEqual(self.backend.count('gardening'), 2)
+        self.content_post.content = 'Nothing about plants anymore.'
+        self.content_post.save()
+        self.assertEqual(self.backend.count('gardening'), 1)
+        self.draft.delete()
+        self.assertEqual(self.backend.count('gardening'), 0)
+
+    def test_rebuild(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {Fts5SearchBackend.table}')
+        self.assertEqual(self.backend.count('gardening'), 0)
+        call_command('rebuild_search_index', stdout=open(os.devnull, 'w'))
+        self.assertEqual(self.backend.count('gardening'), 2)
+
+
+@override_settings(SEARCH_BACKEND='app_search.backends.DatabaseSearchBackend')
+class DatabaseSearchBackendTestCase(Fts5SearchBackendTestCase):
+    backend_class = DatabaseSearchBackend
+
+    def test_rebuild(self):
+        self.assertEqual(self.backend.rebuild(), 2)
+
+    def test_search_results(self):
+        results = SearchResults('gardening')
+        self.assertIsInstance(results.backend, DatabaseSearchBackend)
+        self.assertEqual(len(results), 2)
+        self.assertEqual(results[1:2][0].pk, self.content_post.pk)
+
+
+class SearchViewTestCase(SearchTestMixin, TestCase):
+
+    def test_search_page(self):
+        response = self.client.get(reverse('app_search:search'), {'q': 'gardening'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([post.pk for post in response.context['posts']], [self.title_post.pk, self.content_post.pk])
+        self.assertContains(response, '<mark>Gardening</mark>', html=False)
+        self.assertNotContains(response, '<script>tags', html=False)
+
+    def test_empty_query(self):
+        response = self.client.get(reverse('app_search:search'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(list(response.context['posts']), [])
+
+
+class SearchAPITestCase(SearchTestMixin, APITestCase):
+
+    def test_search_api(self):
+        response = self.client.get(reverse('app_api:search'), {'q': 'gardening', 'limit': 1})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 2)
+        self.assertEqual(len(response.data['results']), 1)
+        result = response.data['results'][0]
+        self.assertEqual(result['id'], self.title_post.pk)
+        self.assertEqual(result['highlighted_title'], '<mark>Gardening</mark> in winter')
+        self.assertEqual(result['profile']['username'], 'searcher')
+        self.assertIsNotNone(response.data['next'])
+
+    def test_search_api_without_query(self):
+        response = self.client.get(reverse('app_api:search'))
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
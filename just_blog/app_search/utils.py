@@ -0,0 +1,51 @@
+from app_blog.models import Post
+from .backends import BaseSearchBackend, get_backend
+from typing import List, Optional, Union
+
+
+class SearchResults:
+    """
+    A lazy sequence of the posts matching the query, for the Django and DRF paginators.
+    The number of the results and every slice are retrieved from the search backend only when requested.
+    The posts of a slice have the extra attributes search_rank, search_title and search_snippet.
+    """
+
+    def __init__(self, query: str, backend: Optional[BaseSearchBackend] = None) -> None:
+        self.query = query
+        self.backend = backend or get_backend()
+        self._count: Optional[int] = None
+
+    def count(self) -> int:
+        """
+        Returns the number of the posts matching the query.
+        """
+        if self._count is None:
+            self._count = self.backend.count(self.query)
+        return self._count
+
+    def __len__(self) -> int:
+        return self.count()
+
+    def __getitem__(self, item: Union[slice, int]) -> Union[List[Post], Post]:
+        """
+        Retrieves the slice of the hits from the backend and the posts with their blogs and authors in one query.
+        The posts deleted after they were found are skipped.
+        """
+        if isinstance(item, int):
+            return self[item:item + 1][0]
+        start = item.start or 0
+        stop = self.count() if item.stop is None else item.stop
+        if stop <= start:
+            return []
+        hits = self.backend.search(self.query, limit=stop - start, offset=start)
+        posts = Post.objects.select_related('blog', 'profile__user').in_bulk([hit.pk for hit in hits])
+        results = []
+        for hit in hits:
+            post = posts.get(hit.pk)
+            if post is None:
+                continue
+            post.search_rank = hit.rank
+            post.search_title = hit.title
+            post.search_snippet = hit.snippet
+            results.append(post)
+        return results
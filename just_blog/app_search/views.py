@@ -0,0 +1,41 @@
+from django.conf import settings
+from django.views.generic import ListView
+from app_auth.models import Profile
+from app_auth.utils import get_profile_for_context
+from .utils import SearchResults
+from typing import Dict, List, Union
+
+
+class SearchView(ListView):
+    """
+    A view for the search of the published posts by the words in the q parameter.
+    The posts are ordered by relevance and displayed with the highlighted title and snippet of the content.
+    """
+    template_name = 'app_search/search.html'
+    context_object_name = 'posts'
+    paginate_by = settings.SEARCH_PAGE_SIZE
+
+    def get_query(self) -> str:
+        """
+        Returns the search query from the q parameter.
+        """
+        return self.request.GET.get('q', '').strip()
+
+    def get_queryset(self) -> Union[SearchResults, List]:
+        """
+        Returns the lazy search results, or an empty list if the query is empty.
+        """
+        query = self.get_query()
+        if not query:
+            return []
+        return SearchResults(query)
+
+    def get_context_data(self, *, object_list=None, **kwargs) -> Dict[str, Union[str, Profile, List]]:
+        """
+        Adds the query and the Profile instance of the current user, if authenticated, to the context.
+        """
+        context = super().get_context_data(object_list=object_list, **kwargs)
+        context['query'] = self.get_query()
+        if self.request.user.is_authenticated:
+            context['profile'] = get_profile_for_context(self.request)
+        return context
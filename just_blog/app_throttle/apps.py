@@ -0,0 +1,12 @@
+from django.apps import AppConfig
+
+
+class AppThrottleConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'app_throttle'
+
+    def ready(self) -> None:
+        """
+        Registers the system checks of the throttling.
+        """
+        from . import checks  # noqa: F401
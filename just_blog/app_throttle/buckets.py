@@ -0,0 +1,74 @@
+"""
+The token buckets of the throttling, kept in the cache shared by the workers. A bucket of the rate
+'number/period' holds up to number tokens and is refilled with number tokens per period,
+so a client may send a burst of number requests at once and then number requests per period.
+The bucket is stored as one integer: the time in microseconds when it will be full again.
+Every request moves it forward by the refill interval of one token with the atomic incr() of the cache
+and is refused if the bucket would be full later than in one period, that is, if there is no token left.
+So the concurrent requests of the workers never take more tokens than there are, as long as the cache
+is shared by the workers and its incr() is atomic: Redis, Memcached or app_cache.backends.FileBasedCache
+on one host. The local memory cache is not shared, every process would have its own buckets (see checks).
+"""
+from django.core.cache import caches
+from django.core.cache.backends.base import BaseCache
+import math
+import time
+from typing import Optional, Tuple
+
+THROTTLE_CACHE_PREFIX = 'throttle'
+
+# The periods of the rates in seconds, by the first letter of their names.
+PERIODS = {'s': 1, 'm': 60, 'h': 60 * 60, 'd': 60 * 60 * 24}
+
+
+def parse_rate(rate: str) -> Tuple[int, int]:
+    """
+    Parses the rate 'number/period' (second, minute, hour or day, only the first letter matters, e.g. '10/min')
+    into the number of the requests and the period in seconds. Raises ValueError if the rate is malformed.
+    """
+    number, _, period = rate.partition('/')
+    capacity = int(number)
+    if capacity < 1 or not period or period[0] not in PERIODS:
+        raise ValueError(f'Invalid rate {rate!r}')
+    return capacity, PERIODS[period[0]]
+
+
+class TokenBucket:
+    """
+    The token bucket with the passed capacity, refilled with capacity tokens per period (in seconds).
+    """
+
+    def __init__(self, key: str, capacity: int, period: int, cache: Optional[BaseCache] = None) -> None:
+        self.key = f'{THROTTLE_CACHE_PREFIX}:{key}'
+        self.interval = max(1, round(period * 1_000_000 / capacity))
+        self.limit = capacity * self.interval
+        # The bucket is full after one period without requests, then the key is not needed anymore.
+        self.timeout = math.ceil(period) + 1
+        self.cache = cache or caches['default']
+
+    def consume(self, now: Optional[float] = None) -> float:
+        """
+        Takes a token from the bucket. Returns 0 if there was one, otherwise the seconds until the next token.
+        The refused requests don't take tokens, so the client may retry after the returned time.
+        """
+        now = int((time.time() if now is None else now) * 1_000_000)
+        full_at = self.cache.get(self.key)
+        if full_at is None or full_at < now:
+            # The bucket is full. The concurrent requests may both start it from now,
+            # losing only the tokens of each other taken in between.
+            self.cache.set(self.key, now, self.timeout)
+        try:
+            full_at = self.cache.incr(self.key, self.interval)
+        except ValueError:
+            # The key has expired in between.
+            full_at = now + self.interval
+            self.cache.set(self.key, full_at, self.timeout)
+
+        if full_at - now > self.limit:
+            try:
+                self.cache.decr(self.key, self.interval)
+            except ValueError:
+                pass
+            return (full_at - now - self.limit) / 1_000_000
+        self.cache.touch(self.key, self.timeout)
+        return 0.0
@@ -0,0 +1,26 @@
+"""
+The system checks of the throttling.
+"""
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.checks import Warning, register
+from typing import List
+
+
+@register()
+def check_throttle_cache(app_configs, **kwargs) -> List[Warning]:
+    """
+    Warns if the throttling is enabled with the local memory cache: every process has its own token buckets,
+    so the clients may send the number of the processes times more requests than THROTTLE_RATES allow.
+    """
+    if not settings.THROTTLE_ENABLED or not isinstance(caches['default'], LocMemCache):
+        return []
+    return [
+        Warning(
+            'The throttling keeps the token buckets in the local memory cache of every process.',
+            hint='Use a cache shared by the processes with an atomic incr() (Redis, Memcached '
+                 'or app_cache.backends.FileBasedCache), or disable THROTTLE_ENABLED.',
+            id='app_throttle.W001',
+        )
+    ]
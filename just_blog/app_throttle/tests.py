@@ -0,0 +1,140 @@
+from concurrent.futures import ThreadPoolExecutor
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.shortcuts import reverse
+from django.test import SimpleTestCase, TestCase, override_settings
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+from unittest import mock
+import time
+from app_throttle.buckets import TokenBucket, parse_rate
+from app_throttle.checks import check_throttle_cache
+
+RATES = {'read': '3/min', 'write': '2/min', 'upload': '1/min', 'login': '2/min'}
+
+
+class TokenBucketTestCase(SimpleTestCase):
+
+    def setUp(self) -> None:
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def test_parse_rate(self):
+        self.assertEqual(parse_rate('10/min'), (10, 60))
+        self.assertEqual(parse_rate('5/s'), (5, 1))
+        self.assertEqual(parse_rate('100/day'), (100, 86400))
+        for rate in ('0/min', '10', '10/week', 'ten/min'):
+            with self.assertRaises(ValueError):
+                parse_rate(rate)
+
+    def test_burst_and_refill(self):
+        bucket = TokenBucket('test', 3, 60)
+        self.assertEqual([bucket.consume(1000.0) for _ in range(3)], [0, 0, 0])
+        self.assertAlmostEqual(bucket.consume(1000.0), 20.0)
+        # The refused requests don't take tokens: one token is refilled after 20 seconds.
+        self.assertAlmostEqual(bucket.consume(1010.0), 10.0)
+        self.assertEqual(bucket.consume(1020.0), 0)
+        self.assertGreater(bucket.consume(1020.0), 0)
+        # The bucket is full again after the period, but never holds more than its capacity.
+        self.assertEqual([bucket.consume(2000.0) for _ in range(3)], [0, 0, 0])
+        self.assertGreater(bucket.consume(2000.0), 0)
+
+    def test_concurrent_requests(self):
+        bucket = TokenBucket('concurrent', 10, 3600)
+        self.assertEqual(bucket.consume(), 0)
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            waits = list(executor.map(lambda _: TokenBucket('concurrent', 10, 3600).consume(), range(50)))
+        self.assertEqual(waits.count(0), 9)
+
+    def test_incr_keeps_expiry(self):
+        cache.set('counter', 10, 60)
+        self.assertEqual(cache.incr('counter', 5), 15)
+        self.assertEqual(cache.decr('counter', 3), 12)
+        self.assertEqual(cache.get('counter'), 12)
+        with self.assertRaises(ValueError):
+            cache.incr('missing')
+        cache.set('expired', 1, 1)
+        with mock.patch('time.time', return_value=time.time() + 2), self.assertRaises(ValueError):
+            cache.incr('expired')
+
+    def test_check_local_memory_cache(self):
+        self.assertEqual(check_throttle_cache(None), [])
+        with override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}):
+            self.assertEqual([error.id for error in check_throttle_cache(None)], ['app_throttle.W001'])
+            with override_settings(THROTTLE_ENABLED=False):
+                self.assertEqual(check_throttle_cache(None), [])
+
+
+@override_settings(THROTTLE_RATES=RATES)
+class ThrottleAPITestCase(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='throttled', password='robot1234')
+        cls.other = User.objects.create_user(username='another', password='robot1234')
+        cls.token = Token.objects.create(user=cls.user)
+
+    def setUp(self) -> None:
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.client = APIClient()
+
+    def test_read_scope(self):
+        url = reverse('app_api:post_list')
+        for _ in range(3):
+            self.assertEqual(self.client.get(url).status_code, status.HTTP_200_OK)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(response['Retry-After'], '20')
+
+        # Every user and every token has its own bucket.
+        token_client = APIClient()
+        token_client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        self.assertEqual(token_client.get(url).status_code, status.HTTP_200_OK)
+        self.client.force_authenticate(self.other)
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_200_OK)
+
+    def test_write_and_upload_scopes(self):
+        self.client.force_authenticate(self.user)
+        url = reverse('app_api:new_blog')
+        for _ in range(2):
+            self.assertEqual(self.client.post(url, {'title': 'blog'}).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.post(url, {'title': 'blog'}).status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+        # The reads and the uploads (the requests with files or of the upload views) are counted separately.
+        self.assertEqual(self.client.get(reverse('app_api:post_list')).status_code, status.HTTP_200_OK)
+        response = self.client.post(url, {'title': '', 'file': SimpleUploadedFile('a.txt', b'text')})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.post(reverse('app_api:new_image'), {'title': 'image'})
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(response['Retry-After'], '60')
+
+    def test_login_scope(self):
+        url = reverse('login')
+        for _ in range(2):
+            response = self.client.post(url, {'username': 'throttled', 'password': 'wrong'})
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.post(url, {'username': 'throttled', 'password': 'robot1234'})
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertIn('Retry-After', response)
+
+        response = self.client.post(reverse('user-list'), {'username': 'new-user', 'password': 'robot1234'})
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+    def test_login_page(self):
+        url = reverse('app_auth:login')
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_200_OK)
+        for _ in range(2):
+            response = self.client.post(url, {'username': 'throttled', 'password': 'wrong'})
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = self.client.post(url, {'username': 'throttled', 'password': 'robot1234'})
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(response['Retry-After'], '30')
+
+    @override_settings(THROTTLE_ENABLED=False)
+    def test_disabled(self):
+        url = reverse('app_api:post_list')
+        for _ in range(5):
+            self.assertEqual(self.client.get(url).status_code, status.HTTP_200_OK)
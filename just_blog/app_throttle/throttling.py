@@ -0,0 +1,127 @@
+"""
+The throttling of the api and the login with the token buckets (see app_throttle.buckets).
+Every request takes a token from the bucket of its scope and its client. The scopes are:
+    - login: the unsafe requests of the views logging in, creating the users and resetting
+      the passwords (THROTTLE_LOGIN_VIEWS), counted by the IP address, as the client is not authenticated yet;
+    - upload: the other unsafe requests of the views with throttle_scope = 'upload' or with files;
+    - write: the other unsafe requests;
+    - read: the safe requests.
+The authenticated clients are identified by their token, or by their user if they are authenticated
+otherwise, the anonymous ones by the IP address. The rates of the scopes are set in THROTTLE_RATES.
+"""
+from django.conf import settings
+from django.http import HttpRequest, HttpResponse
+from django.utils.translation import gettext_lazy as _
+from hashlib import sha256
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.throttling import BaseThrottle
+import math
+from .buckets import TokenBucket, parse_rate
+
+READ = 'read'
+WRITE = 'write'
+UPLOAD = 'upload'
+LOGIN = 'login'
+
+
+def take_token(scope: str, client: str) -> float:
+    """
+    Takes a token from the bucket of the client in the scope. Returns 0 if there was one,
+    otherwise the seconds until the next token.
+    """
+    capacity, period = parse_rate(settings.THROTTLE_RATES[scope])
+    return TokenBucket(f'{scope}:{client}', capacity, period).consume()
+
+
+def is_login_request(request: HttpRequest) -> bool:
+    """
+    Checks if the request is an unsafe request of a login view (see THROTTLE_LOGIN_VIEWS).
+    """
+    match = request.resolver_match
+    return request.method not in SAFE_METHODS and match is not None and match.view_name in settings.THROTTLE_LOGIN_VIEWS
+
+
+def get_ip_client(request: HttpRequest) -> str:
+    """
+    Returns the client of the anonymous request: its IP address, behind the NUM_PROXIES proxies of the api settings.
+    """
+    return f'ip:{BaseThrottle().get_ident(request)}'
+
+
+def get_throttled_response(wait: float) -> HttpResponse:
+    """
+    Returns the response 429 (Too Many Requests) with the Retry-After header for the refused request.
+    """
+    response = HttpResponse(_('Too many requests. Try again later.'), status=429)
+    response['Retry-After'] = str(math.ceil(wait))
+    return response
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """
+    The throttle of the api, taking a token from the bucket of the scope and the client of the request.
+    The refused requests are answered by the api view with 429 and the Retry-After header.
+    Disabled with THROTTLE_ENABLED.
+    """
+
+    def __init__(self) -> None:
+        self.wait_seconds = 0.0
+
+    def get_scope(self, request: HttpRequest, view) -> str:
+        """
+        Returns the scope of the request.
+        """
+        if request.method in SAFE_METHODS:
+            return READ
+        if is_login_request(request):
+            return LOGIN
+        if getattr(view, 'throttle_scope', None) == UPLOAD:
+            return UPLOAD
+        if request.content_type.startswith('multipart/') and request.FILES:
+            return UPLOAD
+        return WRITE
+
+    def get_client(self, request: HttpRequest, scope: str) -> str:
+        """
+        Returns the client of the request: the hash of the token, the id of the user or the IP address.
+        The login requests are always counted by the IP address.
+        """
+        if scope == LOGIN or not request.user.is_authenticated:
+            return get_ip_client(request)
+        key = getattr(request.auth, 'key', None)
+        if key:
+            return f'token:{sha256(key.encode("utf-8")).hexdigest()[:32]}'
+        return f'user:{request.user.pk}'
+
+    def allow_request(self, request: HttpRequest, view) -> bool:
+        """
+        Takes a token for the request and allows it if there was one.
+        """
+        if not settings.THROTTLE_ENABLED:
+            return True
+        scope = self.get_scope(request, view)
+        self.wait_seconds = take_token(scope, self.get_client(request, scope))
+        return not self.wait_seconds
+
+    def wait(self) -> float:
+        """
+        Returns the seconds until the refused request may be retried.
+        """
+        return self.wait_seconds
+
+
+class LoginThrottleMixin:
+    """
+    A mixin for the class-based login views of the site, taking a token from the login bucket
+    of the IP address for every POST. Answers 429 with the Retry-After header if there is no token.
+    """
+
+    def post(self, request: HttpRequest, *args, **kwargs) -> HttpResponse:
+        """
+        Processes the login if the client hasn't exhausted its login bucket.
+        """
+        if settings.THROTTLE_ENABLED:
+            wait = take_token(LOGIN, get_ip_client(request))
+            if wait:
+                return get_throttled_response(wait)
+        return super().post(request, *args, **kwargs)
@@ -0,0 +1,12 @@
+from django.contrib import admin
+from .models import Upload
+
+"""
+Register the model Upload in the admin panel.
+"""
+
+
+@admin.register(Upload)
+class UploadAdmin(admin.ModelAdmin):
+    list_display = 'pk', 'filename', 'target', 'status', 'offset', 'size', 'owner', 'updated_at',
+    list_filter = 'status', 'target',
@@ -0,0 +1,26 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from app_uploads.utils import clean_uploads
+
+
+class Command(BaseCommand):
+    """
+    Deletes the chunked upload sessions not updated for UPLOAD_SESSION_TTL seconds with their partial files,
+    and the orphaned partial files. Should be run periodically, e.g. by cron.
+    """
+    help = 'Deletes the stale upload sessions and their partial files.'
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument(
+            '--ttl', type=int, default=None,
+            help='The seconds without updates after which a session is stale. UPLOAD_SESSION_TTL by default.'
+        )
+        parser.add_argument('--dry-run', action='store_true', help='Only count the stale sessions and files.')
+
+    def handle(self, *args, **options) -> None:
+        ttl = settings.UPLOAD_SESSION_TTL if options['ttl'] is None else options['ttl']
+        if ttl < 0:
+            raise CommandError('--ttl should not be negative')
+        sessions, files = clean_uploads(ttl, dry_run=options['dry_run'])
+        verb = 'Would delete' if options['dry_run'] else 'Deleted'
+        self.stdout.write(self.style.SUCCESS(f'{verb} {sessions} stale sessions and {files} orphaned files'))
@@ -0,0 +1,46 @@
+# Generated by Django 4.2 on 2026-10-18 06:08
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('app_blog', '0008_updated_at'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Upload',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('target', models.CharField(choices=[('image', 'image'), ('avatar', 'avatar')], max_length=10, verbose_name='target')),
+                ('filename', models.CharField(max_length=100, verbose_name='file name')),
+                ('size', models.PositiveBigIntegerField(verbose_name='size')),
+                ('checksum', models.CharField(max_length=64, verbose_name='SHA-256 checksum')),
+                ('offset', models.PositiveBigIntegerField(default=0, verbose_name='offset')),
+                ('status', models.CharField(choices=[('pending', 'pending'), ('complete', 'complete'), ('failed', 'failed')], default='pending', max_length=10, verbose_name='status')),
+                ('title', models.CharField(blank=True, max_length=20, verbose_name='title')),
+                ('result', models.JSONField(blank=True, null=True, verbose_name='result')),
+                ('error', models.TextField(blank=True, verbose_name='error')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='created at')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='updated at')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='finished at')),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='uploads', to=settings.AUTH_USER_MODEL, verbose_name='owner')),
+                ('post', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='uploads', to='app_blog.post', verbose_name='post')),
+            ],
+            options={
+                'verbose_name': 'upload',
+                'verbose_name_plural': 'uploads',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='upload',
+            index=models.Index(fields=['status', 'updated_at'], name='upload_status_updated_idx'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2 on 2026-10-18 06:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_uploads', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='upload',
+            name='locked_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='locked at'),
+        ),
+        migrations.AddField(
+            model_name='upload',
+            name='locked_by',
+            field=models.CharField(blank=True, max_length=32, verbose_name='locked by'),
+        ),
+    ]
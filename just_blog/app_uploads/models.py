@@ -0,0 +1,76 @@
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import models
+from django.utils.translation import gettext_lazy as _
+from app_blog.models import Post
+import os
+
+
+class Upload(models.Model):
+    """
+    A model describing a session of a chunked upload: the file of the declared size and SHA-256 checksum
+    is sent in byte ranges, appended to a partial file in UPLOAD_SESSIONS_DIR, and attached
+    to its target, a new image of the post or the avatar of the owner, when the upload is finalized.
+    The offset is the number of the bytes received so far, the next chunk should start at it.
+    The request writing a chunk or finalizing the upload claims it with locked_by and locked_at
+    (see app_uploads.utils.claim_upload), so the concurrent requests never write the partial file together.
+    """
+    PENDING = 'pending'
+    COMPLETE = 'complete'
+    FAILED = 'failed'
+    STATUS_CHOICES = (
+        (PENDING, _('pending')),
+        (COMPLETE, _('complete')),
+        (FAILED, _('failed')),
+    )
+    IMAGE = 'image'
+    AVATAR = 'avatar'
+    TARGET_CHOICES = (
+        (IMAGE, _('image')),
+        (AVATAR, _('avatar')),
+    )
+
+    owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name='uploads', verbose_name=_('owner'))
+    target = models.CharField(max_length=10, choices=TARGET_CHOICES, verbose_name=_('target'))
+    filename = models.CharField(max_length=100, verbose_name=_('file name'))
+    size = models.PositiveBigIntegerField(verbose_name=_('size'))
+    checksum = models.CharField(max_length=64, verbose_name=_('SHA-256 checksum'))
+    offset = models.PositiveBigIntegerField(default=0, verbose_name=_('offset'))
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING, verbose_name=_('status'))
+    # The title and the post of the image created from the upload.
+    title = models.CharField(max_length=20, blank=True, verbose_name=_('title'))
+    post = models.ForeignKey(
+        Post, on_delete=models.CASCADE, null=True, blank=True, related_name='uploads', verbose_name=_('post')
+    )
+    result = models.JSONField(null=True, blank=True, verbose_name=_('result'))
+    error = models.TextField(blank=True, verbose_name=_('error'))
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name=_('created at'))
+    updated_at = models.DateTimeField(auto_now=True, verbose_name=_('updated at'))
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name=_('finished at'))
+    locked_by = models.CharField(max_length=32, blank=True, verbose_name=_('locked by'))
+    locked_at = models.DateTimeField(null=True, blank=True, verbose_name=_('locked at'))
+
+    class Meta:
+        verbose_name_plural = _('uploads')
+        verbose_name = _('upload')
+        indexes = [
+            models.Index(fields=['status', 'updated_at'], name='upload_status_updated_idx'),
+        ]
+
+    def __str__(self) -> str:
+        """
+        Returns the file name and the id of the upload.
+        """
+        return f'{self.filename}#{self.pk}'
+
+    def is_finished(self) -> bool:
+        """
+        Checks if the upload is complete or failed, so it accepts no more chunks.
+        """
+        return self.status in (self.COMPLETE, self.FAILED)
+
+    def get_path(self) -> str:
+        """
+        Returns the path of the partial file of the upload on the local disk.
+        """
+        return os.path.join(settings.UPLOAD_SESSIONS_DIR, f'{self.pk}.part')
@@ -0,0 +1,261 @@
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.shortcuts import reverse
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+from app_auth.models import Profile
+from app_blog.models import Blog, Post, Image
+from app_jobs.models import Job
+from app_uploads.models import Upload
+from app_uploads.utils import UploadError, claim_upload, unlock_upload, write_chunk
+from PIL import Image as PilImage
+from datetime import timedelta
+from hashlib import sha256
+from io import BytesIO, StringIO
+import base64
+import os
+import shutil
+import tempfile
+
+
+def get_image_bytes(width: int = 30, height: int = 20) -> bytes:
+    buffer = BytesIO()
+    PilImage.frombytes('RGB', (width, height), os.urandom(width * height * 3)).save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+@override_settings(UPLOAD_BLOCK_SIZE=16, UPLOAD_CHUNK_MAX_SIZE=200, UPLOAD_MAX_SIZE=10000)
+class ChunkedUploadTestCase(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='uploader', password='uploader1234')
+        cls.profile = Profile.objects.create(user=cls.user)
+        blog = Blog.objects.create(profile=cls.profile, title='blog', description='description')
+        cls.post = Post.objects.create(title='post', tag='tag', content='content', blog=blog, profile=cls.profile)
+        other = User.objects.create_user(username='stranger', password='stranger1234')
+        other_profile = Profile.objects.create(user=other)
+        other_blog = Blog.objects.create(profile=other_profile, title='blog', description='description')
+        cls.other_post = Post.objects.create(
+            title='post', tag='tag', content='content', blog=other_blog, profile=other_profile
+        )
+        cls.other = other
+
+    def setUp(self) -> None:
+        for name in ('MEDIA_ROOT', 'UPLOAD_SESSIONS_DIR'):
+            directory = tempfile.mkdtemp()
+            directory_settings = override_settings(**{name: directory})
+            directory_settings.enable()
+            self.addCleanup(directory_settings.disable)
+            self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.content = get_image_bytes()
+
+    def create_upload(self, content: bytes, target: str = Upload.IMAGE, **fields):
+        data = {
+            'target': target, 'filename': 'photo.png', 'size': len(content), 'checksum': sha256(content).hexdigest(),
+        }
+        if target == Upload.IMAGE:
+            data.update(title='photo', post=self.post.pk)
+        data.update(fields)
+        return self.client.post(reverse('app_api:upload_create'), data, format='json')
+
+    def send_chunk(self, pk: int, content: bytes, start: int, size: int, **headers):
+        return self.client.put(
+            reverse('app_api:upload_detail', kwargs={'pk': pk}), content, content_type='application/octet-stream',
+            HTTP_CONTENT_RANGE=f'bytes {start}-{start + len(content) - 1}/{size}', **headers
+        )
+
+    def send_file(self, pk: int, content: bytes, chunk_size: int = 150) -> None:
+        for start in range(0, len(content), chunk_size):
+            response = self.send_chunk(pk, content[start:start + chunk_size], start, len(content))
+            self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+
+    def finalize(self, pk: int):
+        return self.client.post(reverse('app_api:upload_finalize', kwargs={'pk': pk}))
+
+    def test_image_upload(self):
+        response = self.create_upload(self.content)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED, response.data)
+        self.assertEqual((response.data['offset'], response.data['status']), (0, Upload.PENDING))
+        pk = response.data['id']
+
+        first, second = self.content[:150], self.content[150:300]
+        self.assertEqual(self.send_chunk(pk, first, 0, len(self.content)).status_code, status.HTTP_200_OK)
+        digest = base64.b64encode(sha256(second).digest()).decode()
+        response = self.send_chunk(pk, second, 150, len(self.content), HTTP_CONTENT_DIGEST=f'sha-256=:{digest}:')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['offset'], 300)
+        self.assertEqual(response['Range'], 'bytes=0-299')
+
+        response = self.client.get(reverse('app_api:upload_detail', kwargs={'pk': pk}))
+        self.assertEqual((response.data['offset'], response['Range']), (300, 'bytes=0-299'))
+        for start in range(300, len(self.content), 150):
+            response = self.send_chunk(pk, self.content[start:start + 150], start, len(self.content))
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        response = self.finalize(pk)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED, response.data)
+        image = Image.objects.get(pk=response.data['id'])
+        self.assertEqual((image.title, image.post_id), ('photo', self.post.pk))
+        with image.image.open('rb') as file:
+            self.assertEqual(file.read(), self.content)
+        self.assertTrue(Job.objects.filter(name='generate_image_derivatives', payload__pk=image.pk).exists())
+
+        upload = Upload.objects.get(pk=pk)
+        self.assertEqual((upload.status, upload.result), (Upload.COMPLETE, {'image': image.pk}))
+        self.assertFalse(os.path.exists(upload.get_path()))
+        self.assertEqual(self.finalize(pk).status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(self.send_chunk(pk, b'x', 0, len(self.content)).status_code, status.HTTP_409_CONFLICT)
+
+    def test_avatar_upload(self):
+        pk = self.create_upload(self.content, target=Upload.AVATAR, filename='dir/avatar.PNG').data['id']
+        digest = sha256(self.content).hexdigest()
+        self.send_file(pk, self.content)
+        response = self.finalize(pk)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED, response.data)
+        self.assertEqual(response.data['id'], self.profile.pk)
+        self.profile.refresh_from_db()
+        self.assertEqual(self.profile.avatar.name, f'avatars/{digest[:2]}/{digest[2:4]}/{digest}.png')
+        with self.profile.avatar.open('rb') as file:
+            self.assertEqual(file.read(), self.content)
+        self.assertEqual(Upload.objects.get(pk=pk).result, {'avatar': self.profile.pk})
+
+    def test_resume(self):
+        pk = self.create_upload(self.content).data['id']
+        size = len(self.content)
+        self.assertEqual(self.send_chunk(pk, self.content[:100], 0, size).status_code, status.HTTP_200_OK)
+
+        # The chunks not starting at the offset get the offset to resume from.
+        for start in (0, 150):
+            response = self.send_chunk(pk, self.content[start:start + 50], start, size)
+            self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+            self.assertEqual((response.data['offset'], response['Range']), (100, 'bytes=0-99'))
+
+        # The chunk not matching its digest is rejected and the received part is kept.
+        digest = base64.b64encode(sha256(b'other').digest()).decode()
+        response = self.send_chunk(pk, self.content[100:150], 100, size, HTTP_CONTENT_DIGEST=f'sha-256=:{digest}:')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        upload = Upload.objects.get(pk=pk)
+        self.assertEqual(upload.offset, 100)
+        self.assertEqual(os.path.getsize(upload.get_path()), 100)
+
+        # An interrupted chunk is truncated back to its start.
+        with self.assertRaises(UploadError):
+            write_chunk(upload, BytesIO(self.content[100:120]), 100, 50)
+        self.assertEqual(os.path.getsize(upload.get_path()), 100)
+
+        self.assertEqual(self.finalize(pk).status_code, status.HTTP_409_CONFLICT)
+        for start in range(100, size, 150):
+            self.assertEqual(self.send_chunk(pk, self.content[start:start + 150], start, size).status_code, 200)
+        self.assertEqual(self.finalize(pk).status_code, status.HTTP_201_CREATED)
+
+    def test_concurrent_chunks(self):
+        pk = self.create_upload(self.content).data['id']
+        size = len(self.content)
+        upload = Upload.objects.get(pk=pk)
+
+        # Another request is writing the chunk at the offset: the chunks at the same offset are refused.
+        token = claim_upload(upload, 0)
+        self.assertIsNone(claim_upload(upload, 0))
+        response = self.send_chunk(pk, self.content[:100], 0, size)
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(response.data['offset'], 0)
+        self.assertFalse(os.path.exists(upload.get_path()))
+        self.assertTrue(unlock_upload(upload, token))
+        self.assertEqual(self.send_chunk(pk, self.content[:100], 0, size).status_code, status.HTTP_200_OK)
+
+        # The claim of an interrupted request is taken over after UPLOAD_LOCK_TIMEOUT.
+        token = claim_upload(upload, 100)
+        Upload.objects.filter(pk=pk).update(locked_at=timezone.now() - timedelta(seconds=3600))
+        self.assertEqual(self.send_chunk(pk, self.content[100:200], 100, size).status_code, status.HTTP_200_OK)
+        self.assertFalse(unlock_upload(upload, token))
+        self.assertEqual(Upload.objects.filter(pk=pk, locked_by='').values_list('offset', flat=True).get(), 200)
+
+    def test_invalid_file(self):
+        pk = self.create_upload(self.content, checksum='0' * 64).data['id']
+        self.send_file(pk, self.content)
+        response = self.finalize(pk)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        upload = Upload.objects.get(pk=pk)
+        self.assertEqual(upload.status, Upload.FAILED)
+        self.assertIn('checksum', upload.error)
+        self.assertFalse(os.path.exists(upload.get_path()))
+        self.assertFalse(Image.objects.exists())
+
+        text = b'not an image at all'
+        pk = self.create_upload(text).data['id']
+        self.send_file(pk, text)
+        self.assertEqual(self.finalize(pk).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Upload.objects.get(pk=pk).status, Upload.FAILED)
+
+    def test_validation(self):
+        for fields in (
+                {'post': None}, {'title': ''}, {'post': self.other_post.pk}, {'size': 10001}, {'size': 0},
+                {'checksum': 'abc'}, {'target': 'video'},
+        ):
+            with self.subTest(fields=fields):
+                response = self.create_upload(self.content, **fields)
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.create_upload(self.content, target=Upload.AVATAR, post=self.post.pk)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        pk = self.create_upload(self.content).data['id']
+        url = reverse('app_api:upload_detail', kwargs={'pk': pk})
+        size = len(self.content)
+        response = self.client.put(url, b'abc', content_type='application/octet-stream')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.send_chunk(pk, self.content[:201], 0, size).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.send_chunk(pk, self.content[:10], 0, size + 1).status_code, 400)
+        response = self.client.put(
+            url, b'abc', content_type='application/octet-stream', HTTP_CONTENT_RANGE=f'bytes 0-9/{size}'
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        # The uploads of the other users are not found.
+        self.client.force_authenticate(self.other)
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.send_chunk(pk, self.content[:10], 0, size).status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.finalize(pk).status_code, status.HTTP_404_NOT_FOUND)
+        self.client.force_authenticate(None)
+        self.assertIn(self.client.get(url).status_code, (status.HTTP_401_UNAUTHORIZED, status.HTTP_403_FORBIDDEN))
+
+    def test_cancel(self):
+        pk = self.create_upload(self.content).data['id']
+        self.send_chunk(pk, self.content[:100], 0, len(self.content))
+        path = Upload.objects.get(pk=pk).get_path()
+        self.assertTrue(os.path.exists(path))
+        response = self.client.delete(reverse('app_api:upload_detail', kwargs={'pk': pk}))
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertFalse(Upload.objects.filter(pk=pk).exists())
+        self.assertFalse(os.path.exists(path))
+
+    def test_clean_uploads(self):
+        stale_pk = self.create_upload(self.content).data['id']
+        fresh_pk = self.create_upload(self.content).data['id']
+        for pk in (stale_pk, fresh_pk):
+            self.send_chunk(pk, self.content[:100], 0, len(self.content))
+        Upload.objects.filter(pk=stale_pk).update(updated_at=timezone.now() - timedelta(days=2))
+        stale_path, fresh_path = Upload(pk=stale_pk).get_path(), Upload(pk=fresh_pk).get_path()
+        orphan_path = Upload(pk=999).get_path()
+        with open(orphan_path, 'wb') as file:
+            file.write(b'orphan')
+        old = (timezone.now() - timedelta(days=2)).timestamp()
+        os.utime(orphan_path, (old, old))
+
+        out = StringIO()
+        call_command('clean_uploads', '--dry-run', stdout=out)
+        self.assertIn('Would delete 1 stale sessions and 1 orphaned files', out.getvalue())
+        self.assertTrue(os.path.exists(stale_path) and os.path.exists(orphan_path))
+
+        out = StringIO()
+        call_command('clean_uploads', stdout=out)
+        self.assertIn('Deleted 1 stale sessions and 1 orphaned files', out.getvalue())
+        self.assertEqual(list(Upload.objects.values_list('pk', flat=True)), [fresh_pk])
+        self.assertFalse(os.path.exists(stale_path) or os.path.exists(orphan_path))
+        self.assertTrue(os.path.exists(fresh_path))
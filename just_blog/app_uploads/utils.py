@@ -0,0 +1,255 @@
+"""
+The chunked uploads. A client creates an upload session declaring the size and the SHA-256 checksum
+of the file, sends the file in byte ranges with the Content-Range header, each chunk starting
+at the offset of the session, and finalizes the session. The chunks are copied from the request stream
+to the partial file on the local disk block by block, so neither the whole file nor a whole chunk
+is held in memory, and an interrupted upload is resumed from the offset of the session.
+The finalized file is verified and moved to the storage as a new image of the post or the avatar of the owner.
+"""
+from django.conf import settings
+from django.core.files import File
+from django.db import transaction
+from django.db.models import Model, Q
+from django.utils import timezone
+from PIL import Image as PILImage
+from app_auth.models import Profile
+from app_blog.models import Image
+from .models import Upload
+from datetime import timedelta
+from hashlib import sha256
+import base64
+import binascii
+import os
+import re
+import uuid
+from typing import IO, Optional, Tuple
+
+CONTENT_RANGE_RE = re.compile(r'^bytes (\d+)-(\d+)/(\d+)$')
+
+
+class UploadError(Exception):
+    """
+    Raised when a chunk can't be written or the finalized file is not valid.
+    """
+
+
+class PartFile(File):
+    """
+    The partial file of a finalized upload. Exposes the path on the disk like the temporary uploaded files,
+    so the file system storage moves the file instead of copying it.
+    """
+
+    def temporary_file_path(self) -> str:
+        """
+        Returns the path of the partial file.
+        """
+        return self.file.name
+
+
+def parse_content_range(value: str) -> Tuple[int, int, int]:
+    """
+    Parses the Content-Range header 'bytes start-end/size' into the first and the last byte of the chunk
+    and the size of the file. Raises ValueError if the header is malformed or the range is not within the file.
+    """
+    match = CONTENT_RANGE_RE.match(value.strip())
+    if match is None:
+        raise ValueError(f'Invalid Content-Range {value!r}')
+    start, end, size = map(int, match.groups())
+    if start > end or end >= size:
+        raise ValueError(f'Invalid Content-Range {value!r}')
+    return start, end, size
+
+
+def parse_content_digest(value: str) -> Optional[bytes]:
+    """
+    Returns the SHA-256 digest from the Content-Digest header (e.g. 'sha-256=:base64:'),
+    or None if the header has no SHA-256 digest. Raises ValueError if the digest is malformed.
+    """
+    for item in value.split(','):
+        algorithm, _, digest = item.strip().partition('=')
+        if algorithm.strip().lower() != 'sha-256':
+            continue
+        try:
+            digest = base64.b64decode(digest.strip().strip(':'), validate=True)
+        except binascii.Error:
+            raise ValueError(f'Invalid Content-Digest {value!r}')
+        if len(digest) != sha256().digest_size:
+            raise ValueError(f'Invalid Content-Digest {value!r}')
+        return digest
+    return None
+
+
+def claim_upload(upload: Upload, offset: int) -> Optional[str]:
+    """
+    Claims the pending upload at the offset for the current request, or takes over the claim of a request
+    that hasn't finished in UPLOAD_LOCK_TIMEOUT seconds. The upload is claimed with an UPDATE conditioned
+    on its status, offset and lock, so only one of the concurrent requests gets it.
+    Returns the token of the claim, or None if the upload is claimed by another request or has changed.
+    """
+    token = uuid.uuid4().hex
+    now = timezone.now()
+    claimed = Upload.objects.filter(
+        Q(locked_by='') | Q(locked_at__lt=now - timedelta(seconds=settings.UPLOAD_LOCK_TIMEOUT)),
+        pk=upload.pk, status=Upload.PENDING, offset=offset,
+    ).update(locked_by=token, locked_at=now, updated_at=now)
+    return token if claimed else None
+
+
+def unlock_upload(upload: Upload, token: str, **fields) -> bool:
+    """
+    Releases the claim of the upload, updating the passed fields, while the claim is still held by the token.
+    Returns False if it was taken over.
+    """
+    return bool(Upload.objects.filter(pk=upload.pk, locked_by=token).update(
+        locked_by='', locked_at=None, updated_at=timezone.now(), **fields
+    ))
+
+
+def write_chunk(upload: Upload, stream: IO[bytes], start: int, length: int, digest: Optional[bytes] = None) -> None:
+    """
+    Copies length bytes from the stream to the partial file of the upload at start, by UPLOAD_BLOCK_SIZE blocks.
+    The bytes after start left by an interrupted write are overwritten. If the stream ends early
+    or the chunk doesn't match the digest, the partial file is truncated back to start and UploadError is raised.
+    """
+    path = upload.get_path()
+    if start and not os.path.exists(path):
+        raise UploadError('The received part of the file is lost.')
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    hasher = sha256() if digest is not None else None
+    with open(path, 'r+b' if start else 'wb') as file:
+        file.seek(start)
+        file.truncate()
+        remaining = length
+        while remaining:
+            block = stream.read(min(settings.UPLOAD_BLOCK_SIZE, remaining))
+            if not block:
+                break
+            file.write(block)
+            if hasher is not None:
+                hasher.update(block)
+            remaining -= len(block)
+        if remaining:
+            file.truncate(start)
+            raise UploadError(f'The chunk ended after {length - remaining} of {length} bytes.')
+        if hasher is not None and hasher.digest() != digest:
+            file.truncate(start)
+            raise UploadError('The chunk does not match its Content-Digest.')
+
+
+def compute_checksum(path: str) -> str:
+    """
+    Returns the hex SHA-256 checksum of the file, read by UPLOAD_BLOCK_SIZE blocks.
+    """
+    hasher = sha256()
+    with open(path, 'rb') as file:
+        while block := file.read(settings.UPLOAD_BLOCK_SIZE):
+            hasher.update(block)
+    return hasher.hexdigest()
+
+
+def verify_upload(upload: Upload) -> None:
+    """
+    Raises UploadError if the received file doesn't match the checksum of the upload or is not an image.
+    """
+    path = upload.get_path()
+    if not os.path.exists(path) or os.path.getsize(path) != upload.size:
+        raise UploadError('The received file does not match the size of the upload.')
+    if compute_checksum(path) != upload.checksum:
+        raise UploadError('The received file does not match the checksum of the upload.')
+    try:
+        with PILImage.open(path) as image:
+            image.verify()
+    except Exception:
+        raise UploadError('The received file is not a valid image.')
+
+
+def attach_upload(upload: Upload) -> Model:
+    """
+    Moves the received file to the storage as a new image of the post of the upload or the new avatar
+    of its owner, and returns the created image or the updated profile.
+    """
+    with open(upload.get_path(), 'rb') as file:
+        part = PartFile(file, name=upload.filename)
+        if upload.target == Upload.IMAGE:
+            instance = Image(title=upload.title, post=upload.post, image=part)
+        else:
+            instance = Profile.objects.get(user_id=upload.owner_id)
+            instance.avatar = part
+        instance.save()
+    return instance
+
+
+def delete_part_file(upload: Upload) -> None:
+    """
+    Deletes the partial file of the upload, if there is one.
+    """
+    try:
+        os.remove(upload.get_path())
+    except FileNotFoundError:
+        pass
+
+
+def fail_upload(upload: Upload, error: str) -> None:
+    """
+    Marks the upload as failed with the error and deletes its partial file.
+    """
+    upload.status = Upload.FAILED
+    upload.error = error
+    upload.finished_at = timezone.now()
+    upload.save(update_fields=['status', 'error', 'finished_at', 'updated_at'])
+    delete_part_file(upload)
+
+
+def finalize_upload(upload: Upload) -> Model:
+    """
+    Verifies the received file of the upload and attaches it to the target of the upload.
+    Returns the created image or the updated profile. If the file is not valid, the upload fails
+    and UploadError is raised.
+    """
+    try:
+        verify_upload(upload)
+    except UploadError as exc:
+        fail_upload(upload, str(exc))
+        raise
+    with transaction.atomic():
+        instance = attach_upload(upload)
+        upload.status = Upload.COMPLETE
+        upload.result = {upload.target: instance.pk}
+        upload.finished_at = timezone.now()
+        upload.save(update_fields=['status', 'result', 'finished_at', 'updated_at'])
+    delete_part_file(upload)
+    return instance
+
+
+def clean_uploads(ttl: int, dry_run: bool = False) -> Tuple[int, int]:
+    """
+    Deletes the upload sessions not updated for ttl seconds with their partial files, and the partial files
+    of UPLOAD_SESSIONS_DIR older than ttl without a pending session, e.g. left by a crashed worker.
+    Returns the numbers of the deleted sessions and the deleted orphaned files.
+    With dry_run only counts them.
+    """
+    cutoff = timezone.now() - timedelta(seconds=ttl)
+    stale = Upload.objects.filter(updated_at__lt=cutoff)
+    sessions = 0
+    for upload in stale.only('id').iterator():
+        if not dry_run:
+            delete_part_file(upload)
+        sessions += 1
+    if not dry_run:
+        stale.delete()
+
+    files = 0
+    directory = settings.UPLOAD_SESSIONS_DIR
+    if not os.path.isdir(directory):
+        return sessions, files
+    pending = {str(pk) for pk in Upload.objects.filter(status=Upload.PENDING).values_list('pk', flat=True)}
+    for entry in os.scandir(directory):
+        name, extension = os.path.splitext(entry.name)
+        if not entry.is_file() or extension != '.part' or name in pending:
+            continue
+        if entry.stat().st_mtime >= cutoff.timestamp():
+            continue
+        if not dry_run:
+            os.remove(entry.path)
+        files += 1
+    return sessions, files
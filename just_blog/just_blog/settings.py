@@ -50,6 +50,14 @@ INSTALLED_APPS = [
     'rest_framework.authtoken',
     'djoser',
     'app_api.apps.AppApiConfig',
+    'app_cache.apps.AppCacheConfig',
+    'app_jobs.apps.AppJobsConfig',
+    'app_media.apps.AppMediaConfig',
+    'app_search.apps.AppSearchConfig',
+    'app_queries.apps.AppQueriesConfig',
+    'app_bench.apps.AppBenchConfig',
+    'app_throttle.apps.AppThrottleConfig',
+    'app_uploads.apps.AppUploadsConfig',
     'django_filters',
     'drf_yasg',
 ]
@@ -61,8 +69,10 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'app_auth.middleware.ProfileMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'app_queries.middleware.QueryBudgetMiddleware',
     # 'debug_toolbar.middleware.DebugToolbarMiddleware',
 ]
 
@@ -79,17 +89,30 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'app_auth.context_processors.profile',
             ],
         },
     },
 ]
 
-CASHES = {
+# The cache is shared by the processes: the web processes keep the token buckets of the throttling in it,
+# and the workers of the jobs (the run_jobs command) invalidate the cached pages and the stored ETags
+# of the objects they change, so it can't be the local memory cache of one process.
+# The file-based cache is shared by the processes of one host, use Redis or Memcached with several nodes.
+CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': 'app_cache.backends.FileBasedCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache/'),
     }
 }
 
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+
+PAGE_CACHE_TIMEOUT = 60 * 15
+
+# The seconds the serialized feeds are kept in the cache (see app_rss.feeds.CachedFeed).
+FEED_CACHE_TIMEOUT = 60 * 60
+
 WSGI_APPLICATION = 'just_blog.wsgi.application'
 
 
@@ -152,6 +175,125 @@ STATICFILES_DIRS = os.path.join(BASE_DIR, 'static/'),
 
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media/')
 
+# The uploaded images and avatars are stored by their content (see app_media.storage): the files
+# of MEDIA_CONTENT_ADDRESSED_DIRS are named by their SHA-256 and sharded into subdirectories,
+# so the identical uploads share one file. The existing files are converted with the dedupe_media command.
+STORAGES = {
+    'default': {'BACKEND': 'app_media.storage.ContentAddressedStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+}
+
+MEDIA_CONTENT_ADDRESSED_DIRS = ('images/', 'avatars/')
+
+SITEMAP_ROOT = os.path.join(BASE_DIR, 'sitemaps/')
+
+SITEMAP_SECTION_SIZE = 50000
+
+# The seconds the etags of the sitemap of the posts are kept in the cache (see app_blog.sitemap).
+# They are also replaced whenever a published post changes.
+SITEMAP_CACHE_TIMEOUT = 60 * 60
+
+# The number of the posts imported from a csv file that are saved with one bulk_create query.
+POST_IMPORT_BATCH_SIZE = 1000
+
+# The maximum number of the items in one request to the batch endpoints of the posts api.
+POST_BATCH_MAX_ITEMS = 100
+
+# The number of the characters of the content returned as the excerpt of a post in the compact lists of the api.
+API_EXCERPT_LENGTH = 200
+
+# The lists of the api are serialized from the rows of values() without the model instances
+# (see app_api.values.ValuesSerializer), unless the serializer has a field it doesn't support.
+API_VALUES_SERIALIZATION = True
+
+# The background jobs: the directory in the storage for the uploaded files waiting for a worker,
+# the default number of attempts, the delay before the first retry (doubled after every attempt),
+# the seconds after which a running job is considered abandoned by its worker
+# and the number of the jobs a worker tries to claim at once.
+JOB_FILES_DIR = 'jobs/'
+
+JOB_MAX_ATTEMPTS = 3
+
+JOB_RETRY_DELAY = 10
+
+JOB_LOCK_TIMEOUT = 60 * 30
+
+JOB_CLAIM_CANDIDATES = 10
+
+# The derivatives of the uploaded images: the directory in the storage, the widths of the thumbnails
+# and the quality of the JPEG and WebP encoding.
+IMAGE_DERIVATIVES_DIR = 'derivatives/'
+
+IMAGE_DERIVATIVE_WIDTHS = (80, 160, 320, 640, 1280)
+
+IMAGE_DERIVATIVE_QUALITY = 80
+
+# The chunked uploads of the api (see app_uploads): the local directory of the partial files,
+# the maximum size of an uploaded file and of one chunk, the size of the blocks copied from the request
+# to the disk, the seconds without updates after which a session is deleted by the clean_uploads command
+# and the seconds after which the claim of a session by an interrupted request is taken over.
+UPLOAD_SESSIONS_DIR = os.path.join(BASE_DIR, 'uploads/')
+
+UPLOAD_MAX_SIZE = 20 * 1024 * 1024
+
+UPLOAD_CHUNK_MAX_SIZE = 5 * 1024 * 1024
+
+UPLOAD_BLOCK_SIZE = 64 * 1024
+
+UPLOAD_SESSION_TTL = 60 * 60 * 24
+
+UPLOAD_LOCK_TIMEOUT = 60 * 5
+
+# The full-text search of the posts: the backend (app_search.backends.DatabaseSearchBackend
+# for the databases without FTS5), the maximum number of the words in a query and the page size.
+SEARCH_BACKEND = 'app_search.backends.Fts5SearchBackend'
+
+SEARCH_MAX_TERMS = 10
+
+SEARCH_PAGE_SIZE = 10
+
+# The profile of the current user is resolved once per request (request.profile).
+# With PROFILE_SESSION_CACHE its id is kept in the session under PROFILE_SESSION_KEY,
+# so the profile is loaded by the primary key.
+PROFILE_SESSION_CACHE = True
+
+PROFILE_SESSION_KEY = '_profile_id'
+
+# The budgets of the SQL queries per request: the middleware recording the queries is enabled in the debug mode,
+# and in the strict mode raises an exception instead of logging a warning. A request may execute
+# QUERY_BUDGET_DEFAULT queries, unless the name of its view has its own budget in QUERY_BUDGETS,
+# and may repeat a statement with different parameters at most QUERY_BUDGET_MAX_REPEATS times.
+# Only the requests with the methods from QUERY_BUDGET_METHODS are checked: the writes also update
+# the counters, the tags, the search index and the cache, so their cost is not bounded by the page.
+# The budgets are checked for every route by the tests of app_queries.
+QUERY_BUDGET_ENABLED = DEBUG
+
+QUERY_BUDGET_STRICT = False
+
+QUERY_BUDGET_DEFAULT = 10
+
+QUERY_BUDGET_MAX_REPEATS = 3
+
+QUERY_BUDGET_METHODS = ('GET', 'HEAD')
+
+QUERY_BUDGETS = {
+    'app_blog:user_blog_list': 5,
+    'app_blog:blog_detail': 6,
+    'app_blog:post_detail': 6,
+    'app_blog:posts_latest': 5,
+    'app_blog:publish_or_archive': 12,
+    'app_auth:profile_detail': 4,
+    'app_auth:profile_public': 4,
+    'app_main:index': 4,
+    'app_api:profile_list': 5,
+    'app_api:blog_list': 4,
+    'app_api:blog_detail': 4,
+    'app_api:post_detail': 5,
+    'app_api:post_list': 4,
+    'app_api:search': 5,
+    'app_api:tag_list': 4,
+}
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
@@ -172,8 +314,28 @@ REST_FRAMEWORK = {
         'rest_framework.authentication.BasicAuthentication',
         'rest_framework.authentication.SessionAuthentication',
     ],
+    'DEFAULT_THROTTLE_CLASSES': ['app_throttle.throttling.TokenBucketThrottle'],
 }
 
+# The throttling of the api and the login (see app_throttle): every client has a token bucket per scope
+# in the cache, holding up to number tokens of the rate 'number/period' and refilled with number tokens per period.
+# The login scope covers the unsafe requests of the views from THROTTLE_LOGIN_VIEWS and the login page,
+# the upload scope the unsafe requests with files, the write scope the other unsafe requests
+# and the read scope the safe ones.
+THROTTLE_ENABLED = True
+
+THROTTLE_RATES = {
+    'read': '1200/min',
+    'write': '120/min',
+    'upload': '30/min',
+    'login': '10/min',
+}
+
+THROTTLE_LOGIN_VIEWS = (
+    'login', 'user-list', 'user-activation', 'user-resend-activation', 'user-reset-password',
+    'user-reset-password-confirm', 'user-reset-username', 'user-reset-username-confirm',
+)
+
 # INTERNAL_IPS = [
 #     # ...
 #     "127.0.0.1",
@@ -26,17 +26,14 @@ from drf_yasg.views import get_schema_view
 from rest_framework import permissions
 
 from django.contrib.sitemaps.views import sitemap
-from app_blog.sitemap import PostSiteMap
+from app_blog.sitemap import post_sitemap_index, post_sitemap_section
+from app_blog.views import TagPostsView
 from app_main.sitemap import StaticSiteMap
 
 sitemap_static = {
     'static': StaticSiteMap,
 }
 
-sitemap_posts = {
-    'posts': PostSiteMap,
-}
-
 
 schema_view = get_schema_view(
     openapi.Info(
@@ -60,6 +57,9 @@ urlpatterns = [
     path('i18n', include('django.conf.urls.i18n')),
     path('blogs/', include('app_blog.urls')),
     path('posts-feed/', include('app_rss.urls')),
+    path('tags/<str:slug>/', TagPostsView.as_view(), name='tag_posts'),
+    path('jobs/', include('app_jobs.urls')),
+    path('search/', include('app_search.urls')),
     path('api/', include('app_api.urls')),
     path('api/auth/', include('djoser.urls')),
     re_path(r'^auth/', include('djoser.urls.authtoken')),
@@ -71,11 +71,8 @@ urlpatterns = [
          {'sitemaps': sitemap_static},
          name='django.contrib.sitemaps.views.sitemap'
          ),
-    path('sitemap-posts.xml/',
-         sitemap,
-         {'sitemaps': sitemap_posts},
-         name='django.contrib.sitemaps.views.sitemap'
-         ),
+    path('sitemap-posts.xml/', post_sitemap_index, name='post_sitemap_index'),
+    path('sitemap-posts-<int:section>.xml/', post_sitemap_section, name='post_sitemap_section'),
 ]
 
 